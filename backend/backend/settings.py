@@ -73,6 +73,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "grc.middleware.RequestMetricsMiddleware",
+    "grc.middleware.CompressedJSONMiddleware",  # gzip large JSON bodies; before anything that reads the body
     "corsheaders.middleware.CorsMiddleware",
     "grc.middleware.CORSMiddleware",
     "django.middleware.security.SecurityMiddleware",
@@ -141,6 +143,17 @@ DATABASES = {
     }
 }
 
+# Second connection to the same database for writes that must be visible to
+# other processes while the current request's transaction is still open
+# (upload task progress written from inside a framework import)
+DATABASES["progress"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+
+# Start the PDF processing, acknowledgement fan-out and email outbox workers
+# inside the web process. Off unless the server enables it (the Dockerfile
+# passes it to gunicorn only), so tests, shells and django.setup() scripts never
+# claim jobs or send mail.
+BACKGROUND_WORKERS_AUTOSTART = os.environ.get('BACKGROUND_WORKERS_AUTOSTART', 'false').lower() == 'true'
+
 # ===== SESSION CONFIGURATION - CRITICAL FOR AUTHENTICATION! =====
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Use database sessions
 SESSION_SAVE_EVERY_REQUEST = True  # Save session on every request to keep it active
@@ -5,6 +5,7 @@ from django.conf.urls.static import static
 from django.http import HttpResponse
 from django.views.decorators.cache import cache_control
 from django.views.generic import TemplateView
+from grc.routes.Global.request_metrics import metrics_view
 from grc.routes.Integrations.Bamboohr.bamboohr import (
     bamboohr_oauth, bamboohr_oauth_callback, bamboohr_stored_data,
     bamboohr_employees, bamboohr_departments, bamboohr_sync_data, bamboohr_reports, bamboohr_debug
@@ -38,7 +39,8 @@ from grc.routes.Integrations.Gmail.gmail_integration import (
     gmail_oauth_initiate, gmail_oauth_callback, get_gmail_connection_status,
     get_gmail_messages, get_calendar_events, download_attachment,
     get_stored_gmail_data, get_stored_gmail_data_formatted, save_gmail_data_to_db, disconnect_gmail,
-    test_gmail_headers, save_gmail_message_to_integration_list, save_calendar_event_to_integration_list
+    test_gmail_headers, save_gmail_message_to_integration_list, save_calendar_event_to_integration_list,
+    sync_gmail_mailbox
 )
 from grc.routes.Integrations.Sentinel.sentinel import (
     sentinel_oauth_start, sentinel_oauth_callback, sentinel_disconnect,
@@ -58,6 +60,7 @@ def favicon_view(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('favicon.ico', favicon_view, name='favicon'),  # Handle favicon requests
+    path('api/metrics/', metrics_view, name='metrics'),  # Per-endpoint request metrics (Prometheus)
     path('api/', include('grc.urls')),  # Use the correct app name for API routes
     path('api/', include('backend.api.urls')),  # Include API module URLs
     
@@ -102,6 +105,7 @@ urlpatterns = [
     path('api/gmail/oauth-callback/', gmail_oauth_callback, name='gmail-oauth-callback'),
     path('api/gmail/connection-status/', get_gmail_connection_status, name='gmail-connection-status'),
     path('api/gmail/messages/', get_gmail_messages, name='gmail-messages'),
+    path('api/gmail/sync/', sync_gmail_mailbox, name='gmail-sync'),
     path('api/gmail/calendar-events/', get_calendar_events, name='gmail-calendar-events'),
     path('api/gmail/download-attachment/', download_attachment, name='gmail-download-attachment'),
     path('api/gmail/stored-data/', get_stored_gmail_data, name='gmail-stored-data'),
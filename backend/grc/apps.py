@@ -1,4 +1,21 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.conf import settings
+
+
+def _should_start_workers():
+    """Only web servers that opt in run the background queues"""
+    if not getattr(settings, 'BACKGROUND_WORKERS_AUTOSTART', False):
+        return False
+    if os.path.basename(sys.argv[0]) != 'manage.py':
+        # Set for the WSGI server only (e.g. gunicorn --env)
+        return True
+    if len(sys.argv) < 2 or sys.argv[1] != 'runserver':
+        return False
+    # runserver's autoreloader imports the project twice; only the serving child runs workers
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
 
 
 class GrcConfig(AppConfig):
@@ -7,4 +24,18 @@ class GrcConfig(AppConfig):
     
     def ready(self):
         # Import signal handlers when the app is ready
-        import grc.signals.event_signals
\ No newline at end of file
+        import grc.signals.event_signals
+
+        if _should_start_workers():
+            self.start_background_workers()
+
+    def start_background_workers(self):
+        # Each honours its own *_IN_PROCESS_* setting; jobs queued before a restart
+        # or waiting for a retry run without needing a new enqueue to wake them
+        from grc.routes.Global.notification_outbox import start_delivery_worker
+        from grc.routes.Global.pdf_processing_queue import start_workers
+        from grc.routes.Policy.acknowledgement_fanout import start_fanout_worker
+
+        start_workers()
+        start_fanout_worker()
+        start_delivery_worker()
@@ -11,6 +11,14 @@ _local_storage = threading.local()
 # In-memory cache as fallback
 _memory_cache: Dict[str, Dict[str, Any]] = {}
 
+def _invalidate_conditional_responses() -> None:
+    """Framework-filtered endpoints include the selection in their ETags"""
+    try:
+        from .routes.Global.conditional_responses import touch, FRAMEWORK_SELECTION
+        touch(FRAMEWORK_SELECTION)
+    except Exception as e:
+        print(f"⚠️ DEBUG: Could not bump framework selection version: {str(e)}")
+
 def set_framework_context(user_id: str, framework_id: str, request=None) -> None:
     """
     Store framework ID for a user
@@ -48,6 +56,8 @@ def set_framework_context(user_id: str, framework_id: str, request=None) -> None
         except Exception as e:
             print(f"⚠️ DEBUG: Could not clear session: {str(e)}")
     
+    _invalidate_conditional_responses()
+
     print(f"✅ Framework context set: User {user_id_str}, Framework {framework_id_str}")
     print(f"🔍 Thread-local keys: {list(_local_storage.framework_context.keys()) if hasattr(_local_storage, 'framework_context') else []}")
     print(f"🔍 Memory cache keys: {list(_memory_cache.keys())}")
@@ -133,6 +143,8 @@ def clear_framework_context(user_id: str, request=None) -> None:
         except Exception as e:
             print(f"⚠️ DEBUG: Could not clear session: {str(e)}")
     
+    _invalidate_conditional_responses()
+
     print(f"✅ Framework context cleared for user {user_id}")
     print(f"🔍 DEBUG: Thread-local after clear: {getattr(_local_storage, 'framework_context', {})}")
     print(f"🔍 DEBUG: Memory cache after clear: {_memory_cache}")
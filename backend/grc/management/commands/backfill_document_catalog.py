@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ...routes.DocumentHandling.document_catalog import catch_up
+
+
+class Command(BaseCommand):
+    help = 'Builds the document catalog from file_operations and stores the catch-up watermark'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Rescan every upload instead of only those changed since the stored watermark'
+        )
+
+    def handle(self, *args, **options):
+        processed = catch_up(force=True, backfill=True, full=options['full'])
+        self.stdout.write(f'Scanned {processed} uploads into the document catalog')
@@ -0,0 +1,116 @@
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import JSONRenderer
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from operator import attrgetter
+import gc
+import json
+import time
+import tracemalloc
+
+from ...models import Compliance
+from ...routes.Compliance.compliance import COMPLIANCE_LIST_FIELDS
+from ...routes.Global.fast_json import dumps, orjson, project_rows, use_orjson
+
+
+def synthetic_rows(count):
+    """Rows shaped like the incident/event listings: ids, text, dates, decimals, nested JSON"""
+    started = datetime(2024, 1, 1, 9, 30)
+    return [
+        {
+            'IncidentId': row_id,
+            'IncidentTitle': f'Incident {row_id}',
+            'Description': 'Unauthorised access attempt detected on a production host ' * 2,
+            'RiskPriority': ('High', 'Medium', 'Low')[row_id % 3],
+            'Status': ('Open', 'Scheduled', 'Closed')[row_id % 3],
+            'Date': (started + timedelta(minutes=row_id)).date(),
+            'CreatedAt': started + timedelta(minutes=row_id, microseconds=row_id),
+            'CostOfIncident': Decimal(row_id) / Decimal(7),
+            'AssignerId': row_id % 50 or None,
+            'IsAuditFinding': row_id % 2 == 0,
+            'mitigation': {'1': 'Rotate credentials', '2': 'Review access logs'},
+        }
+        for row_id in range(count)
+    ]
+
+
+def formatted_rows(rows):
+    """What the views do today: format every date by hand before encoding"""
+    return [
+        dict(
+            row,
+            Date=row['Date'].strftime('%Y-%m-%d'),
+            CreatedAt=row['CreatedAt'].isoformat(),
+            CostOfIncident=str(row['CostOfIncident']),
+        )
+        for row in rows
+    ]
+
+
+def model_rows(queryset, fields):
+    """Row dicts built from model instances, as the list views did before project_rows"""
+    getters = {key: attrgetter(lookup.replace('__', '.')) for key, lookup in fields.items()}
+    relations = {lookup.rsplit('__', 1)[0] for lookup in fields.values() if '__' in lookup}
+    return [
+        {key: getter(obj) for key, getter in getters.items()}
+        for obj in queryset.select_related(*relations)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Compares JSON serialization time and memory for large list payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='Rows in the synthetic payload (default: 50000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per path; the fastest is reported')
+        parser.add_argument(
+            '--compliances', action='store_true',
+            help='Also compare model instantiation with values_list() projection on the compliance table'
+        )
+
+    def measure(self, label, build):
+        timings = []
+        peak = 0
+        size = 0
+        for _ in range(max(1, self.repeat)):
+            gc.collect()
+            tracemalloc.start()
+            started = time.perf_counter()
+            payload = build()
+            timings.append(time.perf_counter() - started)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            size = len(payload) if isinstance(payload, (bytes, str)) else len(payload or ())
+            del payload
+        self.stdout.write(
+            f"  {label:<42} {min(timings) * 1000:9.1f} ms  peak {peak / 1048576:8.1f} MB  size {size}"
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        rows = synthetic_rows(options['rows'])
+        self.stdout.write(
+            f"Encoding {len(rows)} rows (orjson {'available' if orjson is not None else 'not installed'}, "
+            f"FAST_JSON_BACKEND uses {'orjson' if use_orjson() else 'json'})"
+        )
+        self.measure(
+            'strftime per row + JsonResponse encoder',
+            lambda: json.dumps(formatted_rows(rows), cls=DjangoJSONEncoder).encode('utf-8')
+        )
+        self.measure('DRF JSONRenderer', lambda: JSONRenderer().render(rows))
+        self.measure('fast_json.dumps (stdlib fallback)', lambda: dumps(rows, backend='json'))
+        if orjson is not None:
+            self.measure('fast_json.dumps (orjson)', lambda: dumps(rows, backend='orjson'))
+
+        if options['compliances']:
+            queryset = Compliance.objects.order_by('ComplianceId')[:options['rows']]
+            self.stdout.write(f"Projecting up to {options['rows']} compliance rows")
+            self.measure(
+                'model instances + JSONRenderer',
+                lambda: JSONRenderer().render(model_rows(queryset, COMPLIANCE_LIST_FIELDS))
+            )
+            self.measure(
+                'project_rows + fast_json.dumps',
+                lambda: dumps(project_rows(queryset, COMPLIANCE_LIST_FIELDS), decimal_as=float)
+            )
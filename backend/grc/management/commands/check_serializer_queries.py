@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import AuditFinding, Framework, Incident, Policy
+from ...routes.Global.query_planning import assert_constant_queries
+from ...serializers import AuditFindingSerializer, FrameworkSerializer, IncidentSerializer, PolicySerializer
+
+# (serializer, queryset factory) pairs checked by default
+PLANNED_SERIALIZERS = [
+    (FrameworkSerializer, lambda: Framework.objects.order_by('FrameworkId')),
+    (PolicySerializer, lambda: Policy.objects.order_by('PolicyId')),
+    (AuditFindingSerializer, lambda: AuditFinding.objects.order_by('pk')),
+    (IncidentSerializer, lambda: Incident.objects.order_by('IncidentId')),
+]
+
+
+class Command(BaseCommand):
+    help = 'Checks that list serializers use a constant number of queries as the list grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1, 5, 25],
+            help='List sizes to serialize (default: 1 5 25)'
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+        for serializer_class, make_queryset in PLANNED_SERIALIZERS:
+            try:
+                counts = assert_constant_queries(serializer_class, make_queryset(), sizes=options['sizes'])
+            except AssertionError as e:
+                failures.append(str(e))
+                self.stdout.write(f"FAIL {e}")
+                continue
+            if not counts:
+                self.stdout.write(f"SKIP {serializer_class.__name__}: no rows")
+                continue
+            summary = ', '.join(f"{size} rows: {count}" for size, count in counts.items())
+            self.stdout.write(f"OK   {serializer_class.__name__} ({summary} queries)")
+        if failures:
+            raise CommandError(f"{len(failures)} serializer(s) issue queries per row")
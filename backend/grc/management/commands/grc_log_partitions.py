@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+import logging
+
+from ...routes.Global import grc_log_store
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Maintains monthly grc_logs partitions and archives months older than the hot window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='store_true', help='Show partitions and archived months')
+        parser.add_argument('--setup-sql', action='store_true', help='Print the one-time partitioning ALTER statements')
+        parser.add_argument('--execute', action='store_true', help='With --setup-sql, run the statements instead of printing them')
+        parser.add_argument('--maintain', action='store_true', help='Add future partitions and archive cold months')
+        parser.add_argument('--no-drop', action='store_true', help='Write archives but keep the rows in the table')
+
+    def handle(self, *args, **options):
+        if options['setup_sql']:
+            statements = grc_log_store.partition_setup_sql()
+            if not options['execute']:
+                for statement in statements:
+                    self.stdout.write(f"{statement};")
+                return
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    self.stdout.write(f"Running: {statement.splitlines()[0]}")
+                    cursor.execute(statement)
+            self.stdout.write('grc_logs is now partitioned by month')
+            return
+
+        if options['maintain']:
+            added = grc_log_store.ensure_future_partitions()
+            if added:
+                self.stdout.write(f"Added partitions: {', '.join(added)}")
+            for result in grc_log_store.archive_cold_months(drop=not options['no_drop']):
+                self.stdout.write(
+                    f"{result['month']}: archived {result['archived']}, removed {result['removed']}"
+                    + (f" -> {result['path']}" if result['path'] else '')
+                )
+                logger.info(f"grc_logs archive {result}")
+            return
+
+        self._status()
+
+    def _status(self):
+        partitions = grc_log_store.partitions()
+        self.stdout.write(f"Hot window starts {grc_log_store.hot_window_start()}")
+        if partitions:
+            self.stdout.write(f"{len(partitions)} partitions: {', '.join(name for name, _ in partitions)}")
+        else:
+            self.stdout.write('grc_logs is not partitioned (see --setup-sql)')
+        archived = grc_log_store.archived_months()
+        for month, path in sorted(archived.items()):
+            self.stdout.write(f"  archived {month:%Y-%m}: {path}")
+        if not archived:
+            self.stdout.write('No archived months')
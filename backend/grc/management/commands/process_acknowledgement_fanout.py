@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+import logging
+
+from ...routes.Policy.acknowledgement_fanout import process_pending, IDLE_POLL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Sends queued policy acknowledgement emails and in-app notifications in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run pending fan-outs once and exit')
+        parser.add_argument('--max-requests', type=int, default=None, help='Acknowledgement requests to run per pass')
+        parser.add_argument('--interval', type=float, default=IDLE_POLL_SECONDS, help='Seconds to sleep when idle')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Starting acknowledgement fan-out worker...')
+        while True:
+            try:
+                close_old_connections()
+                stats = process_pending(max_requests=options['max_requests'])
+                if any(stats.values()):
+                    self.stdout.write(
+                        f"Completed {stats['completed']} fan-outs ({stats['failed']} failed)"
+                    )
+            except KeyboardInterrupt:
+                self.stdout.write('Acknowledgement fan-out worker stopped')
+                return
+            except Exception as e:
+                logger.error(f'Acknowledgement fan-out worker error: {str(e)}')
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
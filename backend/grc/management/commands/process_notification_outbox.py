@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+import logging
+
+from ...routes.Global.notification_outbox import deliver_pending, IDLE_POLL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued notification emails from the notification_outbox table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the outbox once and exit')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows claimed per SMTP session')
+        parser.add_argument('--interval', type=float, default=IDLE_POLL_SECONDS, help='Seconds to sleep when idle')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Starting notification outbox worker...')
+        while True:
+            try:
+                close_old_connections()
+                stats = deliver_pending(batch_size=options['batch_size'])
+                if stats['batches']:
+                    self.stdout.write(
+                        f"Sent {stats['emails_sent']} emails for {stats['rows_sent']} queued notifications "
+                        f"({stats['rows_retried']} to retry, {stats['rows_failed']} failed)"
+                    )
+            except KeyboardInterrupt:
+                self.stdout.write('Notification outbox worker stopped')
+                return
+            except Exception as e:
+                logger.error(f'Notification outbox worker error: {str(e)}')
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
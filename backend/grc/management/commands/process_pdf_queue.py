@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+import logging
+
+from ...routes.Global.pdf_processing_queue import process_pending, queue_metrics, IDLE_POLL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Processes uploaded PDFs queued in the pdf_processing_jobs table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+        parser.add_argument('--max-jobs', type=int, default=None, help='Jobs to run per pass')
+        parser.add_argument('--interval', type=float, default=IDLE_POLL_SECONDS, help='Seconds to sleep when idle')
+        parser.add_argument('--metrics', action='store_true', help='Print queue depth and stage timings and exit')
+
+    def handle(self, *args, **options):
+        if options['metrics']:
+            metrics = queue_metrics()
+            self.stdout.write(f"Backlog: {metrics['backlog']}")
+            self.stdout.write(
+                f"Completed in last {metrics['window_minutes']} min: {metrics['completed_in_window']} "
+                f"({metrics['jobs_per_minute']}/min)"
+            )
+            for stage, seconds in metrics['mean_stage_seconds'].items():
+                self.stdout.write(f"  {stage}: {seconds}s average")
+            return
+
+        self.stdout.write('Starting PDF processing worker...')
+        while True:
+            try:
+                close_old_connections()
+                stats = process_pending(max_jobs=options['max_jobs'])
+                if any(stats.values()):
+                    self.stdout.write(
+                        f"Processed {stats['completed']} PDFs ({stats['retried_or_failed']} to retry or failed)"
+                    )
+            except KeyboardInterrupt:
+                self.stdout.write('PDF processing worker stopped')
+                return
+            except Exception as e:
+                logger.error(f'PDF processing worker error: {str(e)}')
+
+            if options['once']:
+                return
+            time.sleep(options['interval'])
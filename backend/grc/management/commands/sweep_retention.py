@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from ...routes.Global.retention_sweeper import RetentionSweeper, SWEEP_MODELS
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Archives and deletes records whose retention period has expired, in small chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows archived and deleted per transaction')
+        parser.add_argument('--pause', type=float, default=None, help='Seconds to sleep between chunks')
+        parser.add_argument('--max-rows', type=int, default=None, help='Stop after deleting this many rows')
+        parser.add_argument('--max-seconds', type=float, default=None, help='Stop after running this long')
+        parser.add_argument(
+            '--model', action='append', dest='models', default=None,
+            help=f"Model label to sweep by retentionExpiry (repeatable, default: {', '.join(SWEEP_MODELS)})"
+        )
+
+    def handle(self, *args, **options):
+        sweeper = RetentionSweeper(
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size'],
+            pause_seconds=options['pause'],
+            max_rows=options['max_rows'],
+            max_seconds=options['max_seconds'],
+            stdout=self.stdout,
+        )
+        try:
+            stats = sweeper.run(models=options['models'])
+        except KeyboardInterrupt:
+            self.stdout.write('Retention sweep interrupted; the next run resumes from the last completed chunk')
+            return
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(
+            f"{verb} {stats['deleted']} rows ({stats['archived']} archived, "
+            f"{stats['skipped_held']} held, {stats['timelines_disposed']} timelines disposed, "
+            f"{stats['timelines_skipped']} timelines skipped)"
+        )
+        for table, table_stats in stats['by_table'].items():
+            self.stdout.write(f"  {table}: {table_stats}")
+        for table, path in stats.get('archives', {}).items():
+            self.stdout.write(f"  archive {table}: {path}")
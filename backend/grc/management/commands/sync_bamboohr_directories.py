@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from ...models import ExternalApplicationConnection
+from ...routes.Integrations.Bamboohr.bamboohr_sync import BambooHRSyncEngine, client_for_connection
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Incrementally syncs the BambooHR employee directory of every active connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connection-id', type=int, default=None, help='Only sync this connection')
+
+    def handle(self, *args, **options):
+        connections = ExternalApplicationConnection.objects.filter(
+            application__name='BambooHR',
+            connection_status='active'
+        )
+        if options['connection_id']:
+            connections = connections.filter(id=options['connection_id'])
+
+        for connection in connections:
+            try:
+                stats = BambooHRSyncEngine(client_for_connection(connection), connection).sync()
+            except Exception as e:
+                logger.error(f'BambooHR sync failed for connection {connection.id}: {str(e)}')
+                self.stdout.write(f'Connection {connection.id}: failed ({str(e)})')
+                continue
+            if stats['status'] == 'success':
+                self.stdout.write(
+                    f"Connection {connection.id}: {stats['inserted']} inserted, {stats['updated']} updated, "
+                    f"{stats['deleted']} deleted, {stats['unchanged']} unchanged in {stats['duration_seconds']}s"
+                )
+            else:
+                self.stdout.write(f"Connection {connection.id}: failed ({stats.get('error')})")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from ...models import UsersProjectList, invalidate_project_summaries
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Backfills users_project_membership from the users_list JSON of every project assignment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Project assignments loaded per query')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        synced = changed = 0
+        last_id = 0
+        while True:
+            chunk = list(UsersProjectList.objects.filter(id__gt=last_id).order_by('id')[:chunk_size])
+            if not chunk:
+                break
+            for project_list in chunk:
+                try:
+                    changed_users = project_list.sync_memberships()
+                    if changed_users:
+                        changed += 1
+                        invalidate_project_summaries(changed_users)
+                except Exception as e:
+                    logger.error(f'Could not sync memberships for project list {project_list.id}: {str(e)}')
+                synced += 1
+            last_id = chunk[-1].id
+        self.stdout.write(f'Synced {synced} project assignments ({changed} changed)')
@@ -1,12 +1,18 @@
 import jwt
 import logging
+import cProfile
+import time
+from contextlib import ExitStack
 from django.conf import settings
+from django.db import connections
 from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
 from django.utils.deprecation import MiddlewareMixin
 from .models import Users
 from .authentication import verify_jwt_token
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .routes.Global import request_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +55,7 @@ class JWTAuthenticationMiddleware(MiddlewareMixin):
             '/api/frameworks/set-selected/',  # Skip authentication for setting selected framework (home page)
             '/api/home/policies-by-status-public/',  # Skip authentication for public home page policies
             '/api/get-notifications/',
+            '/api/metrics/',  # Protected by METRICS_TOKEN instead (see request_metrics.py)
             '/api/push-notification/',
             '/jwt/refresh/',
             '/api/test-submit-review/',  # Add test endpoint to skip list
@@ -310,3 +317,53 @@ class AuditLoggingMiddleware(MiddlewareMixin):
             logger.info(f"User {user.UserName} (ID: {user.UserId}) accessing {request.method} {request.path}")
         
         return None
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per-endpoint query count, DB time, Python time and response size
+    (see routes/Global/request_metrics.py). Listed first so it covers every
+    other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request_metrics.ENABLED:
+            return self.get_response(request)
+
+        recorder = request_metrics.QueryRecorder()
+        profiler = cProfile.Profile() if request_metrics.should_profile() else None
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            if profiler:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+        request_metrics.record_request(request, response, time.perf_counter() - started, recorder, profiler)
+        return response
+
+
+class CompressedJSONMiddleware(GZipMiddleware):
+    """
+    Gzips JSON and text responses of at least GZIP_MIN_BYTES. Streams (the
+    notification SSE endpoint) and already-compressed downloads such as PDFs
+    and Excel exports are passed through unchanged.
+    """
+
+    min_bytes = getattr(settings, 'GZIP_MIN_BYTES', 1024)
+    compressible_types = ('application/json', 'text/')
+
+    def process_response(self, request, response):
+        if response.streaming or len(response.content) < self.min_bytes:
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(self.compressible_types):
+            return response
+        return super().process_response(request, response)
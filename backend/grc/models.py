@@ -489,6 +489,36 @@ class ExportTask(models.Model):
         db_table = 'exported_files'
 
 
+class UploadTaskProgress(models.Model):
+    """Shared progress state for background framework upload/processing tasks"""
+    id = models.AutoField(primary_key=True)
+    task_id = models.CharField(max_length=255, unique=True)
+    progress = models.IntegerField(default=0)
+    message = models.TextField(null=True, blank=True)
+    stage = models.CharField(max_length=50, null=True, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('running', 'Running'),
+            ('completed', 'Completed'),
+            ('failed', 'Failed')
+        ],
+        default='running'
+    )
+    # {stage: {"started_at": epoch, "ended_at": epoch, "duration": seconds}}
+    stage_timings = models.JSONField(default=dict, blank=True)
+    # Incremented on every update so long-poll/SSE clients can detect changes
+    version = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    retentionExpiry = models.DateField(null=True, blank=True)
+    class Meta:
+        db_table = 'upload_task_progress'
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+
+
 
 # Audit model
 class Audit(models.Model):
@@ -818,6 +848,90 @@ class Notification(models.Model):
         db_table = 'notifications'
 
 
+class NotificationOutbox(models.Model):
+    """Rendered emails waiting for the outbox delivery worker"""
+    id = models.AutoField(primary_key=True)
+    recipient = models.CharField(max_length=255)
+    email_type = models.CharField(max_length=20, default='gmail')
+    notification_type = models.CharField(max_length=100)
+    subject = models.CharField(max_length=500)
+    body_html = models.TextField()
+    # sha256 of recipient/email_type/subject/body, used to drop duplicates
+    dedupe_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('pending', 'Pending'),
+            ('sending', 'Sending'),
+            ('sent', 'Sent'),
+            ('failed', 'Failed')
+        ],
+        default='pending'
+    )
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    # Set when this row was delivered as part of another row's email
+    coalesced_into = models.IntegerField(null=True, blank=True)
+    # Digest grouping (see routes/Global/notification_digest.py)
+    digest_key = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    digest_count = models.IntegerField(default=1)
+    digest_items = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    retentionExpiry = models.DateField(null=True, blank=True)
+    class Meta:
+        db_table = 'notification_outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['recipient', 'status']),
+        ]
+
+
+class InAppNotification(models.Model):
+    """In-app notifications shown in the sidebar (see routes/Global/notification_store.py)"""
+    id = models.CharField(max_length=36, primary_key=True)
+    user_id = models.CharField(max_length=100)
+    title = models.CharField(max_length=500)
+    message = models.TextField(blank=True, default='')
+    category = models.CharField(max_length=50, default='common')
+    priority = models.CharField(max_length=20, default='medium')
+    link = models.TextField(null=True, blank=True)
+    # Digest grouping (see routes/Global/notification_digest.py)
+    digest_key = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+    digest = models.JSONField(null=True, blank=True)
+    is_read = models.BooleanField(default=False)
+    read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    retentionExpiry = models.DateField(null=True, blank=True)
+    class Meta:
+        db_table = 'in_app_notifications'
+        indexes = [
+            models.Index(fields=['user_id', 'created_at']),
+            models.Index(fields=['user_id', 'is_read', 'created_at']),
+        ]
+
+
+class InAppNotificationCounter(models.Model):
+    """Per-user unread count and change version, updated with every notification write"""
+    user_id = models.CharField(max_length=100, primary_key=True)
+    unread = models.IntegerField(default=0)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        db_table = 'in_app_notification_counters'
+
+
+class ChangeCounter(models.Model):
+    """Change version of a table (or other scope), bumped after every committed write; used for ETags"""
+    scope = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        db_table = 'change_counters'
+
+
 class S3File(models.Model):
     url = models.TextField()
     file_type = models.CharField(max_length=50, null=True, blank=True)
@@ -1003,10 +1117,20 @@ class GRCLog(models.Model):
     Description = models.TextField(null=True)
     IPAddress = models.CharField(max_length=45, null=True)
     AdditionalInfo = models.JSONField(null=True, blank=True)
-    FrameworkId = models.ForeignKey('Framework', on_delete=models.CASCADE, db_column='FrameworkId')
+    # No database FK: MySQL cannot partition a table that has foreign keys
+    # (grc_logs is partitioned by month, see routes/Global/grc_log_store.py)
+    FrameworkId = models.ForeignKey('Framework', on_delete=models.CASCADE, db_column='FrameworkId', db_constraint=False)
     retentionExpiry = models.DateField(null=True, blank=True)
     class Meta:
         db_table = 'grc_logs'
+        indexes = [
+            # Range scans of the retention sweeper
+            models.Index(fields=['retentionExpiry']),
+            # Log viewer: newest-first by module, and per-user history
+            models.Index(fields=['Timestamp', 'Module']),
+            models.Index(fields=['UserId', 'Timestamp']),
+            models.Index(fields=['EntityType', 'Timestamp']),
+        ]
 
     def __str__(self):
         return f"Log {self.LogId}: {self.ActionType} on {self.Module}"
@@ -1728,7 +1852,7 @@ class Applicability(models.Model):
 
 
 # Signal handlers for automatic risk record management
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
 @receiver(post_save, sender=Compliance)
@@ -2304,6 +2428,12 @@ class FileOperations(models.Model):
         verbose_name = 'File Operation'
         verbose_name_plural = 'File Operations'
         ordering = ['-created_at']
+        indexes = [
+            # Used by the document catalog to pick up rows written outside the ORM
+            models.Index(fields=['updated_at']),
+            # Range scans of the retention sweeper
+            models.Index(fields=['retentionExpiry']),
+        ]
 
     def __str__(self):
         return f"{self.operation_type.title()} - {self.file_name} ({self.status})"
@@ -2327,6 +2457,91 @@ class FileOperations(models.Model):
         return self.original_name or self.file_name or "Unknown File"
 
 
+class PdfProcessingJob(models.Model):
+    """
+    Durable queue entry for post-upload PDF processing
+    (download -> text extraction -> metadata -> AI summary -> store)
+    """
+    id = models.AutoField(primary_key=True)
+    # file_operations.id of the upload; one job per upload
+    operation_id = models.IntegerField(unique=True)
+    s3_url = models.TextField()
+    file_name = models.CharField(max_length=500)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('completed', 'Completed'),
+            ('failed', 'Failed')
+        ],
+        default='pending'
+    )
+    stage = models.CharField(max_length=20, default='queued')
+    # {stage: {"started_at": epoch, "ended_at": epoch, "duration": seconds}} of the latest attempt
+    stage_timings = models.JSONField(default=dict, blank=True)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    retentionExpiry = models.DateField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'pdf_processing_jobs'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['completed_at']),
+        ]
+
+    def __str__(self):
+        return f"PDF job {self.id} for operation {self.operation_id} ({self.status}/{self.stage})"
+
+
+class DocumentCatalogEntry(models.Model):
+    """
+    Read model behind the Document Handling list.
+
+    One row per user-visible upload in file_operations, with the display name,
+    uploader name, extension and module already resolved so the list endpoint
+    never parses metadata or looks up users per row. Maintained by
+    routes/DocumentHandling/document_catalog.py.
+    """
+    file_operation = models.OneToOneField(
+        FileOperations, on_delete=models.CASCADE, primary_key=True, db_constraint=False,
+        db_column='file_operation_id', related_name='catalog_entry'
+    )
+    display_name = models.CharField(max_length=500)
+    uploader_id = models.CharField(max_length=255)
+    uploader_name = models.CharField(max_length=255)
+    extension = models.CharField(max_length=20)
+    module = models.CharField(max_length=45)
+    status = models.CharField(max_length=10)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=255, null=True, blank=True)
+    s3_url = models.TextField(null=True, blank=True)
+    s3_key = models.CharField(max_length=1000, null=True, blank=True)
+    s3_bucket = models.CharField(max_length=255, null=True, blank=True)
+    # Lower-cased display name, file name and uploader for the search box
+    search_text = models.CharField(max_length=1000)
+    uploaded_at = models.DateTimeField(null=True, blank=True)
+    # file_operations.updated_at when this row was built (catch-up watermark)
+    source_updated_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    retentionExpiry = models.DateField(null=True, blank=True)
+    class Meta:
+        db_table = 'document_catalog'
+        indexes = [
+            models.Index(fields=['uploaded_at']),
+            models.Index(fields=['module', 'uploaded_at']),
+            models.Index(fields=['extension', 'uploaded_at']),
+            models.Index(fields=['module', 'extension', 'uploaded_at']),
+            models.Index(fields=['uploader_id']),
+        ]
+
+
 # =====================================================
 # DOCUMENT HANDLING MODULE - FileOperations Signal Handler
 # =====================================================
@@ -2338,6 +2553,16 @@ def set_file_operations_retention_expiry(sender, instance, created, **kwargs):
         _set_retention_expiry(instance, 'document_handling', 'document_upload')
 
 
+@receiver(post_save, sender=FileOperations)
+def refresh_document_catalog_entry(sender, instance, **kwargs):
+    """Keep the document catalog row in step with ORM writes to file_operations"""
+    try:
+        from grc.routes.DocumentHandling.document_catalog import refresh_entries
+        refresh_entries([instance.id])
+    except Exception as e:
+        print(f"Warning: could not refresh document catalog for file operation {instance.id}: {e}")
+
+
 # =====================================================
 # EXTERNAL APPLICATIONS MODELS
 # =====================================================
@@ -2544,6 +2769,114 @@ class UsersProjectList(models.Model):
         """Check if a user is assigned to this project"""
         return user_id in (self.users_list or [])
 
+    def member_ids(self):
+        """users_list as a set of integer user IDs (entries may be stored as strings)"""
+        ids = set()
+        for user_id in self.users_list or []:
+            try:
+                ids.add(int(user_id))
+            except (TypeError, ValueError):
+                continue
+        return ids
+
+    def sync_memberships(self):
+        """
+        Bring users_project_membership in line with users_list.
+
+        Returns the set of user IDs whose membership changed.
+        """
+        wanted = self.member_ids()
+        current = set(self.memberships.values_list('user_id', flat=True))
+        added = wanted - current
+        removed = current - wanted
+        if removed:
+            self.memberships.filter(user_id__in=removed).delete()
+        if added:
+            UsersProjectMembership.objects.bulk_create(
+                [UsersProjectMembership(project_list=self, user_id=user_id) for user_id in added],
+                ignore_conflicts=True
+            )
+        return added | removed
+
+
+class UsersProjectMembership(models.Model):
+    """
+    One row per (project assignment, user): the indexed form of
+    UsersProjectList.users_list, kept in sync whenever a project list is saved
+    """
+    id = models.BigAutoField(primary_key=True)
+    project_list = models.ForeignKey(UsersProjectList, on_delete=models.CASCADE, related_name='memberships')
+    user_id = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    retentionExpiry = models.DateField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'users_project_membership'
+        unique_together = ['project_list', 'user_id']
+        indexes = [
+            models.Index(fields=['user_id', 'project_list']),
+        ]
+
+    def __str__(self):
+        return f"User {self.user_id} -> project list {self.project_list_id}"
+
+
+def project_summary_scope(user_id):
+    """ChangeCounter scope the cached StreamLine project summary of a user is keyed on"""
+    return f"project_summary:{user_id}"
+
+
+def invalidate_project_summaries(user_ids):
+    # A database counter, not cache.delete: the cache is per process, the counter is shared
+    from grc.routes.Global.conditional_responses import touch
+    scopes = [project_summary_scope(user_id) for user_id in user_ids]
+    if scopes:
+        touch(*scopes)
+
+
+@receiver(post_save, sender=UsersProjectList)
+def sync_users_project_memberships(sender, instance, **kwargs):
+    """Mirror users_list into users_project_membership and drop cached per-user summaries"""
+    try:
+        changed = instance.sync_memberships()
+        # Active flag, list type or dates may have changed for every member
+        invalidate_project_summaries(changed | instance.member_ids())
+    except Exception as e:
+        print(f"Warning: could not sync memberships for project list {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=UsersProjectList)
+def drop_users_project_summaries(sender, instance, **kwargs):
+    try:
+        invalidate_project_summaries(instance.member_ids())
+    except Exception as e:
+        print(f"Warning: could not invalidate project summaries for project list {instance.id}: {e}")
+
+
+@receiver([post_save, post_delete], sender=Framework)
+@receiver([post_save, post_delete], sender=FrameworkApproval)
+@receiver([post_save, post_delete], sender=Policy)
+@receiver([post_save, post_delete], sender=PolicyApproval)
+@receiver([post_save, post_delete], sender=SubPolicy)
+@receiver([post_save, post_delete], sender=Compliance)
+@receiver([post_save, post_delete], sender=ComplianceApproval)
+@receiver([post_save, post_delete], sender=Audit)
+@receiver([post_save, post_delete], sender=AuditFinding)
+@receiver([post_save, post_delete], sender=Incident)
+@receiver([post_save, post_delete], sender=Risk)
+@receiver([post_save, post_delete], sender=RiskInstance)
+@receiver([post_save, post_delete], sender=RBAC)
+def bump_change_counter(sender, **kwargs):
+    """
+    Conditional GET endpoints build their ETags, and analytics facet counts
+    their cache keys, from these tables' change counters
+    """
+    try:
+        from grc.routes.Global.conditional_responses import touch
+        touch(sender)
+    except Exception as e:
+        print(f"Warning: could not bump change counter for {sender.__name__}: {e}")
+
 
 class IntegrationDataList(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -2570,6 +2903,56 @@ class IntegrationDataList(models.Model):
         return f"{self.id} — {self.heading}"
 
 
+class IntegrationSyncWatermark(models.Model):
+    """
+    Delta-sync checkpoint for an external source (e.g. last incident update
+    time seen for a Sentinel tenant)
+    """
+    id = models.AutoField(primary_key=True)
+    source = models.CharField(max_length=100)
+    scope_key = models.CharField(max_length=255, help_text="Tenant, connection or account the watermark belongs to")
+    watermark = models.DateTimeField(null=True, blank=True)
+    cursor = models.JSONField(null=True, blank=True, help_text="Source specific sync state")
+    last_sync_stats = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    retentionExpiry = models.DateField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'integration_sync_watermarks'
+        unique_together = ['source', 'scope_key']
+
+    def __str__(self):
+        return f"{self.source}:{self.scope_key} @ {self.watermark}"
+
+
+class BambooHREmployee(models.Model):
+    """
+    One BambooHR directory entry of a connection, with a content hash of the
+    raw record so syncs only write employees that changed
+    """
+    id = models.BigAutoField(primary_key=True)
+    connection = models.ForeignKey(ExternalApplicationConnection, on_delete=models.CASCADE, related_name='bamboohr_employees')
+    employee_id = models.CharField(max_length=50)
+    content_hash = models.CharField(max_length=64)
+    data = models.JSONField(help_text="Directory record as returned by BambooHR")
+    department = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(max_length=50, null=True, blank=True)
+    first_synced_at = models.DateTimeField()
+    last_synced_at = models.DateTimeField()
+    retentionExpiry = models.DateField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'bamboohr_employees'
+        unique_together = ['connection', 'employee_id']
+        indexes = [
+            models.Index(fields=['connection', 'department']),
+        ]
+
+    def __str__(self):
+        return f"BambooHR employee {self.employee_id} (connection {self.connection_id})"
+
+
 class OAuthState(models.Model):
     """
     OAuth State model for storing OAuth state during external OAuth flows
@@ -2611,6 +2994,13 @@ class PolicyAcknowledgementRequest(models.Model):
         ('Completed', 'Completed'),
         ('Cancelled', 'Cancelled'),
     ]
+    FANOUT_STATUS_CHOICES = [
+        ('NotRequired', 'Not Required'),
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+    ]
 
     AcknowledgementRequestId = models.AutoField(primary_key=True)
     PolicyId = models.ForeignKey('Policy', on_delete=models.CASCADE, db_column='PolicyId')
@@ -2640,6 +3030,17 @@ class PolicyAcknowledgementRequest(models.Model):
     # Notifications
     EmailNotificationSent = models.BooleanField(default=False)
     
+    # Background notification fan-out (see routes/Policy/acknowledgement_fanout.py)
+    FanoutStatus = models.CharField(max_length=20, choices=FANOUT_STATUS_CHOICES, default='NotRequired')
+    FanoutOptions = models.JSONField(null=True, blank=True, help_text="Channels and link settings for the fan-out")
+    FanoutCursor = models.IntegerField(default=0, help_text="Last AcknowledgementUserId notified")
+    FanoutAttempts = models.IntegerField(default=0)
+    FanoutLockedAt = models.DateTimeField(null=True, blank=True)
+    FanoutError = models.TextField(null=True, blank=True)
+    FanoutCompletedAt = models.DateTimeField(null=True, blank=True)
+    NotifiedCount = models.IntegerField(default=0, help_text="Users whose notifications were queued")
+    NotificationFailedCount = models.IntegerField(default=0, help_text="Users whose email could not be queued")
+    
     FrameworkId = models.ForeignKey('Framework', on_delete=models.CASCADE, db_column='FrameworkId')
     retentionExpiry = models.DateField(null=True, blank=True)
     
@@ -2650,6 +3051,7 @@ class PolicyAcknowledgementRequest(models.Model):
             models.Index(fields=['PolicyId', 'PolicyVersion']),
             models.Index(fields=['Status', 'CreatedAt']),
             models.Index(fields=['CreatedBy']),
+            models.Index(fields=['FanoutStatus', 'FanoutLockedAt']),
         ]
     
     def __str__(self):
@@ -3492,3 +3894,78 @@ def upsert_retention_timeline(instance, record_type: str, record_name: str = Non
         print(f"[RETENTION] RetentionTimeline {action} for {record_type}#{rid} (end={timeline.RetentionEndDate})")
     except Exception as e:
         print(f"[RETENTION] RetentionTimeline upsert failed for {record_type}#{getattr(instance, 'pk', None)}: {e}")
+
+
+# -----------------------------------------------------
+# Retention helpers for rows written with bulk_create
+# -----------------------------------------------------
+def bulk_set_retention(instances, module_key: str, page_key: str, record_type: str = None,
+                       name_attr: str = None, batch_size: int = 1000):
+    """
+    bulk_create sends no post_save, so the retention receivers above never run
+    for bulk-inserted rows. This does the same work for a list of saved
+    instances of one model: sets retentionExpiry with one UPDATE per batch and,
+    when record_type is given, creates their RetentionTimeline rows in bulk.
+    Instances must already have their primary keys.
+    """
+    instances = [obj for obj in instances if getattr(obj, 'pk', None)]
+    if not instances:
+        return
+    expiry = compute_retention_expiry(module_key, page_key)
+    if not expiry:
+        return
+    model = type(instances[0])
+    pks = [obj.pk for obj in instances]
+    for start in range(0, len(pks), batch_size):
+        model.objects.filter(pk__in=pks[start:start + batch_size]).update(retentionExpiry=expiry)
+    for obj in instances:
+        obj.retentionExpiry = expiry
+    if not record_type:
+        return
+
+    existing = set()
+    for start in range(0, len(pks), batch_size):
+        existing.update(RetentionTimeline.objects.filter(
+            RecordType=record_type, RecordId__in=pks[start:start + batch_size]
+        ).values_list('RecordId', flat=True))
+
+    default_framework_id = None
+    timelines = []
+    for obj in instances:
+        record_name = getattr(obj, name_attr, None) if name_attr else None
+        if obj.pk in existing:
+            # A stale timeline for a reused id: update it the same way the receiver would
+            upsert_retention_timeline(
+                obj, record_type, record_name=record_name,
+                created_date=getattr(obj, 'CreatedByDate', None),
+                framework_id=getattr(obj, 'FrameworkId_id', None)
+            )
+            continue
+        fw_id = getattr(obj, 'FrameworkId_id', None)
+        if not fw_id:
+            if default_framework_id is None:
+                first_framework = Framework.objects.first()
+                default_framework_id = first_framework.FrameworkId if first_framework else 0
+            fw_id = default_framework_id or None
+        if not fw_id:
+            continue
+        start_date = (
+            getattr(obj, 'CreatedByDate', None)
+            or getattr(obj, 'CreatedDate', None)
+            or timezone.now().date()
+        )
+        timelines.append(RetentionTimeline(
+            RecordType=record_type,
+            RecordId=obj.pk,
+            RecordName=record_name[:255] if record_name else record_name,
+            CreatedDate=start_date,
+            RetentionStartDate=start_date,
+            RetentionEndDate=expiry,
+            Status='Active',
+            is_archived=False,
+            deletion_paused=False,
+            auto_delete_enabled=True,
+            FrameworkId_id=fw_id,
+        ))
+    RetentionTimeline.objects.bulk_create(timelines, batch_size=batch_size)
+    print(f"[RETENTION] {len(timelines)} RetentionTimeline rows created for bulk-inserted {record_type} records")
@@ -13,6 +13,7 @@ from ...rbac.decorators import (
     audit_analytics_required, audit_view_all_required
 )
 from .framework_filter_helper import get_active_framework_filter, apply_framework_filter_to_audits
+from ..Global.facet_counts import facet_counts, facet_values
 
 __all__ = [
     'get_audit_completion_rate',
@@ -563,9 +564,9 @@ def status_distribution(request):
         base_queryset = apply_framework_filter_to_audits(base_queryset, request)
     
     # Count audits by status
-    total = base_queryset.count()
-    completed = base_queryset.filter(Status='Completed').count()
-    in_progress = base_queryset.filter(Status='In Progress').count()
+    counts = facet_counts(base_queryset, ['Status'])
+    total = counts['total']
+    completed, in_progress = facet_values(counts, 'Status', ['Completed', 'In Progress'])
     yet_to_start = total - (completed + in_progress)
 
     # Calculate percentages
@@ -878,27 +879,30 @@ def category_distribution(request):
             print(f"Error fetching categories: {e}")
             categories = ['Information Security', 'Data Protection', 'Risk Assessment', 'Access Control', 'Change Management']
         
+        # Totals and completions for every category from one grouped query
+        audits = Audit.objects.all()
+        if framework_id_filter:
+            audits = audits.filter(FrameworkId_id=framework_id_filter)
+        
+        # Apply policy filter if provided
+        if policy_id and policy_id != 'all' and policy_id != '':
+            audits = audits.filter(PolicyId=policy_id)
+        
+        counts = facet_counts(audits, ['FrameworkId__Category', 'Status'], depends_on=(Framework,))
+        totals = counts['facets']['FrameworkId__Category']
+        completed_by_category = {}
+        for audit_category, audit_status, count in counts['combinations']:
+            if audit_status == 'Completed':
+                completed_by_category[audit_category] = completed_by_category.get(audit_category, 0) + count
+        
         result = []
         
-        for category in categories:
+        for category in set(categories):
             if not category:  # Skip empty categories
                 continue
-                
-            # Get audits for this category through the framework
-            framework_query = Framework.objects.filter(Category=category)
-            if framework_id_filter:
-                framework_query = framework_query.filter(FrameworkId=framework_id_filter)
-            framework_ids = framework_query.values_list('FrameworkId', flat=True)
-            
-            # Use FrameworkId_id instead of Framework__in based on error message
-            audits = Audit.objects.filter(FrameworkId_id__in=framework_ids)
-            
-            # Apply policy filter if provided
-            if policy_id and policy_id != 'all' and policy_id != '':
-                audits = audits.filter(PolicyId=policy_id)
             
-            total = audits.count()
-            completed = audits.filter(Status='Completed').count()
+            total = totals.get(category, 0)
+            completed = completed_by_category.get(category, 0)
             
             # Calculate completion rate
             completion_rate = round((completed / total) * 100, 2) if total else 0
@@ -1010,20 +1014,18 @@ def criticality_distribution(request):
         if not framework_id and not policy_id:
             base_queryset = apply_framework_filter_to_audits(base_queryset, request)
             
-        filtered_audit_ids = list(base_queryset.values_list('AuditId', flat=True))
-        
         # Get findings for filtered audits
-        findings = AuditFinding.objects.filter(AuditId__in=filtered_audit_ids)
+        findings = AuditFinding.objects.filter(AuditId__in=base_queryset.values('AuditId'))
         
-        total_findings = findings.count()
+        # Use MajorMinor field for criticality (Main field to use)
+        counts = facet_counts(findings, ['MajorMinor'], depends_on=(Audit,))
+        total_findings = counts['total']
         
         print(f"\n{'='*60}")
         print(f"📊 [CRITICALITY DISTRIBUTION] Chart")
         print(f"{'='*60}")
         print(f"Framework ID: {framework_id}")
         print(f"Policy ID: {policy_id}")
-        print(f"Filtered Audit IDs: {len(filtered_audit_ids)}")
-        print(f"Total Audits: {len(filtered_audit_ids)}")
         print(f"Total Findings: {total_findings}")
         
         # If no findings, return empty result
@@ -1035,31 +1037,12 @@ def criticality_distribution(request):
                 "count": 0
             } for level in ['Critical', 'High', 'Medium', 'Low', 'Info']])
         
-        # Check MajorMinor field for criticality (this is the actual criticality field)
-        print(f"\nFinding details - First 5 findings:")
-        sample_findings = findings[:5]
-        for f in sample_findings:
-            print(f"  - Finding ID: {f.AuditFindingsId}, MajorMinor: '{f.MajorMinor}'")
-        
-        # Use MajorMinor field for criticality (Main field to use)
-        majorminor_counts = findings.values('MajorMinor').annotate(count=Count('MajorMinor'))
-        
-        # Print MajorMinor counts
-        all_majorminor = findings.values_list('MajorMinor', flat=True).distinct()
-        print(f"\nMajorMinor values (this is the criticality field):")
-        for mm in all_majorminor:
-            count = findings.filter(MajorMinor=mm).count()
-            print(f"  - MajorMinor='{mm}': {count} findings")
-        
-        # Define criticality levels in order (Y-axis)
         # Map database MajorMinor values to our criticality levels
         # MajorMinor: '1' = Major (Critical), '0' = Minor (Medium/Low), '2' = Not Applicable (Info)
-        
-        # Create a mapping dictionary for MajorMinor counts
         majorminor_dict = {}
-        for item in majorminor_counts:
-            mm_value = str(item['MajorMinor']).strip() if item['MajorMinor'] else ''
-            majorminor_dict[mm_value] = item['count']
+        for mm_value, count in counts['facets']['MajorMinor'].items():
+            mm_value = str(mm_value).strip() if mm_value else ''
+            majorminor_dict[mm_value] = majorminor_dict.get(mm_value, 0) + count
         
         print(f"\nMajorMinor Distribution:")
         print(f"  - Major ('1'): {majorminor_dict.get('1', 0)}")
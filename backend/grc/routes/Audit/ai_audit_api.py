@@ -33,6 +33,8 @@ from rest_framework.response import Response
 from ...rbac.permissions import AuditConductPermission, AuditReviewPermission
 from ...rbac.decorators import audit_conduct_required
 from ...authentication import verify_jwt_token
+from ..Global.document_text_extraction import extract_text
+from ..Global.http_client import get_client
 
 # DRF Session auth variant that skips CSRF enforcement for API clients
 class CsrfExemptSessionAuthentication(SessionAuthentication):
@@ -105,7 +107,7 @@ def _call_openai_api(prompt, audit_id=None, document_id=None, model_type='compli
     logger.info(f"🔍 Model in payload: '{payload['model']}'")
     
     try:
-        response = requests.post(
+        response = get_client('openai').post(
             'https://api.openai.com/v1/chat/completions',
             headers=headers,
             json=payload,
@@ -1028,29 +1030,18 @@ def extract_text_from_document(file_path, doc_type):
 
 
 def extract_text_from_pdf(file_path):
-    """Extract text from PDF using PyPDF2"""
+    """Extract text from PDF via the shared, content-hash cached extractor"""
     try:
-        import PyPDF2
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text
+        return extract_text(file_path, '.pdf', raise_errors=True)
     except Exception as e:
         logger.error(f"PDF extraction error: {e}")
         return f"PDF extraction failed: {str(e)}"
 
 
 def extract_text_from_word(file_path):
-    """Extract text from Word document using python-docx"""
+    """Extract text (paragraphs and tables) from Word document via the shared extractor"""
     try:
-        from docx import Document
-        doc = Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return extract_text(file_path, '.docx', raise_errors=True)
     except Exception as e:
         logger.error(f"Word extraction error: {e}")
         return f"Word extraction failed: {str(e)}"
@@ -1091,8 +1082,7 @@ def extract_text_from_excel(file_path):
 def extract_text_from_txt(file_path):
     """Extract text from plain text file"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
+        return extract_text(file_path, '.txt', raise_errors=True)
     except Exception as e:
         logger.error(f"TXT extraction error: {e}")
         return f"TXT extraction failed: {str(e)}"
@@ -19,6 +19,7 @@ from django.conf import settings
 from django.db import connection
 from ...rbac.decorators import audit_conduct_required
 from ...rbac.permissions import AuditConductPermission
+from ..Global.http_client import get_client
 from .ai_audit_api import extract_text_from_document
 
 logger = logging.getLogger(__name__)
@@ -218,7 +219,7 @@ Focus on content relevance, not just keyword matching. Score based on how well t
         for attempt in range(2):
             try:
                 from django.conf import settings
-                response = requests.post(f"{settings.OLLAMA_BASE_URL}/api/generate", 
+                response = get_client('ollama').post(f"{settings.OLLAMA_BASE_URL}/api/generate", 
                                        json={
                                            'model': getattr(settings, 'OLLAMA_MODEL', 'llama3.1'),
                                            'prompt': prompt,
@@ -1,6 +1,6 @@
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
@@ -9,6 +9,8 @@ import traceback
 
 from ...serializers import ComplianceSerializer, ComplianceApprovalSerializer
 from ...models import SubPolicy, ComplianceApproval, Compliance, Framework, Policy
+from ..Global.conditional_responses import conditional_on
+from ..Global.fast_json import FastJSONRenderer, project_rows
 from ...rbac.permissions import (
     ComplianceViewPermission, ComplianceCreatePermission, ComplianceEditPermission,
     ComplianceApprovePermission
@@ -476,28 +478,40 @@ def get_compliance_status(request, compliance_id):
             'error': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
 
+# Fields returned by get_compliances_by_type, with hierarchy information
+COMPLIANCE_LIST_FIELDS = {
+    name: name for name in (
+        'ComplianceId', 'ComplianceTitle', 'ComplianceItemDescription', 'ComplianceType', 'Scope',
+        'Objective', 'IsRisk', 'PossibleDamage', 'mitigation', 'Criticality', 'MandatoryOptional',
+        'ManualAutomatic', 'Impact', 'Probability', 'MaturityLevel', 'Status', 'ComplianceVersion',
+        'CreatedByName', 'CreatedByDate', 'Identifier', 'RiskType', 'RiskCategory', 'RiskBusinessImpact',
+    )
+}
+COMPLIANCE_LIST_FIELDS.update({
+    'SubPolicyName': 'SubPolicy__SubPolicyName',
+    'PolicyName': 'SubPolicy__PolicyId__PolicyName',
+    'FrameworkName': 'SubPolicy__PolicyId__FrameworkId__FrameworkName',
+})
+
+
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer])
 @permission_classes([ComplianceViewPermission])
 @compliance_view_required
+@conditional_on(Compliance, SubPolicy, Policy, Framework)
 def get_compliances_by_type(request, type, id):
     """
     Get all compliances based on framework, policy, or subpolicy ID
     """
     try:
-        compliances = []
-        
         if type == 'framework':
             # Get all compliances under the framework through policy and subpolicy relationships
-            compliances = Compliance.objects.select_related(
-                'SubPolicy__PolicyId__FrameworkId'
-            ).filter(
+            compliances = Compliance.objects.filter(
                 SubPolicy__PolicyId__FrameworkId__FrameworkId=id
             ).order_by('ComplianceId')
         elif type == 'policy':
             # Get all compliances under the policy through subpolicy relationship
-            compliances = Compliance.objects.select_related(
-                'SubPolicy__PolicyId'
-            ).filter(
+            compliances = Compliance.objects.filter(
                 SubPolicy__PolicyId__PolicyId=id
             ).order_by('ComplianceId')
         elif type == 'subpolicy':
@@ -511,39 +525,8 @@ def get_compliances_by_type(request, type, id):
                 'message': 'Invalid type specified'
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Serialize the compliances with additional hierarchy information
-        serialized_compliances = []
-        for compliance in compliances:
-            compliance_data = {
-                'ComplianceId': compliance.ComplianceId,
-                'ComplianceTitle': compliance.ComplianceTitle,
-                'ComplianceItemDescription': compliance.ComplianceItemDescription,
-                'ComplianceType': compliance.ComplianceType,
-                'Scope': compliance.Scope,
-                'Objective': compliance.Objective,
-                'IsRisk': compliance.IsRisk,
-                'PossibleDamage': compliance.PossibleDamage,
-                'mitigation': compliance.mitigation,
-                'Criticality': compliance.Criticality,
-                'MandatoryOptional': compliance.MandatoryOptional,
-                'ManualAutomatic': compliance.ManualAutomatic,
-                'Impact': compliance.Impact,
-                'Probability': compliance.Probability,
-                'MaturityLevel': compliance.MaturityLevel,
-                'Status': compliance.Status,
-                'ComplianceVersion': compliance.ComplianceVersion,
-                'CreatedByName': compliance.CreatedByName,
-                'CreatedByDate': compliance.CreatedByDate,
-                'Identifier': compliance.Identifier,
-                'RiskType': compliance.RiskType,
-                'RiskCategory': compliance.RiskCategory,
-                'RiskBusinessImpact': compliance.RiskBusinessImpact,
-                # Add hierarchy information
-                'SubPolicyName': compliance.SubPolicy.SubPolicyName,
-                'PolicyName': compliance.SubPolicy.PolicyId.PolicyName,
-                'FrameworkName': compliance.SubPolicy.PolicyId.FrameworkId.FrameworkName
-            }
-            serialized_compliances.append(compliance_data)
+        # Rows come straight from values_list(); CreatedByDate is formatted by the renderer
+        serialized_compliances = project_rows(compliances, COMPLIANCE_LIST_FIELDS)
 
         return Response({
             'success': True,
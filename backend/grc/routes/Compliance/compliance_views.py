@@ -11,6 +11,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 from ...routes.Consent import require_consent
+from ...routes.Global.http_client import get_client
+from ...routes.Global.facet_counts import facet_counts, facet_values
+from ...routes.Global.conditional_responses import conditional_on
 from ...rbac.decorators import (
     compliance_view_required, compliance_create_required, compliance_edit_required,
     compliance_approve_required, compliance_delete_required, compliance_analytics_required,
@@ -61,7 +64,7 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.units import inch
 from django.db import connection
-import json, requests
+import json
 from datetime import timedelta
 from celery import shared_task
 import re
@@ -74,7 +77,7 @@ if TYPE_CHECKING:
     from django.db.models import Manager
 from django.contrib.auth.hashers import make_password, check_password
 from ...routes.Global.notification_service import NotificationService
-from ...routes.Global.notifications import notifications_storage
+from ...routes.Global.notifications import store_notification
 from django.contrib.auth.models import User
 from ...models import Users
 
@@ -88,11 +91,14 @@ class CsrfExemptSessionAuthentication(SessionAuthentication):
 LOGGING_SERVICE_URL = None
 
 
-def create_in_app_notification(user_id, title, message, category: str = "compliance", priority: str = "medium") -> None:
+def create_in_app_notification(user_id, title, message, category: str = "compliance", priority: str = "medium",
+                               group_key: Optional[str] = None, link: Optional[str] = None) -> None:
     """
     Helper to create lightweight in-app notifications for the compliance module.
-    Uses the shared notifications_storage structure consumed by the notifications API
+    Uses the shared notification store consumed by the notifications API
     and Sidebar.vue, mirroring the pattern used by policy acknowledgements.
+    Notifications sharing a group_key (e.g. "framework:12") within the digest
+    window are coalesced into one digest entry.
     """
     try:
         from datetime import datetime as dt
@@ -112,11 +118,7 @@ def create_in_app_notification(user_id, title, message, category: str = "complia
             "user_id": str(user_id),
         }
 
-        notifications_storage.append(notification)
-
-        # Keep only last 100 notifications in memory, same safeguard as Global.notifications
-        if len(notifications_storage) > 100:
-            notifications_storage.pop(0)
+        store_notification(notification, group_key=group_key, link=link)
     except Exception as e:
         # Never break core flows because of in-app notification issues
         print(f"Error creating in-app notification for user {user_id}: {str(e)}")
@@ -778,7 +780,7 @@ def send_log(module, actionType, description=None, userId=None, userName=None,
                 # Clean out None values
                 api_log_data = {k: v for k, v in api_log_data.items() if v is not None}
                
-                response = requests.post(LOGGING_SERVICE_URL, json=api_log_data)
+                response = get_client('logging_service').post(LOGGING_SERVICE_URL, json=api_log_data)
                 if response.status_code != 200:
                     print(f"Failed to send log to service: {response.text}")
         except Exception as e:
@@ -1226,6 +1228,7 @@ def create_compliance(request):
                     message=f"Compliance {new_compliance.ComplianceId} has been created and sent to reviewer {reviewer_id}.",
                     category="compliance",
                     priority="medium",
+                    group_key=f"framework:{new_compliance.FrameworkId_id}",
                 )
 
             # Reviewer gets an "assigned" notification
@@ -1236,6 +1239,7 @@ def create_compliance(request):
                     message=f"You have been assigned to review compliance {new_compliance.ComplianceId}.",
                     category="compliance",
                     priority="high",
+                    group_key=f"framework:{new_compliance.FrameworkId_id}",
                 )
         except Exception as e:
             print(f"Error creating in-app notifications for compliance creation: {str(e)}")
@@ -2312,6 +2316,7 @@ def submit_compliance_review(request, approval_id):
                     message=f"Your compliance {current_compliance.ComplianceId} has been {decision_label}.",
                     category="compliance",
                     priority="high",
+                    group_key=f"framework:{current_compliance.FrameworkId_id}",
                 )
 
             # Notify reviewer
@@ -2323,6 +2328,7 @@ def submit_compliance_review(request, approval_id):
                     message=f"You submitted a review for compliance {current_compliance.ComplianceId} with status {decision_label}.",
                     category="compliance",
                     priority="medium",
+                    group_key=f"framework:{current_compliance.FrameworkId_id}",
                 )
         except Exception as e:
             print(f"Error creating in-app notifications for compliance review: {str(e)}")
@@ -3929,6 +3935,16 @@ def test_analytics_endpoint(request):
         'message': 'Analytics endpoint is reachable'
     })
 
+# Chart labels (in display order) for each Y axis of the analytics view
+ANALYTICS_AXIS_LABELS = {
+    'Criticality': ['High', 'Medium', 'Low'],
+    'Status': ['Approved', 'Under Review', 'Rejected', 'Active'],
+    'ActiveInactive': ['Active', 'Inactive'],
+    'ManualAutomatic': ['Manual', 'Automatic'],
+    'MandatoryOptional': ['Mandatory', 'Optional'],
+    'MaturityLevel': ['Initial', 'Developing', 'Defined', 'Managed', 'Optimizing'],
+}
+
 @api_view(['POST'])
 @csrf_exempt
 @authentication_classes([])
@@ -4014,83 +4030,23 @@ def get_compliance_analytics(request):
             queryset = queryset.filter(Criticality=priority)
             print(f"Applied priority filter: {priority}")
         
-        print(f"Filtered queryset count: {queryset.count()}")
+        # Dashboard metrics and the Y axis breakdown come from one grouped query
+        dimensions = ['Status', 'ActiveInactive', 'IsRisk']
+        if y_axis in ANALYTICS_AXIS_LABELS and y_axis not in dimensions:
+            dimensions.append(y_axis)
+        counts = facet_counts(queryset, dimensions)
         
-        # Get counts for dashboard metrics
-        total_compliances = queryset.count()
-        approved_compliances = queryset.filter(Status='Approved').count()
-        active_compliances = queryset.filter(ActiveInactive='Active').count()
-        under_review_compliances = queryset.filter(Status='Under Review').count()
+        total_compliances = counts['total']
+        approved_compliances, under_review_compliances = facet_values(counts, 'Status', ['Approved', 'Under Review'])
+        active_compliances = facet_values(counts, 'ActiveInactive', ['Active'])[0]
+        print(f"Filtered queryset count: {total_compliances}")
 
         # Calculate approval rate
         approval_rate = (approved_compliances / total_compliances * 100) if total_compliances > 0 else 0
 
         # Initialize chart data based on Y axis selection
-        labels = []
-        data = []
-
-        if y_axis == 'Criticality':
-            counts = queryset.values('Criticality').annotate(
-                count=models.Count('ComplianceId')
-            ).exclude(Criticality__isnull=True).exclude(Criticality='')
-            labels = ['High', 'Medium', 'Low']
-            data = [
-                next((item['count'] for item in counts if item['Criticality'] == 'High'), 0),
-                next((item['count'] for item in counts if item['Criticality'] == 'Medium'), 0),
-                next((item['count'] for item in counts if item['Criticality'] == 'Low'), 0)
-            ]
-
-        elif y_axis == 'Status':
-            counts = queryset.values('Status').annotate(
-                count=models.Count('ComplianceId')
-            ).exclude(Status__isnull=True).exclude(Status='')
-            labels = ['Approved', 'Under Review', 'Rejected', 'Active']
-            data = [
-                next((item['count'] for item in counts if item['Status'] == 'Approved'), 0),
-                next((item['count'] for item in counts if item['Status'] == 'Under Review'), 0),
-                next((item['count'] for item in counts if item['Status'] == 'Rejected'), 0),
-                next((item['count'] for item in counts if item['Status'] == 'Active'), 0)
-            ]
-
-        elif y_axis == 'ActiveInactive':
-            counts = queryset.values('ActiveInactive').annotate(
-                count=models.Count('ComplianceId')
-            ).exclude(ActiveInactive__isnull=True).exclude(ActiveInactive='')
-            labels = ['Active', 'Inactive']
-            data = [
-                next((item['count'] for item in counts if item['ActiveInactive'] == 'Active'), 0),
-                next((item['count'] for item in counts if item['ActiveInactive'] == 'Inactive'), 0)
-            ]
-
-        elif y_axis == 'ManualAutomatic':
-            counts = queryset.values('ManualAutomatic').annotate(
-                count=models.Count('ComplianceId')
-            ).exclude(ManualAutomatic__isnull=True).exclude(ManualAutomatic='')
-            labels = ['Manual', 'Automatic']
-            data = [
-                next((item['count'] for item in counts if item['ManualAutomatic'] == 'Manual'), 0),
-                next((item['count'] for item in counts if item['ManualAutomatic'] == 'Automatic'), 0)
-            ]
-
-        elif y_axis == 'MandatoryOptional':
-            counts = queryset.values('MandatoryOptional').annotate(
-                count=models.Count('ComplianceId')
-            ).exclude(MandatoryOptional__isnull=True).exclude(MandatoryOptional='')
-            labels = ['Mandatory', 'Optional']
-            data = [
-                next((item['count'] for item in counts if item['MandatoryOptional'] == 'Mandatory'), 0),
-                next((item['count'] for item in counts if item['MandatoryOptional'] == 'Optional'), 0)
-            ]
-
-        elif y_axis == 'MaturityLevel':
-            counts = queryset.values('MaturityLevel').annotate(
-                count=models.Count('ComplianceId')
-            ).exclude(MaturityLevel__isnull=True).exclude(MaturityLevel='')
-            labels = ['Initial', 'Developing', 'Defined', 'Managed', 'Optimizing']
-            data = [
-                next((item['count'] for item in counts if item['MaturityLevel'] == level), 0)
-                for level in labels
-            ]
+        labels = list(ANALYTICS_AXIS_LABELS.get(y_axis, []))
+        data = facet_values(counts, y_axis, labels) if labels else []
 
         # Prepare dashboard data
         dashboard_data = {
@@ -4100,7 +4056,7 @@ def get_compliance_analytics(request):
                 'under_review': under_review_compliances
             },
             'total_count': total_compliances,
-            'total_findings': queryset.filter(IsRisk=True).count(),
+            'total_findings': facet_values(counts, 'IsRisk', [True])[0],
             'approval_rate': round(approval_rate, 2)
         }
 
@@ -4138,6 +4094,7 @@ def get_compliance_analytics(request):
 @authentication_classes([])
 @permission_classes([ComplianceKPIPermission])
 @compliance_kpi_required
+@conditional_on(Compliance, SubPolicy, Policy)
 def get_compliance_kpi(request):
     try:
         # Get framework_id from query parameters
@@ -1,8 +1,9 @@
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Q
-from grc.models import FileOperations, Users
+from django.conf import settings
+from django.db.models import Count
+from grc.models import DocumentCatalogEntry, FileOperations
 from datetime import datetime
 import logging
 import os
@@ -10,11 +11,12 @@ import tempfile
 from grc.routes.Global.s3_fucntions import create_direct_mysql_client
 from rest_framework.parsers import MultiPartParser, FormParser
 import re
+from .document_catalog import EXCLUDED_MODULES, UserNameResolver, catch_up, refresh_entries
 
 logger = logging.getLogger(__name__)
 
-# Modules we never want to expose to the UI
-EXCLUDED_MODULES = {'synthetic'}
+DEFAULT_MAX_UNPAGED = getattr(settings, 'DOCUMENT_CATALOG_MAX_UNPAGED', 5000)
+MAX_PAGE_SIZE = 500
 
 
 def apply_module_exclusions(queryset):
@@ -32,142 +34,88 @@ def get_user_display_name(user_id):
     Returns full name (FirstName LastName) or username as fallback
     """
     try:
-        if not user_id:
-            return 'Unknown User'
-        
-        # Try to get user by UserId (integer)
-        try:
-            user_id_int = int(user_id)
-            user = Users.objects.get(UserId=user_id_int)
-            if user.FirstName and user.LastName:
-                return f"{user.FirstName} {user.LastName}"
-            elif user.UserName:
-                return user.UserName
-            else:
-                return f"User {user_id}"
-        except (ValueError, Users.DoesNotExist):
-            # If user_id is not an integer or user not found, try as username
-            try:
-                user = Users.objects.get(UserName=user_id)
-                if user.FirstName and user.LastName:
-                    return f"{user.FirstName} {user.LastName}"
-                else:
-                    return user.UserName
-            except Users.DoesNotExist:
-                return str(user_id)  # Return original user_id if not found
+        return UserNameResolver().name(user_id)
     except Exception as e:
         logger.warning(f"Error getting user name for {user_id}: {str(e)}")
         return str(user_id)
 
 
+def serialize_catalog_entry(entry):
+    module_label = entry.module or 'general'
+    upload_date = entry.uploaded_at.strftime("%Y-%m-%d") if entry.uploaded_at else "unknown date"
+    return {
+        'id': entry.file_operation_id,
+        'name': entry.display_name,
+        'fileType': entry.extension,
+        'fileSize': format_file_size(entry.file_size),
+        'uploadTime': entry.uploaded_at.isoformat() if entry.uploaded_at else None,
+        'uploadedBy': entry.uploader_name,
+        'module': module_label,
+        's3Url': entry.s3_url or '',
+        's3Key': entry.s3_key or '',
+        's3Bucket': entry.s3_bucket or '',
+        'description': f'{module_label} document uploaded on {upload_date}',
+        'status': entry.status,
+        'contentType': entry.content_type or ''
+    }
+
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+        return value if value > 0 else default
+    except (TypeError, ValueError):
+        return default
+
+
 @api_view(['GET'])
 def get_documents(request):
     """
-    Fetch documents from FileOperations table
+    Fetch uploaded documents from the document catalog
     Optionally filter by module: policy, audit, incident, risk
+    Paginated with ?page=&page_size=; without them the newest
+    DOCUMENT_CATALOG_MAX_UNPAGED documents are returned.
     """
     try:
         # Get query parameters
         module_filter = request.GET.get('module', 'all')
-        search_query = request.GET.get('search', '')
+        search_query = request.GET.get('search', '').strip()
         file_type_filter = request.GET.get('file_type', 'all')
+        paged = 'page' in request.GET or 'page_size' in request.GET
+        page = _positive_int(request.GET.get('page'), 1)
+        page_size = min(_positive_int(request.GET.get('page_size'), 50), MAX_PAGE_SIZE) if paged else DEFAULT_MAX_UNPAGED
+
+        # Pick up uploads written since the last request
+        catch_up()
+
+        queryset = DocumentCatalogEntry.objects.all()
         
-        # Base query - get all uploads (completed, pending, failed)
-        # Exclude downloads, exports, and system-generated files
-        queryset = FileOperations.objects.filter(
-            operation_type='upload'
-        ).exclude(
-            user_id='export_user'  # Exclude system-generated exports
-        )
-        queryset = apply_module_exclusions(queryset)
-        
-        # Filter by module
+        # Filter by module (stored lower-cased, so this is an indexed equality match)
         if module_filter and module_filter != 'all':
-            queryset = queryset.filter(module__iexact=module_filter)
-        
-        # Search filter
-        if search_query:
-            queryset = queryset.filter(
-                Q(file_name__icontains=search_query) |
-                Q(original_name__icontains=search_query) |
-                Q(user_id__icontains=search_query)
-            )
+            queryset = queryset.filter(module=module_filter.lower())
         
         # File type filter
         if file_type_filter and file_type_filter != 'all':
-            queryset = queryset.filter(file_type__iexact=file_type_filter)
+            queryset = queryset.filter(extension=file_type_filter.lower().lstrip('.'))
         
-        # Order by most recent first
-        queryset = queryset.order_by('-created_at')
+        # Search filter over the single pre-lowered search column
+        if search_query:
+            queryset = queryset.filter(search_text__contains=search_query.lower())
         
-        # Build response
-        documents = []
-        for file_op in queryset:
-            # Determine file type from file_type or content_type
-            file_ext = file_op.file_type or ''
-            if not file_ext and file_op.content_type:
-                # Extract extension from content_type
-                if 'pdf' in file_op.content_type.lower():
-                    file_ext = 'pdf'
-                elif 'word' in file_op.content_type.lower() or 'document' in file_op.content_type.lower():
-                    file_ext = 'doc'
-                elif 'excel' in file_op.content_type.lower() or 'spreadsheet' in file_op.content_type.lower():
-                    file_ext = 'xlsx'
-                elif 'csv' in file_op.content_type.lower():
-                    file_ext = 'csv'
-                else:
-                    file_ext = 'file'
-            
-            # Format file size
-            file_size_str = format_file_size(file_op.file_size)
-            
-            # Get display name - try to get originalName from metadata.upload_response first
-            display_name = file_op.file_name or 'Unknown File'
-            
-            # Try to extract originalName from metadata.upload_response
-            if file_op.metadata:
-                try:
-                    import json
-                    metadata = json.loads(file_op.metadata) if isinstance(file_op.metadata, str) else file_op.metadata
-                    if metadata and 'upload_response' in metadata:
-                        upload_response = metadata['upload_response']
-                        if upload_response and 'originalName' in upload_response:
-                            display_name = upload_response['originalName']
-                            # logger.info(f"Using originalName from upload_response: {display_name}")
-                        else:
-                            logger.info(f"No originalName in upload_response for file {file_op.id}")
-                    else:
-                        logger.info(f"No upload_response in metadata for file {file_op.id}")
-                except (json.JSONDecodeError, TypeError) as e:
-                    logger.warning(f"Error parsing metadata for file {file_op.id}: {str(e)}")
-            
-            # If no originalName found, use original_name as fallback
-            if display_name == file_op.file_name:
-                display_name = file_op.original_name or file_op.file_name or 'Unknown File'
-                # logger.info(f"Using fallback name: {display_name}")
-            
-            # Get user display name
-            user_display_name = get_user_display_name(file_op.user_id)
-            
-            documents.append({
-                'id': file_op.id,
-                'name': display_name,
-                'fileType': file_ext.lower(),
-                'fileSize': file_size_str,
-                'uploadTime': file_op.created_at.isoformat() if file_op.created_at else None,
-                'uploadedBy': user_display_name,
-                'module': file_op.module or 'general',
-                's3Url': file_op.s3_url or '',
-                's3Key': file_op.s3_key or '',
-                's3Bucket': file_op.s3_bucket or '',
-                'description': f'{file_op.module or "General"} document uploaded on {file_op.created_at.strftime("%Y-%m-%d") if file_op.created_at else "unknown date"}',
-                'status': file_op.status,
-                'contentType': file_op.content_type or ''
-            })
+        # Order by most recent first
+        queryset = queryset.order_by('-uploaded_at', '-file_operation_id')
+
+        total = queryset.count()
+        offset = (page - 1) * page_size
+        documents = [serialize_catalog_entry(entry) for entry in queryset[offset:offset + page_size]]
         
         return Response({
             'success': True,
             'count': len(documents),
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+            'has_more': offset + len(documents) < total,
             'documents': documents
         }, status=status.HTTP_200_OK)
         
@@ -186,21 +134,18 @@ def get_document_counts(request):
     Get document counts by module
     """
     try:
-        # Base query - all uploads (exclude downloads, exports, and system files)
-        base_query = FileOperations.objects.filter(
-            operation_type='upload'
-        ).exclude(
-            user_id='export_user'  # Exclude system-generated exports
+        catch_up()
+        by_module = dict(
+            DocumentCatalogEntry.objects.values_list('module').annotate(total=Count('file_operation_id')).order_by()
         )
-        base_query = apply_module_exclusions(base_query)
         
         counts = {
-            'all': base_query.count(),
-            'policy': base_query.filter(module__iexact='policy').count(),
-            'audit': base_query.filter(module__iexact='audit').count(),
-            'incident': base_query.filter(module__iexact='incident').count(),
-            'risk': base_query.filter(module__iexact='risk').count(),
-            'event': base_query.filter(module__iexact='event').count()
+            'all': sum(by_module.values()),
+            'policy': by_module.get('policy', 0),
+            'audit': by_module.get('audit', 0),
+            'incident': by_module.get('incident', 0),
+            'risk': by_module.get('risk', 0),
+            'event': by_module.get('event', 0)
         }
         
         return Response({
@@ -344,6 +289,10 @@ def upload_document(request):
                         # logger.info(f"📝 FileOperations record {operation_id} updated with custom filename")
                     except Exception as db_err:
                         logger.warning(f"⚠️ Failed to update FileOperations record {operation_id}: {db_err}")
+                    try:
+                        refresh_entries([operation_id])
+                    except Exception as catalog_err:
+                        logger.warning(f"⚠️ Failed to refresh document catalog for {operation_id}: {catalog_err}")
                 
                 return Response({
                     'success': True,
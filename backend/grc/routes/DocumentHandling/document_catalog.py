@@ -0,0 +1,287 @@
+"""
+Document catalog read model.
+
+get_documents used to walk every upload row in file_operations, parse its
+metadata JSON for the original name and look up the uploader one row at a
+time. The document_catalog table holds those values already resolved, with
+indexes for the module / file type filters and newest-first paging.
+
+Rows are refreshed:
+- on ORM saves of FileOperations (post_save receiver in grc.models)
+- explicitly by upload_document after it renames the stored file
+- by catch_up(), which the list endpoints call before reading and which picks
+  up rows the S3 client writes with raw SQL. Its watermark is the newest
+  file_operations.updated_at it has scanned, stored in
+  integration_sync_watermarks, so it moves on even when none of the scanned
+  rows belong in the catalog
+
+The initial backfill of the whole table never runs on a request: the first
+catch_up() without a watermark starts it on a background thread, and
+`python manage.py backfill_document_catalog` runs it directly.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+
+from grc.models import DocumentCatalogEntry, FileOperations, IntegrationSyncWatermark, Users
+
+logger = logging.getLogger(__name__)
+
+# Modules we never want to expose to the UI
+EXCLUDED_MODULES = {'synthetic'}
+EXCLUDED_USERS = {'export_user'}  # system-generated exports
+
+CATCH_UP_INTERVAL_SECONDS = getattr(settings, 'DOCUMENT_CATALOG_CATCH_UP_SECONDS', 5)
+CATCH_UP_CHUNK = 1000
+WATERMARK_SOURCE = 'document_catalog'
+WATERMARK_SCOPE = 'file_operations'
+
+_REFRESH_FIELDS = [
+    'display_name', 'uploader_id', 'uploader_name', 'extension', 'module', 'status',
+    'file_size', 'content_type', 's3_url', 's3_key', 's3_bucket', 'search_text',
+    'uploaded_at', 'source_updated_at',
+]
+
+
+class UserNameResolver:
+    """
+    Resolves many user ids to display names with at most two queries.
+
+    Ids may be numeric UserIds or usernames; the result is the user's full name,
+    falling back to the username and then to the raw id.
+    """
+
+    def __init__(self):
+        self._names = {}
+
+    @staticmethod
+    def _name_for(user, fallback):
+        if user['FirstName'] and user['LastName']:
+            return f"{user['FirstName']} {user['LastName']}"
+        return user['UserName'] or fallback
+
+    def resolve(self, user_ids):
+        pending = {str(uid) for uid in user_ids if uid and str(uid) not in self._names}
+        if pending:
+            numeric = {uid: int(uid) for uid in pending if uid.isdigit()}
+            if numeric:
+                for user in Users.objects.filter(UserId__in=set(numeric.values())).values(
+                        'UserId', 'UserName', 'FirstName', 'LastName'):
+                    uid = str(user['UserId'])
+                    self._names[uid] = self._name_for(user, f"User {uid}")
+            by_username = [uid for uid in pending if uid not in self._names]
+            if by_username:
+                for user in Users.objects.filter(UserName__in=by_username).values(
+                        'UserId', 'UserName', 'FirstName', 'LastName'):
+                    self._names[user['UserName']] = self._name_for(user, user['UserName'])
+            for uid in pending:
+                self._names.setdefault(uid, uid)
+        return {str(uid): self._names.get(str(uid), 'Unknown User') if uid else 'Unknown User' for uid in user_ids}
+
+    def name(self, user_id):
+        if not user_id:
+            return 'Unknown User'
+        return self.resolve([user_id])[str(user_id)]
+
+
+def normalize_extension(file_op):
+    """Lower-case extension without the dot, falling back to content type and file name"""
+    ext = (file_op.file_type or '').strip().lower().lstrip('.')
+    if ext:
+        return ext[:20]
+    content_type = (file_op.content_type or '').lower()
+    if content_type:
+        if 'pdf' in content_type:
+            return 'pdf'
+        if 'word' in content_type or 'document' in content_type:
+            return 'doc'
+        if 'excel' in content_type or 'spreadsheet' in content_type:
+            return 'xlsx'
+        if 'csv' in content_type:
+            return 'csv'
+    ext = os.path.splitext(file_op.original_name or file_op.file_name or '')[1].lower().lstrip('.')
+    return (ext or 'file')[:20]
+
+
+def resolve_display_name(file_op):
+    """originalName from metadata.upload_response, else original_name, else file_name"""
+    metadata = file_op.metadata
+    if metadata:
+        try:
+            if isinstance(metadata, str):
+                metadata = json.loads(metadata)
+            original = ((metadata or {}).get('upload_response') or {}).get('originalName')
+            if original:
+                return original
+        except (json.JSONDecodeError, TypeError, AttributeError) as e:
+            logger.warning(f"Error parsing metadata for file {file_op.id}: {str(e)}")
+    return file_op.original_name or file_op.file_name or 'Unknown File'
+
+
+def is_catalogued(file_op):
+    return (
+        file_op.operation_type == 'upload'
+        and file_op.user_id not in EXCLUDED_USERS
+        and (file_op.module or '').lower() not in EXCLUDED_MODULES
+    )
+
+
+def build_entry(file_op, uploader_name):
+    display_name = resolve_display_name(file_op)[:500]
+    search_text = ' '.join(filter(None, [
+        display_name, file_op.file_name, file_op.original_name, file_op.user_id, uploader_name
+    ])).lower()[:1000]
+    return DocumentCatalogEntry(
+        file_operation_id=file_op.id,
+        display_name=display_name,
+        uploader_id=file_op.user_id or '',
+        uploader_name=(uploader_name or '')[:255],
+        extension=normalize_extension(file_op),
+        module=(file_op.module or 'general').lower(),
+        status=file_op.status,
+        file_size=file_op.file_size,
+        content_type=file_op.content_type,
+        s3_url=file_op.s3_url,
+        s3_key=file_op.s3_key,
+        s3_bucket=file_op.s3_bucket,
+        search_text=search_text,
+        uploaded_at=file_op.created_at,
+        source_updated_at=file_op.updated_at,
+    )
+
+
+def _upsert(file_ops, resolver=None):
+    resolver = resolver or UserNameResolver()
+    visible = [op for op in file_ops if is_catalogued(op)]
+    hidden_ids = [op.id for op in file_ops if not is_catalogued(op)]
+    names = resolver.resolve([op.user_id for op in visible])
+    entries = [build_entry(op, names.get(str(op.user_id), 'Unknown User')) for op in visible]
+
+    existing = set(
+        DocumentCatalogEntry.objects.filter(
+            file_operation_id__in=[e.file_operation_id for e in entries]
+        ).values_list('file_operation_id', flat=True)
+    )
+    to_create = [e for e in entries if e.file_operation_id not in existing]
+    to_update = [e for e in entries if e.file_operation_id in existing]
+    with transaction.atomic():
+        if to_create:
+            DocumentCatalogEntry.objects.bulk_create(to_create, batch_size=CATCH_UP_CHUNK)
+        if to_update:
+            DocumentCatalogEntry.objects.bulk_update(to_update, _REFRESH_FIELDS, batch_size=CATCH_UP_CHUNK)
+        if hidden_ids:
+            DocumentCatalogEntry.objects.filter(file_operation_id__in=hidden_ids).delete()
+    return len(to_create), len(to_update)
+
+
+def refresh_entries(file_operation_ids):
+    """Rebuild catalog rows for the given file_operations ids"""
+    ids = [i for i in file_operation_ids if i]
+    if not ids:
+        return 0, 0
+    file_ops = list(FileOperations.objects.filter(id__in=ids))
+    found = {op.id for op in file_ops}
+    missing = [i for i in ids if i not in found]
+    if missing:
+        DocumentCatalogEntry.objects.filter(file_operation_id__in=missing).delete()
+    return _upsert(file_ops)
+
+
+_catch_up_lock = threading.Lock()
+_last_catch_up = [0.0]
+_backfill_thread = [None]
+
+
+def _stored_watermark():
+    watermark = IntegrationSyncWatermark.objects.filter(
+        source=WATERMARK_SOURCE, scope_key=WATERMARK_SCOPE
+    ).values_list('watermark', flat=True).first()
+    if watermark is not None:
+        return watermark
+    # Catalogs built before the watermark was stored
+    return DocumentCatalogEntry.objects.aggregate(latest=Max('source_updated_at'))['latest']
+
+
+def _scan(watermark):
+    queryset = FileOperations.objects.filter(operation_type='upload')
+    if watermark is not None:
+        queryset = queryset.filter(updated_at__gte=watermark)
+
+    resolver = UserNameResolver()
+    processed = 0
+    last_id = 0
+    latest = watermark
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id')[:CATCH_UP_CHUNK])
+        if not chunk:
+            break
+        _upsert(chunk, resolver)
+        processed += len(chunk)
+        last_id = chunk[-1].id
+        for op in chunk:
+            if op.updated_at and (latest is None or op.updated_at > latest):
+                latest = op.updated_at
+
+    if latest is not None and latest != watermark:
+        IntegrationSyncWatermark.objects.update_or_create(
+            source=WATERMARK_SOURCE,
+            scope_key=WATERMARK_SCOPE,
+            defaults={'watermark': latest, 'last_sync_stats': {'scanned': processed}}
+        )
+    return processed
+
+
+def start_backfill():
+    """Run the full backfill on a daemon thread unless one is already running in this process"""
+    thread = _backfill_thread[0]
+    if thread is not None and thread.is_alive():
+        return False
+
+    def run():
+        try:
+            processed = catch_up(force=True, backfill=True)
+            logger.info(f"Document catalog backfill scanned {processed} uploads")
+        finally:
+            close_old_connections()
+
+    thread = threading.Thread(target=run, name='document-catalog-backfill', daemon=True)
+    _backfill_thread[0] = thread
+    thread.start()
+    return True
+
+
+def catch_up(force=False, backfill=False, full=False):
+    """
+    Bring the catalog up to date with file_operations rows changed since the
+    watermark. Throttled to once every CATCH_UP_INTERVAL_SECONDS per process
+    unless force is set.
+
+    Without a watermark (or with full) the whole table has to be scanned; that
+    only happens when backfill is set. Otherwise the backfill is started in
+    the background and nothing is scanned on the caller's thread.
+    """
+    now = time.monotonic()
+    if not force and now - _last_catch_up[0] < CATCH_UP_INTERVAL_SECONDS:
+        return 0
+    # A backfill waits for a running catch-up; requests never wait
+    if not _catch_up_lock.acquire(blocking=backfill):
+        return 0
+    try:
+        _last_catch_up[0] = now
+        watermark = None if full else _stored_watermark()
+        if watermark is None and not backfill:
+            start_backfill()
+            return 0
+        return _scan(watermark)
+    except Exception as e:
+        logger.error(f"Document catalog catch-up failed: {str(e)}", exc_info=True)
+        return 0
+    finally:
+        _catch_up_lock.release()
@@ -1,4 +1,4 @@
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
@@ -32,6 +32,7 @@ from ...models import (
     SubPolicy, Users, EventType, Module, FileOperations
 )
 from ...routes.Global.s3_fucntions import create_direct_mysql_client
+from ...routes.Global.fast_json import FastJSONRenderer
 
 # Simple test endpoint
 @api_view(['GET'])
@@ -1035,7 +1036,7 @@ def create_event(request):
             try:
                 from ...routes.Global.notification_service import NotificationService
                 notification_service = NotificationService()
-                from ...routes.Global.notifications import notifications_storage
+                from ...routes.Global.notifications import store_notification
                 import uuid
                 from datetime import datetime as dt
                 
@@ -1112,9 +1113,7 @@ def create_event(request):
                                 'status': {'isRead': False, 'readAt': None},
                                 'user_id': str(recipient['user_id'])
                             }
-                            notifications_storage.append(notification)
-                            if len(notifications_storage) > 100:
-                                notifications_storage.pop(0)
+                            store_notification(notification)
                                 
                         except Exception as notify_error:
                             print(f"Error sending notification to {recipient.get('email', 'unknown')}: {str(notify_error)}")
@@ -1373,6 +1372,7 @@ def get_document_handling_events(request):
 
 
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer])
 @permission_classes([AllowAny])
 @csrf_exempt
 def get_events_list(request):
@@ -2596,7 +2596,7 @@ def approve_event(request, event_id):
         # Send email notification for status change
         try:
             from ...routes.Global.notification_service import NotificationService
-            from ...routes.Global.notifications import notifications_storage
+            from ...routes.Global.notifications import store_notification
             notification_service = NotificationService()
             import uuid
             from datetime import datetime as dt
@@ -2654,9 +2654,7 @@ def approve_event(request, event_id):
                         'status': {'isRead': False, 'readAt': None},
                         'user_id': str(recipient['user_id'])
                     }
-                    notifications_storage.append(notification)
-                    if len(notifications_storage) > 100:
-                        notifications_storage.pop(0)
+                    store_notification(notification)
                 except Exception as notify_error:
                     print(f"Error sending notification: {str(notify_error)}")
         except Exception as notify_ex:
@@ -2733,7 +2731,7 @@ def reject_event(request, event_id):
         # Send email notification for status change
         try:
             from ...routes.Global.notification_service import NotificationService
-            from ...routes.Global.notifications import notifications_storage
+            from ...routes.Global.notifications import store_notification
             notification_service = NotificationService()
             import uuid
             from datetime import datetime as dt
@@ -2791,9 +2789,7 @@ def reject_event(request, event_id):
                         'status': {'isRead': False, 'readAt': None},
                         'user_id': str(recipient['user_id'])
                     }
-                    notifications_storage.append(notification)
-                    if len(notifications_storage) > 100:
-                        notifications_storage.pop(0)
+                    store_notification(notification)
                 except Exception as notify_error:
                     print(f"Error sending notification: {str(notify_error)}")
         except Exception as notify_ex:
@@ -2976,7 +2972,7 @@ def update_event(request, event_id):
         if status_changed:
             try:
                 from ...routes.Global.notification_service import NotificationService
-                from ...routes.Global.notifications import notifications_storage
+                from ...routes.Global.notifications import store_notification
                 notification_service = NotificationService()
                 import uuid
                 from datetime import datetime as dt
@@ -3034,9 +3030,7 @@ def update_event(request, event_id):
                             'status': {'isRead': False, 'readAt': None},
                             'user_id': str(recipient['user_id'])
                         }
-                        notifications_storage.append(notification)
-                        if len(notifications_storage) > 100:
-                            notifications_storage.pop(0)
+                        store_notification(notification)
                     except Exception as notify_error:
                         print(f"Error sending notification: {str(notify_error)}")
             except Exception as notify_ex:
@@ -0,0 +1,244 @@
+"""
+Batched LLM inference of missing record fields.
+
+AI document ingestion (risks, incidents) used to ask the model for one field of
+one record per request, so a document with 40 records and 15 gaps each cost
+around 600 sequential calls. FieldInferencePlanner collects every missing field
+of every record, packs several records into one structured request (sharing the
+document context when records come from the same text), and runs the requests
+concurrently under a requests-per-minute limit.
+
+Results keep per-field provenance: each inferred field comes back as
+    {"value": ..., "confidence": 0.0-1.0, "rationale": "..."}
+which callers store in record["_meta"]["per_field"].
+
+Set AI_INFERENCE_USE_STUB = True (or pass StubInferenceModel() as call_json) to
+run ingestion offline without calling OpenAI.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+MAX_WORKERS = getattr(settings, 'AI_INFERENCE_MAX_WORKERS', 4)
+REQUESTS_PER_MINUTE = getattr(settings, 'AI_INFERENCE_REQUESTS_PER_MINUTE', 60)
+RECORDS_PER_REQUEST = getattr(settings, 'AI_INFERENCE_RECORDS_PER_REQUEST', 5)
+CONTEXT_CHARS = getattr(settings, 'AI_INFERENCE_CONTEXT_CHARS', 3000)
+USE_STUB = getattr(settings, 'AI_INFERENCE_USE_STUB', False)
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than rate_per_minute start in any minute"""
+
+    def __init__(self, rate_per_minute):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class StubInferenceModel:
+    """
+    Offline stand-in for the LLM.
+
+    Answers every requested field with a fixed value from `values` (by field
+    name) or None, so ingestion falls back to its normal defaults.
+    """
+
+    def __init__(self, values=None, confidence=0.5):
+        self.values = values or {}
+        self.confidence = confidence
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        request = json.loads(prompt[prompt.index(_PAYLOAD_MARKER) + len(_PAYLOAD_MARKER):])
+        return {
+            'records': {
+                record['id']: {
+                    field: {
+                        'value': self.values.get(field),
+                        'confidence': self.confidence if field in self.values else 0.0,
+                        'rationale': 'Stub model'
+                    }
+                    for field in record['missing']
+                }
+                for record in request['records']
+            }
+        }
+
+
+class InferenceJob:
+    """Missing fields of one record plus the text the values should come from"""
+
+    def __init__(self, record, missing_fields, context):
+        self.record = record
+        self.missing_fields = list(missing_fields)
+        self.context = (context or '')[:CONTEXT_CHARS]
+
+
+_PAYLOAD_MARKER = 'REQUEST JSON:\n'
+
+
+def failed_field(error):
+    return {'value': None, 'confidence': 0.0, 'rationale': f'AI prediction failed: {error}'}
+
+
+class FieldInferencePlanner:
+    """
+    Plans and executes batched inference requests.
+
+    call_json(prompt) must return the parsed JSON reply of the model.
+    field_prompts maps field name -> guidance text, known_fields lists the
+    record keys that may be shown to the model as already known.
+    """
+
+    def __init__(self, call_json, field_prompts, known_fields, entity='record',
+                 records_per_request=None, max_workers=None, requests_per_minute=None):
+        if USE_STUB and not isinstance(call_json, StubInferenceModel):
+            call_json = StubInferenceModel()
+        self.call_json = call_json
+        self.field_prompts = field_prompts
+        self.known_fields = known_fields
+        self.entity = entity
+        self.records_per_request = records_per_request or RECORDS_PER_REQUEST
+        self.max_workers = max_workers or MAX_WORKERS
+        self.rate_limiter = RateLimiter(REQUESTS_PER_MINUTE if requests_per_minute is None else requests_per_minute)
+        self.requests_made = 0
+
+    def plan(self, jobs):
+        """Split jobs into request batches, keeping records that share a context together"""
+        by_context = {}
+        for index, job in enumerate(jobs):
+            if job.missing_fields:
+                by_context.setdefault(job.context, []).append(index)
+
+        batches = []
+        current = []
+        for indexes in by_context.values():
+            for index in indexes:
+                current.append(index)
+                if len(current) >= self.records_per_request:
+                    batches.append(current)
+                    current = []
+        if current:
+            batches.append(current)
+        return batches
+
+    def build_prompt(self, jobs, batch):
+        contexts = {}
+        records = []
+        fields = []
+        for index in batch:
+            job = jobs[index]
+            context_id = contexts.setdefault(job.context, f'd{len(contexts)}')
+            records.append({
+                'id': f'r{index}',
+                'document': context_id,
+                'known': {
+                    k: job.record.get(k) for k in self.known_fields
+                    if job.record.get(k) not in (None, '', [])
+                },
+                'missing': job.missing_fields,
+            })
+            for field in job.missing_fields:
+                if field not in fields:
+                    fields.append(field)
+
+        guidance = '\n'.join(
+            f'- {field}: {self.field_prompts.get(field, "Return a concise, professional value.")}'
+            for field in fields
+        )
+        payload = {
+            'documents': {context_id: text for text, context_id in contexts.items()},
+            'records': records,
+        }
+        return f"""You are a GRC analyst. For each {self.entity} in the request, infer ONLY the fields listed in its "missing" array, using its document and already known fields.
+
+FIELD GUIDANCE:
+{guidance}
+
+REQUIRED OUTPUT FORMAT:
+Return ONLY a JSON object of this shape:
+{{"records": {{"<record id>": {{"<field>": {{"value": <value or null>, "confidence": <0.0-1.0>, "rationale": "<brief explanation>"}}}}}}}}
+
+Rules:
+1. Include every record id and every missing field of that record.
+2. If the value is stated in the document, extract it (confidence 0.8-1.0); if inferred from context, confidence 0.5-0.7.
+3. If you cannot determine a value, return {{"value": null, "confidence": 0.0, "rationale": "Not enough information"}}.
+4. No text outside the JSON object.
+
+{_PAYLOAD_MARKER}{json.dumps(payload, default=str)}"""
+
+    def _run_batch(self, jobs, batch):
+        self.rate_limiter.acquire()
+        self.requests_made += 1
+        try:
+            reply = self.call_json(self.build_prompt(jobs, batch))
+        except Exception as e:
+            print(f"   ❌ Batched AI inference failed for {len(batch)} {self.entity}(s): {str(e)}")
+            return {index: {f: failed_field(e) for f in jobs[index].missing_fields} for index in batch}
+
+        answers = reply.get('records', {}) if isinstance(reply, dict) else {}
+        if not isinstance(answers, dict):
+            answers = {}
+        results = {}
+        for index in batch:
+            answer = answers.get(f'r{index}') or {}
+            fields = {}
+            for field in jobs[index].missing_fields:
+                entry = answer.get(field) if isinstance(answer, dict) else None
+                if isinstance(entry, dict):
+                    try:
+                        confidence = float(entry.get('confidence', 0.7))
+                    except (TypeError, ValueError):
+                        confidence = 0.7
+                    fields[field] = {
+                        'value': entry.get('value'),
+                        'confidence': max(0.0, min(1.0, confidence)),
+                        'rationale': entry.get('rationale') or 'AI predicted based on document context',
+                    }
+                elif entry is not None:
+                    # Model answered with a bare value
+                    fields[field] = {
+                        'value': entry, 'confidence': 0.7,
+                        'rationale': 'AI predicted based on document context'
+                    }
+                else:
+                    fields[field] = {'value': None, 'confidence': 0.0, 'rationale': 'Not returned by model'}
+            results[index] = fields
+        return results
+
+    def infer(self, jobs):
+        """
+        Run inference for all jobs.
+
+        Returns a list aligned with jobs; each entry maps field name to
+        {"value", "confidence", "rationale"}.
+        """
+        batches = self.plan(jobs)
+        results = [{} for _ in jobs]
+        if not batches:
+            return results
+
+        print(f"🤖 Inferring {sum(len(j.missing_fields) for j in jobs)} field(s) for "
+              f"{len(jobs)} {self.entity}(s) in {len(batches)} request(s)")
+        workers = max(1, min(self.max_workers, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch_result in executor.map(lambda batch: self._run_batch(jobs, batch), batches):
+                for index, fields in batch_result.items():
+                    results[index] = fields
+        return results
@@ -0,0 +1,91 @@
+"""
+Compressed JSONL archive files for rows removed from the database.
+
+Each ArchiveWriter.write() call appends one independently compressed member
+(a gzip member or a zstd frame) and fsyncs it. A crash therefore leaves a file
+that is readable up to the last completed chunk, and a chunk is durable on
+disk before the caller deletes its rows. Both formats decode concatenated
+members as one stream.
+
+zstd is used when the optional `zstandard` package is installed and
+ARCHIVE_COMPRESSION is 'zstd' (the default); otherwise gzip.
+"""
+
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+ARCHIVE_ROOT = Path(getattr(settings, 'DATA_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'data_archive'))
+ARCHIVE_COMPRESSION = getattr(settings, 'ARCHIVE_COMPRESSION', 'zstd')
+
+
+def archive_extension():
+    return '.jsonl.zst' if ARCHIVE_COMPRESSION == 'zstd' and ZSTD_AVAILABLE else '.jsonl.gz'
+
+
+def _compress(data, path):
+    if path.endswith('.zst'):
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+class ArchiveWriter:
+    """Appends chunks of dict rows to <root>/<group>/<name><ext>"""
+
+    def __init__(self, group, name, root=None):
+        directory = Path(root or ARCHIVE_ROOT) / group
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = str(directory / f"{name}{archive_extension()}")
+        self.rows_written = 0
+
+    def write(self, rows):
+        if not rows:
+            return 0
+        data = ''.join(json.dumps(row, default=str, separators=(',', ':')) + '\n' for row in rows)
+        member = _compress(data.encode('utf-8'), self.path)
+        with open(self.path, 'ab') as handle:
+            handle.write(member)
+            handle.flush()
+            os.fsync(handle.fileno())
+        self.rows_written += len(rows)
+        return len(rows)
+
+
+def iter_archive(path):
+    """Yield the rows of an archive file one at a time without loading it whole"""
+    path = str(path)
+    if path.endswith('.zst'):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        with open(path, 'rb') as raw:
+            reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            for line in io.TextIOWrapper(reader, encoding='utf-8'):
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def list_archives(group, root=None):
+    """Archive files of a group, oldest name first"""
+    directory = Path(root or ARCHIVE_ROOT) / group
+    if not directory.is_dir():
+        return []
+    return sorted(
+        str(path) for path in directory.iterdir()
+        if path.name.endswith('.jsonl.gz') or path.name.endswith('.jsonl.zst')
+    )
@@ -0,0 +1,157 @@
+"""
+Version-based ETags for heavy read endpoints.
+
+Dashboards re-fetch the same framework lists, trees, KPI bundles and
+compliance lists on every navigation. Views decorated with conditional_on()
+answer a repeat request with 304 Not Modified before the view runs:
+
+    @api_view(['GET'])
+    @permission_classes([...])
+    @conditional_on(Framework, Policy, SubPolicy, Compliance)
+    def get_tree(request): ...
+
+The ETag is a digest of:
+- the change counters of the listed tables (ChangeCounter rows), which
+  grc.models bumps after every committed post_save/post_delete
+- the request: path, query string, Authorization header, session cookie and
+  selected framework, so users never share a tag
+- a time bucket of CONDITIONAL_MAX_AGE_SECONDS. Bulk .update() calls and raw
+  SQL send no signals, and KPIs depend on the current date, so a tag expires
+  after this many seconds at most.
+
+Computing it costs one primary-key query on change_counters. Tags are weak
+(W/"...") because they identify the data version, not the exact bytes.
+Responses are marked `Cache-Control: private, no-cache`, so browsers keep the
+body and revalidate it on every use.
+
+For DRF views put the decorator below @permission_classes and the RBAC
+decorators. DRF runs authentication and permission checks before it, so a
+304 is only sent to callers who may see the data.
+
+Code that writes in bulk can call touch(Model) itself so its changes show up
+straight away.
+"""
+
+import functools
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+
+from grc.models import ChangeCounter
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'CONDITIONAL_RESPONSES_ENABLED', True)
+MAX_AGE_SECONDS = getattr(settings, 'CONDITIONAL_MAX_AGE_SECONDS', 300)
+
+# Scope bumped whenever a user changes their selected framework
+FRAMEWORK_SELECTION = 'framework_selection'
+
+
+def scope_name(model_or_scope):
+    if isinstance(model_or_scope, str):
+        return model_or_scope
+    return model_or_scope._meta.db_table
+
+
+def _bump(scopes):
+    for scope in scopes:
+        updated = ChangeCounter.objects.filter(scope=scope).update(version=F('version') + 1)
+        if not updated:
+            counter, created = ChangeCounter.objects.get_or_create(scope=scope, defaults={'version': 1})
+            if not created:
+                ChangeCounter.objects.filter(scope=scope).update(version=F('version') + 1)
+
+
+def touch(*models_or_scopes):
+    """Bump the change counters of these tables/scopes once the current transaction commits"""
+    scopes = [scope_name(item) for item in models_or_scopes]
+    # After commit, so a counter row is never locked for the length of the writer's transaction
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def versions(scopes):
+    """{scope: version} with one query; scopes never written to are 0"""
+    found = dict(ChangeCounter.objects.filter(scope__in=list(scopes)).values_list('scope', 'version'))
+    return {scope: found.get(scope, 0) for scope in scopes}
+
+
+def _request_identity(request):
+    session = getattr(request, 'session', None)
+    selected_framework = None
+    if session is not None:
+        selected_framework = session.get('selected_framework_id') or session.get('grc_framework_selected')
+    return '|'.join(str(part) for part in (
+        request.META.get('HTTP_AUTHORIZATION', ''),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        selected_framework,
+    ))
+
+
+def compute_etag(request, scopes):
+    current = versions(scopes)
+    bucket = int(time.time() // MAX_AGE_SECONDS) if MAX_AGE_SECONDS else 0
+    key = '|'.join([
+        request.path,
+        request.META.get('QUERY_STRING', ''),
+        _request_identity(request),
+        ','.join(f"{scope}={current[scope]}" for scope in sorted(current)),
+        str(bucket),
+    ])
+    return f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+
+
+def _opaque(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(request, etag):
+    """Weak comparison against If-None-Match"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    if '*' in candidates:
+        return True
+    return any(_opaque(candidate) == _opaque(etag) for candidate in candidates)
+
+
+def _mark_revalidate(response, etag):
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization', 'Cookie'))
+    return response
+
+
+def conditional_on(*models_or_scopes):
+    """Serve GET requests with version-based ETags and answer If-None-Match with 304"""
+    scopes = sorted({scope_name(item) for item in models_or_scopes})
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not ENABLED or request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            try:
+                # Read before the view runs: a write in between only makes the tag older
+                etag = compute_etag(request, scopes)
+            except Exception as e:
+                logger.warning(f"Could not compute ETag for {request.path}: {str(e)}")
+                return view(request, *args, **kwargs)
+
+            if etag_matches(request, etag):
+                return _mark_revalidate(HttpResponseNotModified(), etag)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.has_header('ETag'):
+                _mark_revalidate(response, etag)
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,385 @@
+"""
+Shared document text extraction.
+
+Risk, risk-instance, incident and audit AI imports each carried their own copy
+of the PDF/DOCX/Excel extractors, and RenderS3Client had another PDF sampler.
+They all parsed the file on the request thread and again on every retry.
+
+This module is the single implementation:
+- extract_text() dispatches on file extension (or MIME type)
+- PDF pages are extracted in a process pool once a document is large enough,
+  and iter_pdf_pages() streams (page_number, text) in page order. The pool
+  starts its processes from a forkserver, never by forking the threaded web
+  worker, and is shut down at exit
+- page text is cached by SHA-256 of the file content in a size-bounded LRU,
+  so analysing the same upload again does not re-parse it
+"""
+
+import atexit
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+# --- Optional parsers (install as needed) ---
+try:
+    import pdfplumber
+except Exception:
+    pdfplumber = None
+
+try:
+    import PyPDF2
+except Exception:
+    PyPDF2 = None
+
+try:
+    import docx  # python-docx
+except Exception:
+    docx = None
+
+try:
+    import pandas as pd
+except Exception:
+    pd = None
+
+
+CACHE_MAX_CHARS = getattr(settings, 'DOCUMENT_TEXT_CACHE_MAX_CHARS', 50 * 1024 * 1024)
+PROCESS_POOL_SIZE = getattr(settings, 'DOCUMENT_EXTRACTION_PROCESSES', min(4, os.cpu_count() or 1))
+# Below this page count forking workers costs more than it saves
+PARALLEL_MIN_PAGES = getattr(settings, 'DOCUMENT_EXTRACTION_PARALLEL_MIN_PAGES', 16)
+PAGES_PER_TASK = getattr(settings, 'DOCUMENT_EXTRACTION_PAGES_PER_TASK', 8)
+
+MIME_EXTENSIONS = {
+    'application/pdf': '.pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
+    'application/msword': '.doc',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': '.xlsx',
+    'application/vnd.ms-excel': '.xls',
+    'text/plain': '.txt',
+}
+
+
+class DocumentExtractionError(Exception):
+    """Raised by extract_text(..., raise_errors=True) when a document cannot be read"""
+
+
+# =========================
+# CONTENT-HASH CACHE
+# =========================
+class _TextCache:
+    """LRU of per-document extraction results, bounded by total cached characters"""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry, size):
+        if size > self.max_chars:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total -= self._sizes[key]
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._total += size
+            while self._total > self.max_chars and self._entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._total -= self._sizes.pop(old_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total = 0
+
+
+_cache = _TextCache(CACHE_MAX_CHARS)
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def content_hash(source):
+    """SHA-256 of a file path or bytes"""
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        digest.update(source)
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class _PdfPages:
+    """Cached page texts of one PDF (page index -> text)"""
+
+    def __init__(self, page_count):
+        self.page_count = page_count
+        self.pages = {}
+
+    @property
+    def size(self):
+        return sum(len(t) for t in self.pages.values()) + 1
+
+
+# =========================
+# PDF
+# =========================
+def _open_pdf(source):
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    return source
+
+
+def _pdf_page_count(source):
+    if pdfplumber:
+        with pdfplumber.open(_open_pdf(source)) as pdf:
+            return len(pdf.pages)
+    if PyPDF2:
+        return len(PyPDF2.PdfReader(_open_pdf(source)).pages)
+    raise DocumentExtractionError("No PDF library available (install pdfplumber or PyPDF2)")
+
+
+def _extract_pdf_pages(source, page_indexes):
+    """Text of the given pages; runs in the request thread or a pool worker"""
+    texts = []
+    if pdfplumber:
+        with pdfplumber.open(_open_pdf(source)) as pdf:
+            for index in page_indexes:
+                try:
+                    texts.append(pdf.pages[index].extract_text() or "")
+                except Exception as e:
+                    print(f"⚠️  Error extracting page {index + 1}: {str(e)}")
+                    texts.append("")
+    elif PyPDF2:
+        reader = PyPDF2.PdfReader(_open_pdf(source))
+        for index in page_indexes:
+            try:
+                texts.append(reader.pages[index].extract_text() or "")
+            except Exception as e:
+                print(f"⚠️  Error extracting page {index + 1}: {str(e)}")
+                texts.append("")
+    else:
+        raise DocumentExtractionError("No PDF library available (install pdfplumber or PyPDF2)")
+    return texts
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pool_context():
+    # fork() from a gunicorn gthread worker, which also runs the queue threads,
+    # can copy a lock some other thread holds and deadlock the child
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_SIZE, mp_context=_pool_context())
+    return _pool
+
+
+@atexit.register
+def _shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _pdf_entry(source, digest):
+    entry = _cache.get(('pdf', digest))
+    if entry is None:
+        entry = _PdfPages(_pdf_page_count(source))
+        _cache.put(('pdf', digest), entry, entry.size)
+    return entry
+
+
+def iter_pdf_pages(source, pages=None, digest=None):
+    """
+    Yield (page_number, text) for a PDF path or bytes, in page order.
+
+    pages is an optional iterable of 0-based page indexes (default: all pages).
+    Cached pages are served from memory; the rest are extracted in chunks across
+    the process pool when there are at least PARALLEL_MIN_PAGES of them.
+    """
+    digest = digest or content_hash(source)
+    entry = _pdf_entry(source, digest)
+    wanted = sorted(set(range(entry.page_count) if pages is None else
+                        (p for p in pages if 0 <= p < entry.page_count)))
+    missing = [p for p in wanted if p not in entry.pages]
+
+    def emit_cached_until(limit):
+        while wanted and wanted[0] < limit:
+            index = wanted.pop(0)
+            yield index + 1, entry.pages.get(index, "")
+
+    if missing:
+        chunks = [missing[i:i + PAGES_PER_TASK] for i in range(0, len(missing), PAGES_PER_TASK)]
+        temp_path = None
+        try:
+            if len(missing) >= PARALLEL_MIN_PAGES and PROCESS_POOL_SIZE > 1:
+                worker_source = source
+                if isinstance(source, (bytes, bytearray)):
+                    # Workers open the file themselves instead of receiving the bytes per task
+                    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+                        tmp.write(source)
+                        temp_path = worker_source = tmp.name
+                results = _get_pool().map(_extract_pdf_pages, [worker_source] * len(chunks), chunks)
+            else:
+                results = (_extract_pdf_pages(source, chunk) for chunk in chunks)
+
+            for chunk, texts in zip(chunks, results):
+                for index, text in zip(chunk, texts):
+                    entry.pages[index] = text
+                yield from emit_cached_until(chunk[-1] + 1)
+        finally:
+            if temp_path:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+            _cache.put(('pdf', digest), entry, entry.size)
+
+    yield from emit_cached_until(entry.page_count)
+
+
+def pdf_page_count(source, digest=None):
+    return _pdf_entry(source, digest or content_hash(source)).page_count
+
+
+def sample_pdf_pages(total_pages):
+    """
+    Pages worth reading to characterise a document, and the strategy name.
+
+    - Small docs (1-5 pages): all pages
+    - Medium docs (6-20 pages): first 5, last 1, and 2 from the middle
+    - Large docs (20+ pages): first 3, last 1, and 3 from throughout
+    """
+    if total_pages <= 5:
+        return list(range(total_pages)), "full"
+    if total_pages <= 20:
+        indexes = [0, 1, 2, 3, 4, total_pages // 3, 2 * total_pages // 3, total_pages - 1]
+        strategy = "medium"
+    else:
+        indexes = [0, 1, 2, total_pages // 4, total_pages // 2, 3 * total_pages // 4, total_pages - 1]
+        strategy = "large_sample"
+    return sorted(set(p for p in indexes if p < total_pages)), strategy
+
+
+def extract_text_from_pdf(source) -> str:
+    """All non-empty page texts of a PDF joined by newlines"""
+    return "\n".join(text for _, text in iter_pdf_pages(source) if text.strip())
+
+
+# =========================
+# OTHER FORMATS
+# =========================
+def extract_text_from_docx(file_path) -> str:
+    if not docx:
+        raise DocumentExtractionError("python-docx not installed")
+    d = docx.Document(file_path)
+    parts = []
+    for p in d.paragraphs:
+        if p.text.strip():
+            parts.append(p.text)
+    for t in d.tables:
+        for row in t.rows:
+            cells = [c.text.strip() for c in row.cells]
+            if any(cells):
+                parts.append(" | ".join(cells))
+    return "\n".join(parts)
+
+
+def extract_text_from_excel(file_path) -> str:
+    if not pd:
+        raise DocumentExtractionError("pandas/openpyxl not installed")
+    df_sheets = pd.read_excel(file_path, sheet_name=None)
+    out = []
+    for name, df in df_sheets.items():
+        out.append(f"=== Sheet: {name} ===")
+        out.append(df.to_string(index=False))
+    return "\n".join(out)
+
+
+def extract_text_from_txt(file_path) -> str:
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+_EXTRACTORS = {
+    '.pdf': extract_text_from_pdf,
+    '.docx': extract_text_from_docx,
+    '.doc': extract_text_from_docx,
+    '.xlsx': extract_text_from_excel,
+    '.xls': extract_text_from_excel,
+    '.txt': extract_text_from_txt,
+}
+
+
+def extension_for(file_path, file_extension=None, mime_type=None):
+    if file_extension:
+        ext = file_extension.lower()
+        return ext if ext.startswith('.') else f'.{ext}'
+    if mime_type and mime_type in MIME_EXTENSIONS:
+        return MIME_EXTENSIONS[mime_type]
+    return os.path.splitext(str(file_path))[1].lower()
+
+
+def is_supported(file_path, file_extension=None, mime_type=None):
+    return extension_for(file_path, file_extension, mime_type) in _EXTRACTORS
+
+
+def extract_text(file_path, file_extension=None, mime_type=None, raise_errors=False) -> str:
+    """
+    Text of a document, dispatched by extension (or MIME type) and cached by content hash.
+
+    Returns "" for unsupported types or unreadable files unless raise_errors is set.
+    """
+    ext = extension_for(file_path, file_extension, mime_type)
+    extractor = _EXTRACTORS.get(ext)
+    try:
+        if extractor is None:
+            raise DocumentExtractionError(f"Document type {mime_type or ext} not supported for text extraction")
+        if ext == '.pdf':
+            # Page-level caching happens inside iter_pdf_pages
+            return extractor(file_path)
+
+        key = ('text', content_hash(file_path), ext)
+        text = _cache.get(key)
+        if text is None:
+            text = extractor(file_path)
+            _cache.put(key, text, len(text) + 1)
+        return text
+    except Exception as e:
+        print(f"[{ext.lstrip('.').upper() or 'FILE'}] Extraction error: {e}")
+        if raise_errors:
+            if isinstance(e, DocumentExtractionError):
+                raise
+            raise DocumentExtractionError(str(e)) from e
+        return ""
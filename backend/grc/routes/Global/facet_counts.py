@@ -0,0 +1,101 @@
+"""
+Faceted counts over a filtered queryset in one query.
+
+Analytics endpoints used to run queryset.count() several times and one
+grouped query per dimension (Criticality, Status, ActiveInactive, ...), then
+search each result with next(...) generators. facet_counts() runs a single
+GROUP BY over the tuple of requested dimensions and folds the rows into
+per-dimension counts in Python. The number of distinct combinations of these
+low-cardinality columns is small, so the fold is cheap.
+
+Results are cached per SQL statement (which covers framework and any other
+filters) and per data version. The versions are the tables' ChangeCounter
+rows (see conditional_responses), which grc.models bumps after every
+committed post_save/post_delete. They live in the database, so a write
+handled by one worker process invalidates the counts cached by every other.
+Bulk writers call touch() themselves; other bulk .update() calls and raw SQL
+send no signals, and FACET_CACHE_SECONDS bounds how long those can stay
+unnoticed.
+"""
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Count
+
+from .conditional_responses import scope_name, touch, versions
+
+logger = logging.getLogger(__name__)
+
+FACET_CACHE_SECONDS = getattr(settings, 'FACET_CACHE_SECONDS', 300)
+
+
+def facet_version(model):
+    """Current data version of a model's table for cache keys"""
+    return versions([scope_name(model)])[scope_name(model)]
+
+
+def bump_facet_version(model):
+    """Invalidate cached facet counts that read this model, in every process"""
+    touch(model)
+
+
+def _cache_key(queryset, dimensions, depends_on):
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return None
+    models = [queryset.model] + [model for model in depends_on if model is not queryset.model]
+    try:
+        # One primary-key query for all the tables involved
+        current = versions([scope_name(model) for model in models])
+    except Exception as e:
+        logger.warning(f"Could not read change counters, facet counts not cached: {str(e)}")
+        return None
+    tag = ':'.join(f"{scope}={current[scope]}" for scope in sorted(current))
+    digest = hashlib.md5(f"{sql}|{dimensions}".encode('utf-8')).hexdigest()
+    return f"facets:{queryset.model._meta.db_table}:{digest}:{tag}"
+
+
+def facet_counts(queryset, dimensions, depends_on=(), use_cache=True):
+    """
+    Counts for each dimension over queryset from one GROUP BY.
+
+    Returns {'total': n, 'facets': {dimension: {value: count}},
+    'combinations': [(value_1, ..., value_n, count), ...]}. Dimensions may
+    follow relations ('FrameworkId__Category'). Pass the related models the
+    dimensions read in depends_on so their changes invalidate the cache too.
+    """
+    dimensions = list(dimensions)
+    key = _cache_key(queryset, dimensions, depends_on) if use_cache else None
+    if key:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    combinations = list(
+        queryset.order_by()
+        .values_list(*dimensions)
+        .annotate(facet_count=Count('pk'))
+    )
+    facets = {dimension: {} for dimension in dimensions}
+    total = 0
+    for row in combinations:
+        count = row[-1]
+        total += count
+        for dimension, value in zip(dimensions, row):
+            facets[dimension][value] = facets[dimension].get(value, 0) + count
+
+    result = {'total': total, 'facets': facets, 'combinations': combinations}
+    if key:
+        cache.set(key, result, FACET_CACHE_SECONDS)
+    return result
+
+
+def facet_values(result, dimension, labels):
+    """Counts for labels in order, 0 for labels with no rows"""
+    counts = result['facets'].get(dimension, {})
+    return [counts.get(label, 0) for label in labels]
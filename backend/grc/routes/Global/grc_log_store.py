@@ -0,0 +1,322 @@
+"""
+Monthly partitions and cold archives for grc_logs.
+
+send_log writes a grc_logs row for nearly every API call, and the log viewer
+filters that table by Module, UserId, EntityType and Timestamp. The table is
+laid out for that access pattern as follows:
+
+- Composite indexes (Timestamp, Module), (UserId, Timestamp) and
+  (EntityType, Timestamp) are defined on GRCLog. Newest-first pages stop
+  after `limit` rows instead of sorting the whole table.
+- MySQL RANGE partitions by month on TO_DAYS(Timestamp). partition_setup_sql()
+  builds the one-time conversion: the primary key becomes (LogId, Timestamp)
+  and the FrameworkId foreign key is dropped, because partitioned InnoDB tables
+  allow neither a unique key without the partition column nor foreign keys.
+  ensure_future_partitions() splits pmax ahead of time.
+- Months older than GRC_LOG_HOT_MONTHS are streamed to
+  <DATA_ARCHIVE_DIR>/grc_logs/YYYY-MM.jsonl.{zst,gz} and then removed with
+  DROP PARTITION, which is instant. On a table that is not partitioned yet,
+  they are removed with chunked deletes instead.
+- iter_archived_logs() streams archived months back through the same filters
+  as the log API, so GRCLogList can return old entries with include_archived.
+
+Run `python manage.py grc_log_partitions --help` for the maintenance entry points.
+"""
+
+import collections
+import logging
+import os
+import re
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.dateparse import parse_date, parse_datetime
+
+from grc.models import GRCLog
+
+from .archive_files import ARCHIVE_ROOT, ArchiveWriter, iter_archive
+
+logger = logging.getLogger(__name__)
+
+HOT_MONTHS = getattr(settings, 'GRC_LOG_HOT_MONTHS', 6)
+FUTURE_PARTITIONS = getattr(settings, 'GRC_LOG_FUTURE_PARTITIONS', 3)
+ARCHIVE_CHUNK = getattr(settings, 'GRC_LOG_ARCHIVE_CHUNK', 5000)
+
+TABLE = GRCLog._meta.db_table
+ARCHIVE_GROUP = TABLE
+_ARCHIVE_NAME = re.compile(r'^(\d{4})-(\d{2})\.jsonl\.(gz|zst)$')
+
+
+# -- months -------------------------------------------------------------------
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def hot_window_start(today=None):
+    """First day of the oldest month kept in the database"""
+    return add_months(month_start(today or date.today()), -(HOT_MONTHS - 1))
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+# -- partitions ---------------------------------------------------------------
+
+def partitions():
+    """[(name, description)] of grc_logs partitions in order, empty if not partitioned"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """,
+            [TABLE]
+        )
+        return list(cursor.fetchall())
+
+
+def is_partitioned():
+    return bool(partitions())
+
+
+def _partition_clause(month):
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN (TO_DAYS('{add_months(month, 1):%Y-%m-%d}'))"
+
+
+def partition_setup_sql(today=None):
+    """
+    Statements converting grc_logs to monthly partitions. The ALTERs rebuild the
+    table, so run them in a maintenance window (or through an online schema
+    change tool) rather than from a request.
+    """
+    today = today or date.today()
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(Timestamp) FROM {TABLE}")
+        oldest = cursor.fetchone()[0]
+        cursor.execute(
+            """
+            SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND CONSTRAINT_TYPE = 'FOREIGN KEY'
+            """,
+            [TABLE]
+        )
+        foreign_keys = [row[0] for row in cursor.fetchall()]
+
+    first = month_start(oldest) if oldest else month_start(today)
+    last = add_months(month_start(today), FUTURE_PARTITIONS)
+    clauses = []
+    month = first
+    while month <= last:
+        clauses.append(_partition_clause(month))
+        month = add_months(month, 1)
+    clauses.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+    statements = [f"ALTER TABLE {TABLE} DROP FOREIGN KEY `{name}`" for name in foreign_keys]
+    statements.append(f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (LogId, Timestamp)")
+    statements.append(
+        f"ALTER TABLE {TABLE} PARTITION BY RANGE (TO_DAYS(Timestamp)) (\n    "
+        + ",\n    ".join(clauses) + "\n)"
+    )
+    return statements
+
+
+def ensure_future_partitions(today=None):
+    """Split pmax so the next FUTURE_PARTITIONS months have their own partition"""
+    existing = {name for name, _ in partitions()}
+    if 'pmax' not in existing:
+        return []
+    month = month_start(today or date.today())
+    missing = []
+    for offset in range(FUTURE_PARTITIONS + 1):
+        candidate = add_months(month, offset)
+        if partition_name(candidate) not in existing:
+            missing.append(candidate)
+    # pmax can only be split at its low end, so months older than the newest
+    # existing partition cannot be added this way
+    newest = max(
+        (datetime.strptime(name[1:], '%Y%m').date() for name in existing if re.match(r'^p\d{6}$', name)),
+        default=None
+    )
+    missing = [m for m in missing if newest is None or m > newest]
+    if missing:
+        clauses = ', '.join(_partition_clause(m) for m in missing)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {TABLE} REORGANIZE PARTITION pmax INTO "
+                f"({clauses}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+            )
+    return [partition_name(m) for m in missing]
+
+
+# -- archives -----------------------------------------------------------------
+
+def archived_months(root=None):
+    """{month: path} of completed month archives"""
+    directory = os.path.join(str(root or ARCHIVE_ROOT), ARCHIVE_GROUP)
+    if not os.path.isdir(directory):
+        return {}
+    months = {}
+    for name in os.listdir(directory):
+        match = _ARCHIVE_NAME.match(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = os.path.join(directory, name)
+    return months
+
+
+def archive_month(month, drop=True, chunk_size=None):
+    """
+    Stream one month of grc_logs into its archive file, then remove the month
+    from the table. Safe to re-run: the archive is written under a temporary
+    name and only renamed once complete, and rows are only removed after that.
+    """
+    chunk_size = chunk_size or ARCHIVE_CHUNK
+    start = datetime.combine(month, datetime.min.time())
+    end = datetime.combine(add_months(month, 1), datetime.min.time())
+    label = f"{month:%Y-%m}"
+
+    month_rows = GRCLog.objects.filter(Timestamp__gte=start, Timestamp__lt=end)
+    existing = archived_months().get(month)
+    if existing and not month_rows.exists():
+        return {'month': label, 'archived': 0, 'removed': 0, 'path': existing}
+    if existing:
+        # A previous run completed the archive but not the removal; the rows
+        # still in the table are all in the file already
+        final_path = existing
+        archived = 0
+        last_id = 0
+        for row in iter_archive(existing):
+            archived += 1
+            last_id = max(last_id, row['LogId'])
+    else:
+        writer = ArchiveWriter(ARCHIVE_GROUP, f"{label}.partial")
+        if os.path.exists(writer.path):
+            os.remove(writer.path)
+        final_path = writer.path.replace('.partial', '')
+        last_id = 0
+        while True:
+            rows = list(month_rows.filter(LogId__gt=last_id).order_by('LogId').values()[:chunk_size])
+            if not rows:
+                break
+            writer.write(rows)
+            last_id = rows[-1]['LogId']
+        archived = writer.rows_written
+        if archived:
+            os.replace(writer.path, final_path)
+        elif os.path.exists(writer.path):
+            os.remove(writer.path)
+
+    removed = 0
+    if drop and archived:
+        if partition_name(month) in {name for name, _ in partitions()}:
+            with connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {partition_name(month)}")
+            removed = archived
+        else:
+            while True:
+                ids = list(month_rows.filter(LogId__lte=last_id).order_by('LogId').values_list('LogId', flat=True)[:chunk_size])
+                if not ids:
+                    break
+                with transaction.atomic():
+                    removed += GRCLog.objects.filter(LogId__in=ids).delete()[0]
+    return {
+        'month': label,
+        'archived': archived,
+        'removed': removed,
+        'path': final_path if archived else None,
+    }
+
+
+def archive_cold_months(today=None, drop=True):
+    """Archive every month older than the hot window that still has rows"""
+    cutoff = datetime.combine(hot_window_start(today), datetime.min.time())
+    oldest = GRCLog.objects.filter(Timestamp__lt=cutoff).order_by('Timestamp').values_list('Timestamp', flat=True).first()
+    results = []
+    if oldest is None:
+        return results
+    month = month_start(oldest)
+    while month < cutoff.date():
+        results.append(archive_month(month, drop=drop))
+        month = add_months(month, 1)
+    return results
+
+
+# -- archive queries ----------------------------------------------------------
+
+def _to_datetime(value, end_of_day=False):
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.max.time() if end_of_day else datetime.min.time())
+    parsed = parse_datetime(value)
+    if parsed is None:
+        parsed_date = parse_date(value)
+        if parsed_date is None:
+            return None
+        return _to_datetime(parsed_date, end_of_day)
+    return parsed.replace(tzinfo=None)
+
+
+def _contains(value, needle):
+    return needle is None or (value is not None and needle.lower() in str(value).lower())
+
+
+def _archived_row_matches(row, filters, start, end):
+    timestamp = _to_datetime(row.get('Timestamp'))
+    if start and (timestamp is None or timestamp < start):
+        return False
+    if end and (timestamp is None or timestamp > end):
+        return False
+    if filters.get('user_id') and str(row.get('UserId')) != str(filters['user_id']):
+        return False
+    if filters.get('log_level') and str(row.get('LogLevel') or '').lower() != filters['log_level'].lower():
+        return False
+    return (
+        _contains(row.get('Module'), filters.get('module'))
+        and _contains(row.get('ActionType'), filters.get('action_type'))
+        and _contains(row.get('EntityType'), filters.get('entity_type'))
+    )
+
+
+def _as_api_row(row):
+    # values() uses attnames; the serializer names the FK field without _id
+    if 'FrameworkId_id' in row:
+        row['FrameworkId'] = row.pop('FrameworkId_id')
+    row['archived'] = True
+    return row
+
+
+def iter_archived_logs(filters=None, start_date=None, end_date=None, limit=1000, root=None):
+    """
+    Newest-first archived log rows matching the log API filters (module,
+    action_type, entity_type: substring; log_level: case-insensitive; user_id:
+    exact). Only months overlapping the date range are read, one at a time.
+    """
+    filters = filters or {}
+    start = _to_datetime(start_date)
+    end = _to_datetime(end_date, end_of_day=True)
+    remaining = limit
+    for month, path in sorted(archived_months(root).items(), reverse=True):
+        if remaining <= 0:
+            return
+        month_end = datetime.combine(add_months(month, 1), datetime.min.time())
+        if start and month_end <= start:
+            return
+        if end and datetime.combine(month, datetime.min.time()) > end:
+            continue
+        # Files are in LogId order; keep the newest `remaining` matches
+        newest = collections.deque(maxlen=remaining)
+        for row in iter_archive(path):
+            if _archived_row_matches(row, filters, start, end):
+                newest.append(row)
+        for row in reversed(newest):
+            yield _as_api_row(row)
+        remaining -= len(newest)
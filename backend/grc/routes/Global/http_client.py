@@ -0,0 +1,274 @@
+"""
+Shared outbound HTTP client for integrations.
+
+Jira, BambooHR, Microsoft Graph, the S3 microservice, OpenAI/Perplexity and
+the logging service were called with bare requests.get/post, so every call
+set up a new DNS lookup, TCP connection and TLS handshake. Some calls had no
+timeout, others up to 600s, and a failing upstream was retried by every
+request that reached it.
+
+get_client(name) returns a process-wide OutboundClient for one integration:
+- one requests.Session per host with a pooled keep-alive HTTPAdapter
+- retries with exponential backoff on connection errors and 429/502/503/504,
+  for idempotent methods only (POST is never replayed unless configured)
+- a (connect, read) timeout, so a dead host fails fast even when the read
+  timeout is long
+- a circuit breaker per host: after `breaker_threshold` consecutive failures
+  calls fail immediately with CircuitOpenError for `breaker_cooldown` seconds,
+  then one trial call is let through
+- a latency histogram per integration, available from metrics_snapshot()
+- no cookie persistence: sessions are shared by every user of the process, so
+  Set-Cookie responses are discarded (cookies= passed to a call still apply)
+
+Per-integration settings override the defaults, e.g.
+    OUTBOUND_HTTP = {
+        'default': {'connect_timeout': 5},
+        's3_service': {'timeout': 300, 'retries': 1},
+    }
+CircuitOpenError subclasses requests.ConnectionError, so existing
+`except requests.RequestException` handlers keep working.
+"""
+
+import http.cookiejar
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {
+    'timeout': 30,
+    'connect_timeout': 5,
+    'retries': 2,
+    'backoff': 0.5,
+    'retry_statuses': (429, 502, 503, 504),
+    'retry_methods': ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'),
+    'pool_maxsize': 20,
+    'breaker_threshold': 5,
+    'breaker_cooldown': 30,
+}
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, float('inf'))
+
+
+# Pooled sessions are shared across users and requests; never keep their cookies
+_REJECT_ALL_COOKIES = http.cookiejar.DefaultCookiePolicy(allowed_domains=[])
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without calling the host while its circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one host"""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Give up the half-open trial without recording an outcome"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.threshold and (self.failures >= self.threshold or self.opened_at is not None):
+                self.opened_at = time.monotonic()
+
+
+class LatencyHistogram:
+    """Cumulative request count, error count and latency buckets"""
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        with self._lock:
+            self.requests += 1
+            self.total_seconds += seconds
+            if error:
+                self.errors += 1
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'total_seconds': round(self.total_seconds, 3),
+                'buckets': {
+                    ('+Inf' if bound == float('inf') else str(bound)): count
+                    for bound, count in zip(LATENCY_BUCKETS, self.counts)
+                },
+            }
+
+
+def _build_retry(config):
+    options = dict(
+        total=config['retries'],
+        connect=config['retries'],
+        read=config['retries'],
+        status=config['retries'],
+        backoff_factor=config['backoff'],
+        status_forcelist=config['retry_statuses'],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(allowed_methods=frozenset(config['retry_methods']), **options)
+    except TypeError:
+        # urllib3 < 1.26
+        return Retry(method_whitelist=frozenset(config['retry_methods']), **options)
+
+
+class OutboundClient:
+    """Pooled sessions, retries, breakers and latency metrics for one integration"""
+
+    def __init__(self, integration, **config):
+        self.integration = integration
+        self.config = dict(DEFAULT_CONFIG, **config)
+        self.histogram = LatencyHistogram()
+        self._sessions = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _session_for(self, host):
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    session.cookies.set_policy(_REJECT_ALL_COOKIES)
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.config['pool_maxsize'],
+                        max_retries=_build_retry(self.config)
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    # Breaker first: callers that find the session without the lock read it straight after
+                    self._breakers[host] = CircuitBreaker(
+                        self.config['breaker_threshold'], self.config['breaker_cooldown']
+                    )
+                    self._sessions[host] = session
+        return session
+
+    def _timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            return timeout
+        return (self.config['connect_timeout'], timeout if timeout is not None else self.config['timeout'])
+
+    def request(self, method, url, timeout=None, **kwargs):
+        host = urlsplit(url).netloc.lower()
+        session = self._session_for(host)
+        breaker = self._breakers[host]
+        if not breaker.allow():
+            self.histogram.observe(0.0, error=True)
+            raise CircuitOpenError(
+                f"{self.integration}: circuit open for {host} after {breaker.failures} consecutive failures"
+            )
+
+        started = time.monotonic()
+        outcome = None
+        try:
+            response = session.request(method, url, timeout=self._timeout(timeout), **kwargs)
+            outcome = 'failure' if response.status_code >= 500 else 'success'
+        except requests.RequestException:
+            outcome = 'failure'
+            raise
+        finally:
+            if outcome == 'success':
+                breaker.record_success()
+            elif outcome == 'failure':
+                breaker.record_failure()
+            else:
+                # Not an upstream failure (e.g. a bad argument), but the trial slot must be freed
+                breaker.release_trial()
+            self.histogram.observe(time.monotonic() - started, error=outcome != 'success')
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def snapshot(self):
+        data = self.histogram.snapshot()
+        data['circuits'] = {host: breaker.state for host, breaker in list(self._breakers.items())}
+        return data
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(integration):
+    """Process-wide OutboundClient for an integration name"""
+    client = _clients.get(integration)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(integration)
+            if client is None:
+                configured = getattr(settings, 'OUTBOUND_HTTP', {}) or {}
+                config = dict(configured.get('default', {}), **configured.get(integration, {}))
+                client = OutboundClient(integration, **config)
+                _clients[integration] = client
+    return client
+
+
+def metrics_snapshot():
+    """{integration: {requests, errors, total_seconds, buckets, circuits}}"""
+    return {name: client.snapshot() for name, client in list(_clients.items())}
@@ -1,4 +1,4 @@
-import requests
+from .http_client import get_client
 from django.utils import timezone
 
 LOGGING_SERVICE_URL = None  # Disabled external logging service
@@ -45,7 +45,7 @@ def send_log(module, actionType, description=None, userId=None, userName=None,
                 }
                 # Clean out None values
                 api_log_data = {k: v for k, v in api_log_data.items() if v is not None}
-                response = requests.post(LOGGING_SERVICE_URL, json=api_log_data)
+                response = get_client('logging_service').post(LOGGING_SERVICE_URL, json=api_log_data)
                 if response.status_code != 200:
                     print(f"Failed to send log to service: {response.text}")
         except Exception as e:
@@ -0,0 +1,189 @@
+"""
+Digest coalescing for in-app and email notifications.
+
+Bulk workflows (approving a framework version, reassigning many compliances)
+emit one notification per child item. Notifications whose type has a digest
+rule are grouped by (recipient, type, group key) inside a time window and
+delivered as a single digest carrying a count and the first few items.
+
+- In-app: a new notification is folded into the recipient's unread digest row
+  (InAppNotification) for the same group if that digest was started inside
+  the window.
+- Email: the first email of a group is queued in the outbox with its delivery
+  delayed by the window; later emails in the window are merged into that row
+  and the row is re-rendered as a digest.
+
+The group key should identify the entity tree the events belong to (for
+example "framework:12"); without one, everything of the same type for the
+recipient is grouped together.
+
+Rules are keyed by email notification type or in-app category and can be
+overridden or extended with the NOTIFICATION_DIGEST_RULES setting, e.g.
+    NOTIFICATION_DIGEST_RULES = {
+        'email': {'complianceAssigned': {'window_seconds': 600}},
+        'in_app': {'compliance': None},   # disable
+    }
+"""
+
+import hashlib
+import html
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+
+DEFAULT_WINDOW_SECONDS = 300
+DEFAULT_MAX_ITEMS = 20
+
+DEFAULT_RULES = {
+    'email': {
+        'complianceAssigned': {'label': 'compliance assignments'},
+        'complianceReviewed': {'label': 'compliance review updates'},
+        'complianceDueReminder': {'label': 'compliance due reminders'},
+        'eventAssigned': {'label': 'event assignments'},
+        'eventStatusChanged': {'label': 'event status changes'},
+        # policyAcknowledgementRequired has no rule: a recipient gets one email
+        # per request, each with its own token link, so it goes out straight away
+    },
+    'in_app': {
+        'compliance': {'label': 'compliance updates'},
+    },
+}
+
+
+class DigestRule:
+    """How notifications of one type are grouped"""
+
+    def __init__(self, name, label=None, window_seconds=DEFAULT_WINDOW_SECONDS, max_items=DEFAULT_MAX_ITEMS):
+        self.name = name
+        self.label = label or f'{name} notifications'
+        self.window = timedelta(seconds=window_seconds)
+        self.max_items = max_items
+
+
+def get_rule(channel, name):
+    """DigestRule for an 'email' notification type or 'in_app' category, or None"""
+    configured = (getattr(settings, 'NOTIFICATION_DIGEST_RULES', {}) or {}).get(channel, {})
+    if name in configured:
+        options = configured[name]
+    else:
+        options = DEFAULT_RULES.get(channel, {}).get(name)
+    if options is None or options is False:
+        return None
+    if options is True:
+        options = {}
+    return DigestRule(name, **options)
+
+
+def digest_key(recipient, channel, name, group_key=None):
+    raw = '\0'.join([str(recipient).lower(), channel, str(name), str(group_key or '')])
+    return hashlib.sha256(raw.encode('utf-8', 'replace')).hexdigest()
+
+
+def _append_item(items, item, max_items):
+    if len(items) < max_items:
+        items.append(item)
+
+
+# ---------------------------------------------------------------------------
+# In-app notifications
+# ---------------------------------------------------------------------------
+
+def coalesce_in_app(notification, group_key=None, link=None):
+    """
+    Save an in-app notification dict as an InAppNotification row, folding it
+    into the recipient's open digest. Call inside a transaction.
+
+    Returns (row, created): the row that is now visible to the user, which is
+    either a new row or the digest the notification was merged into.
+    """
+    from grc.models import InAppNotification
+
+    rule = get_rule('in_app', notification.get('category'))
+    created_at = notification.get('createdAt') or datetime.now().isoformat()
+    item = {
+        'title': notification.get('title'),
+        'message': notification.get('message'),
+        'link': link,
+        'createdAt': created_at,
+    }
+    row = InAppNotification(
+        id=notification.get('id'),
+        user_id=str(notification.get('user_id')),
+        title=notification.get('title') or '',
+        message=notification.get('message') or '',
+        category=notification.get('category') or 'common',
+        priority=notification.get('priority') or 'medium',
+        link=link,
+        created_at=datetime.fromisoformat(created_at),
+    )
+    if rule is None:
+        row.save(force_insert=True)
+        return row, True
+
+    key = digest_key(row.user_id, 'in_app', rule.name, group_key)
+    existing = (
+        InAppNotification.objects.select_for_update()
+        .filter(user_id=row.user_id, digest_key=key, is_read=False)
+        .order_by('-created_at').first()
+    )
+    cutoff = (datetime.now() - rule.window).isoformat()
+    if existing and (existing.digest or {}).get('startedAt', '') >= cutoff:
+        digest = existing.digest
+        digest['count'] += 1
+        _append_item(digest['items'], item, rule.max_items)
+        existing.title = f"{digest['count']} {rule.label}"
+        existing.message = f"Latest: {notification.get('title')} - {notification.get('message')}"
+        # Bumping created_at keeps "latest" ordering
+        existing.created_at = row.created_at
+        if _priority_rank(row.priority) > _priority_rank(existing.priority):
+            existing.priority = row.priority
+        existing.save(update_fields=['digest', 'title', 'message', 'created_at', 'priority'])
+        return existing, False
+
+    row.digest_key = key
+    row.digest = {
+        'key': key,
+        'group': group_key,
+        'count': 1,
+        'items': [item],
+        'startedAt': created_at,
+    }
+    row.save(force_insert=True)
+    return row, True
+
+
+def _priority_rank(priority):
+    return {'low': 0, 'medium': 1, 'high': 2, 'urgent': 3}.get(str(priority or '').lower(), 1)
+
+
+# ---------------------------------------------------------------------------
+# Email notifications
+# ---------------------------------------------------------------------------
+
+def render_email_digest(rule, count, items):
+    """Subject and HTML body of an email digest"""
+    subject = f"{count} {rule.label}"
+    rows = ''.join(
+        f'<li style="margin-bottom: 6px;">'
+        + (f'<a href="{html.escape(item["link"])}">{html.escape(item["subject"])}</a>' if item.get('link')
+           else html.escape(item['subject']))
+        + '</li>'
+        for item in items
+    )
+    more = count - len(items)
+    more_html = f'<p style="color: #666666;">...and {more} more.</p>' if more > 0 else ''
+    body = f"""
+                <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; background-color: #ffffff;">
+                  <div style="background-color: #3498db; padding: 20px; text-align: center;">
+                    <h1 style="color: #ffffff; margin: 0; font-size: 24px;">{html.escape(subject)}</h1>
+                  </div>
+                  <div style="padding: 20px;">
+                    <p style="color: #333333; font-size: 16px;">You have {count} new {html.escape(rule.label)}:</p>
+                    <ul style="color: #333333; font-size: 14px;">{rows}</ul>
+                    {more_html}
+                    <p style="color: #333333; margin-top: 20px;">Please log in to the GRC system for details.</p>
+                  </div>
+                </div>
+                """
+    return subject, body
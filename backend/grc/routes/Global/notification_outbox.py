@@ -0,0 +1,444 @@
+"""
+Email outbox for NotificationService.
+
+Request handlers used to open an SMTP connection, STARTTLS and log in for every
+email they sent. Emails are now rendered immediately (so template errors still
+surface to the caller) and written to the notification_outbox table; a delivery
+worker drains the table in batches over one authenticated SMTP session per
+provider.
+
+Delivery rules:
+- identical pending emails to the same recipient are only sent once
+- notification types with a digest rule are held for the rule's window and
+  merged into one digest email (see notification_digest.py)
+- a recipient with several different emails in one batch gets a single
+  combined email once NOTIFICATION_OUTBOX_COALESCE_MIN is reached
+- failed sends are retried with exponential backoff up to
+  NOTIFICATION_OUTBOX_MAX_ATTEMPTS, then marked failed; a row stuck in
+  'sending' (worker died) is retried after NOTIFICATION_OUTBOX_SENDING_TIMEOUT
+  seconds, and marked failed if that was its last attempt
+
+The worker runs as a daemon thread in the web process (started by
+GrcConfig.ready when BACKGROUND_WORKERS_AUTOSTART is on, and woken on
+enqueue). Set
+NOTIFICATION_OUTBOX_IN_PROCESS_WORKER = False to run it standalone instead with
+`python manage.py process_notification_outbox`.
+"""
+
+import hashlib
+import logging
+import random
+import smtplib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from grc.models import NotificationOutbox
+from .notification_digest import digest_key, get_rule, render_email_digest
+
+logger = logging.getLogger("notification_service")
+
+IN_PROCESS_WORKER = getattr(settings, 'NOTIFICATION_OUTBOX_IN_PROCESS_WORKER', True)
+BATCH_SIZE = getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 100)
+MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5)
+BACKOFF_BASE_SECONDS = getattr(settings, 'NOTIFICATION_OUTBOX_BACKOFF_SECONDS', 30)
+BACKOFF_MAX_SECONDS = getattr(settings, 'NOTIFICATION_OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+COALESCE_MIN = getattr(settings, 'NOTIFICATION_OUTBOX_COALESCE_MIN', 3)
+# Rows stuck in 'sending' longer than this (worker died mid-batch) are retried
+SENDING_TIMEOUT_SECONDS = getattr(settings, 'NOTIFICATION_OUTBOX_SENDING_TIMEOUT', 600)
+IDLE_POLL_SECONDS = getattr(settings, 'NOTIFICATION_OUTBOX_POLL_SECONDS', 5)
+
+# Connection-level failures: the whole session is dropped and reopened
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, OSError)
+
+
+def make_dedupe_key(recipient, email_type, subject, body_html):
+    digest = hashlib.sha256()
+    for part in (recipient.lower(), email_type.lower(), subject, body_html):
+        digest.update(part.encode('utf-8', 'replace'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number `attempts` (1-based), with jitter"""
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def enqueue_emails(service, messages):
+    """
+    Render and queue emails in one insert.
+
+    messages is a list of dicts with 'to', 'email_type', 'notification_type'
+    and 'template_data', plus optional 'group_key' and 'link' used for digests.
+    Returns a list of per-message results in input order:
+    {"success": True, "queued": True, "outbox_id": ..., "duplicate": bool} or
+    {"success": False, "error": ...} when the message could not be rendered.
+    """
+    results = [None] * len(messages)
+    rows = []
+    row_positions = []
+    digested = False
+    for position, message in enumerate(messages):
+        to = message.get('to')
+        email_type = (message.get('email_type') or 'gmail').lower()
+        notification_type = message.get('notification_type')
+        try:
+            if not to:
+                raise ValueError("Missing recipient")
+            service.get_email_config(email_type)
+            subject, body_html = service.render_email(notification_type, message.get('template_data') or [])
+        except Exception as e:
+            logger.error(f"Could not queue {notification_type} email to {to}: {str(e)}")
+            results[position] = {"success": False, "error": str(e)}
+            continue
+        subject = subject[:NotificationOutbox._meta.get_field('subject').max_length]
+        rule = get_rule('email', notification_type)
+        if rule is not None:
+            results[position] = _queue_digest_item(
+                rule, to, email_type, notification_type, subject, body_html,
+                message.get('group_key'), message.get('link')
+            )
+            digested = True
+            continue
+        rows.append(NotificationOutbox(
+            recipient=to,
+            email_type=email_type,
+            notification_type=notification_type,
+            subject=subject,
+            body_html=body_html,
+            dedupe_key=make_dedupe_key(to, email_type, subject, body_html),
+        ))
+        row_positions.append(position)
+
+    if rows:
+        # Drop emails identical to ones still waiting to be delivered
+        already_queued = dict(
+            NotificationOutbox.objects.filter(
+                dedupe_key__in={row.dedupe_key for row in rows},
+                status__in=['pending', 'sending']
+            ).values_list('dedupe_key', 'id')
+        )
+        fresh = []
+        fresh_positions = []
+        repeats = []
+        first_in_call = {}
+        for row, position in zip(rows, row_positions):
+            if row.dedupe_key in already_queued:
+                results[position] = {
+                    "success": True, "queued": True, "duplicate": True,
+                    "outbox_id": already_queued[row.dedupe_key], "to": row.recipient,
+                    "type": row.notification_type
+                }
+            elif row.dedupe_key in first_in_call:
+                repeats.append((row, position))
+            else:
+                first_in_call[row.dedupe_key] = row
+                fresh.append(row)
+                fresh_positions.append(position)
+
+        NotificationOutbox.objects.bulk_create(fresh, batch_size=BATCH_SIZE)
+        if fresh and fresh[0].id is None:
+            # MySQL does not return ids from bulk_create
+            ids = dict(
+                NotificationOutbox.objects.filter(
+                    dedupe_key__in=list(first_in_call), status='pending'
+                ).values_list('dedupe_key', 'id')
+            )
+            for row in fresh:
+                row.id = ids.get(row.dedupe_key)
+        for row, position in zip(fresh, fresh_positions):
+            results[position] = {
+                "success": True, "queued": True, "duplicate": False,
+                "outbox_id": row.id, "to": row.recipient, "type": row.notification_type
+            }
+        for row, position in repeats:
+            results[position] = {
+                "success": True, "queued": True, "duplicate": True,
+                "outbox_id": first_in_call[row.dedupe_key].id, "to": row.recipient,
+                "type": row.notification_type
+            }
+
+        if fresh:
+            wake_delivery_worker()
+    if digested:
+        wake_delivery_worker()
+    return results
+
+
+def _queue_digest_item(rule, to, email_type, notification_type, subject, body_html, group_key, link):
+    """Merge an email into the recipient's open digest row, or start a new delayed one"""
+    key = digest_key(f'{email_type}:{to}', 'email', notification_type, group_key)
+    item = {'subject': subject, 'link': link}
+    with transaction.atomic():
+        row = (
+            NotificationOutbox.objects.select_for_update()
+            .filter(digest_key=key, status='pending')
+            .order_by('-id')
+            .first()
+        )
+        if row is None:
+            row = NotificationOutbox.objects.create(
+                recipient=to,
+                email_type=email_type,
+                notification_type=notification_type,
+                subject=subject,
+                body_html=body_html,
+                dedupe_key=make_dedupe_key(to, email_type, subject, body_html),
+                digest_key=key,
+                digest_count=1,
+                digest_items=[item],
+                # Held back so the rest of a bulk operation can join this email
+                next_attempt_at=datetime.now() + rule.window,
+            )
+            return {
+                "success": True, "queued": True, "duplicate": False, "digest_count": 1,
+                "outbox_id": row.id, "to": to, "type": notification_type
+            }
+
+        items = list(row.digest_items or [])
+        if len(items) < rule.max_items:
+            items.append(item)
+        row.digest_count += 1
+        row.digest_items = items
+        row.subject, row.body_html = render_email_digest(rule, row.digest_count, items)
+        row.dedupe_key = make_dedupe_key(to, email_type, row.subject, row.body_html)
+        row.save(update_fields=['digest_count', 'digest_items', 'subject', 'body_html', 'dedupe_key'])
+    return {
+        "success": True, "queued": True, "duplicate": False, "digest_count": row.digest_count,
+        "outbox_id": row.id, "to": to, "type": notification_type
+    }
+
+
+def _release_stale_rows(now):
+    cutoff = now - timedelta(seconds=SENDING_TIMEOUT_SECONDS)
+    stale = NotificationOutbox.objects.filter(status='sending', locked_at__lt=cutoff)
+    # attempts was counted when the row was claimed, so a dead worker used one up
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='failed', locked_at=None,
+        last_error=f"Worker stopped responding for over {SENDING_TIMEOUT_SECONDS}s on the last attempt"
+    )
+    if failed:
+        logger.error(f"Notification outbox: {failed} stale email(s) failed after {MAX_ATTEMPTS} attempts")
+    return stale.filter(attempts__lt=MAX_ATTEMPTS).update(status='pending', locked_at=None, next_attempt_at=now)
+
+
+def claim_batch(batch_size=None):
+    """Lock up to batch_size due rows for this worker and mark them 'sending'"""
+    now = datetime.now()
+    _release_stale_rows(now)
+    with transaction.atomic():
+        rows = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('id')[:batch_size or BATCH_SIZE]
+        )
+        if rows:
+            NotificationOutbox.objects.filter(id__in=[row.id for row in rows]).update(
+                status='sending', locked_at=now, attempts=F('attempts') + 1
+            )
+    for row in rows:
+        row.attempts += 1
+    return rows
+
+
+def _coalesce(rows):
+    """
+    Group a batch into outgoing emails.
+
+    Returns a list of (primary_row, member_rows). Identical rows collapse into one;
+    a recipient with COALESCE_MIN or more distinct emails gets them combined.
+    """
+    by_recipient = OrderedDict()
+    for row in rows:
+        by_recipient.setdefault((row.email_type, row.recipient.lower()), []).append(row)
+
+    groups = []
+    for recipient_rows in by_recipient.values():
+        unique = OrderedDict()
+        for row in recipient_rows:
+            unique.setdefault(row.dedupe_key, []).append(row)
+        if COALESCE_MIN and len(unique) >= COALESCE_MIN:
+            groups.append((recipient_rows[0], recipient_rows))
+        else:
+            for same in unique.values():
+                groups.append((same[0], same))
+    return groups
+
+
+def _compose(service, primary, members):
+    distinct = OrderedDict((row.dedupe_key, row) for row in members)
+    if len(distinct) == 1:
+        return service.build_email_message(primary.recipient, primary.subject, primary.body_html)
+
+    parts = [
+        f'<div style="margin-bottom: 24px;"><h3 style="font-family: Arial, sans-serif;">{row.subject}</h3>{row.body_html}</div>'
+        for row in distinct.values()
+    ]
+    subject = f"You have {len(distinct)} new GRC notifications"
+    return service.build_email_message(primary.recipient, subject, '<hr>'.join(parts))
+
+
+def _mark_sent(primary, members, now):
+    NotificationOutbox.objects.filter(id=primary.id).update(
+        status='sent', sent_at=now, locked_at=None, last_error=None
+    )
+    others = [row.id for row in members if row.id != primary.id]
+    if others:
+        NotificationOutbox.objects.filter(id__in=others).update(
+            status='sent', sent_at=now, locked_at=None, last_error=None, coalesced_into=primary.id
+        )
+
+
+def _mark_failed(members, error, now):
+    for row in members:
+        if row.attempts >= MAX_ATTEMPTS:
+            NotificationOutbox.objects.filter(id=row.id).update(
+                status='failed', locked_at=None, last_error=error
+            )
+        else:
+            NotificationOutbox.objects.filter(id=row.id).update(
+                status='pending', locked_at=None, last_error=error,
+                next_attempt_at=now + timedelta(seconds=backoff_delay(row.attempts))
+            )
+
+
+def _close(server):
+    if server is None:
+        return
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
+
+
+def deliver_batch(service, rows):
+    """Send claimed rows, reusing one SMTP session per provider. Returns stats."""
+    stats = {'claimed': len(rows), 'emails_sent': 0, 'rows_sent': 0, 'rows_retried': 0, 'rows_failed': 0}
+    log_entries = []
+
+    by_provider = OrderedDict()
+    for primary, members in _coalesce(rows):
+        by_provider.setdefault(primary.email_type, []).append((primary, members))
+
+    for email_type, groups in by_provider.items():
+        server = None
+        for index, (primary, members) in enumerate(groups):
+            now = datetime.now()
+            try:
+                message = _compose(service, primary, members)
+                for attempt in range(2):
+                    try:
+                        if server is None:
+                            server = service.open_smtp_connection(email_type)
+                        server.send_message(message)
+                        break
+                    except _CONNECTION_ERRORS:
+                        # Session dropped (timeout, server limit); reconnect once
+                        _close(server)
+                        server = None
+                        if attempt == 1:
+                            raise
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Outbox delivery to {primary.recipient} failed: {error}")
+                # Bad credentials fail every remaining email for this provider the same way
+                failed_groups = groups[index:] if isinstance(e, smtplib.SMTPAuthenticationError) else [(primary, members)]
+                for _, failed_members in failed_groups:
+                    _mark_failed(failed_members, error, now)
+                    for row in failed_members:
+                        if row.attempts >= MAX_ATTEMPTS:
+                            stats['rows_failed'] += 1
+                            log_entries.append((row.recipient, row.notification_type, False, error))
+                        else:
+                            stats['rows_retried'] += 1
+                if len(failed_groups) > 1:
+                    break
+                continue
+
+            _mark_sent(primary, members, now)
+            stats['emails_sent'] += 1
+            stats['rows_sent'] += len(members)
+            log_entries.extend((row.recipient, row.notification_type, True, None) for row in members)
+        _close(server)
+
+    if log_entries:
+        service.log_notifications(log_entries, 'email')
+    return stats
+
+
+def deliver_pending(batch_size=None, max_batches=None, service=None):
+    """Drain due outbox rows batch by batch; returns accumulated stats"""
+    if service is None:
+        from .notification_service import NotificationService
+        service = NotificationService()
+
+    totals = {'claimed': 0, 'emails_sent': 0, 'rows_sent': 0, 'rows_retried': 0, 'rows_failed': 0, 'batches': 0}
+    while max_batches is None or totals['batches'] < max_batches:
+        rows = claim_batch(batch_size)
+        if not rows:
+            break
+        stats = deliver_batch(service, rows)
+        totals['batches'] += 1
+        for key, value in stats.items():
+            totals[key] += value
+    return totals
+
+
+class _DeliveryWorker:
+    """Per-process daemon thread that drains the outbox"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def wake(self):
+        self._wake.set()
+        self.ensure_started()
+
+    def ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='notification-outbox', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        from .notification_service import NotificationService
+        service = NotificationService()
+        while True:
+            self._wake.clear()
+            try:
+                close_old_connections()
+                stats = deliver_pending(service=service)
+                if stats['batches']:
+                    logger.info(f"Notification outbox delivered: {stats}")
+            except Exception as e:
+                logger.error(f"Notification outbox worker error: {str(e)}")
+            finally:
+                close_old_connections()
+            self._wake.wait(IDLE_POLL_SECONDS)
+
+
+_worker = _DeliveryWorker()
+
+
+def start_delivery_worker():
+    if IN_PROCESS_WORKER:
+        _worker.ensure_started()
+
+
+def wake_delivery_worker():
+    if IN_PROCESS_WORKER:
+        _worker.wake()
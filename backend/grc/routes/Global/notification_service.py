@@ -1,16 +1,19 @@
 import smtplib
-import requests
 import json
 import mysql.connector
 import os
 import socket
+import ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 from datetime import datetime
 import logging
+import threading
 import traceback
 
+from .http_client import get_client
+
 # Load environment variables
 load_dotenv()
 
@@ -25,6 +28,11 @@ logging.basicConfig(
 logger = logging.getLogger("notification_service")
 
 class NotificationService:
+    # Email/WhatsApp template tables are built once per process and shared by
+    # every instance; see init_templates.
+    _template_registry = None
+    _template_registry_lock = threading.Lock()
+
     def __init__(self):
         # Database connection
         self.db_config = {
@@ -169,7 +177,23 @@ class NotificationService:
             return None
     
     def init_templates(self):
-        """Initialize notification templates"""
+        """Attach the shared template registry, building it on first use in this process"""
+        registry = NotificationService._template_registry
+        if registry is None:
+            with NotificationService._template_registry_lock:
+                registry = NotificationService._template_registry
+                if registry is None:
+                    self._build_templates()
+                    registry = {
+                        'email': self.email_templates,
+                        'whatsapp': self.whatsapp_templates,
+                    }
+                    NotificationService._template_registry = registry
+        self.email_templates = registry['email']
+        self.whatsapp_templates = registry['whatsapp']
+
+    def _build_templates(self):
+        """Build the notification template tables"""
         # Email templates
         self.email_templates = {
             'welcome': {
@@ -1292,127 +1316,156 @@ class NotificationService:
             }
         }
 
-    def send_email(self, to, email_type, notification_type, template_data):
-        """Send email notification"""
+    def get_email_config(self, email_type):
+        """SMTP settings for an email provider ('gmail' or 'microsoft')"""
+        config = self.email_configs.get((email_type or '').lower())
+        if not config:
+            error_msg = f"Unsupported email type: {email_type}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        return config
+
+    def render_email_subject(self, notification_type, template_data):
+        """Fill the title/version placeholders of a template subject"""
+        template = self.email_templates.get(notification_type)
+        if not template:
+            error_msg = f"Unsupported notification type: {notification_type}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+
+        subject = template['subject']
+        title_index = self.title_index_map.get(notification_type, 0)
+        if '{policy_title}' in subject and len(template_data) > title_index:
+            subject = subject.replace('{policy_title}', str(template_data[title_index]))
+        if '{framework_title}' in subject and len(template_data) > title_index:
+            subject = subject.replace('{framework_title}', str(template_data[title_index]))
+        if '{subpolicy_title}' in subject and len(template_data) > title_index:
+            subject = subject.replace('{subpolicy_title}', str(template_data[title_index]))
+        if '{incident_title}' in subject and len(template_data) >= 2:
+            subject = subject.replace('{incident_title}', template_data[1])
+        # Add version replacement for templates that use it (index 3 in template_data)
+        if '{version}' in subject and len(template_data) > 3:
+            subject = subject.replace('{version}', str(template_data[3]))
+        # Add policy_name replacement for acknowledgement template
+        if '{policy_name}' in subject and len(template_data) > title_index:
+            subject = subject.replace('{policy_name}', str(template_data[title_index]))
+        # Add item_title replacement for compliance templates
+        if '{item_title}' in subject and len(template_data) > title_index:
+            subject = subject.replace('{item_title}', str(template_data[title_index]))
+        # Add event_title replacement for event templates
+        if '{event_title}' in subject and len(template_data) > title_index:
+            subject = subject.replace('{event_title}', str(template_data[title_index]))
+        return subject
+
+    def render_email(self, notification_type, template_data):
+        """Return (subject, html_content) for a notification type"""
+        subject = self.render_email_subject(notification_type, template_data)
+        html_content = self.email_templates[notification_type]['template'](*template_data)
+        return subject, html_content
+
+    def build_email_message(self, to, subject, html_content):
+        """Wrap a rendered email in a MIME message from the default sender"""
+        msg = MIMEMultipart()
+        msg['From'] = f"{self.default_from['name']} <{self.default_from['email']}>"
+        msg['To'] = to
+        msg['Subject'] = subject
+        msg.attach(MIMEText(html_content, 'html'))
+        return msg
+
+    def open_smtp_connection(self, email_type):
+        """
+        Open and authenticate an SMTP session for the given provider.
+
+        The caller owns the connection and must quit() it; the outbox worker
+        keeps one open for a whole batch instead of reconnecting per email.
+        When credentials are configured the server must offer STARTTLS.
+        """
+        config = self.get_email_config(email_type)
+        logger.info(f"Connecting to SMTP server {config['host']}:{config['port']}")
+
+        # Check DNS resolution before attempting connection
+        try:
+            host_ip = socket.gethostbyname(config['host'])
+            logger.info(f"DNS resolution successful: {config['host']} -> {host_ip}")
+        except socket.gaierror as dns_error:
+            error_msg = (
+                f"DNS resolution failed for {config['host']}. "
+                f"This usually means:\n"
+                f"1. DNS server is not configured properly\n"
+                f"2. Network connectivity issues\n"
+                f"3. Firewall blocking DNS queries\n"
+                f"4. Container/instance has no internet access\n\n"
+                f"Solutions:\n"
+                f"- For Docker: Add DNS servers in docker-compose.yml (dns: [8.8.8.8, 8.8.4.4])\n"
+                f"- For EC2: Check security groups and VPC DNS settings\n"
+                f"- Verify internet connectivity: ping 8.8.8.8\n"
+                f"- Check /etc/resolv.conf for DNS configuration"
+            )
+            logger.error(error_msg)
+            logger.error(f"DNS error details: {str(dns_error)}")
+            raise ConnectionError(error_msg) from dns_error
+
+        server = smtplib.SMTP(config['host'], config['port'])
+        try:
+            server.ehlo()
+            username = config['auth']['user']
+            password = config['auth']['pass']
+            if username and password and not server.has_extn('starttls'):
+                # Never send credentials over a plaintext session
+                raise smtplib.SMTPNotSupportedError(
+                    f"SMTP server {config['host']}:{config['port']} does not support STARTTLS; "
+                    f"refusing to send credentials unencrypted"
+                )
+            if server.has_extn('starttls'):
+                server.starttls(context=ssl.create_default_context())
+                server.ehlo()
+            if username and password:
+                logger.info(f"Attempting SMTP auth with username: {username}")
+                server.login(username, password)
+                logger.info("SMTP login successful")
+        except smtplib.SMTPAuthenticationError as auth_error:
+            logger.error(f"SMTP Authentication failed: {str(auth_error)}")
+            server.close()
+            raise
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def send_email(self, to, email_type, notification_type, template_data, server=None):
+        """
+        Send email notification.
+
+        Pass an already authenticated server from open_smtp_connection() to reuse
+        it; otherwise a connection is opened and closed for this one email.
+        """
         try:
             logger.info(f"Attempting to send email to {to} using {email_type} for {notification_type}")
             logger.info(f"Template data: {template_data}")
-            
-            # Get email config based on type
-            config = self.email_configs.get(email_type.lower())
-            if not config:
-                error_msg = f"Unsupported email type: {email_type}"
-                logger.error(error_msg)
-                raise ValueError(error_msg)
-            
-            logger.info(f"Using email config: {config['host']}:{config['port']}")
-            
-            # Get template
-            template = self.email_templates.get(notification_type)
-            if not template:
-                error_msg = f"Unsupported notification type: {notification_type}"
-                logger.error(error_msg)
-                raise ValueError(error_msg)
-            
-            logger.info(f"Found template for {notification_type}")
-            
-            # Create email message
-            msg = MIMEMultipart()
-            msg['From'] = f"{self.default_from['name']} <{self.default_from['email']}>"
-            msg['To'] = to
-            
-            # Format subject with template data if needed
-            subject = template['subject']
-            title_index = self.title_index_map.get(notification_type, 0)
-            if '{policy_title}' in subject and len(template_data) > title_index:
-                subject = subject.replace('{policy_title}', str(template_data[title_index]))
-            if '{framework_title}' in subject and len(template_data) > title_index:
-                subject = subject.replace('{framework_title}', str(template_data[title_index]))
-            if '{subpolicy_title}' in subject and len(template_data) > title_index:
-                subject = subject.replace('{subpolicy_title}', str(template_data[title_index]))
-            if '{incident_title}' in subject and len(template_data) >= 2:
-                subject = subject.replace('{incident_title}', template_data[1])
-            # Add version replacement for templates that use it (index 3 in template_data)
-            if '{version}' in subject and len(template_data) > 3:
-                subject = subject.replace('{version}', str(template_data[3]))
-            # Add policy_name replacement for acknowledgement template
-            if '{policy_name}' in subject and len(template_data) > title_index:
-                subject = subject.replace('{policy_name}', str(template_data[title_index]))
-            # Add item_title replacement for compliance templates
-            if '{item_title}' in subject and len(template_data) > title_index:
-                subject = subject.replace('{item_title}', str(template_data[title_index]))
-            # Add event_title replacement for event templates
-            if '{event_title}' in subject and len(template_data) > title_index:
-                subject = subject.replace('{event_title}', str(template_data[title_index]))
-            
-            msg['Subject'] = subject
+
+            self.get_email_config(email_type)
+            subject, html_content = self.render_email(notification_type, template_data)
             logger.info(f"Email subject: {subject}")
-            
-            # Apply template data to create HTML content
-            html_content = template['template'](*template_data)
-            msg.attach(MIMEText(html_content, 'html'))
-            
-            logger.info(f"Connecting to SMTP server {config['host']}:{config['port']}")
-            
-            # Check DNS resolution before attempting connection
-            try:
-                host_ip = socket.gethostbyname(config['host'])
-                logger.info(f"DNS resolution successful: {config['host']} -> {host_ip}")
-            except socket.gaierror as dns_error:
-                error_msg = (
-                    f"DNS resolution failed for {config['host']}. "
-                    f"This usually means:\n"
-                    f"1. DNS server is not configured properly\n"
-                    f"2. Network connectivity issues\n"
-                    f"3. Firewall blocking DNS queries\n"
-                    f"4. Container/instance has no internet access\n\n"
-                    f"Solutions:\n"
-                    f"- For Docker: Add DNS servers in docker-compose.yml (dns: [8.8.8.8, 8.8.4.4])\n"
-                    f"- For EC2: Check security groups and VPC DNS settings\n"
-                    f"- Verify internet connectivity: ping 8.8.8.8\n"
-                    f"- Check /etc/resolv.conf for DNS configuration"
-                )
-                logger.error(error_msg)
-                logger.error(f"DNS error details: {str(dns_error)}")
-                raise ConnectionError(error_msg) from dns_error
-            
-            # Connect to SMTP server and send email - handling Microsoft differently
-            if email_type.lower() == 'microsoft':
-                with smtplib.SMTP(config['host'], config['port']) as server:
-                    server.ehlo()
-                    server.starttls()
-                    server.ehlo()
-                    username = config['auth']['user']
-                    password = config['auth']['pass']
-                    logger.info(f"Attempting Microsoft SMTP auth with username: {username}")
-                    server.login(username, password)
-                    server.send_message(msg)
-                    logger.info(f"Microsoft email sent successfully to {to}")
+            msg = self.build_email_message(to, subject, html_content)
+
+            if server is not None:
+                server.send_message(msg)
             else:
-                with smtplib.SMTP(config['host'], config['port']) as server:
-                    server.ehlo()
-                    server.starttls()
-                    server.ehlo()
-                    username = config['auth']['user']
-                    password = config['auth']['pass']
-                    logger.info(f"Attempting SMTP auth with username: {username}")
+                connection = self.open_smtp_connection(email_type)
+                try:
+                    connection.send_message(msg)
+                finally:
                     try:
-                        server.login(username, password)
-                        logger.info("SMTP login successful")
-                        server.send_message(msg)
-                        logger.info(f"Email sent successfully to {to}")
-                    except smtplib.SMTPAuthenticationError as auth_error:
-                        logger.error(f"SMTP Authentication failed: {str(auth_error)}")
-                        raise
-                    except Exception as smtp_error:
-                        logger.error(f"SMTP error: {str(smtp_error)}")
-                        raise
-            
+                        connection.quit()
+                    except Exception:
+                        connection.close()
+            logger.info(f"Email sent successfully to {to}")
+
             # Log notification in database
             self.log_notification(to, notification_type, 'email', True)
-            
+
             return {"success": True, "to": to, "type": notification_type}
-            
+
         except Exception as e:
             error_msg = f"Error sending email: {str(e)}"
             logger.error(error_msg)
@@ -1420,7 +1473,7 @@ class NotificationService:
             # Log failed notification
             self.log_notification(to, notification_type, 'email', False, str(e))
             return {"success": False, "error": str(e)}
-    
+
     def send_whatsapp(self, to, notification_type, template_parameters):
         """Send WhatsApp notification"""
         try:
@@ -1457,7 +1510,7 @@ class NotificationService:
             }
             
             # Send message
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
+            response = get_client('whatsapp').post(url, headers=headers, data=json.dumps(payload))
             response.raise_for_status()
             
             response_data = response.json()
@@ -1506,6 +1559,64 @@ class NotificationService:
         except Exception as e:
             logger.error(f"Error logging notification: {str(e)}")
     
+    def log_notifications(self, entries, channel):
+        """Log many (recipient, type, success, error) results with one connection"""
+        try:
+            conn = self.get_db_connection()
+            cursor = conn.cursor()
+
+            query = """
+            INSERT INTO notifications 
+            (recipient, type, channel, success, error, created_at) 
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """
+
+            now = datetime.now()
+            cursor.executemany(query, [
+                (recipient, notification_type, channel, success, error, now)
+                for recipient, notification_type, success, error in entries
+            ])
+            conn.commit()
+
+            cursor.close()
+            conn.close()
+
+        except Exception as e:
+            logger.error(f"Error logging notifications: {str(e)}")
+
+    def queue_email(self, to, email_type, notification_type, template_data, group_key=None, link=None):
+        """
+        Render an email and hand it to the outbox delivery worker.
+
+        group_key/link feed digest coalescing for notification types that have a
+        digest rule. Falls back to sending immediately if the outbox cannot be used.
+        """
+        try:
+            from .notification_outbox import enqueue_emails
+            return enqueue_emails(self, [{
+                'to': to,
+                'email_type': email_type,
+                'notification_type': notification_type,
+                'template_data': template_data,
+                'group_key': group_key,
+                'link': link,
+            }])[0]
+        except Exception as e:
+            logger.error(f"Notification outbox unavailable, sending directly: {str(e)}")
+            return self.send_email(to, email_type, notification_type, template_data)
+
+    def queue_emails(self, messages):
+        """Queue many emails (dicts with to/email_type/notification_type/template_data) in one insert"""
+        try:
+            from .notification_outbox import enqueue_emails
+            return enqueue_emails(self, messages)
+        except Exception as e:
+            logger.error(f"Notification outbox unavailable, sending directly: {str(e)}")
+            return [
+                self.send_email(m.get('to'), m.get('email_type', 'gmail'), m.get('notification_type'), m.get('template_data', []))
+                for m in messages
+            ]
+
     def get_user_email_by_id(self, user_id):
         """
         Convenience wrapper used by various modules (e.g. Compliance) to fetch a user's
@@ -1538,6 +1649,7 @@ class NotificationService:
 
             notification_data = {
                 "notification_type": "complianceAssigned",
+                "group_key": f"framework:{getattr(compliance, 'FrameworkId_id', None)}",
                 "email": reviewer_email,
                 "email_type": "gmail",
                 "template_data": [
@@ -1569,6 +1681,7 @@ class NotificationService:
 
             notification_data = {
                 "notification_type": "complianceReviewed",
+                "group_key": f"framework:{getattr(compliance, 'FrameworkId_id', None)}",
                 "email": creator_email,
                 "email_type": "gmail",
                 "template_data": [
@@ -1615,8 +1728,23 @@ class NotificationService:
             logger.error(f"Error in send_export_completion_notification: {str(e)}")
             return {"success": False, "error": str(e)}
 
+    @staticmethod
+    def _outbox_enabled():
+        try:
+            from django.conf import settings
+            return getattr(settings, 'NOTIFICATION_OUTBOX_ENABLED', True)
+        except Exception:
+            return False
+
     def send_multi_channel_notification(self, notification_data):
-        """Send notification through multiple channels"""
+        """
+        Send notification through multiple channels.
+
+        Email goes through the outbox unless notification_data['deliver_now'] is
+        set or NOTIFICATION_OUTBOX_ENABLED is False. Optional 'group_key' (the
+        entity tree, e.g. "framework:12") and 'link' are used to coalesce bulk
+        notifications into digests.
+        """
         results = {
             "email": None,
             "whatsapp": None,
@@ -1630,17 +1758,28 @@ class NotificationService:
         # Send email if email details provided
         if notification_data.get('email') and notification_data.get('email_type'):
             try:
-                email_result = self.send_email(
-                    notification_data['email'],
-                    notification_data['email_type'],
-                    notification_type,
-                    notification_data.get('template_data', [])
-                )
+                if notification_data.get('deliver_now') or not self._outbox_enabled():
+                    email_result = self.send_email(
+                        notification_data['email'],
+                        notification_data['email_type'],
+                        notification_type,
+                        notification_data.get('template_data', [])
+                    )
+                else:
+                    email_result = self.queue_email(
+                        notification_data['email'],
+                        notification_data['email_type'],
+                        notification_type,
+                        notification_data.get('template_data', []),
+                        group_key=notification_data.get('group_key'),
+                        link=notification_data.get('link')
+                    )
                 
                 if email_result.get('success'):
                     results['email'] = {
                         'to': notification_data['email'],
-                        'type': notification_data['email_type']
+                        'type': notification_data['email_type'],
+                        'queued': bool(email_result.get('queued'))
                     }
                 else:
                     results['errors'].append({
@@ -0,0 +1,268 @@
+"""
+Persistent in-app notification store.
+
+Notifications are InAppNotification rows indexed by (user_id, is_read,
+created_at). Every write also updates the user's InAppNotificationCounter row
+in the same transaction, which gives:
+
+- unread counts from a single primary-key read instead of a scan, and
+- a per-user version number that changes whenever the user's notifications do.
+
+Each process keeps a ring of the newest NOTIFICATION_RING_SIZE notifications
+for recently active users. A ring is only served while its version matches the
+counter row, so a write made by any worker invalidates it everywhere.
+
+wait_for_change() blocks until a user's version moves past a known value. Writes
+in this process wake waiters immediately; writes from other workers are seen
+within NOTIFICATION_WAIT_POLL_SECONDS. The SSE and long-poll endpoints in
+notifications.py are built on it.
+"""
+
+import collections
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from grc.models import InAppNotification, InAppNotificationCounter
+
+from .notification_digest import coalesce_in_app, get_rule
+
+logger = logging.getLogger(__name__)
+
+RING_SIZE = getattr(settings, 'NOTIFICATION_RING_SIZE', 100)
+CACHED_USERS = getattr(settings, 'NOTIFICATION_CACHED_USERS', 2000)
+WAIT_POLL_SECONDS = getattr(settings, 'NOTIFICATION_WAIT_POLL_SECONDS', 2)
+BULK_BATCH_SIZE = 1000
+
+# Titles used by policy acknowledgement requests; these stay unread until acknowledged
+ACKNOWLEDGEMENT_TITLES = ('Acknowledgement Request', 'Policy Acknowledgement')
+
+
+def acknowledgement_q():
+    condition = Q()
+    for title in ACKNOWLEDGEMENT_TITLES:
+        condition |= Q(title__contains=title)
+    return condition
+
+
+def serialize(row):
+    """The notification dict shape used by the notifications API and Sidebar.vue"""
+    notification = {
+        'id': row.id,
+        'title': row.title,
+        'message': row.message,
+        'category': row.category,
+        'priority': row.priority,
+        'createdAt': row.created_at.isoformat() if row.created_at else None,
+        'status': {
+            'isRead': row.is_read,
+            'readAt': row.read_at.isoformat() if row.read_at else None,
+        },
+        'user_id': row.user_id,
+    }
+    if row.link:
+        notification['link'] = row.link
+    if row.digest:
+        notification['digest'] = row.digest
+    return notification
+
+
+# -- counters -----------------------------------------------------------------
+
+def _bump(user_id, unread_delta=0):
+    """Adjust a user's unread count and version; call inside the write's transaction"""
+    updated = InAppNotificationCounter.objects.filter(user_id=user_id).update(
+        unread=F('unread') + unread_delta, version=F('version') + 1
+    )
+    if not updated:
+        counter, created = InAppNotificationCounter.objects.get_or_create(
+            user_id=user_id,
+            defaults={'unread': max(unread_delta, 0), 'version': 1}
+        )
+        if not created:
+            InAppNotificationCounter.objects.filter(user_id=user_id).update(
+                unread=F('unread') + unread_delta, version=F('version') + 1
+            )
+    transaction.on_commit(lambda: _notify_local(user_id))
+
+
+def counter(user_id):
+    """(unread, version) for a user"""
+    row = InAppNotificationCounter.objects.filter(user_id=str(user_id)).values_list('unread', 'version').first()
+    return row or (0, 0)
+
+
+def unread_count(user_id):
+    return max(counter(user_id)[0], 0)
+
+
+def rebuild_counter(user_id):
+    """Recount a user's unread notifications from the table"""
+    user_id = str(user_id)
+    with transaction.atomic():
+        unread = InAppNotification.objects.filter(user_id=user_id, is_read=False).count()
+        InAppNotificationCounter.objects.update_or_create(user_id=user_id, defaults={'unread': unread})
+        _bump(user_id)
+    return unread
+
+
+# -- writes -------------------------------------------------------------------
+
+def add(notification, group_key=None, link=None):
+    """
+    Store a notification dict (see push_notification for the shape), folding it
+    into an open digest where the category has a digest rule. Returns the
+    notification now visible to the user.
+    """
+    with transaction.atomic():
+        row, created = coalesce_in_app(notification, group_key=group_key, link=link)
+        _bump(row.user_id, 1 if created else 0)
+    return serialize(row)
+
+
+def add_many(notifications):
+    """
+    Store many notification dicts with one insert and one counter update per
+    distinct per-user count. Categories with a digest rule still go through
+    add() one at a time so they can be folded. Returns the number stored.
+    """
+    rows = []
+    digested = []
+    for notification in notifications:
+        if get_rule('in_app', notification.get('category')) is not None:
+            digested.append(notification)
+            continue
+        rows.append(InAppNotification(
+            id=notification.get('id') or str(uuid.uuid4()),
+            user_id=str(notification.get('user_id')),
+            title=notification.get('title') or '',
+            message=notification.get('message') or '',
+            category=notification.get('category') or 'common',
+            priority=notification.get('priority') or 'medium',
+            link=notification.get('link'),
+            created_at=timezone.now(),
+        ))
+
+    if rows:
+        per_user = collections.Counter(row.user_id for row in rows)
+        with transaction.atomic():
+            InAppNotification.objects.bulk_create(rows, batch_size=BULK_BATCH_SIZE)
+            InAppNotificationCounter.objects.bulk_create(
+                [InAppNotificationCounter(user_id=user_id) for user_id in per_user],
+                batch_size=BULK_BATCH_SIZE, ignore_conflicts=True
+            )
+            by_delta = collections.defaultdict(list)
+            for user_id, count in per_user.items():
+                by_delta[count].append(user_id)
+            for count, user_ids in by_delta.items():
+                InAppNotificationCounter.objects.filter(user_id__in=user_ids).update(
+                    unread=F('unread') + count, version=F('version') + 1
+                )
+            transaction.on_commit(lambda: _notify_local(None))
+
+    for notification in digested:
+        add(notification, link=notification.get('link'))
+    return len(rows) + len(digested)
+
+
+def mark_read(user_id=None, ids=None, where=None):
+    """
+    Mark unread notifications as read by id, by predicate (a Q object), or both.
+    At least one of user_id / ids is required. Returns the number marked.
+    """
+    if user_id is None and not ids:
+        return 0
+    queryset = InAppNotification.objects.filter(is_read=False)
+    if user_id is not None:
+        queryset = queryset.filter(user_id=str(user_id))
+    if ids:
+        queryset = queryset.filter(id__in=list(ids))
+    if where is not None:
+        queryset = queryset.filter(where)
+
+    with transaction.atomic():
+        rows = list(queryset.select_for_update().values_list('id', 'user_id'))
+        if not rows:
+            return 0
+        InAppNotification.objects.filter(id__in=[row_id for row_id, _ in rows]).update(
+            is_read=True, read_at=timezone.now()
+        )
+        for owner, count in collections.Counter(owner for _, owner in rows).items():
+            _bump(owner, -count)
+    return len(rows)
+
+
+# -- reads --------------------------------------------------------------------
+
+class _RingCache:
+    """Newest notifications per user, tagged with the counter version they were read at"""
+
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user_id, version, notifications):
+        with self._lock:
+            self._entries[user_id] = (version, notifications)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+
+_ring_cache = _RingCache(CACHED_USERS)
+
+
+def recent(user_id, limit=None):
+    """
+    The user's newest notifications, oldest first, as
+    (notifications, unread_count, version).
+    """
+    user_id = str(user_id)
+    limit = min(limit or RING_SIZE, RING_SIZE)
+    unread, version = counter(user_id)
+    notifications = _ring_cache.get(user_id, version)
+    if notifications is None:
+        rows = InAppNotification.objects.filter(user_id=user_id).order_by('-created_at')[:RING_SIZE]
+        notifications = tuple(serialize(row) for row in reversed(list(rows)))
+        _ring_cache.put(user_id, version, notifications)
+    return list(notifications[-limit:]), max(unread, 0), version
+
+
+# -- change notification ------------------------------------------------------
+
+_changed = threading.Condition()
+
+
+def _notify_local(user_id):
+    with _changed:
+        _changed.notify_all()
+
+
+def wait_for_change(user_id, since_version, timeout):
+    """
+    Block until the user's version differs from since_version or timeout
+    seconds pass. Returns the current version.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        version = counter(user_id)[1]
+        remaining = deadline - time.monotonic()
+        if version != since_version or remaining <= 0:
+            return version
+        with _changed:
+            _changed.wait(min(WAIT_POLL_SECONDS, remaining))
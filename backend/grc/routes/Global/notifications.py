@@ -1,12 +1,48 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
+import time
 from datetime import datetime
 import uuid
 
-# Simple in-memory storage for notifications (in production, use database)
-notifications_storage = []
+from ...models import InAppNotification
+from . import notification_store
+
+# How long one long-poll request / SSE connection is held open. Both stay well
+# under the gunicorn worker timeout; clients reconnect with their last version.
+WORKER_TIMEOUT_SECONDS = getattr(settings, 'WORKER_TIMEOUT_SECONDS', 120)
+LONG_POLL_SECONDS = min(getattr(settings, 'NOTIFICATION_LONG_POLL_SECONDS', 20), WORKER_TIMEOUT_SECONDS / 4)
+STREAM_MAX_SECONDS = min(getattr(settings, 'NOTIFICATION_STREAM_MAX_SECONDS', 55), WORKER_TIMEOUT_SECONDS / 2)
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+def store_notification(notification, group_key=None, link=None):
+    """
+    Save a notification in the persistent notification store.
+
+    Categories with a digest rule are folded into the user's open digest for
+    group_key (see notification_digest.py). Returns the stored notification.
+    """
+    return notification_store.add(notification, group_key=group_key, link=link)
+
+
+def _request_user_id(request, fallback=None):
+    """UserId of the authenticated user, else the given fallback"""
+    user = getattr(request, 'user', None)
+    if user and hasattr(user, 'UserId'):
+        return str(user.UserId)
+    if user and getattr(user, 'id', None):
+        return str(user.id)
+    return fallback or 'default_user'
+
+
+def _authenticated_user_id(request):
+    """UserId verified by JWTAuthenticationMiddleware (token or session), else None"""
+    user = getattr(request, 'user', None)
+    user_id = getattr(user, 'UserId', None)
+    return str(user_id) if user_id else None
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -24,17 +60,7 @@ def push_notification(request):
         priority = data.get('priority', 'medium')
         
         # Get user_id from JWT authentication or request data
-        user_id = None
-        
-        # First try to get from authenticated user
-        if hasattr(request, 'user') and request.user and hasattr(request.user, 'UserId'):
-            user_id = str(request.user.UserId)
-        elif hasattr(request, 'user') and request.user and hasattr(request.user, 'id'):
-            user_id = str(request.user.id)
-        
-        # Fallback to request data
-        if not user_id:
-            user_id = data.get('user_id', 'default_user')
+        user_id = _request_user_id(request, data.get('user_id'))
         
         # Create notification object
         notification = {
@@ -51,12 +77,8 @@ def push_notification(request):
             'user_id': user_id
         }
         
-        # Store notification (in production, save to database)
-        notifications_storage.append(notification)
-        
-        # Keep only last 100 notifications to prevent memory issues
-        if len(notifications_storage) > 100:
-            notifications_storage.pop(0)
+        # Store notification
+        notification = store_notification(notification, group_key=data.get('group_key'), link=data.get('link'))
         
         return JsonResponse({
             'status': 'success',
@@ -82,27 +104,15 @@ def get_notifications(request):
     """
     try:
         # Get user_id from JWT authentication or query parameter
-        user_id = None
-        
-        # First try to get from authenticated user
-        if hasattr(request, 'user') and request.user and hasattr(request.user, 'UserId'):
-            user_id = str(request.user.UserId)
-        elif hasattr(request, 'user') and request.user and hasattr(request.user, 'id'):
-            user_id = str(request.user.id)
-        
-        # Fallback to query parameter
-        if not user_id:
-            user_id = request.GET.get('user_id', 'default_user')
+        user_id = _request_user_id(request, request.GET.get('user_id'))
         
-        # Filter notifications by user_id (in production, query database)
-        user_notifications = [
-            n for n in notifications_storage 
-            if n.get('user_id') == user_id
-        ]
+        notifications, unread, version = notification_store.recent(user_id)
         
         return JsonResponse({
             'status': 'success',
-            'notifications': user_notifications,
+            'notifications': notifications,
+            'unread_count': unread,
+            'version': version,
             'user_id': user_id
         })
         
@@ -112,6 +122,91 @@ def get_notifications(request):
             'message': str(e)
         }, status=500)
 
+@require_http_methods(["GET"])
+def get_unread_count(request):
+    """
+    Unread notification count and change version for a user
+    """
+    try:
+        user_id = _authenticated_user_id(request)
+        if not user_id:
+            return JsonResponse({'status': 'error', 'message': 'Authentication required'}, status=401)
+        unread, version = notification_store.counter(user_id)
+        return JsonResponse({
+            'status': 'success',
+            'unread_count': max(unread, 0),
+            'version': version,
+            'user_id': user_id
+        })
+    except Exception as e:
+        return JsonResponse({
+            'status': 'error',
+            'message': str(e)
+        }, status=500)
+
+@require_http_methods(["GET"])
+def notification_stream(request):
+    """
+    Push notification changes instead of polling get-notifications, for the
+    user of the verified token or session only.
+
+    With `Accept: text/event-stream` this is a server-sent events stream that
+    sends a `notifications` event (the same payload as get-notifications) each
+    time the user's notifications change, and closes after
+    NOTIFICATION_STREAM_MAX_SECONDS so EventSource reconnects.
+
+    Otherwise it is a long poll: pass the last seen `version`; the response
+    comes back as soon as it changes, or with `changed: false` after
+    NOTIFICATION_LONG_POLL_SECONDS.
+    """
+    user_id = _authenticated_user_id(request)
+    if not user_id:
+        return JsonResponse({'status': 'error', 'message': 'Authentication required'}, status=401)
+    try:
+        since = int(request.GET.get('version', request.META.get('HTTP_LAST_EVENT_ID', -1)))
+    except (TypeError, ValueError):
+        since = -1
+
+    if 'text/event-stream' not in request.META.get('HTTP_ACCEPT', ''):
+        try:
+            version = notification_store.wait_for_change(user_id, since, LONG_POLL_SECONDS)
+            if version == since:
+                return JsonResponse({'status': 'success', 'changed': False, 'version': version})
+            notifications, unread, version = notification_store.recent(user_id)
+            return JsonResponse({
+                'status': 'success',
+                'changed': True,
+                'notifications': notifications,
+                'unread_count': unread,
+                'version': version,
+                'user_id': user_id
+            })
+        except Exception as e:
+            return JsonResponse({
+                'status': 'error',
+                'message': str(e)
+            }, status=500)
+
+    def events():
+        yield 'retry: 3000\n\n'
+        version = since
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            current = notification_store.wait_for_change(
+                user_id, version, min(STREAM_HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0))
+            )
+            if current == version:
+                yield ': keepalive\n\n'
+                continue
+            notifications, unread, version = notification_store.recent(user_id)
+            payload = json.dumps({'notifications': notifications, 'unread_count': unread, 'version': version})
+            yield f'id: {version}\nevent: notifications\ndata: {payload}\n\n'
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def mark_as_read(request):
@@ -122,12 +217,8 @@ def mark_as_read(request):
         data = json.loads(request.body)
         notification_id = data.get('notification_id')
         
-        # Find and update notification (in production, update database)
-        for notification in notifications_storage:
-            if notification['id'] == notification_id:
-                notification['status']['isRead'] = True
-                notification['status']['readAt'] = datetime.now().isoformat()
-                break
+        ids = data.get('notification_ids') or ([notification_id] if notification_id else [])
+        notification_store.mark_read(ids=ids)
         
         return JsonResponse({
             'status': 'success',
@@ -157,29 +248,16 @@ def mark_all_as_read(request):
         user_id = data.get('user_id', 'default_user')
         exclude_acknowledgements = data.get('exclude_acknowledgements', False)
         
-        # Mark all user notifications as read (in production, update database)
+        # Mark all user notifications as read
         # BUT exclude acknowledgement notifications if requested
-        marked_count = 0
+        where = None
         skipped_count = 0
-        
-        for notification in notifications_storage:
-            if notification.get('user_id') == user_id and not notification['status'].get('isRead', False):
-                # Check if this is an acknowledgement notification
-                is_acknowledgement = False
-                if exclude_acknowledgements:
-                    title = notification.get('title', '')
-                    is_acknowledgement = (
-                        'Acknowledgement Request' in title or 
-                        'Policy Acknowledgement' in title
-                    )
-                
-                # Only mark as read if it's not an acknowledgement notification
-                if not is_acknowledgement:
-                    notification['status']['isRead'] = True
-                    notification['status']['readAt'] = datetime.now().isoformat()
-                    marked_count += 1
-                else:
-                    skipped_count += 1
+        if exclude_acknowledgements:
+            where = ~notification_store.acknowledgement_q()
+            skipped_count = InAppNotification.objects.filter(
+                notification_store.acknowledgement_q(), user_id=str(user_id), is_read=False
+            ).count()
+        marked_count = notification_store.mark_read(user_id=user_id, where=where)
         
         return JsonResponse({
             'status': 'success',
@@ -0,0 +1,280 @@
+"""
+Durable queue for post-upload PDF processing.
+
+RenderS3Client.upload used to start one thread per uploaded PDF. A burst of
+uploads started as many threads as there were files, and work in flight was
+lost on restart. Uploads now add a row to pdf_processing_jobs and a bounded
+pool of worker threads drains it:
+
+- jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+  processes can share the queue
+- each job records its current stage and per-stage timings
+- failures are retried with exponential backoff up to
+  PDF_PROCESSING_MAX_ATTEMPTS; a job stuck in 'running' (worker died) is
+  picked up again after PDF_PROCESSING_RUNNING_TIMEOUT seconds, and marked
+  failed once that was its last attempt
+- processing is idempotent: every attempt rewrites the same file_operations
+  metadata/summary, and there is one job per upload
+
+The worker pool starts with the web server when BACKGROUND_WORKERS_AUTOSTART
+is on (GrcConfig.ready). Set PDF_PROCESSING_IN_PROCESS_WORKERS = 0 to run it
+standalone instead with `python manage.py process_pdf_queue`.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+
+from grc.models import PdfProcessingJob
+
+logger = logging.getLogger(__name__)
+
+IN_PROCESS_WORKERS = getattr(settings, 'PDF_PROCESSING_IN_PROCESS_WORKERS', 2)
+MAX_ATTEMPTS = getattr(settings, 'PDF_PROCESSING_MAX_ATTEMPTS', 3)
+BACKOFF_BASE_SECONDS = getattr(settings, 'PDF_PROCESSING_BACKOFF_SECONDS', 60)
+BACKOFF_MAX_SECONDS = getattr(settings, 'PDF_PROCESSING_BACKOFF_MAX_SECONDS', 3600)
+RUNNING_TIMEOUT_SECONDS = getattr(settings, 'PDF_PROCESSING_RUNNING_TIMEOUT', 1800)
+IDLE_POLL_SECONDS = getattr(settings, 'PDF_PROCESSING_POLL_SECONDS', 10)
+
+
+def backoff_delay(attempts):
+    return min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+
+
+def enqueue(operation_id, s3_url, file_name):
+    """Queue an uploaded PDF for processing; re-queuing the same upload is a no-op"""
+    job, created = PdfProcessingJob.objects.get_or_create(
+        operation_id=operation_id,
+        defaults={'s3_url': s3_url, 'file_name': (file_name or '')[:500]}
+    )
+    if created:
+        wake_workers()
+    return job
+
+
+def _release_stale_jobs(now):
+    stale = PdfProcessingJob.objects.filter(
+        status='running',
+        locked_at__lt=now - timedelta(seconds=RUNNING_TIMEOUT_SECONDS)
+    )
+    # attempts was counted when the job was claimed, so a dead worker used one up
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='failed', locked_at=None, completed_at=now, updated_at=now,
+        last_error=f"Worker stopped responding for over {RUNNING_TIMEOUT_SECONDS}s on the last attempt"
+    )
+    if failed:
+        logger.error(f"PDF processing: {failed} stale job(s) failed after {MAX_ATTEMPTS} attempts")
+    stale.filter(attempts__lt=MAX_ATTEMPTS).update(
+        status='pending', locked_at=None, next_attempt_at=now, updated_at=now
+    )
+
+
+def claim_job():
+    """Lock the next due job and mark it running, or return None"""
+    now = datetime.now()
+    _release_stale_jobs(now)
+    with transaction.atomic():
+        job = (
+            PdfProcessingJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.stage = 'queued'
+        job.stage_timings = {}
+        job.locked_at = now
+        job.attempts += 1
+        job.started_at = job.started_at or now
+        job.save(update_fields=['status', 'stage', 'stage_timings', 'locked_at', 'attempts', 'started_at', 'updated_at'])
+    return job
+
+
+class _StageRecorder:
+    """on_stage callback that persists the current stage and its timings"""
+
+    def __init__(self, job):
+        self.job = job
+
+    def _close_current(self, now):
+        entry = self.job.stage_timings.get(self.job.stage)
+        if entry and not entry.get('ended_at'):
+            entry['ended_at'] = now
+            entry['duration'] = round(now - entry['started_at'], 3)
+
+    def __call__(self, stage):
+        now = time.time()
+        self._close_current(now)
+        self.job.stage = stage
+        self.job.stage_timings[stage] = {'started_at': now}
+        # Refresh the lock too, so a long stage is not mistaken for a dead worker
+        self.job.locked_at = datetime.now()
+        PdfProcessingJob.objects.filter(id=self.job.id).update(
+            stage=stage, stage_timings=self.job.stage_timings, locked_at=self.job.locked_at
+        )
+
+    def finish(self):
+        self._close_current(time.time())
+
+
+def run_job(job, client):
+    """Process one claimed job and record the outcome"""
+    recorder = _StageRecorder(job)
+    try:
+        client.process_pdf(job.operation_id, job.s3_url, job.file_name, on_stage=recorder)
+    except Exception as e:
+        recorder.finish()
+        now = datetime.now()
+        job.last_error = f"{type(e).__name__}: {str(e)}"[:2000]
+        job.locked_at = None
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+            job.completed_at = now
+            logger.error(f"PDF processing failed for operation {job.operation_id} after {job.attempts} attempts: {str(e)}")
+            try:
+                client.record_pdf_processing_failure(job.operation_id, e)
+            except Exception as db_error:
+                logger.error(f"Could not record PDF processing failure: {str(db_error)}")
+        else:
+            job.status = 'pending'
+            job.next_attempt_at = now + timedelta(seconds=backoff_delay(job.attempts))
+            logger.warning(f"PDF processing attempt {job.attempts} failed for operation {job.operation_id}, will retry: {str(e)}")
+        job.save(update_fields=[
+            'status', 'stage_timings', 'last_error', 'locked_at', 'next_attempt_at', 'completed_at', 'updated_at'
+        ])
+        return False
+
+    recorder.finish()
+    job.status = 'completed'
+    job.stage = 'done'
+    job.last_error = None
+    job.locked_at = None
+    job.completed_at = datetime.now()
+    job.save(update_fields=['status', 'stage', 'stage_timings', 'last_error', 'locked_at', 'completed_at', 'updated_at'])
+    return True
+
+
+def _default_client():
+    from .s3_fucntions import create_direct_mysql_client
+    return create_direct_mysql_client()
+
+
+def process_pending(max_jobs=None, client=None):
+    """Run due jobs until the queue is empty (or max_jobs ran); returns counts"""
+    stats = {'completed': 0, 'retried_or_failed': 0}
+    while max_jobs is None or sum(stats.values()) < max_jobs:
+        job = claim_job()
+        if job is None:
+            break
+        client = client or _default_client()
+        if run_job(job, client):
+            stats['completed'] += 1
+        else:
+            stats['retried_or_failed'] += 1
+    return stats
+
+
+def job_status(operation_id):
+    """Queue state of an upload's job as a dict, or None if it was never queued"""
+    job = PdfProcessingJob.objects.filter(operation_id=operation_id).first()
+    if job is None:
+        return None
+    return {
+        'job_status': job.status,
+        'stage': job.stage,
+        'attempts': job.attempts,
+        'max_attempts': MAX_ATTEMPTS,
+        'last_error': job.last_error,
+        'next_attempt_at': job.next_attempt_at.isoformat() if job.status == 'pending' and job.next_attempt_at else None,
+        'stage_timings': job.stage_timings,
+        'queued_at': job.created_at.isoformat() if job.created_at else None,
+        'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+    }
+
+
+def queue_metrics(window_minutes=60):
+    """Backlog by status plus throughput and mean stage durations over a recent window"""
+    since = datetime.now() - timedelta(minutes=window_minutes)
+    by_status = dict(
+        PdfProcessingJob.objects.values_list('status').annotate(total=Count('id')).order_by()
+    )
+    recent = list(
+        PdfProcessingJob.objects.filter(status='completed', completed_at__gte=since)
+        .values_list('stage_timings', flat=True)
+    )
+    durations = {}
+    for timings in recent:
+        for stage, entry in (timings or {}).items():
+            if entry.get('duration') is not None:
+                durations.setdefault(stage, []).append(entry['duration'])
+    return {
+        'backlog': {status: by_status.get(status, 0) for status in ('pending', 'running', 'completed', 'failed')},
+        'window_minutes': window_minutes,
+        'completed_in_window': len(recent),
+        'jobs_per_minute': round(len(recent) / window_minutes, 3),
+        'mean_stage_seconds': {
+            stage: round(sum(values) / len(values), 3)
+            for stage, values in durations.items()
+        },
+    }
+
+
+class _WorkerPool:
+    """Fixed number of daemon threads per process draining the queue"""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = []
+
+    def wake(self):
+        self._wake.set()
+        self.ensure_started()
+
+    def ensure_started(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.size:
+                thread = threading.Thread(
+                    target=self._run, name=f'pdf-processing-{len(self._threads)}', daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        client = None
+        while True:
+            self._wake.clear()
+            try:
+                close_old_connections()
+                client = client or _default_client()
+                stats = process_pending(client=client)
+                if any(stats.values()):
+                    logger.info(f"PDF processing queue: {stats}")
+            except Exception as e:
+                logger.error(f"PDF processing worker error: {str(e)}")
+            finally:
+                close_old_connections()
+            self._wake.wait(IDLE_POLL_SECONDS)
+
+
+_pool = _WorkerPool(IN_PROCESS_WORKERS)
+
+
+def start_workers():
+    """Start the in-process pool so queued and retried jobs run without a new upload"""
+    if IN_PROCESS_WORKERS:
+        _pool.ensure_started()
+
+
+def wake_workers():
+    if IN_PROCESS_WORKERS:
+        _pool.wake()
@@ -0,0 +1,133 @@
+"""
+Query planning for list serializers.
+
+A serializer that reads related rows per object (obj.policy_set, obj.FK.field,
+a per-row exists()) costs one query per row when it serializes a list. Planned
+serializers declare those reads in a QueryPlan instead:
+
+    class PolicySerializer(PlannedSerializerMixin, serializers.ModelSerializer):
+        query_plan = QueryPlan(
+            select_related=['FrameworkId'],
+            prefetch_related=['subpolicy_set'],
+        )
+
+Serializing with many=True then plans the instance before it is evaluated:
+
+- an unevaluated QuerySet gets select_related / prefetch_related / annotate
+- a list, an evaluated QuerySet or a union() gets one prefetch_related_objects()
+  call plus one query per annotation for the whole list
+
+Prefetch entries may be callables returning a Prefetch, so a plan can nest
+another serializer's plan (see FrameworkSerializer). Method fields read
+annotations with getattr() and keep their per-object query as a fallback for
+single-object serialization.
+
+assert_constant_queries() serializes growing slices of a queryset and fails if
+the query count grows with the list size. `python manage.py
+check_serializer_queries` runs it for every planned serializer.
+"""
+
+from django.db import connection
+from django.db.models import Prefetch, QuerySet, prefetch_related_objects
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryPlan:
+    """Relations and annotations a serializer reads for each object"""
+
+    def __init__(self, select_related=(), prefetch_related=(), annotations=None):
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+        # {attribute name: callable returning a query expression}
+        self.annotations = dict(annotations or {})
+
+    def prefetches(self):
+        return [entry() if callable(entry) else entry for entry in self.prefetch_related]
+
+
+def plan_queryset(serializer_class, instance):
+    """Apply serializer_class.query_plan to a QuerySet, or to a list of model instances"""
+    plan = getattr(serializer_class, 'query_plan', None)
+    if plan is None or instance is None:
+        return instance
+
+    if isinstance(instance, QuerySet) and instance._result_cache is None and not instance.query.combinator:
+        queryset = instance
+        if plan.select_related:
+            queryset = queryset.select_related(*plan.select_related)
+        prefetches = plan.prefetches()
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        if plan.annotations:
+            queryset = queryset.annotate(**{name: make() for name, make in plan.annotations.items()})
+        return queryset
+
+    objects = list(instance)
+    if not objects:
+        return instance
+    lookups = list(plan.select_related) + plan.prefetches()
+    if lookups:
+        # Relations that are already cached (e.g. from an outer prefetch) are skipped
+        prefetch_related_objects(objects, *lookups)
+    missing = [name for name in plan.annotations if not hasattr(objects[0], name)]
+    if missing:
+        model = type(objects[0])
+        values = {
+            row[0]: row[1:]
+            for row in model._default_manager.filter(pk__in=[obj.pk for obj in objects])
+            .annotate(**{name: plan.annotations[name]() for name in missing})
+            .values_list('pk', *missing)
+        }
+        for obj in objects:
+            for position, name in enumerate(missing):
+                row = values.get(obj.pk)
+                setattr(obj, name, row[position] if row else None)
+    return instance
+
+
+class PlannedSerializerMixin:
+    """Applies the serializer's query_plan whenever it is used with many=True"""
+
+    query_plan = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        if args:
+            args = (plan_queryset(cls, args[0]),) + args[1:]
+        elif kwargs.get('instance') is not None:
+            kwargs['instance'] = plan_queryset(cls, kwargs['instance'])
+        return super().many_init(*args, **kwargs)
+
+
+def planned_prefetch(serializer_class, lookup, queryset, to_attr=None):
+    """A Prefetch whose queryset is planned for serializer_class"""
+    return Prefetch(lookup, queryset=plan_queryset(serializer_class, queryset), to_attr=to_attr)
+
+
+def count_serializer_queries(serializer_class, queryset, size, context=None):
+    """Number of queries needed to serialize the first `size` rows of queryset"""
+    with CaptureQueriesContext(connection) as captured:
+        serializer_class(queryset[:size], many=True, context=context or {}).data
+    return len(captured.captured_queries)
+
+
+def assert_constant_queries(serializer_class, queryset, sizes=(1, 5, 25), context=None):
+    """
+    Serialize growing slices of queryset and raise AssertionError if the query
+    count still grows between the two largest sizes. Returns {size: query count}.
+
+    Only the largest sizes are compared because a small slice can legitimately
+    need fewer queries: Django skips a nested prefetch when the outer one found
+    no rows.
+    """
+    available = queryset.count()
+    counts = {
+        size: count_serializer_queries(serializer_class, queryset, size, context)
+        for size in sorted({min(size, available) for size in sizes if available})
+    }
+    largest = sorted(counts)[-2:]
+    if len(largest) == 2 and counts[largest[1]] > counts[largest[0]]:
+        raise AssertionError(
+            f"{serializer_class.__name__} query count grows with list size: {counts}"
+        )
+    return counts
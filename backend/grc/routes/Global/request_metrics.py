@@ -0,0 +1,349 @@
+"""
+Per-endpoint request instrumentation.
+
+RequestMetricsMiddleware (grc/middleware.py) wraps every request and records
+the following into in-process histograms, keyed by URL name:
+- SQL query count and total DB time (through a connection execute_wrapper, so
+  DEBUG is not needed)
+- Python time (wall time minus DB time)
+- response size
+
+Query budgets:
+    QUERY_BUDGETS = {'framework-list': 10, 'api-get-notifications': 3}
+    QUERY_BUDGET_DEFAULT = None       # budget for endpoints not listed
+    QUERY_BUDGET_MODE = 'log'         # 'raise' in tests: QueryBudgetExceeded
+An exceeded budget is logged with the endpoint's most repeated SQL, which is
+usually the N+1.
+
+Slow-request profiles: REQUEST_PROFILE_SAMPLE_RATE of requests run under
+cProfile. Those that take longer than SLOW_REQUEST_SECONDS keep their top
+functions and repeated SQL in a ring of the last SLOW_REQUEST_PROFILES_KEPT.
+
+metrics_view exports everything in Prometheus text format (JSON with
+?format=json). The export includes the outbound HTTP client histograms and
+the PDF processing backlog.
+"""
+
+import collections
+import hmac
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+ENABLED = getattr(settings, 'REQUEST_METRICS_ENABLED', True)
+QUERY_BUDGETS = getattr(settings, 'QUERY_BUDGETS', {}) or {}
+QUERY_BUDGET_DEFAULT = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+QUERY_BUDGET_MODE = getattr(settings, 'QUERY_BUDGET_MODE', 'log')
+SLOW_REQUEST_SECONDS = getattr(settings, 'SLOW_REQUEST_SECONDS', 1.0)
+PROFILE_SAMPLE_RATE = getattr(settings, 'REQUEST_PROFILE_SAMPLE_RATE', 0.01)
+PROFILES_KEPT = getattr(settings, 'SLOW_REQUEST_PROFILES_KEPT', 20)
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', None)
+
+SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float('inf'))
+BYTES_BUCKETS = (1024, 10240, 102400, 1048576, 10485760, float('inf'))
+
+PROFILE_TOP_FUNCTIONS = 25
+REPEATED_SQL_SHOWN = 5
+
+
+class QueryBudgetExceeded(Exception):
+    """An endpoint ran more queries than its QUERY_BUDGETS entry (QUERY_BUDGET_MODE='raise')"""
+
+
+class Histogram:
+    """Observation count, sum and per-bucket counts (non-cumulative)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'buckets': {
+                ('+Inf' if bound == float('inf') else str(bound)): count
+                for bound, count in zip(self.buckets, self.counts)
+            },
+        }
+
+
+class EndpointStats:
+    def __init__(self):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.db_seconds = Histogram(SECONDS_BUCKETS)
+        self.python_seconds = Histogram(SECONDS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.response_bytes = Histogram(BYTES_BUCKETS)
+        self.statuses = collections.Counter()
+        self.budget_exceeded = 0
+        self.max_queries = 0
+
+    def snapshot(self):
+        return {
+            'duration_seconds': self.duration.snapshot(),
+            'db_seconds': self.db_seconds.snapshot(),
+            'python_seconds': self.python_seconds.snapshot(),
+            'queries': self.queries.snapshot(),
+            'response_bytes': self.response_bytes.snapshot(),
+            'statuses': dict(self.statuses),
+            'budget_exceeded': self.budget_exceeded,
+            'max_queries': self.max_queries,
+        }
+
+
+class MetricsStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._profiles = collections.deque(maxlen=PROFILES_KEPT)
+
+    def record(self, endpoint, status, duration, db_seconds, queries, response_bytes, over_budget):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.duration.observe(duration)
+            stats.db_seconds.observe(db_seconds)
+            stats.python_seconds.observe(max(duration - db_seconds, 0))
+            stats.queries.observe(queries)
+            if response_bytes is not None:
+                stats.response_bytes.observe(response_bytes)
+            stats.statuses[str(status)] += 1
+            stats.max_queries = max(stats.max_queries, queries)
+            if over_budget:
+                stats.budget_exceeded += 1
+
+    def add_profile(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {name: stats.snapshot() for name, stats in self._endpoints.items()}
+            for name, data in endpoints.items():
+                data['budget'] = query_budget(name)
+            return endpoints
+
+    def profiles(self):
+        with self._lock:
+            return list(self._profiles)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._profiles.clear()
+
+
+store = MetricsStore()
+
+
+def query_budget(endpoint, default=QUERY_BUDGET_DEFAULT):
+    return QUERY_BUDGETS.get(endpoint, default) if endpoint else default
+
+
+class QueryRecorder:
+    """execute_wrapper counting queries, DB time and repeated statements"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = collections.Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            # Parameters are not interpolated, so an N+1 shows up as one repeated statement
+            self.statements[sql] += 1
+
+    def repeated(self, limit=REPEATED_SQL_SHOWN):
+        return [
+            {'sql': sql[:500], 'count': count}
+            for sql, count in self.statements.most_common(limit) if count > 1
+        ]
+
+
+def _endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.url_name or match.view_name
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        return None
+    try:
+        return len(response.content)
+    except Exception:
+        return None
+
+
+def _profile_summary(profiler):
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return output.getvalue()
+
+
+def record_request(request, response, duration, recorder, profiler=None):
+    """Record one finished request; raises QueryBudgetExceeded in 'raise' mode"""
+    endpoint = _endpoint_name(request)
+    budget = query_budget(endpoint)
+    over_budget = budget is not None and recorder.count > budget
+    store.record(
+        endpoint, response.status_code, duration, recorder.seconds, recorder.count,
+        _response_size(response), over_budget
+    )
+
+    if profiler and duration >= SLOW_REQUEST_SECONDS:
+        store.add_profile({
+            'endpoint': endpoint,
+            'path': request.path,
+            'method': request.method,
+            'duration_seconds': round(duration, 3),
+            'db_seconds': round(recorder.seconds, 3),
+            'queries': recorder.count,
+            'repeated_sql': recorder.repeated(),
+            'at': time.time(),
+            'profile': _profile_summary(profiler),
+        })
+
+    if over_budget:
+        message = (
+            f"Query budget exceeded for {endpoint}: {recorder.count} queries "
+            f"(budget {budget}) on {request.method} {request.path}; repeated: {recorder.repeated()}"
+        )
+        if QUERY_BUDGET_MODE == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def should_profile():
+    return random.random() < PROFILE_SAMPLE_RATE
+
+
+# -- export -------------------------------------------------------------------
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _histogram_lines(metric, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in histogram['buckets'].items():
+        cumulative += count
+        lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{metric}_sum{{{labels}}} {histogram["sum"]}')
+    lines.append(f'{metric}_count{{{labels}}} {histogram["count"]}')
+    return lines
+
+
+def _external_metrics():
+    """Metrics kept by other modules; each source is optional"""
+    data = {}
+    try:
+        from .http_client import metrics_snapshot
+        data['outbound_http'] = metrics_snapshot()
+    except Exception as e:
+        logger.error(f"Outbound HTTP metrics unavailable: {str(e)}")
+    try:
+        from .pdf_processing_queue import queue_metrics
+        data['pdf_processing'] = queue_metrics()
+    except Exception as e:
+        logger.error(f"PDF processing metrics unavailable: {str(e)}")
+    return data
+
+
+def prometheus_text():
+    lines = []
+    metrics = [
+        ('grc_request_duration_seconds', 'duration_seconds', 'Request wall time'),
+        ('grc_request_db_seconds', 'db_seconds', 'Time spent in SQL per request'),
+        ('grc_request_python_seconds', 'python_seconds', 'Request time outside SQL'),
+        ('grc_request_queries', 'queries', 'SQL queries per request'),
+        ('grc_response_bytes', 'response_bytes', 'Response body size'),
+    ]
+    endpoints = store.snapshot()
+    for metric, key, help_text in metrics:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        for endpoint, data in sorted(endpoints.items()):
+            lines.extend(_histogram_lines(metric, f'endpoint="{_label(endpoint)}"', data[key]))
+
+    lines.append('# HELP grc_requests_total Requests by endpoint and status')
+    lines.append('# TYPE grc_requests_total counter')
+    for endpoint, data in sorted(endpoints.items()):
+        for status, count in sorted(data['statuses'].items()):
+            lines.append(f'grc_requests_total{{endpoint="{_label(endpoint)}",status="{status}"}} {count}')
+    lines.append('# HELP grc_query_budget_exceeded_total Requests over their query budget')
+    lines.append('# TYPE grc_query_budget_exceeded_total counter')
+    for endpoint, data in sorted(endpoints.items()):
+        if data['budget'] is not None:
+            lines.append(f'grc_query_budget_exceeded_total{{endpoint="{_label(endpoint)}"}} {data["budget_exceeded"]}')
+
+    external = _external_metrics()
+    outbound = external.get('outbound_http') or {}
+    if outbound:
+        lines.append('# HELP grc_outbound_http_seconds Outbound integration call latency')
+        lines.append('# TYPE grc_outbound_http_seconds histogram')
+        for integration, data in sorted(outbound.items()):
+            histogram = {'buckets': data['buckets'], 'sum': data['total_seconds'], 'count': data['requests']}
+            lines.extend(_histogram_lines('grc_outbound_http_seconds', f'integration="{_label(integration)}"', histogram))
+        lines.append('# TYPE grc_outbound_http_errors_total counter')
+        for integration, data in sorted(outbound.items()):
+            lines.append(f'grc_outbound_http_errors_total{{integration="{_label(integration)}"}} {data["errors"]}')
+    backlog = (external.get('pdf_processing') or {}).get('backlog') or {}
+    if backlog:
+        lines.append('# TYPE grc_pdf_processing_jobs gauge')
+        for status, count in backlog.items():
+            lines.append(f'grc_pdf_processing_jobs{{status="{status}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _authorized(request):
+    if not METRICS_TOKEN:
+        return False
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    supplied = header[len('Bearer '):] if header.startswith('Bearer ') else request.META.get('HTTP_X_METRICS_TOKEN', '')
+    return hmac.compare_digest(supplied.encode('utf-8'), METRICS_TOKEN.encode('utf-8'))
+
+
+def metrics_view(request):
+    """
+    Prometheus text by default; ?format=json for JSON, ?profiles=1 to include
+    sampled slow-request profiles. Requires METRICS_TOKEN (Bearer or
+    X-Metrics-Token header); while METRICS_TOKEN is unset it always answers 404.
+    """
+    if not _authorized(request):
+        return JsonResponse({'error': 'Not found'}, status=404)
+    if request.GET.get('format') == 'json' or request.GET.get('profiles'):
+        data = {'endpoints': store.snapshot(), **_external_metrics()}
+        if request.GET.get('profiles'):
+            data['slow_profiles'] = store.profiles()
+        return JsonResponse(data)
+    return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,375 @@
+"""
+Retention sweeper: archive and delete records whose retention has expired.
+
+Two sources of expired records are swept, both with keyset range scans and
+bounded chunks so no statement touches more than RETENTION_SWEEP_CHUNK rows:
+
+- RetentionTimeline rows that are Active/Expired, past RetentionEndDate,
+  auto-delete enabled and not paused (or whose pause has lapsed). The
+  underlying record (RETENTION_DELETE_MODEL_MAP) is archived and deleted, the
+  timeline is marked Disposed and one DataLifecycleAuditLog DELETE entry is
+  written per record. Timelines whose RecordType has no mapped model are left
+  as they are and logged as skipped.
+- High-volume tables without timelines (RETENTION_SWEEP_MODELS, by default
+  grc_logs and file_operations) swept by their indexed retentionExpiry column.
+  Records held by a paused/archived/extended timeline are skipped. These get
+  one summary audit entry per chunk instead of one per row.
+
+Per chunk: rows are written to a compressed archive file and fsynced, then
+deleted in a short transaction, then audit entries are bulk inserted. Rows
+that would be removed by an on_delete=CASCADE (a framework's policies, a
+policy's subpolicies, ...) are archived and deleted first, table by table in
+chunks of the same size, so the parent's own delete has nothing left to
+cascade and no child row is lost without an archive. The
+sweep sleeps RETENTION_SWEEP_PAUSE_SECONDS between chunks and stops at
+max_rows / max_seconds. Progress per table is kept in integration_sync_watermarks
+(source 'retention_sweep'), so an interrupted or capped run resumes after the
+last key it handled; a scan that reaches the end starts over next time.
+
+Run with `python manage.py sweep_retention` (--dry-run to only count).
+"""
+
+import logging
+import time
+import uuid
+from datetime import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CASCADE, Q
+from django.utils import timezone
+
+from grc.models import (
+    RETENTION_DELETE_MODEL_MAP, DataLifecycleAuditLog, IntegrationSyncWatermark, RetentionTimeline
+)
+
+from .archive_files import ArchiveWriter
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, 'RETENTION_SWEEP_CHUNK', 500)
+PAUSE_SECONDS = getattr(settings, 'RETENTION_SWEEP_PAUSE_SECONDS', 0.2)
+SWEEP_MODELS = getattr(settings, 'RETENTION_SWEEP_MODELS', ['grc.GRCLog', 'grc.FileOperations'])
+
+WATERMARK_SOURCE = 'retention_sweep'
+TIMELINE_SCOPE = 'retention_timelines'
+
+# Timeline states that can still expire; see RetentionTimeline.is_expired
+SWEEPABLE_STATUSES = ['Active', 'Expired']
+
+# Deepest chain of CASCADE relations followed below a swept record
+MAX_CASCADE_DEPTH = 6
+
+
+def _model(label):
+    app_label, model_name = label.split('.', 1)
+    return apps.get_model(app_label, model_name)
+
+
+def _record_types_for(model):
+    label = f"{model._meta.app_label}.{model.__name__}"
+    return [record_type for record_type, mapped in RETENTION_DELETE_MODEL_MAP.items() if mapped == label]
+
+
+def expired_timelines(today=None):
+    today = today or timezone.now().date()
+    return RetentionTimeline.objects.filter(
+        Status__in=SWEEPABLE_STATUSES,
+        RetentionEndDate__lt=today,
+        auto_delete_enabled=True,
+    ).filter(
+        Q(deletion_paused=False) | Q(pause_until__lt=today)
+    )
+
+
+class RetentionSweeper:
+    def __init__(self, dry_run=False, chunk_size=None, pause_seconds=None, max_rows=None,
+                 max_seconds=None, today=None, stdout=None):
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        self.pause_seconds = PAUSE_SECONDS if pause_seconds is None else pause_seconds
+        self.max_rows = max_rows
+        self.max_seconds = max_seconds
+        self.today = today or timezone.now().date()
+        self.run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.stdout = stdout
+        self._started = time.monotonic()
+        self._writers = {}
+        self.stats = {
+            'archived': 0, 'deleted': 0, 'skipped_held': 0,
+            'timelines_disposed': 0, 'timelines_skipped': 0, 'by_table': {},
+        }
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _log(self, message):
+        logger.info(message)
+        if self.stdout:
+            self.stdout.write(message)
+
+    def _budget_left(self):
+        if self.max_rows is not None and self.stats['deleted'] >= self.max_rows:
+            return False
+        if self.max_seconds is not None and time.monotonic() - self._started >= self.max_seconds:
+            return False
+        return True
+
+    def _chunk_limit(self):
+        if self.max_rows is None:
+            return self.chunk_size
+        return max(0, min(self.chunk_size, self.max_rows - self.stats['deleted']))
+
+    def _cursor(self, scope):
+        mark = IntegrationSyncWatermark.objects.filter(source=WATERMARK_SOURCE, scope_key=scope).first()
+        return (mark.cursor or {}).get('last_key', 0) if mark else 0
+
+    def _save_cursor(self, scope, last_key, finished=False):
+        if self.dry_run:
+            return
+        IntegrationSyncWatermark.objects.update_or_create(
+            source=WATERMARK_SOURCE, scope_key=scope,
+            defaults={
+                'cursor': {'last_key': 0 if finished else last_key, 'run_id': self.run_id},
+                'watermark': datetime.now(),
+                'last_sync_stats': {key: value for key, value in self.stats.items() if key != 'by_table'},
+            }
+        )
+
+    def _count(self, table, field, amount):
+        table_stats = self.stats['by_table'].setdefault(table, {'archived': 0, 'deleted': 0, 'skipped_held': 0})
+        table_stats[field] += amount
+        self.stats[field] += amount
+
+    def _writer(self, model):
+        table = model._meta.db_table
+        if table not in self._writers:
+            self._writers[table] = ArchiveWriter(table, f"{self.today:%Y-%m-%d}-{self.run_id}")
+        return self._writers[table]
+
+    @staticmethod
+    def _cascade_relations(model):
+        """(child model, FK name, parent key attname) for every relation that CASCADEs from model"""
+        return [
+            (rel.related_model, rel.field.name, rel.field.target_field.attname)
+            for rel in model._meta.related_objects
+            if rel.on_delete is CASCADE and not rel.many_to_many
+        ]
+
+    def _archive_and_delete(self, model, pks, depth=0):
+        """
+        Archive then delete rows of model, after archiving and deleting the rows
+        that would cascade from them. Returns (deleted pks, archive path).
+        """
+        rows = list(model.objects.filter(pk__in=pks).order_by().values())
+        if not rows:
+            return [], None
+        pk_name = model._meta.pk.attname
+        deleted = [row[pk_name] for row in rows]
+
+        for child_model, fk_name, target_attname in self._cascade_relations(model):
+            keys = deleted if target_attname == pk_name else [row[target_attname] for row in rows]
+            self._archive_and_delete_children(child_model, fk_name, keys, depth + 1)
+
+        writer = self._writer(model)
+        writer.write(rows)
+        with transaction.atomic():
+            model.objects.filter(pk__in=deleted).delete()
+        table = model._meta.db_table
+        self._count(table, 'archived', len(rows))
+        self._count(table, 'deleted', len(rows))
+        return deleted, writer.path
+
+    def _archive_and_delete_children(self, model, fk_name, parent_keys, depth):
+        """Cascade set of one relation, archived and deleted in chunks"""
+        if depth > MAX_CASCADE_DEPTH:
+            raise RuntimeError(
+                f"{model._meta.db_table}: CASCADE chain deeper than {MAX_CASCADE_DEPTH} levels"
+            )
+        last_pk = None
+        while True:
+            queryset = model.objects.filter(**{f"{fk_name}__in": parent_keys}).order_by('pk')
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            pks = list(queryset.values_list('pk', flat=True)[:self.chunk_size])
+            if not pks:
+                return
+            last_pk = pks[-1]
+            deleted, archive_path = self._archive_and_delete(model, pks, depth)
+            if deleted:
+                self._audit_chunk(model, deleted, archive_path, 'Automatic retention sweep (cascade)')
+
+    def _audit_chunk(self, model, deleted, archive_path, reason):
+        table = model._meta.db_table
+        DataLifecycleAuditLog.objects.create(
+            action_type='DELETE', record_type=table, record_id=min(deleted),
+            reason=reason, backup_id=archive_path,
+            before_status='Expired', after_status='Disposed',
+            details={
+                'rows': len(deleted), 'first_id': min(deleted), 'last_id': max(deleted),
+                'archive_location': archive_path, 'run_id': self.run_id, 'auto_delete': True,
+            },
+        )
+
+    def _throttle(self):
+        if self.pause_seconds:
+            time.sleep(self.pause_seconds)
+
+    # -- timeline driven -----------------------------------------------------
+
+    def sweep_timelines(self):
+        last_id = self._cursor(TIMELINE_SCOPE)
+        finished = False
+        while self._budget_left():
+            limit = self._chunk_limit()
+            timelines = list(
+                expired_timelines(self.today)
+                .filter(RetentionTimelineId__gt=last_id)
+                .order_by('RetentionTimelineId')[:limit]
+            )
+            if not timelines:
+                finished = True
+                break
+            last_id = timelines[-1].RetentionTimelineId
+
+            by_type = {}
+            for timeline in timelines:
+                by_type.setdefault((timeline.RecordType or '').lower(), []).append(timeline)
+
+            if self.dry_run:
+                for record_type, group in by_type.items():
+                    self._count(f"timeline:{record_type}", 'deleted', len(group))
+                continue
+
+            for record_type, group in by_type.items():
+                model_label = RETENTION_DELETE_MODEL_MAP.get(record_type)
+                if not model_label:
+                    self._skip(group, f"No model mapped for record type '{record_type}'")
+                    continue
+                deleted, archive_path, error = [], None, None
+                try:
+                    model = _model(model_label)
+                    deleted, archive_path = self._archive_and_delete(model, [t.RecordId for t in group])
+                except Exception as e:
+                    error = str(e)
+                    logger.error(f"Retention sweep of {record_type} failed: {error}")
+                self._dispose(group, deleted, archive_path, error)
+            self._save_cursor(TIMELINE_SCOPE, last_id)
+            self._throttle()
+        self._save_cursor(TIMELINE_SCOPE, last_id, finished=finished)
+
+    def _skip(self, timelines, reason):
+        """Nothing can be deleted for these timelines; record that and leave them as they are"""
+        logger.warning(f"Retention sweep skipped {len(timelines)} timeline(s): {reason}")
+        DataLifecycleAuditLog.objects.bulk_create([
+            DataLifecycleAuditLog(
+                action_type='DELETE', record_type=t.RecordType, record_id=t.RecordId,
+                record_name=t.RecordName, retention_timeline=t,
+                before_status=t.Status, after_status=t.Status,
+                reason='Automatic retention sweep skipped',
+                details={'skipped': True, 'deleted_record': False, 'error': reason,
+                         'run_id': self.run_id, 'auto_delete': True},
+            )
+            for t in timelines
+        ], batch_size=self.chunk_size)
+        self.stats['timelines_skipped'] += len(timelines)
+
+    def _dispose(self, timelines, deleted, archive_path, error):
+        if error:
+            # Leave the timelines for the next sweep, but record the failure
+            DataLifecycleAuditLog.objects.bulk_create([
+                DataLifecycleAuditLog(
+                    action_type='DELETE', record_type=t.RecordType, record_id=t.RecordId,
+                    record_name=t.RecordName, retention_timeline=t,
+                    before_status=t.Status, after_status=t.Status,
+                    reason='Automatic retention sweep failed',
+                    details={'error': error, 'run_id': self.run_id, 'auto_delete': True},
+                )
+                for t in timelines
+            ])
+            return
+
+        deleted_ids = set(deleted)
+        with transaction.atomic():
+            RetentionTimeline.objects.filter(
+                RetentionTimelineId__in=[t.RetentionTimelineId for t in timelines]
+            ).update(Status='Disposed', UpdatedAt=timezone.now())
+            DataLifecycleAuditLog.objects.bulk_create([
+                DataLifecycleAuditLog(
+                    action_type='DELETE', record_type=t.RecordType, record_id=t.RecordId,
+                    record_name=t.RecordName, retention_timeline=t,
+                    before_status=t.Status, after_status='Disposed',
+                    reason='Automatic retention sweep',
+                    backup_id=archive_path,
+                    details={
+                        # Missing rows were already gone; they still count as disposed
+                        'deleted_record': True,
+                        'archived': t.RecordId in deleted_ids,
+                        'archive_location': archive_path,
+                        'auto_delete': True,
+                        'run_id': self.run_id,
+                        'retention_end_date': t.RetentionEndDate.isoformat() if t.RetentionEndDate else None,
+                    },
+                )
+                for t in timelines
+            ], batch_size=self.chunk_size)
+        self.stats['timelines_disposed'] += len(timelines)
+
+    # -- column driven -------------------------------------------------------
+
+    def _held_ids(self, model, pks):
+        """Records whose timeline is paused, archived or extended"""
+        record_types = _record_types_for(model)
+        if not record_types:
+            return set()
+        return set(
+            RetentionTimeline.objects.filter(RecordType__in=record_types, RecordId__in=pks)
+            .filter(Q(deletion_paused=True) | Q(Status__in=['Archived', 'Paused', 'Extended']))
+            .values_list('RecordId', flat=True)
+        )
+
+    def sweep_model(self, model):
+        table = model._meta.db_table
+        last_key = self._cursor(table)
+        finished = False
+        while self._budget_left():
+            limit = self._chunk_limit()
+            pks = list(
+                model.objects.filter(retentionExpiry__lt=self.today, pk__gt=last_key)
+                .order_by('pk').values_list('pk', flat=True)[:limit]
+            )
+            if not pks:
+                finished = True
+                break
+            last_key = pks[-1]
+
+            held = self._held_ids(model, pks)
+            if held:
+                self._count(table, 'skipped_held', len(held))
+                pks = [pk for pk in pks if pk not in held]
+            if self.dry_run:
+                self._count(table, 'deleted', len(pks))
+                continue
+            if pks:
+                deleted, archive_path = self._archive_and_delete(model, pks)
+                if deleted:
+                    self._audit_chunk(model, deleted, archive_path, 'Automatic retention sweep (chunk)')
+            self._save_cursor(table, last_key)
+            self._throttle()
+        self._save_cursor(table, last_key, finished=finished)
+
+    # -- entry point ---------------------------------------------------------
+
+    def run(self, models=None):
+        self._log(f"Retention sweep {self.run_id} (cutoff {self.today}, dry_run={self.dry_run})")
+        self.sweep_timelines()
+        for label in (models if models is not None else SWEEP_MODELS):
+            if not self._budget_left():
+                break
+            model = _model(label)
+            if not any(field.name == 'retentionExpiry' for field in model._meta.fields):
+                self._log(f"Skipping {label}: no retentionExpiry column")
+                continue
+            self.sweep_model(model)
+        self.stats['archives'] = {table: writer.path for table, writer in self._writers.items()}
+        return self.stats
@@ -75,6 +75,8 @@ ERROR HANDLING:
 """
 
 import requests
+from grc.routes.Global.http_client import get_client
+from grc.routes.Global.s3_transfer import StreamingMultipartBody, download_to_file
 import os
 import json
 import mimetypes
@@ -82,7 +84,6 @@ from typing import Dict, List, Optional, Union, Any
 import datetime
 import mysql.connector
 from mysql.connector import pooling
-import threading
 import tempfile
 import io
 from io import BytesIO
@@ -462,101 +463,41 @@ class RenderS3Client:
             cursor.close()
             conn.close()
     
-    def _extract_text_from_pdf(self, pdf_content: bytes, smart_extract: bool = True) -> tuple:
+    def _extract_text_from_pdf(self, pdf_content: Union[bytes, str], smart_extract: bool = True) -> tuple:
         """
-        Extract text from PDF bytes using available PDF libraries
+        Extract text from PDF bytes (or a PDF file path) using the shared document text extractor
         Returns: (text, page_count, extraction_strategy)
         
-        Smart extraction logic:
+        Smart extraction logic (see document_text_extraction.sample_pdf_pages):
         - Small docs (1-5 pages): Extract all pages
         - Medium docs (6-20 pages): Extract first 5, last 1, and sample 2 from middle
         - Large docs (20+ pages): Extract first 3, last 1, and sample 3 from throughout
+        Page text is cached by content hash, so re-analysing the same file is free.
         """
         text = ""
         total_pages = 0
         extraction_strategy = "full"
         
         try:
-            # Determine total pages first
-            if PDFPLUMBER_AVAILABLE:
-                with io.BytesIO(pdf_content) as pdf_buffer:
-                    with pdfplumber.open(pdf_buffer) as pdf:
-                        total_pages = len(pdf.pages)
-                        
-                        # Determine extraction strategy based on document size
-                        if total_pages <= 5:
-                            # Small document - extract all pages
-                            pages_to_extract = list(range(total_pages))
-                            extraction_strategy = "full"
-                            print(f"📄 Small document ({total_pages} pages) - extracting all pages")
-                        elif total_pages <= 20:
-                            # Medium document - extract first 5, last 1, and 2 from middle
-                            middle_start = total_pages // 3
-                            middle_end = 2 * total_pages // 3
-                            pages_to_extract = [0, 1, 2, 3, 4, middle_start, middle_end, total_pages - 1]
-                            pages_to_extract = sorted(list(set([p for p in pages_to_extract if p < total_pages])))
-                            extraction_strategy = "medium"
-                            print(f"📄 Medium document ({total_pages} pages) - extracting {len(pages_to_extract)} pages")
-                        else:
-                            # Large document - extract first 3, last 1, and 3 from throughout
-                            sample_indices = [
-                                0, 1, 2,  # First 3 pages
-                                total_pages // 4,  # 25% mark
-                                total_pages // 2,  # 50% mark
-                                3 * total_pages // 4,  # 75% mark
-                                total_pages - 1  # Last page
-                            ]
-                            pages_to_extract = sorted(list(set([p for p in sample_indices if p < total_pages])))
-                            extraction_strategy = "large_sample"
-                            print(f"📄 Large document ({total_pages} pages) - extracting {len(pages_to_extract)} key pages")
-                        
-                        # Extract text from selected pages
-                        for page_num in pages_to_extract:
-                            try:
-                                page = pdf.pages[page_num]
-                                page_text = page.extract_text()
-                                if page_text:
-                                    text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
-                            except Exception as page_error:
-                                print(f"⚠️  Error extracting page {page_num + 1}: {str(page_error)}")
-                        
-                        print(f"✅ Extracted text from {len(pages_to_extract)} pages using pdfplumber")
-            
-            # Fallback to PyPDF2
-            elif PDF_LIBRARY_AVAILABLE:
-                pdf_buffer = io.BytesIO(pdf_content)
-                pdf_reader = PyPDF2.PdfReader(pdf_buffer)
-                total_pages = len(pdf_reader.pages)
-                
-                # Same extraction strategy
-                if total_pages <= 5:
-                    pages_to_extract = list(range(total_pages))
-                    extraction_strategy = "full"
-                elif total_pages <= 20:
-                    middle_start = total_pages // 3
-                    middle_end = 2 * total_pages // 3
-                    pages_to_extract = [0, 1, 2, 3, 4, middle_start, middle_end, total_pages - 1]
-                    pages_to_extract = sorted(list(set([p for p in pages_to_extract if p < total_pages])))
-                    extraction_strategy = "medium"
-                else:
-                    sample_indices = [0, 1, 2, total_pages // 4, total_pages // 2, 3 * total_pages // 4, total_pages - 1]
-                    pages_to_extract = sorted(list(set([p for p in sample_indices if p < total_pages])))
-                    extraction_strategy = "large_sample"
-                
-                for page_num in pages_to_extract:
-                    try:
-                        page = pdf_reader.pages[page_num]
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
-                    except Exception as page_error:
-                        print(f"⚠️  Error extracting page {page_num + 1}: {str(page_error)}")
-                
-                print(f"✅ Extracted text from {len(pages_to_extract)} pages using PyPDF2")
-            
-            else:
+            if not (PDFPLUMBER_AVAILABLE or PDF_LIBRARY_AVAILABLE):
                 print("⚠️  No PDF library available for text extraction")
                 return "", 0, "none"
+
+            from .document_text_extraction import content_hash, iter_pdf_pages, pdf_page_count, sample_pdf_pages
+
+            digest = content_hash(pdf_content)
+            total_pages = pdf_page_count(pdf_content, digest=digest)
+            if smart_extract:
+                pages_to_extract, extraction_strategy = sample_pdf_pages(total_pages)
+            else:
+                pages_to_extract = list(range(total_pages))
+            print(f"📄 Document ({total_pages} pages, {extraction_strategy}) - extracting {len(pages_to_extract)} pages")
+
+            for page_number, page_text in iter_pdf_pages(pdf_content, pages=pages_to_extract, digest=digest):
+                if page_text:
+                    text += f"\n--- Page {page_number} ---\n{page_text}\n"
+
+            print(f"✅ Extracted text from {len(pages_to_extract)} pages")
             
             # Limit text length to avoid token limits (approximately 4000 words for safety)
             words = text.split()
@@ -570,7 +511,7 @@ class RenderS3Client:
             print(f"ERROR Failed to extract text from PDF: {str(e)}")
             return "", 0, "error"
     
-    def _extract_pdf_metadata(self, pdf_content: bytes, file_name: str, total_pages: int = None, extraction_strategy: str = None) -> Dict:
+    def _extract_pdf_metadata(self, pdf_content: Union[bytes, str], file_name: str, total_pages: int = None, extraction_strategy: str = None) -> Dict:
         """
         Extract comprehensive metadata from PDF
         
@@ -589,7 +530,8 @@ class RenderS3Client:
         try:
             # Use PyPDF2 to extract PDF metadata
             if PDF_LIBRARY_AVAILABLE:
-                pdf_buffer = io.BytesIO(pdf_content)
+                # pdf_content may be the PDF bytes or the path of a downloaded copy
+                pdf_buffer = io.BytesIO(pdf_content) if isinstance(pdf_content, (bytes, bytearray)) else pdf_content
                 pdf_reader = PyPDF2.PdfReader(pdf_buffer)
                 
                 # Get basic PDF info
@@ -640,31 +582,32 @@ class RenderS3Client:
                 print(f"📋 Extracted comprehensive metadata: {page_count} pages, {metadata.get('document_size_category', 'unknown')} document")
             
             elif PDFPLUMBER_AVAILABLE:
-                with io.BytesIO(pdf_content) as pdf_buffer:
-                    with pdfplumber.open(pdf_buffer) as pdf:
-                        page_count = total_pages or len(pdf.pages)
-                        metadata['page_count'] = page_count
-                        
-                        # Categorize document size
-                        if page_count <= 5:
-                            metadata['document_size_category'] = 'small'
-                        elif page_count <= 20:
-                            metadata['document_size_category'] = 'medium'
-                        else:
-                            metadata['document_size_category'] = 'large'
-                        
-                        # Extract metadata from pdfplumber
-                        if pdf.metadata:
-                            for key, value in pdf.metadata.items():
-                                if value and key not in metadata:
-                                    metadata[key] = str(value)
+                pdf_buffer = io.BytesIO(pdf_content) if isinstance(pdf_content, (bytes, bytearray)) else pdf_content
+                with pdfplumber.open(pdf_buffer) as pdf:
+                    page_count = total_pages or len(pdf.pages)
+                    metadata['page_count'] = page_count
+                    
+                    # Categorize document size
+                    if page_count <= 5:
+                        metadata['document_size_category'] = 'small'
+                    elif page_count <= 20:
+                        metadata['document_size_category'] = 'medium'
+                    else:
+                        metadata['document_size_category'] = 'large'
+                    
+                    # Extract metadata from pdfplumber
+                    if pdf.metadata:
+                        for key, value in pdf.metadata.items():
+                            if value and key not in metadata:
+                                metadata[key] = str(value)
                 
                 print(f"📋 Extracted metadata: {page_count} pages")
             
             # Add file size information
-            metadata['file_size_bytes'] = len(pdf_content)
-            metadata['file_size_kb'] = round(len(pdf_content) / 1024, 2)
-            metadata['file_size_mb'] = round(len(pdf_content) / (1024 * 1024), 2)
+            file_size = len(pdf_content) if isinstance(pdf_content, (bytes, bytearray)) else os.path.getsize(pdf_content)
+            metadata['file_size_bytes'] = file_size
+            metadata['file_size_kb'] = round(file_size / 1024, 2)
+            metadata['file_size_mb'] = round(file_size / (1024 * 1024), 2)
             
             # Add extraction strategy info
             if extraction_strategy:
@@ -836,7 +779,7 @@ Your summaries should be:
             
             return fallback
     
-    def _process_pdf_after_upload(self, operation_id: int, s3_url: str, file_name: str):
+    def process_pdf(self, operation_id: int, s3_url: str, file_name: str, on_stage=None):
         """
         Enhanced PDF processing after upload:
         1. Download PDF from S3
@@ -845,8 +788,15 @@ Your summaries should be:
         4. Generate AI-powered summary using OpenAI GPT-3.5-turbo
         5. Update database with all information
         
-        This runs in a background thread to not block the upload response
+        Raises on failure so the caller can retry. on_stage(name) is called as
+        each stage starts. The PDF is streamed to a temporary file rather than
+        held in memory. Uploads queue this through pdf_processing_queue.
         """
+        def stage(name):
+            if on_stage:
+                on_stage(name)
+        
+        temp_pdf_path = None
         try:
             print(f"\n{'='*60}")
             print(f"🔄 Starting Enhanced PDF Processing")
@@ -855,25 +805,30 @@ Your summaries should be:
             print(f"{'='*60}")
             
             # Step 1: Download PDF content from S3
+            stage('download')
             print(f"\n[Step 1/5] ⬇️  Downloading PDF from S3...")
             print(f"   URL: {s3_url}")
-            response = requests.get(s3_url, timeout=90)
-            response.raise_for_status()
-            pdf_content = response.content
+            fd, temp_pdf_path = tempfile.mkstemp(suffix='.pdf')
+            os.close(fd)
+            downloaded = download_to_file(s3_url, temp_pdf_path, timeout=90)
+            pdf_content = temp_pdf_path
             
-            file_size_mb = round(len(pdf_content) / (1024 * 1024), 2)
-            print(f"   ✅ Downloaded: {len(pdf_content)} bytes ({file_size_mb} MB)")
+            file_size_mb = round(downloaded / (1024 * 1024), 2)
+            print(f"   ✅ Downloaded: {downloaded} bytes ({file_size_mb} MB)")
             
             # Step 2: Extract text using intelligent strategy
+            stage('extract')
             print(f"\n[Step 2/5] 📄 Extracting text from PDF (smart extraction)...")
             text, total_pages, extraction_strategy = self._extract_text_from_pdf(pdf_content)
             
             if not text:
                 print("   ⚠️  No text extracted from PDF")
                 # Still extract metadata even if no text
+                stage('metadata')
                 print(f"\n[Step 3/5] 📋 Extracting metadata (text-less document)...")
                 metadata = self._extract_pdf_metadata(pdf_content, file_name, total_pages, extraction_strategy)
                 
+                stage('store')
                 print(f"\n[Step 5/5] 💾 Updating database...")
                 self._update_pdf_metadata_in_db(
                     operation_id, 
@@ -884,6 +839,7 @@ Your summaries should be:
                 return
             
             # Step 3: Extract comprehensive metadata
+            stage('metadata')
             print(f"\n[Step 3/5] 📋 Extracting comprehensive metadata...")
             metadata = self._extract_pdf_metadata(pdf_content, file_name, total_pages, extraction_strategy)
             
@@ -895,6 +851,7 @@ Your summaries should be:
             print(f"   - Category: {metadata.get('suggested_category', 'Unknown')}")
             
             # Step 4: Generate AI summary using OpenAI
+            stage('summary')
             print(f"\n[Step 4/5] 🤖 Generating AI-powered summary...")
             summary = self._generate_summary_with_openai(text, metadata)
             
@@ -906,6 +863,7 @@ Your summaries should be:
                 print(f"   ⚠️  Summary generation had issues: {summary[:100]}...")
             
             # Step 5: Update database with all information
+            stage('store')
             print(f"\n[Step 5/5] 💾 Updating database with metadata and summary...")
             self._update_pdf_metadata_in_db(operation_id, metadata, summary)
             
@@ -917,36 +875,46 @@ Your summaries should be:
             print(f"   Strategy: {extraction_strategy}")
             print(f"   Summary Length: {len(summary)} chars")
             print(f"{'='*60}\n")
-            
-        except requests.exceptions.RequestException as req_error:
-            error_msg = f"Failed to download PDF from S3: {str(req_error)}"
-            print(f"\n❌ ERROR: {error_msg}")
-            try:
-                self._update_pdf_metadata_in_db(
-                    operation_id, 
-                    {'error': error_msg, 'processing_failed': True}, 
-                    f"Processing failed: Unable to download file from S3"
-                )
-            except:
-                pass
-                
+        
+        finally:
+            if temp_pdf_path:
+                try:
+                    os.unlink(temp_pdf_path)
+                except OSError:
+                    pass
+    
+    def record_pdf_processing_failure(self, operation_id: int, error: Exception):
+        """Store a final processing failure on the file_operations record"""
+        if isinstance(error, requests.exceptions.RequestException):
+            error_msg = f"Failed to download PDF from S3: {str(error)}"
+            self._update_pdf_metadata_in_db(
+                operation_id, 
+                {'error': error_msg, 'processing_failed': True}, 
+                f"Processing failed: Unable to download file from S3"
+            )
+            return
+        
+        error_msg = f"PDF processing error: {str(error)}"
+        self._update_pdf_metadata_in_db(
+            operation_id, 
+            {
+                'error': error_msg, 
+                'processing_failed': True,
+                'error_type': type(error).__name__
+            }, 
+            f"Automatic processing failed. Please review document manually.\nError: {str(error)}"
+        )
+    
+    def _process_pdf_after_upload(self, operation_id: int, s3_url: str, file_name: str):
+        """Run process_pdf once in the calling thread, recording any failure"""
+        try:
+            self.process_pdf(operation_id, s3_url, file_name)
         except Exception as e:
-            error_msg = f"PDF processing error: {str(e)}"
             print(f"\n❌ ERROR: PDF processing failed for operation {operation_id}")
             print(f"   Error: {str(e)}")
             print(f"   Type: {type(e).__name__}")
-            
-            # Update database with error information
             try:
-                self._update_pdf_metadata_in_db(
-                    operation_id, 
-                    {
-                        'error': error_msg, 
-                        'processing_failed': True,
-                        'error_type': type(e).__name__
-                    }, 
-                    f"Automatic processing failed. Please review document manually.\nError: {str(e)}"
-                )
+                self.record_pdf_processing_failure(operation_id, e)
             except Exception as db_error:
                 print(f"   ⚠️  Also failed to update database: {str(db_error)}")
     
@@ -1027,6 +995,18 @@ Your summaries should be:
     
     def get_pdf_processing_status(self, operation_id: int) -> Dict:
         """Check if PDF processing is complete and get metadata/summary"""
+        try:
+            from .pdf_processing_queue import job_status
+            job = job_status(operation_id)
+        except Exception as e:
+            print(f"WARNING Could not read PDF processing queue: {str(e)}")
+            job = None
+        if job and job['job_status'] != 'completed':
+            status = {'pending': 'queued', 'running': 'processing'}.get(job['job_status'], job['job_status'])
+            response = {'status': status, 'message': f"PDF processing {status} (stage: {job['stage']})"}
+            response.update(job)
+            return response
+        
         if not self.db_pool:
             return {'status': 'error', 'message': 'Database not available'}
         
@@ -1194,7 +1174,7 @@ Your summaries should be:
         # Test Direct microservice
         try:
             print("🧪 Testing Direct microservice connection...")
-            response = requests.get(f"{self.api_base_url}/health", timeout=30)
+            response = get_client('s3_service').get(f"{self.api_base_url}/health", timeout=30)
             response.raise_for_status()
             
             health_info = response.json()
@@ -1315,19 +1295,21 @@ Your summaries should be:
             
             print(f"📍 Upload URL: {url}")
             
-            with open(file_path, 'rb') as file:
-                files = {'file': (file_name, file, mimetypes.guess_type(file_path)[0])}
+            # Multipart body streamed from disk instead of built in memory
+            with StreamingMultipartBody(file_path, file_name=file_name, content_type=mimetypes.guess_type(file_path)[0]) as body:
                 
                 print(f"📁 File details: name={file_name}, size={file_size}, type={mimetypes.guess_type(file_path)[0]}")
                 
                 try:
                     upload_start_time = datetime.datetime.now()
                     print(f"⏱️  [UPLOAD] Starting upload at {upload_start_time.strftime('%H:%M:%S')}")
-                    print(f"⏱️  [UPLOAD] Timeout set to: 600 seconds (10 minutes)")
+                    print(f"⏱️  [UPLOAD] Read timeout set to: 600 seconds (10 minutes)")
                     print(f"⏱️  [UPLOAD] File size: {file_size:,} bytes ({file_size / (1024*1024):.2f} MB)")
                     
-                    # Increased timeout for large files (10 minutes)
-                    response = requests.post(url, files=files, timeout=600)
+                    # Read timeout applies per socket read, so slow links that keep sending do not hit it
+                    response = get_client('s3_service').post(
+                        url, data=body, headers={'Content-Type': body.content_type}, timeout=600
+                    )
                     
                     upload_elapsed = (datetime.datetime.now() - upload_start_time).total_seconds()
                     print(f"⏱️  [UPLOAD] Upload completed in {upload_elapsed:.2f} seconds")
@@ -1383,16 +1365,18 @@ Your summaries should be:
                 
                 # Check if file is PDF and trigger background processing
                 file_extension = os.path.splitext(file_name)[1].lower()
+                pdf_processing = 'not_applicable'
                 if file_extension == '.pdf' and operation_id:
-                    print(f"📄 PDF detected, starting background processing...")
-                    # Start PDF processing in a background thread (non-blocking)
-                    processing_thread = threading.Thread(
-                        target=self._process_pdf_after_upload,
-                        args=(operation_id, file_info['url'], file_name),
-                        daemon=True
-                    )
-                    processing_thread.start()
-                    print(f"✅ PDF processing thread started for operation {operation_id}")
+                    print(f"📄 PDF detected, queuing background processing...")
+                    # Durable queue drained by a bounded worker pool (see pdf_processing_queue)
+                    try:
+                        from .pdf_processing_queue import enqueue as enqueue_pdf_processing
+                        enqueue_pdf_processing(operation_id, file_info['url'], file_name)
+                        pdf_processing = 'queued'
+                        print(f"✅ PDF processing queued for operation {operation_id}")
+                    except Exception as queue_error:
+                        pdf_processing = 'failed_to_queue'
+                        print(f"⚠️  Could not queue PDF processing: {str(queue_error)}")
                 
                 return {
                     'success': True,
@@ -1401,7 +1385,7 @@ Your summaries should be:
                     'platform': 'Direct',
                     'database': 'MySQL',
                     'message': 'File uploaded successfully to Direct/S3',
-                    'pdf_processing': 'started' if file_extension == '.pdf' else 'not_applicable'
+                    'pdf_processing': pdf_processing
                 }
             else:
                 # Update MySQL with failure
@@ -1456,7 +1440,7 @@ Your summaries should be:
             # Get download URL from Direct service
             url = f"{self.api_base_url}/api/download/{s3_key}/{file_name}"
             
-            response = requests.get(url, timeout=60)
+            response = get_client('s3_service').get(url, timeout=60)
             response.raise_for_status()
             
             download_info = response.json()
@@ -1464,23 +1448,18 @@ Your summaries should be:
             if not download_info.get('success'):
                 raise Exception(f"Failed to get download URL: {download_info.get('error')}")
             
-            # Download file
+            # Stream the file to disk (parallel ranged parts for large objects)
             download_url = download_info['downloadUrl']
-            file_response = requests.get(download_url, timeout=300)
-            file_response.raise_for_status()
-            
-            # Save locally
             os.makedirs(destination_path, exist_ok=True)
             local_file_path = os.path.join(destination_path, file_name) if os.path.isdir(destination_path) else destination_path
             
-            with open(local_file_path, 'wb') as f:
-                f.write(file_response.content)
+            downloaded_size = download_to_file(download_url, local_file_path, timeout=300)
             
             # Update MySQL with success
             if operation_id:
                 self._update_operation_record(operation_id, {
                     'status': 'completed',
-                    'file_size': len(file_response.content),
+                    'file_size': downloaded_size,
                                             'metadata': {
                             'destination_path': destination_path,
                             'local_file_path': local_file_path,
@@ -1496,7 +1475,7 @@ Your summaries should be:
                 'success': True,
                 'operation_id': operation_id,
                 'file_path': local_file_path,
-                'file_size': len(file_response.content),
+                'file_size': downloaded_size,
                 'platform': 'Direct',
                 'database': 'MySQL',
                 'message': 'File downloaded successfully from Direct/S3'
@@ -1581,7 +1560,7 @@ Your summaries should be:
             
             # Increased timeout for large exports (10 minutes)
             # Note: For very large datasets (>1000 records), use local export instead
-            response = requests.post(url, json=payload, timeout=600)
+            response = get_client('s3_service').post(url, json=payload, timeout=600)
             print(f"📊 Response status: {response.status_code}")
             
             if response.status_code != 200:
@@ -2088,7 +2067,7 @@ def export_data(data=None, file_format='xlsx', user_id='user123', options=None,
                 print(f"   ├─ Checking microservice health...")
                 try:
                     health_url = f"{s3_client_instance.api_base_url}/health"
-                    health_response = requests.get(health_url, timeout=10)
+                    health_response = get_client('s3_service').get(health_url, timeout=10)
                     if health_response.status_code == 200:
                         print(f"   ├─ ✅ Microservice is reachable")
                     else:
@@ -0,0 +1,251 @@
+"""
+Streaming transfers for the S3 microservice.
+
+RenderS3Client used to build the whole multipart upload body in memory
+(requests' files=) and to read downloads with response.content, so a few
+hundred MB of evidence meant a few hundred MB per worker, twice over for the
+PDF post-processing download.
+
+- StreamingMultipartBody produces the multipart/form-data body the
+  microservice expects while reading the file from disk in chunks.
+- download_to_file() streams a URL to disk. When the server honours Range
+  requests, large files are fetched as parallel byte-range parts, and a part
+  that fails mid-way resumes from its last written byte instead of starting
+  over.
+- download_range() reads a byte range without fetching the rest of the object.
+"""
+
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+
+from .http_client import get_client
+
+CHUNK_SIZE = getattr(settings, 'S3_TRANSFER_CHUNK_SIZE', 1024 * 1024)
+PART_SIZE = getattr(settings, 'S3_DOWNLOAD_PART_SIZE', 16 * 1024 * 1024)
+PARALLEL_PARTS = getattr(settings, 'S3_DOWNLOAD_PARALLEL_PARTS', 4)
+PART_RETRIES = getattr(settings, 'S3_DOWNLOAD_PART_RETRIES', 3)
+# Below this size a single streamed GET is cheaper than probing and splitting
+PARALLEL_MIN_SIZE = getattr(settings, 'S3_DOWNLOAD_PARALLEL_MIN_SIZE', 32 * 1024 * 1024)
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+|\*)')
+
+
+class StreamingMultipartBody:
+    """
+    File-like multipart/form-data body with a single file field.
+
+    requests sends objects with read() in chunks and takes Content-Length
+    from len(), so the file is never held in memory.
+    """
+
+    def __init__(self, file_path, field_name='file', file_name=None, content_type=None, chunk_size=None):
+        self.file_path = file_path
+        self.chunk_size = chunk_size or CHUNK_SIZE
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        file_name = (file_name or os.path.basename(file_path)).replace('"', '%22')
+        self._head = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{file_name}"\r\n'
+            f'Content-Type: {content_type or "application/octet-stream"}\r\n\r\n'
+        ).encode('utf-8')
+        self._tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        self._file_size = os.path.getsize(file_path)
+        self._file = None
+        self._position = 0
+
+    def __len__(self):
+        return len(self._head) + self._file_size + len(self._tail)
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        # Only rewinding is needed (requests rewinds the body on redirects)
+        if offset != 0 or whence != 0:
+            raise OSError('StreamingMultipartBody only supports seek(0)')
+        self._position = 0
+        if self._file:
+            self._file.seek(0)
+        return 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.chunk_size
+        out = b''
+        head_len = len(self._head)
+        file_end = head_len + self._file_size
+        while len(out) < size and self._position < len(self):
+            wanted = size - len(out)
+            if self._position < head_len:
+                piece = self._head[self._position:self._position + wanted]
+            elif self._position < file_end:
+                if self._file is None:
+                    self._file = open(self.file_path, 'rb')
+                self._file.seek(self._position - head_len)
+                piece = self._file.read(min(wanted, file_end - self._position))
+                if not piece:
+                    raise OSError(f'{self.file_path} shrank while uploading')
+            else:
+                offset = self._position - file_end
+                piece = self._tail[offset:offset + wanted]
+            out += piece
+            self._position += len(piece)
+        return out
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def probe(url, timeout=30, client=None):
+    """
+    (size, accepts_ranges) of a URL using a one-byte ranged GET, which works
+    for presigned URLs that are only signed for GET
+    """
+    client = client or get_client('s3_service')
+    response = client.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=timeout)
+    try:
+        response.raise_for_status()
+        if response.status_code == 206:
+            match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+            if match and match.group(3) != '*':
+                return int(match.group(3)), True
+        length = response.headers.get('Content-Length')
+        return (int(length) if length and length.isdigit() else None), False
+    finally:
+        response.close()
+
+
+def download_range(url, start, end, timeout=60, client=None):
+    """Bytes start..end (inclusive) of a URL"""
+    client = client or get_client('s3_service')
+    response = client.get(url, headers={'Range': f'bytes={start}-{end}'}, timeout=timeout)
+    response.raise_for_status()
+    if response.status_code != 206:
+        # Server ignored the range and sent the whole object
+        return response.content[start:end + 1]
+    return response.content
+
+
+def _stream_into(response, handle, offset, counter, limit=None):
+    """
+    Write a streamed response at offset, adding every written chunk to
+    counter[0] so an interrupted read still reports how far it got
+    """
+    written = 0
+    handle.seek(offset)
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        if not chunk:
+            continue
+        if limit is not None and written + len(chunk) > limit:
+            chunk = chunk[:limit - written]
+        handle.write(chunk)
+        written += len(chunk)
+        counter[0] += len(chunk)
+        if limit is not None and written >= limit:
+            break
+
+
+def _download_part(url, destination, start, end, timeout, client, lock, progress):
+    """Fetch one byte range into destination, resuming after interrupted reads"""
+    done = [0]
+    length = end - start + 1
+    attempts = 0
+    with open(destination, 'r+b') as handle:
+        while done[0] < length:
+            try:
+                response = client.get(
+                    url, headers={'Range': f'bytes={start + done[0]}-{end}'}, stream=True, timeout=timeout
+                )
+                try:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise requests.RequestException(f'Range request returned {response.status_code}')
+                    _stream_into(response, handle, start + done[0], done, limit=length - done[0])
+                finally:
+                    response.close()
+            except requests.RequestException:
+                if attempts >= PART_RETRIES:
+                    raise
+            if done[0] < length:
+                attempts += 1
+                if attempts > PART_RETRIES:
+                    raise requests.RequestException(f'Part {start}-{end} incomplete after {attempts} attempts')
+    with lock:
+        progress[0] += length
+    return length
+
+
+def download_to_file(url, destination, timeout=300, client=None, parts=None, part_size=None):
+    """
+    Stream url to destination without holding it in memory.
+
+    Uses parallel ranged parts when the object is large and the server
+    supports Range; otherwise one streamed GET that resumes with a Range
+    request if the connection drops. Returns the number of bytes written.
+    """
+    client = client or get_client('s3_service')
+    parts = PARALLEL_PARTS if parts is None else parts
+    part_size = part_size or PART_SIZE
+
+    size, accepts_ranges = None, False
+    try:
+        size, accepts_ranges = probe(url, timeout=timeout, client=client)
+    except requests.RequestException:
+        pass
+
+    directory = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(directory, exist_ok=True)
+
+    if accepts_ranges and size and size >= PARALLEL_MIN_SIZE and parts > 1:
+        with open(destination, 'wb') as handle:
+            handle.truncate(size)
+        ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+        lock = threading.Lock()
+        progress = [0]
+        with ThreadPoolExecutor(max_workers=min(parts, len(ranges))) as executor:
+            list(executor.map(
+                lambda r: _download_part(url, destination, r[0], r[1], timeout, client, lock, progress),
+                ranges
+            ))
+        return progress[0]
+
+    written = [0]
+    attempts = 0
+    with open(destination, 'wb') as handle:
+        while True:
+            headers = {'Range': f'bytes={written[0]}-'} if written[0] else None
+            try:
+                response = client.get(url, headers=headers, stream=True, timeout=timeout)
+                try:
+                    response.raise_for_status()
+                    if written[0] and response.status_code != 206:
+                        # Range not honoured, start again from the beginning
+                        handle.seek(0)
+                        handle.truncate()
+                        written[0] = 0
+                    _stream_into(response, handle, written[0], written)
+                finally:
+                    response.close()
+                if size is None or written[0] >= size:
+                    return written[0]
+            except requests.RequestException:
+                if not accepts_ranges or attempts >= PART_RETRIES:
+                    raise
+            attempts += 1
+            if attempts > PART_RETRIES:
+                raise requests.RequestException(f'Download incomplete after {attempts} attempts ({written[0]} bytes)')
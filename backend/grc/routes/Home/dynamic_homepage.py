@@ -14,8 +14,14 @@ from grc.models import (
     Incident, Audit, AuditFinding, PolicyApproval, ComplianceApproval,
     PolicyCategory, Users
 )
+from ..Global.conditional_responses import conditional_on, FRAMEWORK_SELECTION
+from ..Global.fast_json import FastJSONResponse
 
 
+@conditional_on(
+    Framework, Policy, SubPolicy, Compliance, Risk, RiskInstance, Incident, Audit, AuditFinding,
+    PolicyApproval, ComplianceApproval, FRAMEWORK_SELECTION
+)
 def get_homepage_data(request):
     """
     GET /api/homepage?frameworkId=<id>
@@ -698,7 +704,7 @@ def get_homepage_data(request):
         print("✅ ========================================")
         print("")
         
-        return JsonResponse(response_data)
+        return FastJSONResponse(response_data)
         
     except Exception as e:
         print("")
@@ -28,29 +28,10 @@ except ImportError:
     OPENAI_AVAILABLE = False
     print("[ERROR] OpenAI library not installed. Run: pip install openai")
 
-# --- Optional parsers (install as needed) ---
-try:
-    import pdfplumber
-except Exception:
-    pdfplumber = None
-
-try:
-    import PyPDF2
-except Exception:
-    PyPDF2 = None
-
-try:
-    import docx  # python-docx
-except Exception:
-    docx = None
-
-try:
-    import pandas as pd
-except Exception:
-    pd = None
-
 # --- Your models ---
 from grc.models import Incident
+from ..Global.ai_field_inference import FieldInferencePlanner, InferenceJob
+from ..Global.document_text_extraction import extract_text
 
 
 # =========================
@@ -421,80 +402,9 @@ def as_boolean(v) -> bool:
 # =========================
 # FILE EXTRACTORS
 # =========================
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF."""
-    try:
-        if pdfplumber:
-            parts = []
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    t = page.extract_text() or ""
-                    if t.strip():
-                        parts.append(t)
-            return "\n".join(parts)
-        elif PyPDF2:
-            with open(file_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                text = ""
-                for p in reader.pages:
-                    text += (p.extract_text() or "") + "\n"
-                return text
-        return ""
-    except Exception as e:
-        print(f"[PDF] Extraction error: {e}")
-        return ""
-
-
-def extract_text_from_docx(file_path: str) -> str:
-    try:
-        if not docx:
-            raise RuntimeError("python-docx not installed")
-        d = docx.Document(file_path)
-        parts = []
-        for p in d.paragraphs:
-            if p.text.strip():
-                parts.append(p.text)
-        for t in d.tables:
-            for row in t.rows:
-                cells = [c.text.strip() for c in row.cells]
-                if any(cells):
-                    parts.append(" | ".join(cells))
-        return "\n".join(parts)
-    except Exception as e:
-        print(f"[DOCX] Extraction error: {e}")
-        return ""
-
-
-def extract_text_from_excel(file_path: str) -> str:
-    try:
-        if not pd:
-            raise RuntimeError("pandas/openpyxl not installed")
-        df_sheets = pd.read_excel(file_path, sheet_name=None)
-        out = []
-        for name, df in df_sheets.items():
-            out.append(f"=== Sheet: {name} ===")
-            out.append(df.to_string(index=False))
-        return "\n".join(out)
-    except Exception as e:
-        print(f"[XLSX] Extraction error: {e}")
-        return ""
-
-
 def extract_text_from_file(file_path: str, file_extension: str) -> str:
-    ext = file_extension.lower()
-    if ext == ".pdf":
-        return extract_text_from_pdf(file_path)
-    if ext in [".docx", ".doc"]:
-        return extract_text_from_docx(file_path)
-    if ext in [".xlsx", ".xls"]:
-        return extract_text_from_excel(file_path)
-    if ext == ".txt":
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-        except Exception:
-            return ""
-    return ""
+    """Text of an uploaded document via the shared, content-hash cached extractor."""
+    return extract_text(file_path, file_extension)
 
 
 # =========================
@@ -544,7 +454,11 @@ Rules:
         print(f"   ❌ AI FAILED to predict {field_name}: {str(e)}")
         v = None
 
-    # Normalize after inference
+    return normalize_inferred_field(field_name, v)
+
+
+def normalize_inferred_field(field_name: str, v: Any) -> Any:
+    """Coerce an AI-inferred value into the field's type/choices, applying defaults"""
     if field_name in ("RepeatedNot", "ReopenedNot"):
         return as_boolean(v)
     if field_name == "Criticality":
@@ -572,6 +486,15 @@ Rules:
     return v
 
 
+def _infer_missing_fields(jobs: list) -> list[dict]:
+    """Batched replacement for calling infer_single_field per field per incident"""
+    planner = FieldInferencePlanner(call_openai_json, FIELD_PROMPTS, INCIDENT_DB_FIELDS, entity='incident')
+    results = planner.infer(jobs)
+    if planner.requests_made:
+        print(f"🤖 AI inference used {planner.requests_made} request(s)")
+    return results
+
+
 def fallback_incident_extraction(text: str) -> list[dict]:
     """Minimal pattern-based fallback when AI fails completely."""
     incidents = []
@@ -755,6 +678,7 @@ Begin analysis now and return the JSON object:"""
         print(f"✅ OpenAI returned {len(incidents)} incident(s)")
 
         cleaned = []
+        jobs = []
         for idx, inc in enumerate(incidents, 1):
             print(f"📋 Processing incident {idx}/{len(incidents)}")
             item = {k: inc.get(k) for k in INCIDENT_DB_FIELDS}
@@ -806,49 +730,56 @@ Begin analysis now and return the JSON object:"""
             
             if missing_fields:
                 print(f"   📝 Missing fields to predict: {missing_fields}")
-                for field in missing_fields:
-                    predicted_value = infer_single_field(field, item, text)
-                    item[field] = predicted_value
-                    # Mark as AI generated in metadata
-                    if predicted_value is not None and predicted_value != "":
-                        if "_meta" not in item:
-                            item["_meta"] = {}
-                        if "per_field" not in item["_meta"]:
-                            item["_meta"]["per_field"] = {}
-                        item["_meta"]["per_field"][field] = {
-                            "source": "AI_GENERATED",
-                            "confidence": 0.7,  # Default confidence for AI predictions
-                            "rationale": f"AI predicted this value based on document context"
-                        }
-                        print(f"   🏷️  Marked {field} as AI_GENERATED in metadata")
             else:
                 print(f"   ✅ All fields already populated")
+            jobs.append(InferenceJob(item, missing_fields, text))
+            cleaned.append(item)
+
+        # Predict the missing fields of all incidents in a few batched requests
+        for item, job, fields in zip(cleaned, jobs, _infer_missing_fields(jobs)):
+            for field in job.missing_fields:
+                result = fields.get(field) or {"value": None, "confidence": 0.0}
+                predicted_value = normalize_inferred_field(field, result["value"])
+                item[field] = predicted_value
+                # Mark as AI generated in metadata
+                if predicted_value is not None and predicted_value != "":
+                    if "_meta" not in item:
+                        item["_meta"] = {}
+                    if "per_field" not in item["_meta"]:
+                        item["_meta"]["per_field"] = {}
+                    item["_meta"]["per_field"][field] = {
+                        "source": "AI_GENERATED",
+                        "confidence": result["confidence"],
+                        "rationale": result.get("rationale") or "AI predicted this value based on document context"
+                    }
 
             # Debug: Print metadata structure
             if "_meta" in item and "per_field" in item["_meta"]:
                 ai_fields = [field for field, info in item["_meta"]["per_field"].items() 
                             if info.get("source") == "AI_GENERATED"]
                 if ai_fields:
-                    print(f"   🤖 AI Generated fields: {ai_fields}")
+                    print(f"   🤖 AI Generated fields for {item.get('IncidentTitle', 'Untitled')}: {ai_fields}")
                 else:
                     print(f"   📄 No AI generated fields for this incident")
             else:
                 print(f"   📄 No metadata available for this incident")
-            
-            cleaned.append(item)
 
         return cleaned
 
     except Exception as e:
         print(f"AI extraction failed, using fallback extractor: {e}")
         base = fallback_incident_extraction(text)
+        items = [{k: inc.get(k) for k in INCIDENT_DB_FIELDS} for inc in base]
+        jobs = [
+            InferenceJob(item, [f for f in INCIDENT_DB_FIELDS if item.get(f) in (None, "", [])], text)
+            for item in items
+        ]
         completed = []
-        for inc in base:
-            item = {k: inc.get(k) for k in INCIDENT_DB_FIELDS}
+        for item, job, fields in zip(items, jobs, _infer_missing_fields(jobs)):
             # Ensure everything present
-            for field in INCIDENT_DB_FIELDS:
-                if item.get(field) in (None, "", []):
-                    item[field] = infer_single_field(field, item, text)
+            for field in job.missing_fields:
+                result = fields.get(field) or {"value": None}
+                item[field] = normalize_inferred_field(field, result["value"])
             # Normalize again
             item["Criticality"] = normalize_choice(item.get("Criticality"), CRITICALITY_CHOICES) or "Medium"
             item["RiskPriority"] = normalize_choice(item.get("RiskPriority"), PRIORITY_CHOICES) or "Medium"
@@ -0,0 +1,203 @@
+"""
+Vectorized duration metrics for the incident KPI endpoints.
+
+incident_mttd / mttr / mttc / mttrv used to load every incident as a Python
+object, issue one RiskInstance query per incident, and then re-scan the whole
+list for each chart bucket, converting timestamps row by row. The helpers here
+pull only the timestamp columns with values_list, turn them into
+datetime64 arrays once, and compute durations and day/week/month bucket
+assignments as array operations, so every granularity comes out of one pass.
+
+- datetime_array(values): list of datetimes/dates/None -> datetime64[s]
+  array (None -> NaT, dates -> midnight)
+- first_per_key / lookup_datetimes: map per-incident RiskInstance values
+  without one query per incident
+- DurationMetric(anchors, seconds, unit): mean, per-period series and sparse
+  per-day series
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+# Chart layout per timeRange: (granularity, number of periods ending now)
+RANGE_LAYOUT = {
+    '7days': ('day', 7),
+    '30days': ('week', 4),
+    '90days': ('month', 3),
+    'all': ('month', 6),
+}
+
+RANGE_DAYS = {'7days': 7, '30days': 30, '90days': 90, '1year': 365}
+
+SECONDS_PER_MINUTE = 60
+SECONDS_PER_HOUR = 3600
+
+
+def range_start(time_range, now=None):
+    """Start of the filter window for a timeRange value, or None for 'all'"""
+    days = RANGE_DAYS.get(time_range)
+    if days is None:
+        return None
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def _naive(value):
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+def datetime_array(values):
+    """datetime64[s] array from datetimes, dates or None (stored as NaT)"""
+    if getattr(settings, 'USE_TZ', False):
+        values = [_naive(value) for value in values]
+    if not values:
+        return np.array([], dtype='datetime64[s]')
+    return np.array(values, dtype='datetime64[s]')
+
+
+def seconds_between(later, earlier):
+    """Elementwise (later - earlier) in float seconds; NaN where either side is NaT"""
+    delta = (later - earlier).astype('timedelta64[s]')
+    seconds = delta.astype(np.float64)
+    seconds[np.isnat(delta)] = np.nan
+    return seconds
+
+
+def first_per_key(keys, *columns):
+    """
+    For rows already ordered by key (then by the tie-break the caller wants),
+    the unique keys and each column's value at the first row of every key
+    """
+    keys = np.asarray(keys)
+    unique_keys, first_index = np.unique(keys, return_index=True)
+    return (unique_keys,) + tuple(np.asarray(column)[first_index] for column in columns)
+
+
+def lookup_datetimes(sorted_keys, values, wanted):
+    """values at the position of each wanted key in sorted_keys, NaT where absent"""
+    wanted = np.asarray(wanted)
+    result = np.full(len(wanted), np.datetime64('NaT'), dtype='datetime64[s]')
+    if len(sorted_keys) and len(wanted):
+        position = np.clip(np.searchsorted(sorted_keys, wanted), 0, len(sorted_keys) - 1)
+        found = sorted_keys[position] == wanted
+        result[found] = np.asarray(values, dtype='datetime64[s]')[position[found]]
+    return result
+
+
+def _day_numbers(anchors):
+    return anchors.astype('datetime64[D]').astype(np.int64)
+
+
+def _week_numbers(days):
+    # 1970-01-01 was a Thursday; shifting by 3 days makes weeks start on Monday
+    return (days + 3) // 7
+
+
+def _month_numbers(anchors):
+    return anchors.astype('datetime64[M]').astype(np.int64)
+
+
+def _period_label(granularity, number):
+    if granularity == 'day':
+        start = np.datetime64(int(number), 'D')
+    elif granularity == 'week':
+        start = np.datetime64(int(number) * 7 - 3, 'D')
+    else:
+        start = np.datetime64(int(number), 'M').astype('datetime64[D]')
+    return str(start)
+
+
+class DurationMetric:
+    """
+    Durations keyed by an anchor timestamp (the timestamp that decides which
+    chart period a row belongs to). Rows with a NaN duration or NaT anchor are
+    dropped on construction.
+    """
+
+    def __init__(self, anchors, seconds, unit_seconds=SECONDS_PER_MINUTE):
+        anchors = np.asarray(anchors, dtype='datetime64[s]')
+        values = np.asarray(seconds, dtype=np.float64) / unit_seconds
+        keep = ~np.isnan(values) & ~np.isnat(anchors)
+        self.anchors = anchors[keep]
+        self.values = values[keep]
+        self._days = _day_numbers(self.anchors)
+        self._codes = {
+            'day': self._days,
+            'week': _week_numbers(self._days),
+            'month': _month_numbers(self.anchors),
+        }
+
+    @property
+    def count(self):
+        return int(self.values.size)
+
+    def mean(self, digits=1):
+        if not self.values.size:
+            return 0
+        return round(float(self.values.mean()), digits)
+
+    def series(self, granularity, periods, now=None, digits=1):
+        """`periods` consecutive periods ending with the current one, oldest first"""
+        now_anchor = np.array([np.datetime64(_naive(now or timezone.now()), 's')])
+        if granularity == 'day':
+            last = int(_day_numbers(now_anchor)[0])
+        elif granularity == 'week':
+            last = int(_week_numbers(_day_numbers(now_anchor))[0])
+        else:
+            last = int(_month_numbers(now_anchor)[0])
+        first = last - periods + 1
+
+        offsets = self._codes[granularity] - first
+        in_window = (offsets >= 0) & (offsets < periods)
+        counts = np.bincount(offsets[in_window], minlength=periods)
+        totals = np.bincount(offsets[in_window], weights=self.values[in_window], minlength=periods)
+        return [
+            {
+                'date': _period_label(granularity, first + i),
+                'value': round(float(totals[i] / counts[i]), digits) if counts[i] else 0,
+                'count': int(counts[i]),
+            }
+            for i in range(periods)
+        ]
+
+    def all_series(self, now=None, digits=1):
+        """Daily, weekly and monthly series at once for dashboards that switch granularity"""
+        return {
+            'daily': self.series('day', RANGE_LAYOUT['7days'][1], now, digits),
+            'weekly': self.series('week', RANGE_LAYOUT['30days'][1], now, digits),
+            'monthly': self.series('month', RANGE_LAYOUT['all'][1], now, digits),
+        }
+
+    def chart_data(self, time_range, now=None, digits=1):
+        granularity, periods = RANGE_LAYOUT.get(time_range, RANGE_LAYOUT['all'])
+        return self.series(granularity, periods, now, digits)
+
+    def daily(self, digits=1):
+        """One point per day that has data, oldest first"""
+        if not self.values.size:
+            return []
+        days, inverse = np.unique(self._days, return_inverse=True)
+        counts = np.bincount(inverse)
+        totals = np.bincount(inverse, weights=self.values)
+        return [
+            {
+                'date': _period_label('day', day),
+                'value': round(float(totals[i] / counts[i]), digits),
+                'count': int(counts[i]),
+            }
+            for i, day in enumerate(days)
+        ]
+
+
+def percent_change(chart_data):
+    """Percent change between the last two chart points"""
+    if len(chart_data) >= 2:
+        current = chart_data[-1]['value']
+        previous = chart_data[-2]['value']
+        if previous > 0:
+            return round(((current - previous) / previous) * 100, 1)
+    return 0
@@ -1,6 +1,6 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
@@ -13,6 +13,7 @@ from ...serializers import (
 )
 from ...models import Incident, AuditFinding, Users, Workflow, Compliance, Framework, PolicyVersion, PolicyApproval, Policy, SubPolicy, RiskInstance, LastChecklistItemVerified, IncidentApproval, ExportTask, CategoryBusinessUnit, GRCLog
 from ...routes.Global.notification_service import NotificationService
+from ...routes.Global.fast_json import FastJSONRenderer
 from ...routes.Global.s3_fucntions import export_data
 # Import KPI functions from separate module
 from .kpis_incidents import (
@@ -61,7 +62,7 @@ from django.conf import settings
 from ...routes.Global.validation import SecureValidator, ValidationError, IncidentValidator, QuestionnaireValidator
 from contextlib import contextmanager
 import logging
-import requests
+from ...routes.Global.http_client import get_client
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -123,7 +124,7 @@ def send_log(module, actionType, description=None, userId=None, userName=None,
                 # Clean out None values
                 api_log_data = {k: v for k, v in api_log_data.items() if v is not None}
                
-                response = requests.post(LOGGING_SERVICE_URL, json=api_log_data)
+                response = get_client('logging_service').post(LOGGING_SERVICE_URL, json=api_log_data)
                 if response.status_code != 200:
                     print(f"Failed to send log to service: {response.text}")
         except Exception as e:
@@ -1569,6 +1570,7 @@ def get_framework_policy_subpolicy_from_compliance(compliance_id):
         }
 @csrf_exempt
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer])
 @authentication_classes([])
 @permission_classes([IncidentViewPermission])
 @rbac_required(required_permission='view_all_incident')
@@ -11,6 +11,11 @@ import logging
 
 from grc.models import Users, ExternalApplication, ExternalApplicationConnection, ExternalApplicationSyncLog, OAuthState, Framework, Department, Entity
 from django.utils import timezone
+from grc.routes.Global.http_client import get_client
+from .bamboohr_sync import (
+    BambooHRSyncEngine, is_sync_running, last_sync_stats, load_employee_data, start_background_sync,
+    summarize_directory
+)
 
 logger = logging.getLogger(__name__)
 
@@ -40,7 +45,7 @@ class BambooHRIntegration:
         try:
             url = f"{self.api_base}/employees/directory"
             logger.info(f"Making request to: {url}")
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = get_client('bamboohr').get(url, headers=self.headers, timeout=30)
             
             logger.info(f"Response status: {response.status_code}")
             if response.status_code != 200:
@@ -68,7 +73,7 @@ class BambooHRIntegration:
         try:
             # First try to get users metadata
             users_url = f"{self.api_base}/meta/users"
-            users_response = requests.get(users_url, headers=self.headers, timeout=30)
+            users_response = get_client('bamboohr').get(users_url, headers=self.headers, timeout=30)
             
             if users_response.status_code == 200:
                 users_data = users_response.json()
@@ -86,7 +91,7 @@ class BambooHRIntegration:
                     ]
                     
                     emp_url = f"{self.api_base}/employees/{employee_id}"
-                    emp_response = requests.get(
+                    emp_response = get_client('bamboohr').get(
                         emp_url,
                         params={"fields": ",".join(fields)},
                         headers=self.headers,
@@ -125,62 +130,11 @@ class BambooHRIntegration:
             directory = directory_result['data']
             employees = directory.get('employees', [])
             
-            # Process and enhance employee data
-            processed_employees = []
-            departments = {}
-            total_employees = len(employees)
-            active_employees = 0
-            recent_hires = 0
-            
-            # Calculate date for recent hires (last 90 days)
-            ninety_days_ago = datetime.now() - timedelta(days=90)
-            
-            for emp in employees:
-                # Count active employees
-                if emp.get('status', '').lower() != 'inactive':
-                    active_employees += 1
-                
-                # Count recent hires
-                hire_date_str = emp.get('hireDate')
-                if hire_date_str:
-                    try:
-                        hire_date = datetime.strptime(hire_date_str, '%Y-%m-%d')
-                        if hire_date > ninety_days_ago:
-                            recent_hires += 1
-                    except ValueError:
-                        pass
-                
-                # Process departments
-                dept_name = emp.get('department', 'Unknown')
-                if dept_name not in departments:
-                    departments[dept_name] = {
-                        'name': dept_name,
-                        'employeeCount': 0,
-                        'manager': None
-                    }
-                departments[dept_name]['employeeCount'] += 1
-                
-                # If this employee is a supervisor, they might be a department manager
-                if emp.get('supervisor') is None and emp.get('jobTitle'):
-                    title = emp.get('jobTitle', '').lower()
-                    if any(word in title for word in ['manager', 'director', 'head', 'lead']):
-                        departments[dept_name]['manager'] = emp.get('displayName') or f"{emp.get('firstName', '')} {emp.get('lastName', '')}"
-                
-                processed_employees.append(emp)
-            
-            # Convert departments dict to list
-            departments_list = list(departments.values())
+            summary = summarize_directory(employees)
             
             return {
                 'success': True,
-                'data': {
-                    'employees': processed_employees,
-                    'departments': departments_list,
-                    'totalEmployees': total_employees,
-                    'activeEmployees': active_employees,
-                    'recentHires': recent_hires,
-                    'lastUpdated': datetime.now().isoformat()
-                }
+                'data': dict(summary, employees=employees)
             }
             
         except Exception as e:
@@ -210,7 +164,7 @@ def bamboohr_employees(request):
                 if connection.projects_data:
                     return JsonResponse({
                         'success': True,
-                        'data': connection.projects_data.get('employees', {}),
+                        'data': load_employee_data(connection),
                         'current_user': connection.projects_data.get('current_user'),
                         'company_info': connection.projects_data.get('company_info', {}),
                         'last_updated': connection.updated_at.isoformat(),
@@ -350,7 +304,7 @@ def bamboohr_stored_data(request):
                 
                 if connection.projects_data:
                     # Parse the employee data correctly from the JSON structure
-                    employees_data = connection.projects_data.get('employees', {})
+                    employees_data = load_employee_data(connection)
                     employees_list = employees_data.get('employees', []) if isinstance(employees_data, dict) else []
                     
                     # Count employees from the actual array
@@ -484,55 +438,50 @@ def bamboohr_stored_data(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 def bamboohr_sync_data(request):
-    """Sync and save BambooHR employee data to database"""
+    """
+    Sync BambooHR employee data to the database.
+
+    With employee_data in the body the given directory is diffed and applied
+    immediately. Without it (or with background=true) the directory is fetched
+    from BambooHR on a background thread; poll bamboohr/sync-status/.
+    """
     try:
         data = json.loads(request.body)
         user_id = data.get('user_id', 1)
-        employee_data = data.get('employee_data', {})
-        current_user = data.get('current_user')
-        access_token = data.get('access_token', '')
+        employee_data = data.get('employee_data') or {}
+        employees = employee_data.get('employees') if isinstance(employee_data, dict) else None
+        background = data.get('background', employees is None)
         
         try:
             user = Users.objects.get(UserId=user_id)
             bamboohr_app = ExternalApplication.objects.get(name='BambooHR')
             
-            # Update connection with employee data
             connection = ExternalApplicationConnection.objects.get(
                 application=bamboohr_app,
                 user=user
             )
             
-            # Update projects_data with employee information
-            projects_data = connection.projects_data or {}
-            
-            # IMPORTANT: Preserve existing keys (especially 'subdomain') when updating
-            projects_data.update({
-                'employees': employee_data,
-                'last_sync': datetime.now().isoformat()
-            })
-            
-            logger.info(f"Syncing data - Projects data keys after update: {list(projects_data.keys())}")
-            logger.info(f"Syncing data - Subdomain preserved: {projects_data.get('subdomain', 'NOT FOUND')}")
-            
-            connection.projects_data = projects_data
-            connection.last_used = datetime.now()
-            connection.save()
+            if background:
+                started = start_background_sync(connection.id, employees=employees)
+                return JsonResponse({
+                    'success': True,
+                    'status': 'started' if started else 'already_running',
+                    'message': 'Employee sync started' if started else 'An employee sync is already running'
+                })
             
-            # Create sync log
-            ExternalApplicationSyncLog.objects.create(
-                application=bamboohr_app,
-                user=user,
-                sync_type='manual',
-                sync_status='success',
-                records_synced=employee_data.get('totalEmployees', 0),
-                sync_started_at=datetime.now(),
-                sync_completed_at=datetime.now()
-            )
+            stats = BambooHRSyncEngine(None, connection).sync(employees=employees or [])
+            if stats['status'] != 'success':
+                return JsonResponse({
+                    'success': False,
+                    'error': stats.get('error', 'Sync failed'),
+                    'stats': stats
+                })
             
             return JsonResponse({
                 'success': True,
                 'message': 'Employee data synced successfully',
-                'records_synced': employee_data.get('totalEmployees', 0)
+                'records_synced': stats['fetched'],
+                'stats': stats
             })
             
         except (Users.DoesNotExist, ExternalApplication.DoesNotExist, ExternalApplicationConnection.DoesNotExist) as e:
@@ -553,6 +502,40 @@ def bamboohr_sync_data(request):
             'error': f'Server error: {str(e)}'
         })
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def bamboohr_sync_status(request):
+    """Whether a background sync is running and the stats of the last sync"""
+    try:
+        user_id = request.GET.get('user_id', 1)
+        
+        try:
+            user = Users.objects.get(UserId=user_id)
+            bamboohr_app = ExternalApplication.objects.get(name='BambooHR')
+            connection = ExternalApplicationConnection.objects.get(
+                application=bamboohr_app,
+                user=user
+            )
+        except (Users.DoesNotExist, ExternalApplication.DoesNotExist, ExternalApplicationConnection.DoesNotExist):
+            return JsonResponse({
+                'success': False,
+                'error': 'BambooHR connection not found'
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'running': is_sync_running(connection.id),
+            'last_sync': last_sync_stats(connection.id),
+            'last_sync_at': (connection.projects_data or {}).get('last_sync')
+        })
+    
+    except Exception as e:
+        logger.error(f"BambooHR sync status endpoint error: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'error': f'Server error: {str(e)}'
+        })
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def bamboohr_departments(request):
@@ -869,7 +852,7 @@ def bamboohr_oauth_callback(request):
                 }
                 
                 logger.info(f"Exchanging code for token with {subdomain}.bamboohr.com")
-                token_response = requests.post(token_url, data=token_data, headers=token_headers, timeout=30)
+                token_response = get_client('bamboohr').post(token_url, data=token_data, headers=token_headers, timeout=30)
                 
                 if token_response.status_code != 200:
                     logger.error(f"Token exchange failed: {token_response.status_code} {token_response.text}")
@@ -936,7 +919,7 @@ def bamboohr_oauth_callback(request):
                     try:
                         api_base = f"https://{subdomain}.bamboohr.com/api/v1"
                         headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
-                        company_resp = requests.get(f"{api_base}/meta/company", headers=headers, timeout=30)
+                        company_resp = get_client('bamboohr').get(f"{api_base}/meta/company", headers=headers, timeout=30)
                         if company_resp.status_code == 200:
                             company_info = company_resp.json()
                             logger.info("Successfully fetched company info")
@@ -967,7 +950,8 @@ def bamboohr_oauth_callback(request):
                     projects_data = {
                         'subdomain': subdomain,
                         'connected_at': datetime.now().isoformat(),
-                        'employees': employee_data or {},
+                        # Employee rows are written to bamboohr_employees by the sync below
+                        'employees': {k: v for k, v in (employee_data or {}).items() if k != 'employees'},
                         'current_user': current_user_data or {},
                         'last_sync': datetime.now().isoformat(),
                         'sync_status': 'success' if employee_data else 'partial'
@@ -989,16 +973,20 @@ def bamboohr_oauth_callback(request):
                         }
                     )
                     
-                    # Create sync log
-                    ExternalApplicationSyncLog.objects.create(
-                        application=bamboohr_app,
-                        user=user,
-                        sync_type='manual',
-                        sync_status='success' if employee_data else 'partial',
-                        records_synced=employee_data.get('totalEmployees', 0) if employee_data else 0,
-                        sync_started_at=datetime.now(),
-                        sync_completed_at=datetime.now()
-                    )
+                    if employee_data:
+                        # Stores the directory and writes the sync log
+                        BambooHRSyncEngine(None, connection).sync(employees=employee_data.get('employees', []))
+                    else:
+                        # Create sync log
+                        ExternalApplicationSyncLog.objects.create(
+                            application=bamboohr_app,
+                            user=user,
+                            sync_type='manual',
+                            sync_status='partial',
+                            records_synced=0,
+                            sync_started_at=datetime.now(),
+                            sync_completed_at=datetime.now()
+                        )
                     
                     logger.info(f"Successfully saved BambooHR connection with employee data: {employee_data.get('totalEmployees', 0)} employees")
                     
@@ -1367,7 +1355,7 @@ def bamboohr_reports(request):
                     'error': 'No employee data found'
                 })
             
-            employee_data = connection.projects_data['employees']
+            employee_data = load_employee_data(connection)
             
             if report_type == 'summary':
                 report = {
@@ -0,0 +1,425 @@
+"""
+Incremental BambooHR directory sync.
+
+Every sync used to copy the whole employee directory into
+ExternalApplicationConnection.projects_data, rewriting one large JSON blob per
+run. Employees now live in the bamboohr_employees table, one row per
+employee, each with a SHA-256 hash of its raw directory record. A sync:
+
+- fetches the directory once
+- loads (employee_id, hash) for the connection in a single query
+- bulk inserts new employees, bulk updates the ones whose hash changed and
+  deletes the ones that left the directory; unchanged rows are not touched
+- holds back the deletes when the directory came back empty or would remove
+  more than BAMBOOHR_SYNC_MAX_DELETE_FRACTION of the stored employees, since
+  that is far more likely a truncated response than a real exodus
+- stores only the directory summary (departments and counts) in
+  projects_data['employees'] and records per-sync stats in
+  ExternalApplicationSyncLog and IntegrationSyncWatermark
+
+start_background_sync() runs a sync on a daemon thread; the
+sync_bamboohr_directories management command runs them for every active
+connection (e.g. nightly). FakeBambooHRDirectory stands in for
+BambooHRIntegration so the engine can run without a BambooHR tenant.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from grc.models import (
+    BambooHREmployee, ExternalApplicationConnection, ExternalApplicationSyncLog, IntegrationSyncWatermark
+)
+
+logger = logging.getLogger(__name__)
+
+SYNC_SOURCE = 'bamboohr'
+EMPLOYEE_STORE = 'bamboohr_employees'
+SYNC_CHUNK_SIZE = getattr(settings, 'BAMBOOHR_SYNC_CHUNK_SIZE', 1000)
+# Mass-delete guard; it only applies once more than MIN_DELETES rows would go
+MAX_DELETE_FRACTION = getattr(settings, 'BAMBOOHR_SYNC_MAX_DELETE_FRACTION', 0.5)
+MIN_GUARDED_DELETES = getattr(settings, 'BAMBOOHR_SYNC_MIN_GUARDED_DELETES', 10)
+
+
+class BambooHRSyncError(Exception):
+    """Raised when the directory cannot be fetched from BambooHR"""
+
+
+def employee_hash(employee):
+    """Stable content hash of a directory record"""
+    raw = json.dumps(employee, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def summarize_directory(employees):
+    """Department breakdown and headcounts of a directory, without the employee list"""
+    departments = {}
+    active_employees = 0
+    recent_hires = 0
+
+    # Calculate date for recent hires (last 90 days)
+    ninety_days_ago = datetime.now() - timedelta(days=90)
+
+    for emp in employees:
+        # Count active employees
+        if (emp.get('status') or '').lower() != 'inactive':
+            active_employees += 1
+
+        # Count recent hires
+        hire_date_str = emp.get('hireDate')
+        if hire_date_str:
+            try:
+                hire_date = datetime.strptime(hire_date_str, '%Y-%m-%d')
+                if hire_date > ninety_days_ago:
+                    recent_hires += 1
+            except ValueError:
+                pass
+
+        # Process departments
+        dept_name = emp.get('department', 'Unknown')
+        if dept_name not in departments:
+            departments[dept_name] = {
+                'name': dept_name,
+                'employeeCount': 0,
+                'manager': None
+            }
+        departments[dept_name]['employeeCount'] += 1
+
+        # If this employee is a supervisor, they might be a department manager
+        if emp.get('supervisor') is None and emp.get('jobTitle'):
+            title = emp.get('jobTitle', '').lower()
+            if any(word in title for word in ['manager', 'director', 'head', 'lead']):
+                departments[dept_name]['manager'] = emp.get('displayName') or f"{emp.get('firstName', '')} {emp.get('lastName', '')}"
+
+    return {
+        'departments': list(departments.values()),
+        'totalEmployees': len(employees),
+        'activeEmployees': active_employees,
+        'recentHires': recent_hires,
+        'lastUpdated': datetime.now().isoformat()
+    }
+
+
+def load_employee_data(connection):
+    """
+    projects_data['employees'] in its original shape, including the 'employees'
+    array, reading the array from bamboohr_employees for synced connections
+    """
+    employee_data = dict((connection.projects_data or {}).get('employees') or {})
+    if employee_data.get('store') == EMPLOYEE_STORE:
+        employee_data['employees'] = list(
+            BambooHREmployee.objects.filter(connection=connection).order_by('id').values_list('data', flat=True)
+        )
+    return employee_data
+
+
+class FakeBambooHRDirectory:
+    """
+    In-memory stand-in for BambooHRIntegration.get_employee_directory.
+
+    Holds a mutable directory so a sequence of syncs can be replayed
+    (hire, edit, terminate) without a BambooHR tenant.
+    """
+
+    def __init__(self, employees=None, error=None):
+        self.employees = {str(emp['id']): dict(emp) for emp in employees or []}
+        self.error = error
+        self.calls = 0
+
+    @classmethod
+    def generate(cls, count, departments=('Engineering', 'Sales', 'Finance', 'Operations')):
+        return cls([
+            {
+                'id': str(i),
+                'displayName': f'Employee {i}',
+                'firstName': 'Employee',
+                'lastName': str(i),
+                'jobTitle': 'Analyst',
+                'department': departments[i % len(departments)],
+                'workEmail': f'employee{i}@example.com',
+                'status': 'Active',
+            }
+            for i in range(1, count + 1)
+        ])
+
+    def upsert(self, employee):
+        self.employees[str(employee['id'])] = dict(employee)
+
+    def remove(self, employee_id):
+        self.employees.pop(str(employee_id), None)
+
+    def get_employee_directory(self):
+        self.calls += 1
+        if self.error:
+            return {'success': False, 'error': self.error}
+        return {
+            'success': True,
+            'data': {'fields': [], 'employees': [dict(emp) for emp in self.employees.values()]}
+        }
+
+
+class BambooHRSyncEngine:
+    """
+    Diffs a BambooHR directory against bamboohr_employees and applies the delta.
+
+    client is anything with get_employee_directory() (BambooHRIntegration or
+    FakeBambooHRDirectory); it may be None when sync() is given the employees.
+    """
+
+    def __init__(self, client, connection, chunk_size=None):
+        self.client = client
+        self.connection = connection
+        self.chunk_size = chunk_size or SYNC_CHUNK_SIZE
+
+    def fetch_directory(self):
+        if self.client is None:
+            raise BambooHRSyncError('No BambooHR client configured')
+        result = self.client.get_employee_directory()
+        if not result.get('success'):
+            raise BambooHRSyncError(result.get('error') or 'Could not fetch employee directory')
+        return (result.get('data') or {}).get('employees', []) or []
+
+    def diff(self, employees):
+        """
+        Returns a dict of inserts [(employee_id, record, hash)],
+        updates [(pk, employee_id, record, hash)], deletes [pk] and counters
+        """
+        incoming = {}
+        skipped = 0
+        for emp in employees:
+            emp_id = str(emp.get('id') or '').strip() if isinstance(emp, dict) else ''
+            if not emp_id:
+                skipped += 1
+                continue
+            incoming[emp_id] = emp
+
+        existing = {
+            emp_id: (pk, content_hash)
+            for pk, emp_id, content_hash in BambooHREmployee.objects.filter(
+                connection=self.connection
+            ).values_list('id', 'employee_id', 'content_hash')
+        }
+
+        inserts, updates = [], []
+        unchanged = 0
+        for emp_id, emp in incoming.items():
+            content_hash = employee_hash(emp)
+            current = existing.get(emp_id)
+            if current is None:
+                inserts.append((emp_id, emp, content_hash))
+            elif current[1] != content_hash:
+                updates.append((current[0], emp_id, emp, content_hash))
+            else:
+                unchanged += 1
+        deletes = [pk for emp_id, (pk, _) in existing.items() if emp_id not in incoming]
+        held_deletes = 0
+        if deletes and (
+            not incoming
+            or (len(deletes) > MIN_GUARDED_DELETES and len(deletes) > MAX_DELETE_FRACTION * len(existing))
+        ):
+            logger.warning(
+                f"BambooHR sync for connection {self.connection.id}: directory returned {len(incoming)} "
+                f"employees against {len(existing)} stored; not deleting {len(deletes)} employees"
+            )
+            held_deletes, deletes = len(deletes), []
+
+        return {
+            'inserts': inserts,
+            'updates': updates,
+            'deletes': deletes,
+            'held_deletes': held_deletes,
+            'unchanged': unchanged,
+            'skipped': skipped,
+            'previous_count': len(existing),
+        }
+
+    def apply(self, delta, now):
+        with transaction.atomic():
+            if delta['inserts']:
+                BambooHREmployee.objects.bulk_create([
+                    BambooHREmployee(
+                        connection=self.connection,
+                        employee_id=emp_id,
+                        content_hash=content_hash,
+                        data=emp,
+                        department=(emp.get('department') or None),
+                        status=(emp.get('status') or None),
+                        first_synced_at=now,
+                        last_synced_at=now,
+                    )
+                    for emp_id, emp, content_hash in delta['inserts']
+                ], batch_size=self.chunk_size)
+
+            if delta['updates']:
+                BambooHREmployee.objects.bulk_update([
+                    BambooHREmployee(
+                        id=pk,
+                        connection=self.connection,
+                        employee_id=emp_id,
+                        content_hash=content_hash,
+                        data=emp,
+                        department=(emp.get('department') or None),
+                        status=(emp.get('status') or None),
+                        last_synced_at=now,
+                    )
+                    for pk, emp_id, emp, content_hash in delta['updates']
+                ], ['content_hash', 'data', 'department', 'status', 'last_synced_at'], batch_size=self.chunk_size)
+
+            deletes = delta['deletes']
+            for i in range(0, len(deletes), self.chunk_size):
+                BambooHREmployee.objects.filter(id__in=deletes[i:i + self.chunk_size]).delete()
+
+    def _store_summary(self, summary, now):
+        # Re-read under lock so concurrent writers (e.g. added_users) are not overwritten
+        with transaction.atomic():
+            connection = ExternalApplicationConnection.objects.select_for_update().get(id=self.connection.id)
+            projects_data = connection.projects_data or {}
+            projects_data.update({
+                'employees': dict(summary, store=EMPLOYEE_STORE),
+                'last_sync': now.isoformat(),
+                'sync_status': 'success'
+            })
+            connection.projects_data = projects_data
+            connection.last_used = now
+            connection.save(update_fields=['projects_data', 'last_used', 'updated_at'])
+        self.connection.projects_data = projects_data
+
+    def _record(self, stats, started_at, completed_at, error=None):
+        ExternalApplicationSyncLog.objects.create(
+            application_id=self.connection.application_id,
+            user_id=self.connection.user_id,
+            sync_type=stats.get('sync_type', 'incremental'),
+            sync_status='failed' if error else 'success',
+            records_synced=stats.get('inserted', 0) + stats.get('updated', 0) + stats.get('deleted', 0),
+            error_message=str(error) if error else None,
+            sync_started_at=started_at,
+            sync_completed_at=completed_at
+        )
+        defaults = {'last_sync_stats': stats}
+        if not error:
+            defaults['watermark'] = started_at
+        IntegrationSyncWatermark.objects.update_or_create(
+            source=SYNC_SOURCE,
+            scope_key=f'connection:{self.connection.id}',
+            defaults=defaults
+        )
+
+    def sync(self, employees=None):
+        """
+        Run one sync. Uses the given directory records, or fetches them.
+
+        Returns the stats dict that is also stored as last_sync_stats.
+        """
+        started_at = timezone.now()
+        clock = time.monotonic()
+        stats = {'status': 'success', 'started_at': started_at.isoformat()}
+        try:
+            if employees is None:
+                employees = self.fetch_directory()
+            fetched_in = time.monotonic() - clock
+
+            delta = self.diff(employees)
+            stats['sync_type'] = 'incremental' if delta['previous_count'] else 'full'
+            self.apply(delta, started_at)
+            # A directory that looked truncated must not replace the stored summary either
+            if not delta['held_deletes']:
+                self._store_summary(summarize_directory(employees), started_at)
+
+            stats.update({
+                'fetched': len(employees),
+                'inserted': len(delta['inserts']),
+                'updated': len(delta['updates']),
+                'deleted': len(delta['deletes']),
+                'held_deletes': delta['held_deletes'],
+                'unchanged': delta['unchanged'],
+                'skipped': delta['skipped'],
+                'fetch_seconds': round(fetched_in, 3),
+                'duration_seconds': round(time.monotonic() - clock, 3),
+                'completed_at': timezone.now().isoformat(),
+            })
+            self._record(stats, started_at, timezone.now())
+            logger.info(
+                f"BambooHR sync for connection {self.connection.id}: {stats['inserted']} inserted, "
+                f"{stats['updated']} updated, {stats['deleted']} deleted, {stats['unchanged']} unchanged "
+                f"in {stats['duration_seconds']}s"
+            )
+            return stats
+        except Exception as e:
+            logger.error(f"BambooHR sync failed for connection {self.connection.id}: {str(e)}")
+            stats.update({
+                'status': 'failed',
+                'error': str(e),
+                'duration_seconds': round(time.monotonic() - clock, 3),
+                'completed_at': timezone.now().isoformat(),
+            })
+            try:
+                self._record(stats, started_at, timezone.now(), error=e)
+            except Exception as log_error:
+                logger.error(f"Could not record BambooHR sync failure: {str(log_error)}")
+            return stats
+
+
+def client_for_connection(connection):
+    """BambooHRIntegration built from a stored connection"""
+    from .bamboohr import BambooHRIntegration
+
+    subdomain = (connection.projects_data or {}).get('subdomain')
+    if not subdomain or not connection.connection_token:
+        raise BambooHRSyncError('Connection has no subdomain or token - please reconnect to BambooHR')
+    return BambooHRIntegration(subdomain, connection.connection_token)
+
+
+def last_sync_stats(connection_id):
+    return IntegrationSyncWatermark.objects.filter(
+        source=SYNC_SOURCE, scope_key=f'connection:{connection_id}'
+    ).values_list('last_sync_stats', flat=True).first()
+
+
+# ---------------------------------------------------------------------------
+# Background runs
+# ---------------------------------------------------------------------------
+
+_running = set()
+_running_lock = threading.Lock()
+
+
+def is_sync_running(connection_id):
+    with _running_lock:
+        return connection_id in _running
+
+
+def start_background_sync(connection_id, employees=None, client=None):
+    """
+    Sync a connection on a daemon thread.
+
+    Returns False if a sync for the connection is already running in this process.
+    """
+    with _running_lock:
+        if connection_id in _running:
+            return False
+        _running.add(connection_id)
+
+    def run():
+        try:
+            close_old_connections()
+            connection = ExternalApplicationConnection.objects.get(id=connection_id)
+            sync_client = client
+            if sync_client is None and employees is None:
+                sync_client = client_for_connection(connection)
+            BambooHRSyncEngine(sync_client, connection).sync(employees=employees)
+        except Exception as e:
+            logger.error(f"Background BambooHR sync failed for connection {connection_id}: {str(e)}")
+        finally:
+            with _running_lock:
+                _running.discard(connection_id)
+            close_old_connections()
+
+    threading.Thread(target=run, name=f'bamboohr-sync-{connection_id}', daemon=True).start()
+    return True
@@ -2,7 +2,6 @@ import os
 import json
 import logging
 import base64
-import mimetypes
 from datetime import datetime, timedelta
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -17,6 +16,10 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 from grc.models import ExternalApplication, ExternalApplicationConnection, ExternalApplicationSyncLog, Users, IntegrationDataList
+from .gmail_sync import (
+    GmailSyncEngine, batch_get_messages, build_message_info, build_attachment_info,
+    collect_attachment_parts, fetch_attachment_data
+)
 
 logger = logging.getLogger(__name__)
 
@@ -127,71 +130,24 @@ def delete_oauth_state(state):
         logger.error(f"Error deleting OAuth state: {str(e)}")
         return False
 
-def extract_attachments_from_message(service, message_id):
+def extract_attachments_from_message(service, message_id, message=None):
     """
-    Extract attachments from a Gmail message
+    Extract attachments from a Gmail message.
+    Pass an already fetched message (format='full') to avoid fetching it again.
     """
     try:
-        # Get the full message
-        message = service.users().messages().get(
-            userId='me',
-            id=message_id,
-            format='full'
-        ).execute()
+        if message is None:
+            message = service.users().messages().get(
+                userId='me',
+                id=message_id,
+                format='full'
+            ).execute()
         
         attachments = []
-        
-        def process_part(part):
-            """Recursively process message parts"""
-            if 'parts' in part:
-                for subpart in part['parts']:
-                    process_part(subpart)
-            
-            # Check if this part has attachments
-            if part.get('filename') and part.get('body', {}).get('attachmentId'):
-                attachment_id = part['body']['attachmentId']
-                filename = part['filename']
-                mime_type = part.get('mimeType', 'application/octet-stream')
-                size = part['body'].get('size', 0)
-                
-                # Get attachment data
-                attachment_data = service.users().messages().attachments().get(
-                    userId='me',
-                    messageId=message_id,
-                    id=attachment_id
-                ).execute()
-                
-                # Decode attachment data
-                file_data = base64.urlsafe_b64decode(attachment_data['data'])
-                
-                # Determine file extension
-                file_extension = mimetypes.guess_extension(mime_type) or '.bin'
-                
-                attachment_info = {
-                    'id': attachment_id,
-                    'filename': filename,
-                    'mime_type': mime_type,
-                    'size': size,
-                    'file_extension': file_extension,
-                    'data': base64.b64encode(file_data).decode('utf-8'),  # Store as base64 for JSON
-                    'is_image': mime_type.startswith('image/'),
-                    'is_pdf': mime_type == 'application/pdf',
-                    'is_document': mime_type in [
-                        'application/msword',
-                        'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                        'application/vnd.ms-excel',
-                        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                        'application/vnd.ms-powerpoint',
-                        'application/vnd.openxmlformats-officedocument.presentationml.presentation'
-                    ]
-                }
-                
-                attachments.append(attachment_info)
-                logger.info(f"Extracted attachment: {filename} ({mime_type}, {size} bytes)")
-        
-        # Process the message payload
-        payload = message.get('payload', {})
-        process_part(payload)
+        for part in collect_attachment_parts(message.get('payload', {})):
+            attachment_info = build_attachment_info(part, fetch_attachment_data(service, message_id, part))
+            attachments.append(attachment_info)
+            logger.info(f"Extracted attachment: {attachment_info['filename']} ({attachment_info['mime_type']}, {attachment_info['size']} bytes)")
         
         return attachments
         
@@ -1132,53 +1088,23 @@ def get_gmail_messages(request):
             ).execute()
             
             messages = results.get('messages', [])
-            message_details = []
+            message_ids = [message['id'] for message in messages]
             
-            for message in messages:
-                msg = service.users().messages().get(
-                    userId='me',
-                    id=message['id'],
-                    format='full'  # Use 'full' instead of 'metadata' to get all headers
-                ).execute()
-                
-                headers = msg['payload'].get('headers', [])
-                
-                # Create a dictionary for easier header lookup
-                header_dict = {h['name']: h['value'] for h in headers}
-                
-                # Extract headers with better fallback handling
-                subject = header_dict.get('Subject', 'No Subject')
-                sender = header_dict.get('From', 'Unknown Sender')
-                recipient = header_dict.get('To', 'Unknown Recipient')
-                cc = header_dict.get('Cc', '')
-                bcc = header_dict.get('Bcc', '')
-                date = header_dict.get('Date', '')
-                
-                # Log extracted values for debugging
-                logger.info(f"Message {message['id']} - From: {sender}, To: {recipient}, CC: {cc}, BCC: {bcc}")
-                
-                message_info = {
-                    'id': message['id'],
-                    'subject': subject,
-                    'from': sender,
-                    'to': recipient,
-                    'cc': cc,
-                    'bcc': bcc,
-                    'date': date,
-                    'snippet': msg.get('snippet', ''),
-                    'attachments': []
-                }
-                
-                # Extract attachments if requested
-                if include_attachments:
-                    attachments = extract_attachments_from_message(service, message['id'])
-                    message_info['attachments'] = attachments
-                    message_info['has_attachments'] = len(attachments) > 0
-                    message_info['attachment_count'] = len(attachments)
-                else:
-                    message_info['has_attachments'] = False
-                    message_info['attachment_count'] = 0
+            # Fetch all message bodies in one batch request instead of one call per message
+            fetched, fetch_errors = batch_get_messages(service, message_ids)
+            for failed_id, error in fetch_errors.items():
+                logger.error(f"Error fetching Gmail message {failed_id}: {error}")
+            
+            message_details = []
+            for message_id in message_ids:
+                msg = fetched.get(message_id)
+                if not msg:
+                    continue
                 
+                # Reuse the fetched payload for attachments rather than getting the message again
+                attachments = extract_attachments_from_message(service, message_id, message=msg) if include_attachments else []
+                message_info = build_message_info(msg, attachments)
+                logger.info(f"Message {message_id} - From: {message_info['from']}, To: {message_info['to']}")
                 message_details.append(message_info)
             
             # Always save message data to database (with or without attachments)
@@ -1662,6 +1588,113 @@ def get_stored_gmail_data(request):
             'error': str(e)
         }, status=500)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def sync_gmail_mailbox(request):
+    """
+    Incrementally sync the user's inbox into integration_data_list.
+    Only messages added since the last stored historyId are downloaded.
+    """
+    try:
+        data = json.loads(request.body) if request.body else {}
+        
+        # Try to get user_id from JWT token first, then from request body
+        if hasattr(request, 'user') and request.user and hasattr(request.user, 'UserId'):
+            user_id = request.user.UserId
+        else:
+            user_id = data.get('user_id', 1)
+        
+        force_full = bool(data.get('force_full', False))
+        include_attachment_data = bool(data.get('include_attachment_data', False))
+        
+        try:
+            user = Users.objects.get(UserId=user_id)
+            gmail_app = ExternalApplication.objects.get(name='Gmail')
+        except (Users.DoesNotExist, ExternalApplication.DoesNotExist):
+            return JsonResponse({
+                'success': False,
+                'error': 'User or Gmail application not found'
+            }, status=404)
+        
+        connection = ExternalApplicationConnection.objects.filter(
+            application=gmail_app,
+            user=user,
+            connection_status='active'
+        ).first()
+        
+        if not connection:
+            return JsonResponse({
+                'success': False,
+                'error': 'Gmail not connected'
+            }, status=401)
+        
+        # Check and refresh token if needed
+        if connection.token_expires_at and connection.token_expires_at <= timezone.now():
+            if not refresh_gmail_token(connection):
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Gmail connection expired'
+                }, status=401)
+        
+        credentials = Credentials(
+            token=connection.connection_token,
+            refresh_token=connection.refresh_token,
+            token_uri='https://oauth2.googleapis.com/token',
+            client_id=GMAIL_CLIENT_ID,
+            client_secret=GMAIL_CLIENT_SECRET
+        )
+        
+        def service_factory():
+            return build('gmail', 'v1', credentials=credentials, cache_discovery=False)
+        
+        engine = GmailSyncEngine(
+            service_factory(),
+            connection,
+            username=user.UserName,
+            service_factory=service_factory,
+            include_attachment_data=include_attachment_data
+        )
+        
+        sync_started_at = timezone.now()
+        stats = engine.sync(force_full=force_full)
+        
+        ExternalApplicationSyncLog.objects.create(
+            application=gmail_app,
+            user=user,
+            sync_type='full' if stats['mode'] == 'full' else 'incremental',
+            sync_status='partial' if stats['errors'] else 'success',
+            records_synced=stats['created'] + stats['updated'],
+            error_message='; '.join(f"{k}: {v}" for k, v in list(stats['errors'].items())[:20]) or None,
+            sync_started_at=sync_started_at,
+            sync_completed_at=timezone.now()
+        )
+        
+        logger.info(f"Gmail {stats['mode']} sync for user {user_id}: {stats['fetched']} fetched, "
+                    f"{stats['created']} created, {stats['skipped_existing']} already stored")
+        
+        return JsonResponse({
+            'success': True,
+            'sync': stats
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON data'
+        }, status=400)
+    except HttpError as e:
+        logger.error(f"Gmail API error during sync: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'error': f'Gmail API error: {str(e)}'
+        }, status=500)
+    except Exception as e:
+        logger.error(f"Error syncing Gmail mailbox: {str(e)}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def save_gmail_data_to_db(request):
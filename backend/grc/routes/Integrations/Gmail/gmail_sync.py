@@ -0,0 +1,431 @@
+"""
+Incremental Gmail mailbox sync.
+
+The first sync for a connection lists the inbox and records the mailbox
+historyId. Later syncs call users.history.list from that historyId and only
+fetch the messages that were added since. Message bodies are fetched with
+Gmail batch requests, and several batches can run at once when a
+service_factory is supplied (googleapiclient service objects are not thread
+safe, so each worker builds its own). Results are upserted into
+IntegrationDataList with bulk_create/bulk_update.
+
+Sync state is stored per connection under projects_data['gmail_sync'].
+"""
+
+import base64
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from googleapiclient.errors import HttpError
+
+from grc.models import IntegrationDataList
+
+logger = logging.getLogger(__name__)
+
+GMAIL_SOURCE = 'Gmail'
+SYNC_STATE_KEY = 'gmail_sync'
+
+# Gmail allows up to 100 calls per batch but recommends 50 or fewer
+GMAIL_BATCH_SIZE = getattr(settings, 'GMAIL_SYNC_BATCH_SIZE', 50)
+GMAIL_SYNC_WORKERS = getattr(settings, 'GMAIL_SYNC_WORKERS', 4)
+# Upper bound on messages pulled by a first (full) sync
+GMAIL_FULL_SYNC_LIMIT = getattr(settings, 'GMAIL_FULL_SYNC_LIMIT', 5000)
+GMAIL_UPSERT_CHUNK = 500
+# A message deleted between listing and fetching answers with one of these;
+# retrying it can never succeed
+GONE_STATUSES = (404, 410)
+
+DOCUMENT_MIME_TYPES = [
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.ms-powerpoint',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+]
+
+
+def collect_attachment_parts(payload):
+    """Return every attachment part of a message payload (recursively)"""
+    parts = []
+
+    def walk(part):
+        for subpart in part.get('parts', []) or []:
+            walk(subpart)
+        body = part.get('body', {}) or {}
+        if part.get('filename') and (body.get('attachmentId') or body.get('data')):
+            parts.append(part)
+
+    walk(payload or {})
+    return parts
+
+
+def build_attachment_info(part, data=None):
+    """Attachment dict in the shape the Gmail views already return"""
+    body = part.get('body', {}) or {}
+    mime_type = part.get('mimeType', 'application/octet-stream')
+    info = {
+        'id': body.get('attachmentId'),
+        'filename': part.get('filename'),
+        'mime_type': mime_type,
+        'size': body.get('size', 0),
+        'file_extension': mimetypes.guess_extension(mime_type) or '.bin',
+        'is_image': mime_type.startswith('image/'),
+        'is_pdf': mime_type == 'application/pdf',
+        'is_document': mime_type in DOCUMENT_MIME_TYPES
+    }
+    if data is not None:
+        info['data'] = data
+    return info
+
+
+def fetch_attachment_data(service, message_id, part):
+    """Base64 attachment content, using inline data when Gmail already returned it"""
+    body = part.get('body', {}) or {}
+    raw = body.get('data')
+    if not raw:
+        raw = service.users().messages().attachments().get(
+            userId='me',
+            messageId=message_id,
+            id=body['attachmentId']
+        ).execute()['data']
+    return base64.b64encode(base64.urlsafe_b64decode(raw)).decode('utf-8')
+
+
+def build_message_info(msg, attachments=None):
+    """Flatten a users.messages.get(format='full') response for the UI and storage"""
+    headers = msg.get('payload', {}).get('headers', [])
+    header_dict = {h['name']: h['value'] for h in headers}
+    attachments = attachments or []
+    return {
+        'id': msg['id'],
+        'thread_id': msg.get('threadId'),
+        'history_id': msg.get('historyId'),
+        'internal_date': msg.get('internalDate'),
+        'subject': header_dict.get('Subject', 'No Subject'),
+        'from': header_dict.get('From', 'Unknown Sender'),
+        'to': header_dict.get('To', 'Unknown Recipient'),
+        'cc': header_dict.get('Cc', ''),
+        'bcc': header_dict.get('Bcc', ''),
+        'date': header_dict.get('Date', ''),
+        'snippet': msg.get('snippet', ''),
+        'attachments': attachments,
+        'has_attachments': len(attachments) > 0,
+        'attachment_count': len(attachments)
+    }
+
+
+def _message_time(message_info):
+    internal_date = message_info.get('internal_date')
+    if internal_date:
+        try:
+            return datetime.utcfromtimestamp(int(internal_date) / 1000)
+        except (TypeError, ValueError):
+            pass
+    return datetime.now()
+
+
+def _http_status(exception):
+    return getattr(getattr(exception, 'resp', None), 'status', None)
+
+
+def batch_get_messages(service, message_ids, batch_size=None, gone=None):
+    """
+    Fetch full messages with one HTTP round trip per batch.
+
+    Returns (messages_by_id, errors_by_id). When a gone dict is passed,
+    messages that no longer exist (404/410) are put there instead of errors.
+    """
+    batch_size = batch_size or GMAIL_BATCH_SIZE
+    messages = {}
+    errors = {}
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            if gone is not None and _http_status(exception) in GONE_STATUSES:
+                gone[request_id] = str(exception)
+            else:
+                errors[request_id] = str(exception)
+        else:
+            messages[request_id] = response
+
+    for start in range(0, len(message_ids), batch_size):
+        batch = service.new_batch_http_request(callback=callback)
+        for message_id in message_ids[start:start + batch_size]:
+            batch.add(
+                service.users().messages().get(userId='me', id=message_id, format='full'),
+                request_id=message_id
+            )
+        batch.execute()
+    return messages, errors
+
+
+class GmailSyncEngine:
+    """
+    Pulls new inbox messages for one Gmail connection.
+
+    service is an authorised Gmail API client (or any object with the same
+    interface). service_factory, when given, returns a fresh client per worker
+    so batches can be fetched concurrently.
+    """
+
+    def __init__(self, service, connection, username=None, service_factory=None,
+                 include_attachment_data=False, max_workers=None, batch_size=None,
+                 full_sync_limit=None, query='in:inbox'):
+        self.service = service
+        self.connection = connection
+        self.username = username
+        self.service_factory = service_factory
+        self.include_attachment_data = include_attachment_data
+        self.max_workers = max_workers or GMAIL_SYNC_WORKERS
+        self.batch_size = batch_size or GMAIL_BATCH_SIZE
+        self.full_sync_limit = full_sync_limit or GMAIL_FULL_SYNC_LIMIT
+        self.query = query
+
+    # ------------------------------------------------------------------
+    # Sync state
+    # ------------------------------------------------------------------
+    def get_state(self):
+        data = self.connection.projects_data or {}
+        if not isinstance(data, dict):
+            return {}
+        return data.get(SYNC_STATE_KEY) or {}
+
+    def save_state(self, state):
+        data = self.connection.projects_data
+        if not isinstance(data, dict):
+            data = {}
+        data[SYNC_STATE_KEY] = state
+        self.connection.projects_data = data
+        self.connection.last_used = timezone.now()
+        self.connection.save(update_fields=['projects_data', 'last_used'])
+
+    # ------------------------------------------------------------------
+    # Listing
+    # ------------------------------------------------------------------
+    def list_all_message_ids(self):
+        """Inbox message ids, newest first, capped at full_sync_limit"""
+        ids = []
+        page_token = None
+        while len(ids) < self.full_sync_limit:
+            response = self.service.users().messages().list(
+                userId='me',
+                q=self.query,
+                maxResults=min(500, self.full_sync_limit - len(ids)),
+                pageToken=page_token
+            ).execute()
+            ids.extend(m['id'] for m in response.get('messages', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        return ids
+
+    def list_added_message_ids(self, start_history_id):
+        """Message ids added to the inbox since start_history_id, plus the new historyId"""
+        ids = []
+        seen = set()
+        page_token = None
+        latest_history_id = start_history_id
+        while True:
+            response = self.service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX',
+                pageToken=page_token
+            ).execute()
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message_id = added.get('message', {}).get('id')
+                    if message_id and message_id not in seen:
+                        seen.add(message_id)
+                        ids.append(message_id)
+            latest_history_id = response.get('historyId', latest_history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        return ids, latest_history_id
+
+    def current_history_id(self):
+        return self.service.users().getProfile(userId='me').execute().get('historyId')
+
+    # ------------------------------------------------------------------
+    # Fetching
+    # ------------------------------------------------------------------
+    def _fetch_chunk(self, message_ids):
+        service = self.service_factory() if self.service_factory else self.service
+        gone = {}
+        messages, errors = batch_get_messages(service, message_ids, self.batch_size, gone=gone)
+        infos = []
+        for message_id in message_ids:
+            msg = messages.get(message_id)
+            if not msg:
+                continue
+            attachments = []
+            for part in collect_attachment_parts(msg.get('payload', {})):
+                data = None
+                if self.include_attachment_data:
+                    try:
+                        data = fetch_attachment_data(service, message_id, part)
+                    except Exception as e:
+                        logger.error(f"Error fetching attachment {part.get('filename')} for {message_id}: {str(e)}")
+                attachments.append(build_attachment_info(part, data))
+            infos.append(build_message_info(msg, attachments))
+        return infos, errors, gone
+
+    def fetch_messages(self, message_ids):
+        """
+        Fetch and flatten messages, keeping the order of message_ids.
+
+        Returns (infos, errors, gone): gone holds messages deleted since they
+        were listed, errors the fetches worth retrying.
+        """
+        chunks = [message_ids[i:i + self.batch_size] for i in range(0, len(message_ids), self.batch_size)]
+        results = []
+        errors = {}
+        gone = {}
+        if self.service_factory and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                for infos, chunk_errors, chunk_gone in executor.map(self._fetch_chunk, chunks):
+                    results.extend(infos)
+                    errors.update(chunk_errors)
+                    gone.update(chunk_gone)
+        else:
+            for chunk in chunks:
+                infos, chunk_errors, chunk_gone = self._fetch_chunk(chunk)
+                results.extend(infos)
+                errors.update(chunk_errors)
+                gone.update(chunk_gone)
+        return results, errors, gone
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def stored_message_ids(self, message_ids):
+        """Subset of message_ids already stored in IntegrationDataList for this user"""
+        stored = set()
+        for start in range(0, len(message_ids), GMAIL_UPSERT_CHUNK):
+            chunk = message_ids[start:start + GMAIL_UPSERT_CHUNK]
+            stored.update(
+                IntegrationDataList.objects.filter(
+                    source=GMAIL_SOURCE,
+                    username=self.username,
+                    metadata__message_id__in=chunk
+                ).values_list('metadata__message_id', flat=True)
+            )
+        return stored
+
+    def upsert_messages(self, message_infos):
+        """Bulk insert new messages and bulk update ones that are already stored"""
+        if not message_infos:
+            return {'created': 0, 'updated': 0}
+
+        user_id = getattr(self.connection, 'user_id', None)
+        now = datetime.now()
+        ids = [info['id'] for info in message_infos]
+        existing = {}
+        for start in range(0, len(ids), GMAIL_UPSERT_CHUNK):
+            for row in IntegrationDataList.objects.filter(
+                source=GMAIL_SOURCE,
+                username=self.username,
+                metadata__message_id__in=ids[start:start + GMAIL_UPSERT_CHUNK]
+            ):
+                existing[(row.metadata or {}).get('message_id')] = row
+
+        to_create = []
+        to_update = []
+        for info in message_infos:
+            metadata = {
+                'message_id': info['id'],
+                'thread_id': info.get('thread_id'),
+                'history_id': info.get('history_id'),
+                'user_id': user_id,
+                'source_type': 'gmail',
+                'saved_at': now.isoformat(),
+                'has_attachments': info.get('has_attachments', False),
+                'attachment_count': info.get('attachment_count', 0)
+            }
+            row = existing.get(info['id'])
+            if row:
+                row.heading = (info.get('subject') or 'No Subject')[:255]
+                row.time = _message_time(info)
+                row.data = info
+                row.metadata = metadata
+                row.updated_at = now
+                to_update.append(row)
+            else:
+                to_create.append(IntegrationDataList(
+                    heading=(info.get('subject') or 'No Subject')[:255],
+                    source=GMAIL_SOURCE,
+                    username=self.username,
+                    time=_message_time(info),
+                    data=info,
+                    metadata=metadata
+                ))
+
+        with transaction.atomic():
+            if to_create:
+                IntegrationDataList.objects.bulk_create(to_create, batch_size=GMAIL_UPSERT_CHUNK)
+            if to_update:
+                IntegrationDataList.objects.bulk_update(
+                    to_update, ['heading', 'time', 'data', 'metadata', 'updated_at'],
+                    batch_size=GMAIL_UPSERT_CHUNK
+                )
+        return {'created': len(to_create), 'updated': len(to_update)}
+
+    # ------------------------------------------------------------------
+    # Entry point
+    # ------------------------------------------------------------------
+    def sync(self, force_full=False):
+        """Run a full or incremental sync and return summary stats"""
+        started = timezone.now()
+        state = self.get_state()
+        start_history_id = None if force_full else state.get('history_id')
+        mode = 'incremental' if start_history_id else 'full'
+
+        if start_history_id:
+            try:
+                candidate_ids, new_history_id = self.list_added_message_ids(start_history_id)
+            except HttpError as e:
+                # A 404 means the stored historyId is too old; start over with a full sync
+                if _http_status(e) != 404:
+                    raise
+                logger.warning(f"Gmail historyId {start_history_id} expired, falling back to full sync")
+                mode = 'full'
+        if mode == 'full':
+            # Take the historyId before listing so nothing added meanwhile is missed
+            new_history_id = self.current_history_id()
+            candidate_ids = self.list_all_message_ids()
+
+        already_stored = self.stored_message_ids(candidate_ids)
+        to_fetch = [message_id for message_id in candidate_ids if message_id not in already_stored]
+        message_infos, errors, gone = self.fetch_messages(to_fetch)
+        upserted = self.upsert_messages(message_infos)
+        if gone:
+            logger.info(f"Gmail sync: {len(gone)} message(s) deleted before they could be fetched")
+
+        # Keep the old checkpoint if some fetches failed so they are retried next time.
+        # Deleted messages are done with; waiting on them would pin the checkpoint forever.
+        if not errors:
+            state['history_id'] = new_history_id
+        state['last_synced_at'] = timezone.now().isoformat()
+        state['last_mode'] = mode
+        self.save_state(state)
+
+        return {
+            'mode': mode,
+            'history_id': state.get('history_id'),
+            'candidates': len(candidate_ids),
+            'skipped_existing': len(already_stored),
+            'fetched': len(message_infos),
+            'deleted_before_fetch': len(gone),
+            'created': upserted['created'],
+            'updated': upserted['updated'],
+            'errors': errors,
+            'duration_seconds': (timezone.now() - started).total_seconds()
+        }
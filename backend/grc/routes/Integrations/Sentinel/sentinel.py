@@ -3,7 +3,6 @@ import json
 import base64
 import zlib
 import secrets
-import requests
 from datetime import datetime, timedelta, timezone
 from urllib.parse import urlencode, quote
 
@@ -14,8 +13,12 @@ from django.conf import settings
 from django.shortcuts import redirect
 from django.db import transaction
 from grc.models import IntegrationDataList, Users
+from grc.routes.Global.http_client import get_client
 import re
 
+GRAPH_TIMEOUT = getattr(settings, 'SENTINEL_GRAPH_TIMEOUT', 60)
+
+
 def parse_microsoft_date(date_string):
     """Parse Microsoft date format with flexible microseconds handling"""
     try:
@@ -129,7 +132,7 @@ class SentinelOAuthService:
             'scope': self.scope
         }
         
-        response = requests.post(token_url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        response = get_client('sentinel').post(token_url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
         
         if not response.ok:
             error_data = response.json()
@@ -149,7 +152,7 @@ class SentinelOAuthService:
             'scope': self.scope
         }
         
-        response = requests.post(token_url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        response = get_client('sentinel').post(token_url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
         
         if not response.ok:
             error_data = response.json()
@@ -192,7 +195,7 @@ class SentinelAuthService:
                 'grant_type': 'password'
             }
             
-            response = requests.post(token_url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+            response = get_client('sentinel').post(token_url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
             response.raise_for_status()
             
             token_data = response.json()
@@ -220,7 +223,7 @@ class SentinelAuthService:
     def get_user_info(self, access_token):
         """Get user information from Microsoft Graph"""
         try:
-            response = requests.get(
+            response = get_client('sentinel').get(
                 'https://graph.microsoft.com/v1.0/me',
                 headers={'Authorization': f'Bearer {access_token}'}
             )
@@ -245,7 +248,7 @@ class SentinelAuthService:
         """Test connection to Microsoft Defender"""
         try:
             test_url = 'https://graph.microsoft.com/v1.0/security/incidents?$top=1'
-            response = requests.get(
+            response = get_client('sentinel').get(
                 test_url,
                 headers={
                     'Authorization': f'Bearer {access_token}',
@@ -278,7 +281,7 @@ class SentinelAuthService:
                 'scope': self.scope
             }
             
-            response = requests.post(token_url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
+            response = get_client('sentinel').post(token_url, data=data, headers={'Content-Type': 'application/x-www-form-urlencoded'})
             response.raise_for_status()
             token_data = response.json()
             
@@ -431,9 +434,49 @@ class QueryDecompressor:
 class DefenderAPIService:
     """Service for interacting with Microsoft Defender API"""
     
-    def __init__(self, access_token):
+    def __init__(self, access_token, base_url=None):
         self.access_token = access_token
-        self.base_url = 'https://graph.microsoft.com/v1.0/security'
+        self.base_url = base_url or getattr(settings, 'SENTINEL_GRAPH_BASE_URL', 'https://graph.microsoft.com/v1.0/security')
+        # Shared pooled client so every Defender call reuses keep-alive connections
+        self.session = get_client('sentinel')
+    
+    def _get(self, url, params=None):
+        """GET through the pooled Graph session with this service's bearer token"""
+        return self.session.get(
+            url,
+            params=params,
+            headers={
+                'Authorization': f'Bearer {self.access_token}',
+                'Content-Type': 'application/json'
+            },
+            timeout=GRAPH_TIMEOUT
+        )
+    
+    @staticmethod
+    def _raise_for_response(response):
+        error_details = ''
+        try:
+            error_data = response.json()
+            error_details = error_data.get('error', {}).get('message', json.dumps(error_data))
+        except Exception:
+            error_details = response.text
+        raise Exception(f'Defender API Error: {response.status_code} - {error_details}')
+    
+    def iter_pages(self, url, params=None, max_pages=None):
+        """Yield the 'value' list of every page, following @odata.nextLink"""
+        page_count = 0
+        while url:
+            response = self._get(url, params=params)
+            if not response.ok:
+                self._raise_for_response(response)
+            data = response.json()
+            yield data.get('value', [])
+            page_count += 1
+            if max_pages and page_count >= max_pages:
+                break
+            # nextLink already carries the query string
+            url = data.get('@odata.nextLink')
+            params = None
     
     def get_incidents(self, filters=None):
         """Get incidents from Microsoft Defender"""
@@ -454,51 +497,10 @@ class DefenderAPIService:
             if odata_filters:
                 url += f'&$filter={quote(" and ".join(odata_filters))}'
             
-            response = requests.get(
-                url,
-                headers={
-                    'Authorization': f'Bearer {self.access_token}',
-                    'Content-Type': 'application/json'
-                }
-            )
-            
-            if not response.ok:
-                error_details = ''
-                try:
-                    error_data = response.json()
-                    error_details = error_data.get('error', {}).get('message', json.dumps(error_data))
-                except:
-                    error_details = response.text
-                raise Exception(f'Defender API Error: {response.status_code} - {error_details}')
-            
-            data = response.json()
-            all_incidents = data.get('value', [])
-            print(f"[SENTINEL] Initial fetch: {len(all_incidents)} incidents")
-            
-            # Handle pagination - increased from 3 to 10 pages to fetch more incidents
-            next_link = data.get('@odata.nextLink')
-            page_count = 1
-            
-            while next_link and page_count < 10:
-                print(f"[SENTINEL] Fetching page {page_count + 1}...")
-                next_response = requests.get(
-                    next_link,
-                    headers={
-                        'Authorization': f'Bearer {self.access_token}',
-                        'Content-Type': 'application/json'
-                    }
-                )
-                
-                if next_response.ok:
-                    next_data = next_response.json()
-                    page_incidents = next_data.get('value', [])
-                    all_incidents.extend(page_incidents)
-                    print(f"[SENTINEL] Page {page_count + 1}: {len(page_incidents)} incidents (Total: {len(all_incidents)})")
-                    next_link = next_data.get('@odata.nextLink')
-                    page_count += 1
-                else:
-                    print(f"[SENTINEL] Pagination failed: {next_response.status_code}")
-                    break
+            # Handle pagination - capped at 10 pages to bound the interactive request
+            all_incidents = []
+            for page_incidents in self.iter_pages(url, max_pages=10):
+                all_incidents.extend(page_incidents)
             
             print(f"[SENTINEL] Total incidents fetched: {len(all_incidents)}")
             
@@ -544,13 +546,7 @@ class DefenderAPIService:
     def get_incident(self, incident_id):
         """Get a single incident by ID"""
         url = f'{self.base_url}/incidents/{incident_id}'
-        response = requests.get(
-            url,
-            headers={
-                'Authorization': f'Bearer {self.access_token}',
-                'Content-Type': 'application/json'
-            }
-        )
+        response = self._get(url)
         
         if not response.ok:
             raise Exception(f'Failed to fetch incident: {response.status_code}')
@@ -558,83 +554,43 @@ class DefenderAPIService:
         incident = response.json()
         return self.transform_incident(incident)
     
+    def get_raw_incident_alerts(self, incident_id):
+        """
+        Return (incident, alerts) for an incident.
+        
+        Alerts are expanded inline on the incident request; if the tenant does
+        not return them that way, alerts_v2 is queried by incidentId with paging.
+        """
+        incident_url = f'{self.base_url}/incidents/{incident_id}'
+        incident_response = self._get(incident_url, params={'$expand': 'alerts'})
+        if not incident_response.ok:
+            print(f'[SENTINEL] Failed to fetch incident: {incident_response.status_code}')
+            raise Exception('Failed to fetch incident')
+        
+        incident = incident_response.json()
+        alerts = incident.get('alerts') or []
+        if alerts:
+            return incident, alerts
+        
+        list_url = f'{self.base_url}/alerts_v2'
+        params = {'$filter': f"incidentId eq '{incident_id}'", '$top': 100}
+        try:
+            for page in self.iter_pages(list_url, params=params):
+                alerts.extend(page)
+        except Exception as e:
+            print(f'[SENTINEL] alerts_v2 lookup failed for incident {incident_id}: {e}')
+        return incident, alerts
+    
     def get_incident_alerts(self, incident_id):
         """Get alerts for a specific incident"""
         try:
             print(f'[SENTINEL] Fetching alerts for incident ID: {incident_id}')
-            incident_url = f'{self.base_url}/incidents/{incident_id}'
-            incident_response = requests.get(
-                incident_url,
-                headers={
-                    'Authorization': f'Bearer {self.access_token}',
-                    'Content-Type': 'application/json'
-                }
-            )
-            
-            if not incident_response.ok:
-                print(f'[SENTINEL] Failed to fetch incident: {incident_response.status_code}')
-                raise Exception('Failed to fetch incident')
-            
-            incident = incident_response.json()
-            print(f'[SENTINEL] Incident fetched successfully')
-            
-            # Try to fetch alerts with different filter attempts
-            alerts = []
-            filter_attempts = [
-                f"incidentId eq '{incident_id}'",
-                f"incidentId eq {incident_id}"
-            ]
-            
-            for filter_str in filter_attempts:
-                list_url = f'https://graph.microsoft.com/v1.0/security/alerts_v2?$filter={quote(filter_str)}&$top=100'
-                print(f'[SENTINEL] Trying filter: {filter_str}')
-                
-                try:
-                    list_response = requests.get(
-                        list_url,
-                        headers={
-                            'Authorization': f'Bearer {self.access_token}',
-                            'Content-Type': 'application/json'
-                        }
-                    )
-                    
-                    if list_response.ok:
-                        list_data = list_response.json()
-                        alerts = list_data.get('value', [])
-                        print(f'[SENTINEL] Found {len(alerts)} alerts with filter')
-                        if alerts:
-                            break
-                except Exception as e:
-                    print(f'[SENTINEL] Filter attempt failed: {e}')
-                    continue
-            
-            # If no alerts found, try fetching all recent alerts and filter
-            if not alerts:
-                print('[SENTINEL] No alerts found with filters, fetching all recent alerts...')
-                all_alerts_url = 'https://graph.microsoft.com/v1.0/security/alerts_v2?$top=200&$orderby=createdDateTime desc'
-                all_alerts_response = requests.get(
-                    all_alerts_url,
-                    headers={
-                        'Authorization': f'Bearer {self.access_token}',
-                        'Content-Type': 'application/json'
-                    }
-                )
-                
-                if all_alerts_response.ok:
-                    all_alerts_data = all_alerts_response.json()
-                    all_alerts = all_alerts_data.get('value', [])
-                    print(f'[SENTINEL] Fetched {len(all_alerts)} total alerts')
-                    alerts = [
-                        alert for alert in all_alerts
-                        if str(alert.get('incidentId')) == str(incident_id)
-                    ]
-                    print(f'[SENTINEL] Filtered to {len(alerts)} alerts for incident {incident_id}')
+            incident, alerts = self.get_raw_incident_alerts(incident_id)
+            print(f'[SENTINEL] Found {len(alerts)} alerts for incident {incident_id}')
             
             if alerts:
                 transformed = self.transform_alerts_to_detailed_format(alerts, incident)
                 print(f'[SENTINEL] Transformed {len(transformed)} alerts')
-                if transformed:
-                    print(f'[SENTINEL] Sample alert: {transformed[0]}')
                 return transformed
             
             print('[SENTINEL] No alerts found for this incident')
@@ -893,13 +849,7 @@ class DefenderAPIService:
         """Test connection to Microsoft Defender API"""
         try:
             url = f'{self.base_url}/incidents?$top=1'
-            response = requests.get(
-                url,
-                headers={
-                    'Authorization': f'Bearer {self.access_token}',
-                    'Content-Type': 'application/json'
-                }
-            )
+            response = self._get(url)
             
             if not response.ok:
                 raise Exception('Connection test failed')
@@ -1513,6 +1463,40 @@ def save_sentinel_incident(request):
         }, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def sync_sentinel_incidents(request):
+    """Pull incidents changed since the tenant's last sync and upsert them into IntegrationDataList"""
+    try:
+        if not request.session.get('isSentinelConnected'):
+            return JsonResponse({'success': False, 'error': 'Not connected to Microsoft Defender'}, status=401)
+        
+        try:
+            data = json.loads(request.body) if request.body else {}
+        except json.JSONDecodeError:
+            return JsonResponse({'success': False, 'error': 'Invalid JSON data'}, status=400)
+        
+        username = None
+        user_id = data.get('user_id')
+        if user_id:
+            user = Users.objects.filter(UserId=user_id).first()
+            username = user.UserName if user else None
+        if not username:
+            user_info = request.session.get('userInfo') or {}
+            username = user_info.get('displayName') or user_info.get('userPrincipalName')
+        
+        from .incident_ingestion import ingest_incidents
+        
+        access_token = get_user_access_token(request)
+        stats = ingest_incidents(access_token, username=username, full=bool(data.get('full', False)))
+        print(f"[SENTINEL] Incident sync: {stats['fetched']} fetched, {stats['created']} created, {stats['updated']} updated")
+        
+        return JsonResponse({'success': True, 'sync': stats})
+    except Exception as error:
+        print(f'[SENTINEL] Error in sync_sentinel_incidents: {error}')
+        return JsonResponse({'success': False, 'error': str(error)}, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_saved_incidents(request):
@@ -11,6 +11,7 @@ import logging
 import urllib.parse as up
 
 from grc.models import Users, ExternalApplication, ExternalApplicationConnection, ExternalApplicationSyncLog
+from grc.routes.Global.http_client import get_client
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +27,7 @@ class JiraIntegration:
         """Get accessible Jira resources from Atlassian API"""
         try:
             url = "https://api.atlassian.com/oauth/token/accessible-resources"
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = get_client('jira').get(url, headers=self.headers, timeout=30)
             
             if response.status_code == 200:
                 return {
@@ -48,7 +49,7 @@ class JiraIntegration:
         """Get current user information from Jira"""
         try:
             url = f"https://api.atlassian.com/ex/jira/{cloud_id}/rest/api/3/myself"
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = get_client('jira').get(url, headers=self.headers, timeout=30)
             
             if response.status_code == 200:
                 return {
@@ -70,7 +71,7 @@ class JiraIntegration:
         """Get all projects from Jira"""
         try:
             url = f"https://api.atlassian.com/ex/jira/{cloud_id}/rest/api/3/project"
-            response = requests.get(url, headers=self.headers, timeout=30)
+            response = get_client('jira').get(url, headers=self.headers, timeout=30)
             
             if response.status_code == 200:
                 return {
@@ -93,7 +94,7 @@ class JiraIntegration:
         try:
             # Get basic project info
             project_url = f"https://api.atlassian.com/ex/jira/{cloud_id}/rest/api/3/project/{project_id}"
-            project_response = requests.get(project_url, headers=self.headers, timeout=30)
+            project_response = get_client('jira').get(project_url, headers=self.headers, timeout=30)
             
             if project_response.status_code != 200:
                 return {
@@ -107,7 +108,7 @@ class JiraIntegration:
             components_data = []
             try:
                 components_url = f"https://api.atlassian.com/ex/jira/{cloud_id}/rest/api/3/project/{project_id}/components"
-                components_response = requests.get(components_url, headers=self.headers, timeout=30)
+                components_response = get_client('jira').get(components_url, headers=self.headers, timeout=30)
                 if components_response.status_code == 200:
                     components_data = components_response.json()
             except Exception as e:
@@ -117,7 +118,7 @@ class JiraIntegration:
             versions_data = []
             try:
                 versions_url = f"https://api.atlassian.com/ex/jira/{cloud_id}/rest/api/3/project/{project_id}/versions"
-                versions_response = requests.get(versions_url, headers=self.headers, timeout=30)
+                versions_response = get_client('jira').get(versions_url, headers=self.headers, timeout=30)
                 if versions_response.status_code == 200:
                     versions_data = versions_response.json()
             except Exception as e:
@@ -128,13 +129,13 @@ class JiraIntegration:
             try:
                 # Try with project ID first
                 issues_url = f"https://api.atlassian.com/ex/jira/{cloud_id}/rest/api/3/search?jql=project={project_id}&maxResults=50"
-                issues_response = requests.get(issues_url, headers=self.headers, timeout=30)
+                issues_response = get_client('jira').get(issues_url, headers=self.headers, timeout=30)
                 if issues_response.status_code == 200:
                     issues_data = issues_response.json()
                 else:
                     # Try with project key
                     issues_url = f"https://api.atlassian.com/ex/jira/{cloud_id}/rest/api/3/search?jql=project=\"{project_data.get('key', '')}\"&maxResults=50"
-                    issues_response = requests.get(issues_url, headers=self.headers, timeout=30)
+                    issues_response = get_client('jira').get(issues_url, headers=self.headers, timeout=30)
                     if issues_response.status_code == 200:
                         issues_data = issues_response.json()
             except Exception as e:
@@ -361,7 +362,7 @@ def jira_oauth_callback(request):
                 }
                 
                 logger.info("Exchanging code for token with Atlassian")
-                token_response = requests.post(token_url, data=token_data, headers=token_headers, timeout=30)
+                token_response = get_client('jira').post(token_url, data=token_data, headers=token_headers, timeout=30)
                 
                 if token_response.status_code != 200:
                     logger.error(f"Token exchange failed: {token_response.status_code} {token_response.text}")
@@ -820,12 +820,22 @@ class JiraBackendManager:
             if project_id:
                 queryset = queryset.filter(project_id=project_id)
             
+            project_lists = list(queryset.select_related('assigned_by').order_by('-created_at'))
+            member_ids = set()
+            for assignment in project_lists:
+                member_ids |= assignment.member_ids()
+            users_by_id = {
+                user.UserId: user for user in Users.objects.filter(UserId__in=member_ids)
+            } if member_ids else {}
+            
             assignments = []
-            for assignment in queryset.order_by('-created_at'):
-                assigned_users = assignment.get_assigned_users()
+            for assignment in project_lists:
                 assigned_users_details = []
                 
-                for user in assigned_users:
+                for member_id in sorted(assignment.member_ids()):
+                    user = users_by_id.get(member_id)
+                    if user is None:
+                        continue
                     assigned_users_details.append({
                         'id': user.UserId,
                         'username': user.UserName,
@@ -5,7 +5,10 @@ Handles user-specific project assignments and streamlined project views
 import json
 import logging
 from django.utils import timezone
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Count, Q
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
@@ -14,13 +17,35 @@ from django.views.decorators.http import require_http_methods
 from ...models import (
     Users,
     UsersProjectList,
-    IntegrationDataList
+    IntegrationDataList,
+    project_summary_scope
 )
 from ...authentication import get_user_from_jwt
+from ..Global.conditional_responses import versions
 
 logger = logging.getLogger(__name__)
 
 
+PROJECT_SUMMARY_CACHE_SECONDS = getattr(settings, 'STREAMLINE_PROJECT_SUMMARY_CACHE_SECONDS', 300)
+USER_DETAIL_FIELDS = ('UserId', 'UserName', 'Email', 'FirstName', 'LastName')
+
+
+def project_summary_cache_key(user_id):
+    # Keyed on the user's change counter, which the UsersProjectList signal
+    # handlers in grc.models bump, so every worker process sees the change
+    scope = project_summary_scope(user_id)
+    return f"streamline:project_summary:{user_id}:{versions([scope])[scope]}"
+
+
+def serialize_user(user):
+    return {
+        'id': user.UserId,
+        'username': user.UserName,
+        'email': user.Email,
+        'full_name': user.get_full_name()
+    }
+
+
 class StreamlineManager:
     """
     Manager class for handling streamlined project views
@@ -28,6 +53,64 @@ class StreamlineManager:
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+
+    def _get_active_user(self, user_id):
+        """
+        Returns (user_id, user, error) with user_id converted to an integer
+        """
+        try:
+            user_id = int(user_id)
+        except (ValueError, TypeError):
+            return None, None, f'Invalid user_id format: {user_id}'
+        try:
+            user = Users.objects.only(*USER_DETAIL_FIELDS).get(UserId=user_id, IsActive='Y')
+        except Users.DoesNotExist:
+            return user_id, None, f'User with ID {user_id} not found or inactive'
+        return user_id, user, None
+
+    def _assignments_for_user(self, user_id):
+        """Active project assignments of a user via the membership index"""
+        return UsersProjectList.objects.filter(
+            is_active=True,
+            memberships__user_id=user_id
+        ).select_related('assigned_by')
+
+    def _resolve_assigned_users(self, assignments):
+        """One Users query for the members of all the given assignments"""
+        user_ids = set()
+        for assignment in assignments:
+            user_ids |= assignment.member_ids()
+        if not user_ids:
+            return {}
+        return {
+            user.UserId: user
+            for user in Users.objects.filter(UserId__in=user_ids).only(*USER_DETAIL_FIELDS)
+        }
+
+    def _serialize_assignment(self, assignment, users_by_id):
+        assigned_users_details = [
+            serialize_user(users_by_id[member_id])
+            for member_id in sorted(assignment.member_ids())
+            if member_id in users_by_id
+        ]
+        return {
+            'id': assignment.id,
+            'project_id': assignment.project_id,
+            'project_name': assignment.project_name,
+            'project_key': assignment.project_key,
+            'project_details': assignment.project_details,
+            'assigned_users': assigned_users_details,
+            'assigned_users_count': assignment.get_assigned_users_count(),
+            'list_type': assignment.list_type,
+            'assigned_by': {
+                'id': assignment.assigned_by.UserId,
+                'username': assignment.assigned_by.UserName,
+                'full_name': assignment.assigned_by.get_full_name()
+            },
+            'created_at': assignment.created_at.isoformat(),
+            'updated_at': assignment.updated_at.isoformat(),
+            'is_current_user_assigned': True
+        }
     
     def get_user_assigned_projects(self, user_id):
         """
@@ -40,66 +123,21 @@ class StreamlineManager:
             dict: List of projects assigned to the user
         """
         try:
-            # Convert user_id to integer if it's a string
-            try:
-                user_id = int(user_id)
-            except (ValueError, TypeError):
+            user_id, user, error = self._get_active_user(user_id)
+            if error:
                 return {
                     'success': False,
-                    'error': f'Invalid user_id format: {user_id}'
+                    'error': error
                 }
             
-            # Get the user
-            try:
-                user = Users.objects.get(UserId=user_id, IsActive='Y')
-            except Users.DoesNotExist:
-                return {
-                    'success': False,
-                    'error': f'User with ID {user_id} not found or inactive'
-                }
+            # Membership index lookup instead of scanning users_list JSON
+            project_assignments = list(self._assignments_for_user(user_id).order_by('-created_at'))
+            users_by_id = self._resolve_assigned_users(project_assignments)
             
-            # Find all project assignments where the user is in the users_list
-            project_assignments = UsersProjectList.objects.filter(
-                is_active=True,
-                users_list__contains=[user_id]  # Check if user_id is in the JSON array
-            ).order_by('-created_at')
-            
-            projects = []
-            for assignment in project_assignments:
-                # Get assigned users details
-                assigned_users = assignment.get_assigned_users()
-                assigned_users_details = []
-                
-                for assigned_user in assigned_users:
-                    assigned_users_details.append({
-                        'id': assigned_user.UserId,
-                        'username': assigned_user.UserName,
-                        'email': assigned_user.Email,
-                        'full_name': assigned_user.get_full_name()
-                    })
-                
-                # Check if current user is assigned to this project
-                is_user_assigned = assignment.is_user_assigned(user_id)
-                
-                if is_user_assigned:
-                    projects.append({
-                        'id': assignment.id,
-                        'project_id': assignment.project_id,
-                        'project_name': assignment.project_name,
-                        'project_key': assignment.project_key,
-                        'project_details': assignment.project_details,
-                        'assigned_users': assigned_users_details,
-                        'assigned_users_count': assignment.get_assigned_users_count(),
-                        'list_type': assignment.list_type,
-                        'assigned_by': {
-                            'id': assignment.assigned_by.UserId,
-                            'username': assignment.assigned_by.UserName,
-                            'full_name': assignment.assigned_by.get_full_name()
-                        },
-                        'created_at': assignment.created_at.isoformat(),
-                        'updated_at': assignment.updated_at.isoformat(),
-                        'is_current_user_assigned': True
-                    })
+            projects = [
+                self._serialize_assignment(assignment, users_by_id)
+                for assignment in project_assignments
+            ]
             
             self.logger.info(f"Found {len(projects)} projects assigned to user {user_id}")
             
@@ -107,12 +145,7 @@ class StreamlineManager:
                 'success': True,
                 'projects': projects,
                 'count': len(projects),
-                'user_info': {
-                    'id': user.UserId,
-                    'username': user.UserName,
-                    'email': user.Email,
-                    'full_name': user.get_full_name()
-                }
+                'user_info': serialize_user(user)
             }
             
         except Exception as e:
@@ -134,67 +167,25 @@ class StreamlineManager:
             dict: Detailed project information
         """
         try:
-            # Convert user_id to integer if it's a string
-            try:
-                user_id = int(user_id)
-            except (ValueError, TypeError):
-                return {
-                    'success': False,
-                    'error': f'Invalid user_id format: {user_id}'
-                }
-            
-            # Get the user
-            try:
-                user = Users.objects.get(UserId=user_id, IsActive='Y')
-            except Users.DoesNotExist:
+            user_id, user, error = self._get_active_user(user_id)
+            if error:
                 return {
                     'success': False,
-                    'error': f'User with ID {user_id} not found or inactive'
+                    'error': error
                 }
             
             # Find the project assignment
             try:
-                assignment = UsersProjectList.objects.get(
-                    project_id=project_id,
-                    is_active=True,
-                    users_list__contains=[user_id]
-                )
-            except UsersProjectList.DoesNotExist:
+                assignment = self._assignments_for_user(user_id).get(project_id=project_id)
+            except (UsersProjectList.DoesNotExist, UsersProjectList.MultipleObjectsReturned):
                 return {
                     'success': False,
                     'error': f'Project {project_id} not found or user not assigned to it'
                 }
             
-            # Get assigned users details
-            assigned_users = assignment.get_assigned_users()
-            assigned_users_details = []
-            
-            for assigned_user in assigned_users:
-                assigned_users_details.append({
-                    'id': assigned_user.UserId,
-                    'username': assigned_user.UserName,
-                    'email': assigned_user.Email,
-                    'full_name': assigned_user.get_full_name()
-                })
-            
-            project_details = {
-                'id': assignment.id,
-                'project_id': assignment.project_id,
-                'project_name': assignment.project_name,
-                'project_key': assignment.project_key,
-                'project_details': assignment.project_details,
-                'assigned_users': assigned_users_details,
-                'assigned_users_count': assignment.get_assigned_users_count(),
-                'list_type': assignment.list_type,
-                'assigned_by': {
-                    'id': assignment.assigned_by.UserId,
-                    'username': assignment.assigned_by.UserName,
-                    'full_name': assignment.assigned_by.get_full_name()
-                },
-                'created_at': assignment.created_at.isoformat(),
-                'updated_at': assignment.updated_at.isoformat(),
-                'is_current_user_assigned': True
-            }
+            project_details = self._serialize_assignment(
+                assignment, self._resolve_assigned_users([assignment])
+            )
             
             self.logger.info(f"Retrieved project details for user {user_id}, project {project_id}")
             
@@ -209,6 +200,26 @@ class StreamlineManager:
                 'success': False,
                 'error': str(e)
             }
+
+    def _build_project_summary(self, user_id):
+        """Counts for get_user_project_statistics in a single aggregate query"""
+        thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
+        counts = self._assignments_for_user(user_id).aggregate(
+            total_projects=Count('id'),
+            single_user_projects=Count('id', filter=Q(list_type='single')),
+            multiple_user_projects=Count('id', filter=Q(list_type='multiple')),
+            recent_projects=Count('id', filter=Q(created_at__gte=thirty_days_ago)),
+        )
+        return {
+            'total_projects': counts['total_projects'],
+            'single_user_projects': counts['single_user_projects'],
+            'multiple_user_projects': counts['multiple_user_projects'],
+            'recent_projects': counts['recent_projects'],
+            'platforms': {
+                # All current projects are from Jira
+                'jira': counts['total_projects']
+            },
+        }
     
     def get_user_project_statistics(self, user_id):
         """
@@ -221,59 +232,22 @@ class StreamlineManager:
             dict: Project statistics for the user
         """
         try:
-            # Convert user_id to integer if it's a string
-            try:
-                user_id = int(user_id)
-            except (ValueError, TypeError):
+            user_id, user, error = self._get_active_user(user_id)
+            if error:
                 return {
                     'success': False,
-                    'error': f'Invalid user_id format: {user_id}'
+                    'error': error
                 }
             
-            # Get the user
-            try:
-                user = Users.objects.get(UserId=user_id, IsActive='Y')
-            except Users.DoesNotExist:
-                return {
-                    'success': False,
-                    'error': f'User with ID {user_id} not found or inactive'
-                }
+            cache_key = project_summary_cache_key(user_id)
+            summary = cache.get(cache_key)
+            if summary is None:
+                summary = self._build_project_summary(user_id)
+                cache.set(cache_key, summary, PROJECT_SUMMARY_CACHE_SECONDS)
             
-            # Get all project assignments for the user
-            project_assignments = UsersProjectList.objects.filter(
-                is_active=True,
-                users_list__contains=[user_id]
-            )
-            
-            # Calculate statistics
-            total_projects = project_assignments.count()
-            single_user_projects = project_assignments.filter(list_type='single').count()
-            multiple_user_projects = project_assignments.filter(list_type='multiple').count()
-            
-            # Get recent projects (last 30 days)
-            thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-            recent_projects = project_assignments.filter(created_at__gte=thirty_days_ago).count()
-            
-            # Get projects by platform (assuming all are Jira for now)
-            jira_projects = project_assignments.count()  # All current projects are from Jira
-            
-            statistics = {
-                'total_projects': total_projects,
-                'single_user_projects': single_user_projects,
-                'multiple_user_projects': multiple_user_projects,
-                'recent_projects': recent_projects,
-                'platforms': {
-                    'jira': jira_projects
-                },
-                'user_info': {
-                    'id': user.UserId,
-                    'username': user.UserName,
-                    'email': user.Email,
-                    'full_name': user.get_full_name()
-                }
-            }
+            statistics = dict(summary, user_info=serialize_user(user))
             
-            self.logger.info(f"Retrieved statistics for user {user_id}: {total_projects} total projects")
+            self.logger.info(f"Retrieved statistics for user {user_id}: {summary['total_projects']} total projects")
             
             return {
                 'success': True,
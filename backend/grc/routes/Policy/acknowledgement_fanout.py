@@ -0,0 +1,315 @@
+"""
+Fan-out for policy acknowledgement requests.
+
+create_acknowledgement_request used to create every manual-email user, every
+PolicyAcknowledgementUser row and every email/in-app notification one at a
+time inside the request. It now only does the bulk database work:
+
+- target users and manual emails are resolved with one query each, and
+  missing manual-email users are created with one bulk insert
+- acknowledgement rows are bulk inserted with their tokens generated up front
+
+Notifications are sent afterwards by a background fan-out. The request row is
+marked FanoutStatus='Pending' and a worker walks its acknowledgement rows in
+chunks of ACK_FANOUT_CHUNK. Each chunk goes through the email outbox
+(NotificationService.queue_emails) and through notification_store.add_many. The
+worker then stamps NotifiedAt and moves FanoutCursor/NotifiedCount forward. An
+interrupted fan-out resumes after the last completed chunk; one whose worker
+died is reclaimed after ACK_FANOUT_RUNNING_TIMEOUT seconds.
+
+The worker runs as a daemon thread in the web process (started by
+GrcConfig.ready when BACKGROUND_WORKERS_AUTOSTART is on, and woken when a
+request is created). Set
+ACK_FANOUT_IN_PROCESS_WORKER = False to run it standalone instead with
+`python manage.py process_acknowledgement_fanout`.
+"""
+
+import logging
+import os
+import secrets
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from grc.models import PolicyAcknowledgementRequest, PolicyAcknowledgementUser, Users
+
+logger = logging.getLogger(__name__)
+
+IN_PROCESS_WORKER = getattr(settings, 'ACK_FANOUT_IN_PROCESS_WORKER', True)
+CHUNK_SIZE = getattr(settings, 'ACK_FANOUT_CHUNK', 500)
+MAX_ATTEMPTS = getattr(settings, 'ACK_FANOUT_MAX_ATTEMPTS', 5)
+RUNNING_TIMEOUT_SECONDS = getattr(settings, 'ACK_FANOUT_RUNNING_TIMEOUT', 900)
+IDLE_POLL_SECONDS = getattr(settings, 'ACK_FANOUT_POLL_SECONDS', 10)
+BULK_BATCH_SIZE = 1000
+
+
+# -- request-time bulk work ---------------------------------------------------
+
+def resolve_manual_users(emails):
+    """
+    {email: Users} for manual emails, creating minimal active users for the
+    ones that do not exist yet. One lookup query plus one bulk insert.
+    """
+    found = {}
+    for manual_user in Users.objects.filter(Email__in=emails, IsActive='Y').order_by('UserId'):
+        found.setdefault(manual_user.Email, manual_user)
+
+    missing = [email for email in emails if email not in found]
+    if missing:
+        Users.objects.bulk_create([
+            Users(
+                UserName=email.split('@')[0],  # Use email prefix as username
+                Email=email,
+                FirstName=email.split('@')[0],
+                LastName='',
+                Password='',  # No password for external users
+                IsActive='Y',
+                DepartmentId='0',  # Default to '0' for manual email users
+            )
+            for email in missing
+        ], batch_size=BULK_BATCH_SIZE)
+        # MySQL does not return ids from bulk_create
+        for manual_user in Users.objects.filter(Email__in=missing, IsActive='Y').order_by('UserId'):
+            found.setdefault(manual_user.Email, manual_user)
+    return found
+
+
+def create_user_acknowledgements(ack_request, user_ids):
+    """Bulk insert one Pending acknowledgement row per user, each with its own token"""
+    PolicyAcknowledgementUser.objects.bulk_create([
+        PolicyAcknowledgementUser(
+            AcknowledgementRequest=ack_request,
+            UserId_id=user_id,
+            # Unique token for external access
+            Token=secrets.token_urlsafe(32),
+        )
+        for user_id in user_ids
+    ], batch_size=BULK_BATCH_SIZE)
+    return len(user_ids)
+
+
+def schedule_fanout(ack_request, send_email=True, send_notifications=True, manual_emails=None):
+    """Mark a request for background notification and wake the worker once committed"""
+    if not send_email and not send_notifications and not manual_emails:
+        return
+    ack_request.FanoutStatus = 'Pending'
+    ack_request.FanoutOptions = {
+        'send_email': bool(send_email),
+        'send_notifications': bool(send_notifications),
+        # Manual-email recipients are always emailed
+        'manual_emails': sorted(manual_emails or []),
+        'frontend_url': os.getenv('FRONTEND_URL', 'http://localhost:8080'),
+    }
+    ack_request.save(update_fields=['FanoutStatus', 'FanoutOptions', 'UpdatedAt'])
+    transaction.on_commit(wake_fanout_worker)
+
+
+def fanout_progress(ack_request):
+    """Progress of a request's fan-out for API responses"""
+    return {
+        'status': ack_request.FanoutStatus,
+        'notified': ack_request.NotifiedCount,
+        'failed': ack_request.NotificationFailedCount,
+        'total': ack_request.TotalUsers,
+        'attempts': ack_request.FanoutAttempts,
+        'error': ack_request.FanoutError,
+        'completed_at': ack_request.FanoutCompletedAt.isoformat() if ack_request.FanoutCompletedAt else None,
+    }
+
+
+# -- background fan-out -------------------------------------------------------
+
+def claim_request(exclude=()):
+    """Lock the oldest pending (or abandoned running) fan-out for this worker"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=RUNNING_TIMEOUT_SECONDS)
+    with transaction.atomic():
+        ack_request = (
+            PolicyAcknowledgementRequest.objects.select_for_update(skip_locked=True)
+            .filter(Q(FanoutStatus='Pending') | Q(FanoutStatus='Running', FanoutLockedAt__lt=stale))
+            .exclude(AcknowledgementRequestId__in=list(exclude))
+            .select_related('PolicyId')
+            .order_by('AcknowledgementRequestId')
+            .first()
+        )
+        if ack_request is None:
+            return None
+        PolicyAcknowledgementRequest.objects.filter(pk=ack_request.pk).update(
+            FanoutStatus='Running', FanoutLockedAt=now, FanoutAttempts=F('FanoutAttempts') + 1
+        )
+    ack_request.FanoutStatus = 'Running'
+    ack_request.FanoutAttempts += 1
+    return ack_request
+
+
+def _email_message(ack_request, user_ack, frontend_url):
+    target_user = user_ack.UserId
+    # External acknowledgement link with token
+    acknowledgement_link = f"{frontend_url}/acknowledge-policy/{user_ack.Token}"
+    policy = ack_request.PolicyId
+    return {
+        'to': target_user.Email,
+        'email_type': 'gmail',
+        'notification_type': 'policyAcknowledgementRequired',
+        'template_data': [
+            target_user.UserName or target_user.Email,
+            policy.PolicyName,
+            ack_request.PolicyVersion,
+            ack_request.Title,
+            ack_request.Description or 'Please review and acknowledge this policy.',
+            str(ack_request.DueDate) if ack_request.DueDate else 'No due date',
+            acknowledgement_link,
+        ],
+        'link': acknowledgement_link,
+    }
+
+
+def _in_app_notification(ack_request, user_ack):
+    return {
+        'id': str(uuid.uuid4()),
+        'title': 'Acknowledgement Request Created',
+        'message': f'Acknowledgement request created for "{ack_request.PolicyId.PolicyName}". {ack_request.TotalUsers} users assigned.',
+        'category': 'policy',
+        'priority': 'high',
+        'user_id': str(user_ack.UserId_id),
+    }
+
+
+def _deliver_chunk(ack_request, user_acks, service, options):
+    """Queue one chunk's emails and in-app notifications; returns (notified, failed)"""
+    manual_emails = set(options.get('manual_emails') or [])
+    messages = []
+    for user_ack in user_acks:
+        email = user_ack.UserId.Email
+        if email and (options.get('send_email') or email in manual_emails):
+            messages.append(_email_message(ack_request, user_ack, options.get('frontend_url')))
+
+    failed = 0
+    if messages:
+        results = service.queue_emails(messages)
+        failed = sum(1 for result in results if not (result or {}).get('success'))
+    if options.get('send_notifications'):
+        from ..Global import notification_store
+        notification_store.add_many([_in_app_notification(ack_request, user_ack) for user_ack in user_acks])
+    return len(user_acks) - failed, failed
+
+
+def run_fanout(ack_request, service, chunk_size=None):
+    """Notify the request's users from FanoutCursor onwards, one chunk at a time"""
+    chunk_size = chunk_size or CHUNK_SIZE
+    options = ack_request.FanoutOptions or {}
+    cursor = ack_request.FanoutCursor
+    try:
+        while True:
+            user_acks = list(
+                PolicyAcknowledgementUser.objects.filter(
+                    AcknowledgementRequest=ack_request, AcknowledgementUserId__gt=cursor
+                ).select_related('UserId').order_by('AcknowledgementUserId')[:chunk_size]
+            )
+            if not user_acks:
+                break
+            notified, failed = _deliver_chunk(ack_request, user_acks, service, options)
+            cursor = user_acks[-1].AcknowledgementUserId
+            now = timezone.now()
+            with transaction.atomic():
+                PolicyAcknowledgementUser.objects.filter(
+                    AcknowledgementUserId__in=[user_ack.AcknowledgementUserId for user_ack in user_acks]
+                ).update(NotifiedAt=now)
+                PolicyAcknowledgementRequest.objects.filter(pk=ack_request.pk).update(
+                    FanoutCursor=cursor,
+                    FanoutLockedAt=now,
+                    NotifiedCount=F('NotifiedCount') + notified,
+                    NotificationFailedCount=F('NotificationFailedCount') + failed,
+                )
+    except Exception as e:
+        status = 'Failed' if ack_request.FanoutAttempts >= MAX_ATTEMPTS else 'Pending'
+        PolicyAcknowledgementRequest.objects.filter(pk=ack_request.pk).update(
+            FanoutStatus=status, FanoutLockedAt=None, FanoutError=str(e)
+        )
+        logger.error(f"Acknowledgement fan-out {ack_request.pk} failed (attempt {ack_request.FanoutAttempts}): {str(e)}")
+        return False
+
+    PolicyAcknowledgementRequest.objects.filter(pk=ack_request.pk).update(
+        FanoutStatus='Completed',
+        FanoutLockedAt=None,
+        FanoutError=None,
+        FanoutCompletedAt=timezone.now(),
+        EmailNotificationSent=bool(options.get('send_email') or options.get('manual_emails')),
+    )
+    return True
+
+
+def process_pending(max_requests=None, service=None):
+    """Run claimable fan-outs until none are left (or max_requests)"""
+    if service is None:
+        from ..Global.notification_service import NotificationService
+        service = NotificationService()
+    stats = {'completed': 0, 'failed': 0}
+    # Failed fan-outs are retried on the next pass, not straight away
+    failed_ids = []
+    while max_requests is None or stats['completed'] + stats['failed'] < max_requests:
+        ack_request = claim_request(exclude=failed_ids)
+        if ack_request is None:
+            break
+        if run_fanout(ack_request, service):
+            stats['completed'] += 1
+        else:
+            stats['failed'] += 1
+            failed_ids.append(ack_request.pk)
+    return stats
+
+
+class _FanoutWorker:
+    """Per-process daemon thread that runs pending fan-outs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def wake(self):
+        self._wake.set()
+        self.ensure_started()
+
+    def ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='acknowledgement-fanout', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        from ..Global.notification_service import NotificationService
+        service = NotificationService()
+        while True:
+            self._wake.clear()
+            try:
+                close_old_connections()
+                stats = process_pending(service=service)
+                if any(stats.values()):
+                    logger.info(f"Acknowledgement fan-out: {stats}")
+            except Exception as e:
+                logger.error(f"Acknowledgement fan-out worker error: {str(e)}")
+            finally:
+                close_old_connections()
+            self._wake.wait(IDLE_POLL_SECONDS)
+
+
+_worker = _FanoutWorker()
+
+
+def start_fanout_worker():
+    if IN_PROCESS_WORKER:
+        _worker.ensure_started()
+
+
+def wake_fanout_worker():
+    if IN_PROCESS_WORKER:
+        _worker.wake()
@@ -7,6 +7,8 @@ from rest_framework.response import Response
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 from rest_framework.parsers import MultiPartParser, FormParser
 from ...models import Framework, Policy, SubPolicy, FrameworkVersion, PolicyVersion, PolicyApproval, Users, FrameworkApproval, ExportTask, PolicyCategory, Entity, LastChecklistItemVerified
+from ...models import RBAC
+from ...routes.Global.conditional_responses import conditional_on
 from ...serializers import FrameworkSerializer, PolicySerializer, SubPolicySerializer, PolicyApprovalSerializer, UserSerializer, EntitySerializer   
 from django.db import transaction, models
 from django.db.transaction import TransactionManagementError
@@ -228,6 +230,7 @@ Example payload:
 
 @api_view(['GET', 'POST'])
 @permission_classes([PolicyViewPermission, PolicyFrameworkPermission])  # RBAC: Require PolicyViewPermission for viewing frameworks, PolicyFrameworkPermission for creating frameworks
+@conditional_on(Framework, FrameworkApproval, RBAC)  # GET only; POST creates a framework
 def framework_list(request):
     """
     Secure framework list endpoint with SQL injection protection and proper connection management.
@@ -8164,7 +8167,7 @@ def create_tailored_framework(request):
             
             # Send in-app notifications for tailored framework
             try:
-                from ...routes.Global.notifications import notifications_storage
+                from ...routes.Global.notifications import store_notification
                 import uuid
                 from datetime import datetime as dt
                 
@@ -8180,9 +8183,7 @@ def create_tailored_framework(request):
                         'status': {'isRead': False, 'readAt': None},
                         'user_id': str(user_id)
                     }
-                    notifications_storage.append(creator_notification)
-                    if len(notifications_storage) > 100:
-                        notifications_storage.pop(0)
+                    store_notification(creator_notification)
                     print(f"In-app notification created for creator: {creator_notification['id']}")
                 
                 # Reviewer in-app notification
@@ -8197,9 +8198,7 @@ def create_tailored_framework(request):
                         'status': {'isRead': False, 'readAt': None},
                         'user_id': str(reviewer_id)
                     }
-                    notifications_storage.append(reviewer_notification)
-                    if len(notifications_storage) > 100:
-                        notifications_storage.pop(0)
+                    store_notification(reviewer_notification)
                     print(f"In-app notification created for reviewer: {reviewer_notification['id']}")
             except Exception as in_app_error:
                 print(f"Error creating in-app notifications for tailored framework: {str(in_app_error)}")
@@ -8627,7 +8626,7 @@ def create_tailored_policy(request):
             
             # Send in-app notifications for tailored policy
             try:
-                from ...routes.Global.notifications import notifications_storage
+                from ...routes.Global.notifications import store_notification
                 import uuid
                 from datetime import datetime as dt
                 
@@ -8643,9 +8642,7 @@ def create_tailored_policy(request):
                         'status': {'isRead': False, 'readAt': None},
                         'user_id': str(user_id)
                     }
-                    notifications_storage.append(creator_notification)
-                    if len(notifications_storage) > 100:
-                        notifications_storage.pop(0)
+                    store_notification(creator_notification)
                     print(f"In-app notification created for creator: {creator_notification['id']}")
                 
                 # Reviewer in-app notification
@@ -8660,9 +8657,7 @@ def create_tailored_policy(request):
                         'status': {'isRead': False, 'readAt': None},
                         'user_id': str(reviewer_id)
                     }
-                    notifications_storage.append(reviewer_notification)
-                    if len(notifications_storage) > 100:
-                        notifications_storage.pop(0)
+                    store_notification(reviewer_notification)
                     print(f"In-app notification created for reviewer: {reviewer_notification['id']}")
             except Exception as in_app_error:
                 print(f"Error creating in-app notifications for tailored policy: {str(in_app_error)}")
@@ -10508,10 +10503,11 @@ def get_policy_extraction_progress(request, task_id):
         
         if not progress_data:
             # If no specific progress is available, check general processing status
-            from grc.routes.UploadFramework.upload_framework import processing_status
+            from grc.routes.UploadFramework.task_progress import get_progress as get_task_progress
             
-            if task_id in processing_status:
-                return JsonResponse(processing_status[task_id])
+            task_status = get_task_progress(task_id)
+            if task_status:
+                return JsonResponse(task_status)
             else:
                 # Provide a default response if no data is available
                 return JsonResponse({
@@ -8,18 +8,17 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.db.models import Q, Count
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
-from datetime import datetime, date
-import secrets
-import os
+from datetime import datetime
 
 from ...models import (
     Policy, PolicyAcknowledgementRequest, PolicyAcknowledgementUser,
     Users, GRCLog
 )
 from ..Global.logging_service import send_log
+from . import acknowledgement_fanout
 
 
 def get_client_ip(request):
@@ -37,35 +36,19 @@ def mark_acknowledgement_notification_as_read(user_id, policy_name, acknowledgem
     Mark acknowledgement notification as read when policy is acknowledged
     """
     try:
-        from ...routes.Global.notifications import notifications_storage
-        from datetime import datetime
-        
-        # Find and mark matching acknowledgement notifications as read
-        marked_count = 0
-        for notification in notifications_storage:
-            if (notification.get('user_id') == str(user_id) and 
-                not notification['status'].get('isRead', False)):
-                
-                # Check if this is an acknowledgement notification for this policy
-                title = notification.get('title', '')
-                message = notification.get('message', '')
-                
-                is_acknowledgement = (
-                    'Acknowledgement Request' in title or 
-                    'Policy Acknowledgement' in title
-                )
-                
-                # Match by policy name in message or title
-                matches_policy = (
-                    policy_name.lower() in message.lower() or
-                    policy_name.lower() in title.lower()
-                )
-                
-                if is_acknowledgement and matches_policy:
-                    notification['status']['isRead'] = True
-                    notification['status']['readAt'] = datetime.now().isoformat()
-                    marked_count += 1
-                    print(f"✅ Marked notification {notification.get('id')} as read for policy '{policy_name}'")
+        from django.db.models import Q
+        from ...routes.Global import notification_store
+        
+        # Acknowledgement notifications that mention this policy, matched in the
+        # database against the user's unread rows only
+        marked_count = notification_store.mark_read(
+            user_id=user_id,
+            where=notification_store.acknowledgement_q() & (
+                Q(message__icontains=policy_name) | Q(title__icontains=policy_name)
+            )
+        )
+        if marked_count:
+            print(f"✅ Marked {marked_count} notification(s) as read for policy '{policy_name}'")
         
         return marked_count
     except Exception as e:
@@ -168,58 +151,13 @@ def create_acknowledgement_request(request):
         
         # Validate all target users exist (if provided)
         if target_user_ids:
-            valid_users = Users.objects.filter(UserId__in=target_user_ids, IsActive='Y')
-            if valid_users.count() != len(target_user_ids):
+            target_user_ids = list(dict.fromkeys(int(target_user_id) for target_user_id in target_user_ids))
+            active_count = Users.objects.filter(UserId__in=target_user_ids, IsActive='Y').count()
+            if active_count != len(target_user_ids):
                 return Response({
                     'error': 'Some target users do not exist or are inactive'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Handle manual emails: find or create users for each email
-        manual_users = []
-        if manual_emails:
-            # Get a default framework (use the policy's framework or first available)
-            default_framework = policy.FrameworkId
-            if not default_framework:
-                from ...models import Framework
-                default_framework = Framework.objects.first()
-                if not default_framework:
-                    return Response({
-                        'error': 'No framework available. Cannot create user for manual email.'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-            
-            for manual_email in manual_emails:
-                # Check if we already have this user in manual_users (avoid duplicates)
-                existing_manual_user = next((mu for mu in manual_users if mu.Email == manual_email), None)
-                if existing_manual_user:
-                    print(f"User for email {manual_email} already processed (UserId: {existing_manual_user.UserId})")
-                    continue
-                
-                # Try to find existing user by email
-                try:
-                    manual_user = Users.objects.get(Email=manual_email, IsActive='Y')
-                    manual_users.append(manual_user)
-                    print(f"Found existing user for manual email: {manual_email} (UserId: {manual_user.UserId})")
-                except Users.DoesNotExist:
-                    # User doesn't exist, create a minimal user record
-                    try:
-                        manual_user = Users.objects.create(
-                            UserName=manual_email.split('@')[0],  # Use email prefix as username
-                            Email=manual_email,
-                            FirstName=manual_email.split('@')[0],
-                            LastName='',
-                            Password='',  # No password for external users
-                            IsActive='Y',
-                            DepartmentId='0',  # Default to '0' for manual email users
-                            FrameworkId=default_framework
-                        )
-                        manual_users.append(manual_user)
-                        print(f"Created user record for manual email: {manual_email} (UserId: {manual_user.UserId})")
-                    except Exception as e:
-                        print(f"Error creating user for email {manual_email}: {str(e)}")
-                        return Response({
-                            'error': f'Error creating user for email {manual_email}: {str(e)}'
-                        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
         # Parse due date if provided
         due_date = None
         if data.get('due_date'):
@@ -232,58 +170,44 @@ def create_acknowledgement_request(request):
                     'error': f'Invalid due_date format. Use YYYY-MM-DD. Error: {str(e)}'
                 }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Calculate total users (database users + manual email users if provided)
-        # Filter out any manual user IDs that are already in target_user_ids to avoid duplicates
-        manual_user_ids = [mu.UserId for mu in manual_users if mu.UserId not in target_user_ids]
-        total_users = len(target_user_ids) + len(manual_user_ids)
-        
-        # Create acknowledgement request
-        ack_request = PolicyAcknowledgementRequest.objects.create(
-            PolicyId=policy,
-            PolicyVersion=policy_version,
-            Title=data.get('title', f'Acknowledge {policy.PolicyName}'),
-            Description=data.get('description', ''),
-            DueDate=due_date,
-            TargetUserIds=target_user_ids + manual_user_ids,
-            TargetGroups=data.get('target_groups', []),
-            TotalUsers=total_users,
-            CreatedBy=user,
-            FrameworkId=policy.FrameworkId
-        )
-        
-        # Create individual user acknowledgement records with unique tokens
-        user_acks = []
-        
-        # Add database users
-        for target_user_id in target_user_ids:
-            target_user = Users.objects.get(UserId=target_user_id)
+        with transaction.atomic():
+            # Find or create users for manual emails in bulk
+            manual_users = acknowledgement_fanout.resolve_manual_users(manual_emails) if manual_emails else {}
             
-            # Generate unique token for external access
-            unique_token = secrets.token_urlsafe(32)
+            # Filter out any manual user IDs that are already in target_user_ids to avoid duplicates
+            target_id_set = set(target_user_ids)
+            manual_user_ids = list(dict.fromkeys(
+                manual_user.UserId for manual_user in manual_users.values()
+                if manual_user.UserId not in target_id_set
+            ))
+            all_user_ids = target_user_ids + manual_user_ids
             
-            user_ack = PolicyAcknowledgementUser.objects.create(
-                AcknowledgementRequest=ack_request,
-                UserId=target_user,
-                Token=unique_token
+            # Create acknowledgement request
+            ack_request = PolicyAcknowledgementRequest.objects.create(
+                PolicyId=policy,
+                PolicyVersion=policy_version,
+                Title=data.get('title', f'Acknowledge {policy.PolicyName}'),
+                Description=data.get('description', ''),
+                DueDate=due_date,
+                TargetUserIds=all_user_ids,
+                TargetGroups=data.get('target_groups', []),
+                TotalUsers=len(all_user_ids),
+                PendingCount=len(all_user_ids),
+                CreatedBy=user,
+                FrameworkId=policy.FrameworkId
+            )
+            
+            # Individual user acknowledgement records with unique tokens, in one insert
+            acknowledgement_fanout.create_user_acknowledgements(ack_request, all_user_ids)
+            
+            # Emails and in-app notifications are sent by the background fan-out
+            # (Requirement 3: Notify Users)
+            acknowledgement_fanout.schedule_fanout(
+                ack_request,
+                send_email=data.get('send_email', True),
+                send_notifications=data.get('send_notifications', True),
+                manual_emails=manual_emails
             )
-            user_acks.append(user_ack)
-        
-        # Add manual email users if provided (only those not already in target_user_ids)
-        for manual_user in manual_users:
-            if manual_user.UserId not in target_user_ids:
-                # Generate unique token for external access
-                unique_token = secrets.token_urlsafe(32)
-                
-                user_ack = PolicyAcknowledgementUser.objects.create(
-                    AcknowledgementRequest=ack_request,
-                    UserId=manual_user,
-                    Token=unique_token
-                )
-                user_acks.append(user_ack)
-        
-        # Update counts
-        ack_request.PendingCount = len(user_acks)
-        ack_request.save()
         
         # Log the action (Requirement 8: Audit Log)
         send_log(
@@ -304,99 +228,13 @@ def create_acknowledgement_request(request):
             }
         )
         
-        # Send notifications to assigned users (Requirement 3: Notify Users)
-        send_notifications = data.get('send_notifications', True)
-        send_email = data.get('send_email', True)
-        
-        if send_notifications or send_email:
-            try:
-                from ...routes.Global.notification_service import NotificationService
-                notification_service = NotificationService()
-                
-                # Get frontend URL from environment variable or use default
-                frontend_url = os.getenv('FRONTEND_URL', 'http://localhost:8080')
-                
-                # Send notification to each assigned user
-                for user_ack in user_acks:
-                    try:
-                        target_user = user_ack.UserId
-                        
-                        # Construct external acknowledgement link with token
-                        acknowledgement_link = f"{frontend_url}/acknowledge-policy/{user_ack.Token}"
-                        
-                        # Send email notification if requested
-                        # For manual emails, always send email; for database users, check send_email flag
-                        should_send_email = send_email and target_user.Email
-                        is_manual_email = target_user.Email in manual_emails if manual_emails else False
-                        
-                        if should_send_email or is_manual_email:
-                            # Prepare email notification data with external link
-                            email_notification_data = {
-                                'notification_type': 'policyAcknowledgementRequired',
-                                'email': target_user.Email,
-                                'email_type': 'gmail',
-                                'template_data': [
-                                    target_user.UserName or target_user.Email,
-                                    policy.PolicyName,
-                                    policy_version,
-                                    ack_request.Title,
-                                    ack_request.Description or 'Please review and acknowledge this policy.',
-                                    str(due_date) if due_date else 'No due date',
-                                    acknowledgement_link  # External acknowledgement link with token
-                                ]
-                            }
-                            
-                            # Send notification via email
-                            email_result = notification_service.send_multi_channel_notification(email_notification_data)
-                            print(f"Email notification sent to user {target_user.UserId}: {email_result}")
-                        
-                        # Send in-app notification if requested
-                        if send_notifications:
-                            try:
-                                # Create in-app notification for the user
-                                from ...routes.Global.notifications import notifications_storage
-                                import uuid
-                                
-                                notification = {
-                                    'id': str(uuid.uuid4()),
-                                    'title': 'Acknowledgement Request Created',
-                                    'message': f'Acknowledgement request created for "{policy.PolicyName}". {ack_request.TotalUsers} users assigned.',
-                                    'category': 'policy',
-                                    'priority': 'high',
-                                    'createdAt': datetime.now().isoformat(),
-                                    'status': {
-                                        'isRead': False,  # Always unread when created
-                                        'readAt': None
-                                    },
-                                    'user_id': str(target_user.UserId)
-                                }
-                                
-                                # Store notification
-                                notifications_storage.append(notification)
-                                
-                                # Keep only last 100 notifications to prevent memory issues
-                                if len(notifications_storage) > 100:
-                                    notifications_storage.pop(0)
-                                
-                                print(f"In-app notification created for user {target_user.UserId}: {notification['id']}")
-                            except Exception as e:
-                                print(f"Error creating in-app notification for user {target_user.UserId}: {str(e)}")
-                        
-                        # Update NotifiedAt for the user acknowledgement record
-                        user_ack.NotifiedAt = timezone.now()
-                        user_ack.save()
-                    except Exception as e:
-                        print(f"Error sending notification to user {target_user.UserId}: {str(e)}")
-            except Exception as e:
-                print(f"Error in notification service: {str(e)}")
-                # Don't fail the request if notifications fail
-        
         return Response({
             'success': True,
             'message': 'Acknowledgement request created successfully',
             'acknowledgement_request_id': ack_request.AcknowledgementRequestId,
             'total_users': ack_request.TotalUsers,
-            'pending_count': ack_request.PendingCount
+            'pending_count': ack_request.PendingCount,
+            'notifications': acknowledgement_fanout.fanout_progress(ack_request)
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
@@ -443,7 +281,8 @@ def get_policy_acknowledgement_requests(request, policy_id):
                 'completion_percentage': req.completion_percentage,
                 'created_by': req.CreatedBy.UserName,
                 'created_at': req.CreatedAt.isoformat(),
-                'completed_at': req.CompletedAt.isoformat() if req.CompletedAt else None
+                'completed_at': req.CompletedAt.isoformat() if req.CompletedAt else None,
+                'notifications': acknowledgement_fanout.fanout_progress(req)
             })
         
         return Response({
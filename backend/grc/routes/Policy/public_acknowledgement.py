@@ -30,35 +30,19 @@ def mark_acknowledgement_notification_as_read(user_id, policy_name, acknowledgem
     Mark acknowledgement notification as read when policy is acknowledged
     """
     try:
-        from ...routes.Global.notifications import notifications_storage
-        from datetime import datetime
+        from django.db.models import Q
+        from ...routes.Global import notification_store
         
-        # Find and mark matching acknowledgement notifications as read
-        marked_count = 0
-        for notification in notifications_storage:
-            if (notification.get('user_id') == str(user_id) and 
-                not notification['status'].get('isRead', False)):
-                
-                # Check if this is an acknowledgement notification for this policy
-                title = notification.get('title', '')
-                message = notification.get('message', '')
-                
-                is_acknowledgement = (
-                    'Acknowledgement Request' in title or 
-                    'Policy Acknowledgement' in title
-                )
-                
-                # Match by policy name in message or title
-                matches_policy = (
-                    policy_name.lower() in message.lower() or
-                    policy_name.lower() in title.lower()
-                )
-                
-                if is_acknowledgement and matches_policy:
-                    notification['status']['isRead'] = True
-                    notification['status']['readAt'] = datetime.now().isoformat()
-                    marked_count += 1
-                    print(f"✅ Marked notification {notification.get('id')} as read for policy '{policy_name}'")
+        # Acknowledgement notifications that mention this policy, matched in the
+        # database against the user's unread rows only
+        marked_count = notification_store.mark_read(
+            user_id=user_id,
+            where=notification_store.acknowledgement_q() & (
+                Q(message__icontains=policy_name) | Q(title__icontains=policy_name)
+            )
+        )
+        if marked_count:
+            print(f"✅ Marked {marked_count} notification(s) as read for policy '{policy_name}'")
         
         return marked_count
     except Exception as e:
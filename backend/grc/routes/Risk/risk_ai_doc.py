@@ -25,29 +25,11 @@ from rest_framework.parsers import MultiPartParser, FormParser
 # RBAC imports
 from ...rbac.decorators import rbac_required
 
-# --- Optional parsers (install as needed) ---
-try:
-    import pdfplumber
-except Exception:
-    pdfplumber = None
-
-try:
-    import PyPDF2
-except Exception:
-    PyPDF2 = None
-
-try:
-    import docx  # python-docx
-except Exception:
-    docx = None
-
-try:
-    import pandas as pd
-except Exception:
-    pd = None
-
 # --- Your models ---
 from grc.models import Risk  # , Users  # (Users not needed here but you can import if required)
+from ..Global.http_client import get_client
+from ..Global.ai_field_inference import FieldInferencePlanner, InferenceJob
+from ..Global.document_text_extraction import extract_text
 
 
 # =========================
@@ -244,7 +226,7 @@ def call_openai_json(prompt: str, retries: int = 3, timeout: int = 120) -> Any:
         print(f"🤖 Attempt {attempt + 1}/{retries}...")
         resp = None
         try:
-            resp = requests.post(OPENAI_API_URL, json=payload, headers=headers, timeout=timeout)
+            resp = get_client('openai').post(OPENAI_API_URL, json=payload, headers=headers, timeout=timeout)
             resp.raise_for_status()
             print(f"✅ OpenAI API responded with status {resp.status_code}")
             
@@ -407,77 +389,9 @@ def normalize_choice(val: str, choices: list[str]) -> Optional[str]:
 # =========================
 # FILE EXTRACTORS
 # =========================
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF (pdfplumber preferred; PyPDF2 fallback)."""
-    try:
-        if pdfplumber:
-            parts = []
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    t = page.extract_text() or ""
-                    if t.strip():
-                        parts.append(t)
-            return "\n".join(parts)
-        elif PyPDF2:
-            with open(file_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                text = ""
-                for p in reader.pages:
-                    text += (p.extract_text() or "") + "\n"
-                return text
-        return ""
-    except Exception as e:
-        print(f"[PDF] Extraction error: {e}")
-        return ""
-
-def extract_text_from_docx(file_path: str) -> str:
-    try:
-        if not docx:
-            raise RuntimeError("python-docx not installed")
-        d = docx.Document(file_path)
-        parts = []
-        for p in d.paragraphs:
-            if p.text.strip():
-                parts.append(p.text)
-        for t in d.tables:
-            for row in t.rows:
-                cells = [c.text.strip() for c in row.cells]
-                if any(cells):
-                    parts.append(" | ".join(cells))
-        return "\n".join(parts)
-    except Exception as e:
-        print(f"[DOCX] Extraction error: {e}")
-        return ""
-
-def extract_text_from_excel(file_path: str) -> str:
-    try:
-        if not pd:
-            raise RuntimeError("pandas/openpyxl not installed")
-        df_sheets = pd.read_excel(file_path, sheet_name=None)
-        out = []
-        for name, df in df_sheets.items():
-            out.append(f"=== Sheet: {name} ===")
-            out.append(df.to_string(index=False))
-        return "\n".join(out)
-    except Exception as e:
-        print(f"[XLSX] Extraction error: {e}")
-        return ""
-
 def extract_text_from_file(file_path: str, file_extension: str) -> str:
-    ext = file_extension.lower()
-    if ext == ".pdf":
-        return extract_text_from_pdf(file_path)
-    if ext in [".docx", ".doc"]:
-        return extract_text_from_docx(file_path)
-    if ext in [".xlsx", ".xls"]:
-        return extract_text_from_excel(file_path)
-    if ext == ".txt":
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-        except Exception:
-            return ""
-    return ""
+    """Text of an uploaded document via the shared, content-hash cached extractor."""
+    return extract_text(file_path, file_extension)
 
 
 # =========================
@@ -602,7 +516,11 @@ Rules:
         "rationale": rationale
     }
 
-    # normalize after inference
+    return normalize_inferred_field(field_name, v, current_record), metadata
+
+
+def normalize_inferred_field(field_name: str, v: Any, current_record: dict) -> Any:
+    """Coerce an AI-inferred value into the field's type/choices, applying defaults"""
     if field_name in ("RiskLikelihood", "RiskImpact"):
         v = clamp_int(v, 1, 10) or 5
     elif field_name == "RiskExposureRating":
@@ -624,7 +542,7 @@ Rules:
     elif isinstance(v, str):
         v = v.strip() or None
     
-    return v, metadata
+    return v
 
 
 def fallback_risk_extraction(text: str) -> list[dict]:
@@ -706,8 +624,9 @@ def parse_risks_from_text(text: str) -> list[dict]:
     
     print(f"✅ Detected {len(detected_risks)} risk(s), now processing each...")
     
-    # Step 2: For each detected risk, normalize extracted fields and fill missing ones
-    completed_risks = []
+    # Step 2: For each detected risk, normalize extracted fields and collect missing ones
+    items = []
+    jobs = []
     for idx, risk_data in enumerate(detected_risks, 1):
         print(f"\n🔧 Processing Risk {idx}: {risk_data.get('RiskTitle', 'Unknown')[:50]}...")
         
@@ -760,22 +679,33 @@ def parse_risks_from_text(text: str) -> list[dict]:
         if item.get("RiskMultiplierY"):
             item["RiskMultiplierY"] = as_float_or_none(item["RiskMultiplierY"])
         
-        # Step 3: Use AI to fill ONLY missing fields (NEVER RiskTitle - must be in document)
+        # Step 3: AI fills ONLY missing fields (NEVER RiskTitle - must be in document)
         missing_fields = [f for f in RISK_DB_FIELDS if item.get(f) in (None, "", []) and f != "RiskTitle"]
         if missing_fields:
             print(f"  🤖 Missing fields: {', '.join(missing_fields)}")
-            print(f"  🤖 Using AI to infer missing fields...")
-            
-            for field in missing_fields:
-                print(f"    🔍 Inferring {field}...")
-                value, metadata = infer_single_field(field, item, risk_block or text[:3000])
-                item[field] = value
-                # Store AI generation metadata
-                item["_meta"]["per_field"][field] = metadata
-                print(f"    🏷️  Marked {field} as AI_GENERATED in metadata")
         else:
             print(f"  ✅ All fields extracted from document!")
-        
+        items.append(item)
+        jobs.append(InferenceJob(item, missing_fields, risk_block or text[:3000]))
+
+    # Step 4: Infer every missing field of every risk in a few batched requests
+    planner = FieldInferencePlanner(call_openai_json, FIELD_PROMPTS, RISK_DB_FIELDS, entity='risk')
+    inferred = planner.infer(jobs)
+    print(f"🤖 AI inference used {planner.requests_made} request(s)")
+
+    completed_risks = []
+    for idx, (item, job, fields) in enumerate(zip(items, jobs, inferred), 1):
+        # Apply in RISK_DB_FIELDS order so exposure sees inferred likelihood/impact
+        for field in job.missing_fields:
+            result = fields.get(field) or {"value": None, "confidence": 0.0, "rationale": "Not returned by model"}
+            item[field] = normalize_inferred_field(field, result["value"], item)
+            # Store AI generation metadata
+            item["_meta"]["per_field"][field] = {
+                "source": "AI_GENERATED",
+                "confidence": result["confidence"],
+                "rationale": result["rationale"]
+            }
+
         # Final normalization and defaults
         item["RiskLikelihood"] = item["RiskLikelihood"] or 5
         item["RiskImpact"] = item["RiskImpact"] or 5
@@ -24,29 +24,10 @@ from rest_framework.parsers import MultiPartParser, FormParser
 # RBAC imports
 from ...rbac.decorators import rbac_required
 
-# --- Optional parsers (install as needed) ---
-try:
-    import pdfplumber
-except Exception:
-    pdfplumber = None
-
-try:
-    import PyPDF2
-except Exception:
-    PyPDF2 = None
-
-try:
-    import docx  # python-docx
-except Exception:
-    docx = None
-
-try:
-    import pandas as pd
-except Exception:
-    pd = None
-
 # --- Your models ---
 from grc.models import RiskInstance  # Import RiskInstance model
+from ..Global.document_text_extraction import extract_text
+from ..Global.http_client import get_client
 
 
 # =========================
@@ -286,7 +267,7 @@ def call_openai_json(prompt: str, retries: int = 3, timeout: int = 120) -> Any:
         print(f"🤖 Attempt {attempt + 1}/{retries}...")
         resp = None
         try:
-            resp = requests.post(OPENAI_API_URL, json=payload, headers=headers, timeout=timeout)
+            resp = get_client('openai').post(OPENAI_API_URL, json=payload, headers=headers, timeout=timeout)
             resp.raise_for_status()
             print(f"✅ OpenAI API responded with status {resp.status_code}")
             
@@ -449,77 +430,9 @@ def normalize_choice(val: str, choices: list[str]) -> Optional[str]:
 # =========================
 # FILE EXTRACTORS
 # =========================
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF (pdfplumber preferred; PyPDF2 fallback)."""
-    try:
-        if pdfplumber:
-            parts = []
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    t = page.extract_text() or ""
-                    if t.strip():
-                        parts.append(t)
-            return "\n".join(parts)
-        elif PyPDF2:
-            with open(file_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                text = ""
-                for p in reader.pages:
-                    text += (p.extract_text() or "") + "\n"
-                return text
-        return ""
-    except Exception as e:
-        print(f"[PDF] Extraction error: {e}")
-        return ""
-
-def extract_text_from_docx(file_path: str) -> str:
-    try:
-        if not docx:
-            raise RuntimeError("python-docx not installed")
-        d = docx.Document(file_path)
-        parts = []
-        for p in d.paragraphs:
-            if p.text.strip():
-                parts.append(p.text)
-        for t in d.tables:
-            for row in t.rows:
-                cells = [c.text.strip() for c in row.cells]
-                if any(cells):
-                    parts.append(" | ".join(cells))
-        return "\n".join(parts)
-    except Exception as e:
-        print(f"[DOCX] Extraction error: {e}")
-        return ""
-
-def extract_text_from_excel(file_path: str) -> str:
-    try:
-        if not pd:
-            raise RuntimeError("pandas/openpyxl not installed")
-        df_sheets = pd.read_excel(file_path, sheet_name=None)
-        out = []
-        for name, df in df_sheets.items():
-            out.append(f"=== Sheet: {name} ===")
-            out.append(df.to_string(index=False))
-        return "\n".join(out)
-    except Exception as e:
-        print(f"[XLSX] Extraction error: {e}")
-        return ""
-
 def extract_text_from_file(file_path: str, file_extension: str) -> str:
-    ext = file_extension.lower()
-    if ext == ".pdf":
-        return extract_text_from_pdf(file_path)
-    if ext in [".docx", ".doc"]:
-        return extract_text_from_docx(file_path)
-    if ext in [".xlsx", ".xls"]:
-        return extract_text_from_excel(file_path)
-    if ext == ".txt":
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-        except Exception:
-            return ""
-    return ""
+    """Text of an uploaded document via the shared, content-hash cached extractor."""
+    return extract_text(file_path, file_extension)
 
 
 # =========================
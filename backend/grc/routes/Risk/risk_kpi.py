@@ -25,6 +25,7 @@ from ...rbac.decorators import rbac_required
 
 # Import models
 from ...models import RiskInstance, Risk, Incident, Compliance, BusinessUnit, Users, Department
+from ...routes.Global.conditional_responses import conditional_on
 
 # Helper function for JSON serialization of Decimal values
 def decimal_to_float(obj):
@@ -39,6 +40,7 @@ def decimal_to_float(obj):
 
 @api_view(['GET'])
 @permission_classes([RiskAnalyticsPermission])
+@conditional_on(RiskInstance)
 def risk_kpi_data(request):
     """Return all KPI data for the risk dashboard using real database queries"""
     
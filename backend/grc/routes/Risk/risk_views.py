@@ -272,7 +272,7 @@ from django.db import models
 from django.db.models.functions import Cast
 import decimal
 from decimal import Decimal
-import requests
+from ...routes.Global.http_client import get_client
 from ...models import CategoryBusinessUnit
 from ...models import Users
 
@@ -336,7 +336,7 @@ def send_log(module, actionType, description=None, userId=None, userName=None,
                 # Clean out None values
                 api_log_data = {k: v for k, v in api_log_data.items() if v is not None}
                 
-                response = requests.post(LOGGING_SERVICE_URL, json=api_log_data)
+                response = get_client('logging_service').post(LOGGING_SERVICE_URL, json=api_log_data)
                 if response.status_code != 200:
                     print(f"Failed to send log to service: {response.text}")
         except Exception as e:
@@ -3111,37 +3111,56 @@ def get_risk_form_details(request, risk_id):
         return Response({"error": str(e)}, status=500)
 
 class GRCLogList(generics.ListCreateAPIView):
+    """
+    Newest-first log entries, at most `limit` per request (default 1000).
+    Months older than the hot window live in archive files; pass
+    include_archived=true, or a start_date before the hot window, to include
+    them after the database rows.
+    """
     queryset = GRCLog.objects.all().order_by('-Timestamp')
     serializer_class = GRCLogSerializer
     permission_classes = [RiskViewPermission]
+    DEFAULT_LIMIT = 1000
+    MAX_LIMIT = 10000
+
+    def _limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            limit = self.DEFAULT_LIMIT
+        return max(1, min(limit, self.MAX_LIMIT))
+
+    def _filters(self):
+        params = self.request.query_params
+        return {
+            key: params.get(key)
+            for key in ('module', 'action_type', 'entity_type', 'log_level', 'user_id')
+            if params.get(key)
+        }
     
     def get_queryset(self):
-        queryset = GRCLog.objects.all().order_by('-Timestamp')
+        queryset = GRCLog.objects.all().order_by('-Timestamp', '-LogId')
+        filters = self._filters()
         
         # Filter by module if provided
-        module = self.request.query_params.get('module')
-        if module:
-            queryset = queryset.filter(Module__icontains=module)
+        if filters.get('module'):
+            queryset = queryset.filter(Module__icontains=filters['module'])
             
         # Filter by action type if provided
-        action_type = self.request.query_params.get('action_type')
-        if action_type:
-            queryset = queryset.filter(ActionType__icontains=action_type)
+        if filters.get('action_type'):
+            queryset = queryset.filter(ActionType__icontains=filters['action_type'])
             
         # Filter by entity type if provided
-        entity_type = self.request.query_params.get('entity_type')
-        if entity_type:
-            queryset = queryset.filter(EntityType__icontains=entity_type)
+        if filters.get('entity_type'):
+            queryset = queryset.filter(EntityType__icontains=filters['entity_type'])
             
         # Filter by log level if provided
-        log_level = self.request.query_params.get('log_level')
-        if log_level:
-            queryset = queryset.filter(LogLevel__iexact=log_level)
+        if filters.get('log_level'):
+            queryset = queryset.filter(LogLevel__iexact=filters['log_level'])
             
         # Filter by user if provided
-        user_id = self.request.query_params.get('user_id')
-        if user_id:
-            queryset = queryset.filter(UserId=user_id)
+        if filters.get('user_id'):
+            queryset = queryset.filter(UserId=filters['user_id'])
             
         # Filter by date range if provided
         start_date = self.request.query_params.get('start_date')
@@ -3151,6 +3170,26 @@ class GRCLogList(generics.ListCreateAPIView):
             
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        from ..Global.grc_log_store import hot_window_start, iter_archived_logs
+
+        limit = self._limit()
+        data = list(self.get_serializer(self.get_queryset()[:limit], many=True).data)
+
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        include_archived = str(request.query_params.get('include_archived', '')).lower() in ('1', 'true', 'yes')
+        if start_date and end_date and start_date[:10] < hot_window_start().isoformat():
+            include_archived = True
+        if include_archived and len(data) < limit:
+            data.extend(iter_archived_logs(
+                self._filters(),
+                start_date=start_date if start_date and end_date else None,
+                end_date=end_date if start_date and end_date else None,
+                limit=limit - len(data)
+            ))
+        return Response(data)
+
 class GRCLogDetail(generics.RetrieveAPIView):
     queryset = GRCLog.objects.all()
     serializer_class = GRCLogSerializer
@@ -3,8 +3,12 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from grc.models import Framework, Policy, SubPolicy, Compliance, Risk, RiskInstance
 from django.db.models import Q
+from collections import defaultdict
 import json
 
+from ..Global.conditional_responses import conditional_on
+from ..Global.fast_json import FastJSONResponse, project_rows
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_all_frameworks(request):
@@ -190,98 +194,84 @@ def get_risks_by_compliance(request, compliance_id):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@conditional_on(Framework, Policy, SubPolicy, Compliance)
 def get_tree_hierarchy(request):
     """
     Get complete tree hierarchy (optional - for loading all at once)
     """
     try:
-        frameworks = Framework.objects.filter(
-            Status='Approved',
-            ActiveInactive='Active'
-        ).order_by('FrameworkName')
-        
-        tree_data = []
-        
-        for framework in frameworks:
-            framework_node = {
-                'id': f'framework-{framework.FrameworkId}',
-                'type': 'framework',
-                'data': {
-                    'FrameworkId': framework.FrameworkId,
-                    'FrameworkName': framework.FrameworkName,
-                    'FrameworkDescription': framework.FrameworkDescription,
-                    'Category': framework.Category,
-                    'Status': framework.Status
-                },
-                'children': []
-            }
-            
-            policies = Policy.objects.filter(
-                FrameworkId=framework.FrameworkId,
+        # One values() query per level instead of one query per parent node
+        frameworks = project_rows(
+            Framework.objects.filter(Status='Approved', ActiveInactive='Active').order_by('FrameworkName'),
+            ['FrameworkId', 'FrameworkName', 'FrameworkDescription', 'Category', 'Status']
+        )
+        policies = project_rows(
+            Policy.objects.filter(
+                FrameworkId__in=[framework['FrameworkId'] for framework in frameworks],
                 Status='Approved',
                 ActiveInactive='Active'
-            ).order_by('PolicyName')
-            
-            for policy in policies:
-                policy_node = {
-                    'id': f'policy-{policy.PolicyId}',
-                    'type': 'policy',
-                    'data': {
-                        'PolicyId': policy.PolicyId,
-                        'PolicyName': policy.PolicyName,
-                        'PolicyDescription': policy.PolicyDescription,
-                        'Status': policy.Status
-                    },
+            ).order_by('PolicyName'),
+            ['FrameworkId', 'PolicyId', 'PolicyName', 'PolicyDescription', 'Status']
+        )
+        subpolicies = project_rows(
+            SubPolicy.objects.filter(
+                PolicyId__in=[policy['PolicyId'] for policy in policies],
+                Status='Approved'
+            ).order_by('SubPolicyName'),
+            ['PolicyId', 'SubPolicyId', 'SubPolicyName', 'Description', 'Status']
+        )
+        compliances = project_rows(
+            Compliance.objects.filter(
+                SubPolicy_id__in=[subpolicy['SubPolicyId'] for subpolicy in subpolicies],
+                Status='Approved',
+                ActiveInactive='Active'
+            ).order_by('ComplianceTitle'),
+            {
+                'SubPolicyId': 'SubPolicy_id',
+                'ComplianceId': 'ComplianceId',
+                'ComplianceTitle': 'ComplianceTitle',
+                'ComplianceItemDescription': 'ComplianceItemDescription',
+                'Criticality': 'Criticality',
+                'Status': 'Status',
+            }
+        )
+        for compliance in compliances:
+            compliance['ComplianceTitle'] = compliance['ComplianceTitle'] or 'Untitled Compliance'
+
+        def children_by(rows, parent_key, node_type, id_key):
+            children = defaultdict(list)
+            for row in rows:
+                parent_id = row.pop(parent_key)
+                children[parent_id].append({
+                    'id': f'{node_type}-{row[id_key]}',
+                    'type': node_type,
+                    'data': row,
                     'children': []
-                }
-                
-                subpolicies = SubPolicy.objects.filter(
-                    PolicyId=policy.PolicyId,
-                    Status='Approved'
-                ).order_by('SubPolicyName')
-                
-                for subpolicy in subpolicies:
-                    subpolicy_node = {
-                        'id': f'subpolicy-{subpolicy.SubPolicyId}',
-                        'type': 'subpolicy',
-                        'data': {
-                            'SubPolicyId': subpolicy.SubPolicyId,
-                            'SubPolicyName': subpolicy.SubPolicyName,
-                            'Description': subpolicy.Description,
-                            'Status': subpolicy.Status
-                        },
-                        'children': []
-                    }
-                    
-                    compliances = Compliance.objects.filter(
-                        SubPolicy_id=subpolicy.SubPolicyId,
-                        Status='Approved',
-                        ActiveInactive='Active'
-                    ).order_by('ComplianceTitle')
-                    
-                    for compliance in compliances:
-                        compliance_node = {
-                            'id': f'compliance-{compliance.ComplianceId}',
-                            'type': 'compliance',
-                            'data': {
-                                'ComplianceId': compliance.ComplianceId,
-                                'ComplianceTitle': compliance.ComplianceTitle or 'Untitled Compliance',
-                                'ComplianceItemDescription': compliance.ComplianceItemDescription,
-                                'Criticality': compliance.Criticality,
-                                'Status': compliance.Status
-                            },
-                            'children': []
-                        }
-                        
-                        subpolicy_node['children'].append(compliance_node)
-                    
-                    policy_node['children'].append(subpolicy_node)
-                
-                framework_node['children'].append(policy_node)
-            
-            tree_data.append(framework_node)
-        
-        return JsonResponse({
+                })
+            return children
+
+        compliance_nodes = children_by(compliances, 'SubPolicyId', 'compliance', 'ComplianceId')
+        subpolicy_nodes = children_by(subpolicies, 'PolicyId', 'subpolicy', 'SubPolicyId')
+        policy_nodes = children_by(policies, 'FrameworkId', 'policy', 'PolicyId')
+
+        for nodes in subpolicy_nodes.values():
+            for subpolicy_node in nodes:
+                subpolicy_node['children'] = compliance_nodes.get(subpolicy_node['data']['SubPolicyId'], [])
+        for nodes in policy_nodes.values():
+            for policy_node in nodes:
+                policy_node['children'] = subpolicy_nodes.get(policy_node['data']['PolicyId'], [])
+
+        tree_data = [
+            {
+                'id': f"framework-{framework['FrameworkId']}",
+                'type': 'framework',
+                'data': framework,
+                'children': policy_nodes.get(framework['FrameworkId'], [])
+            }
+            for framework in frameworks
+        ]
+
+        return FastJSONResponse({
             'status': 'success',
             'data': tree_data
         })
@@ -0,0 +1,272 @@
+"""
+Batched persistence for AI-extracted frameworks.
+
+The upload views used to create every Policy, SubPolicy and Compliance with its
+own INSERT. This module validates the whole extracted tree up front, then writes
+each level with chunked bulk_create calls inside one transaction.
+
+MySQL does not return primary keys from bulk_create, so after each level is
+inserted the new ids are read back for the framework in PK order. The framework
+row is created inside the same transaction, so no other writer can add children
+to it and PK order matches insertion order.
+
+bulk_create skips post_save, so once a level has its ids the retention expiry
+and RetentionTimeline rows the receivers in grc.models would have written are
+set in bulk (bulk_set_retention), and the tables' change counters are bumped
+with touch() so cached facet counts and ETags see the new rows.
+
+Duplicate identifiers are renamed by default; every rename is listed in the
+result's 'renamed_identifiers' so the upload response can show it.
+"""
+
+from django.conf import settings
+from django.db import transaction
+
+from grc.models import Framework, Policy, SubPolicy, Compliance, bulk_set_retention
+from ..Global.conditional_responses import touch
+
+
+DEFAULT_BATCH_SIZE = getattr(settings, 'FRAMEWORK_IMPORT_BATCH_SIZE', 500)
+
+# How duplicate identifiers inside one framework are resolved
+CONFLICT_SUFFIX = 'suffix'   # rename the duplicate to "<id>-2", "<id>-3", ...
+CONFLICT_SKIP = 'skip'       # drop the duplicate node (and its children)
+CONFLICT_ERROR = 'error'     # reject the whole import
+
+
+class FrameworkImportError(Exception):
+    """Raised when the extracted structure fails validation"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class FrameworkImportPlan:
+    """
+    Validated, in-memory representation of one framework import.
+
+    policies is a list of dicts:
+        {'fields': {...Policy kwargs...}, 'subpolicies': [
+            {'key': <link key>, 'fields': {...SubPolicy kwargs...},
+             'compliances': [{...Compliance kwargs...}, ...]}, ...]}
+    """
+
+    def __init__(self, framework_fields, policies, on_conflict=CONFLICT_SUFFIX):
+        self.framework_fields = framework_fields
+        self.policies = policies
+        self.on_conflict = on_conflict
+        self.warnings = []
+        self.errors = []
+        self.renamed_identifiers = []
+
+    @property
+    def total_policies(self):
+        return len(self.policies)
+
+    @property
+    def total_subpolicies(self):
+        return sum(len(p['subpolicies']) for p in self.policies)
+
+    @property
+    def total_compliances(self):
+        return sum(len(sp['compliances']) for p in self.policies for sp in p['subpolicies'])
+
+    def validate(self):
+        """Truncate over-long values, resolve identifier conflicts and check required fields"""
+        self.errors = []
+        self.warnings = []
+        self.renamed_identifiers = []
+
+        _fit_fields(Framework, self.framework_fields, 'Framework', self.warnings)
+        if not self.framework_fields.get('FrameworkName'):
+            self.errors.append('Framework name is required')
+
+        policy_ids = {}
+        kept_policies = []
+        for p_idx, policy in enumerate(self.policies):
+            label = f"Policy #{p_idx + 1}"
+            _fit_fields(Policy, policy['fields'], label, self.warnings)
+            if not self._resolve_identifier(policy['fields'], policy_ids, label):
+                continue
+
+            subpolicy_ids = {}
+            kept_subpolicies = []
+            for s_idx, subpolicy in enumerate(policy['subpolicies']):
+                sub_label = f"{label} / SubPolicy #{s_idx + 1}"
+                _fit_fields(SubPolicy, subpolicy['fields'], sub_label, self.warnings)
+                if not self._resolve_identifier(subpolicy['fields'], subpolicy_ids, sub_label):
+                    continue
+                for c_idx, compliance in enumerate(subpolicy['compliances']):
+                    _fit_fields(Compliance, compliance, f"{sub_label} / Compliance #{c_idx + 1}", self.warnings)
+                    if not compliance.get('ComplianceVersion'):
+                        compliance['ComplianceVersion'] = '1.0'
+                kept_subpolicies.append(subpolicy)
+            policy['subpolicies'] = kept_subpolicies
+            kept_policies.append(policy)
+        self.policies = kept_policies
+
+        if self.errors:
+            raise FrameworkImportError(
+                f"Framework import validation failed with {len(self.errors)} error(s)",
+                errors=self.errors
+            )
+        return self
+
+    def _resolve_identifier(self, fields, seen, label):
+        identifier = fields.get('Identifier') or ''
+        if not identifier:
+            return True
+        if identifier not in seen:
+            seen[identifier] = 1
+            return True
+
+        if self.on_conflict == CONFLICT_ERROR:
+            self.errors.append(f"{label}: duplicate identifier '{identifier}'")
+            return False
+        if self.on_conflict == CONFLICT_SKIP:
+            self.warnings.append(f"{label}: skipped duplicate identifier '{identifier}'")
+            return False
+
+        seen[identifier] += 1
+        candidate = f"{identifier}-{seen[identifier]}"
+        while candidate in seen:
+            seen[identifier] += 1
+            candidate = f"{identifier}-{seen[identifier]}"
+        seen[candidate] = 1
+        fields['Identifier'] = candidate
+        self.renamed_identifiers.append({'item': label, 'from': identifier, 'to': candidate})
+        self.warnings.append(f"{label}: renamed duplicate identifier '{identifier}' to '{candidate}'")
+        return True
+
+
+def _fit_fields(model, values, label, warnings):
+    """Trim string values to the model's max_length so one long value cannot abort a bulk insert"""
+    for field_name, value in list(values.items()):
+        if not isinstance(value, str):
+            continue
+        try:
+            field = model._meta.get_field(field_name)
+        except Exception:
+            continue
+        max_length = getattr(field, 'max_length', None)
+        if max_length and len(value) > max_length:
+            values[field_name] = value[:max_length]
+            warnings.append(f"{label}: truncated {field_name} to {max_length} characters")
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _bulk_insert(model, objects, pk_name, framework, batch_size, on_chunk=None):
+    """
+    bulk_create objects in chunks and make sure every object has its primary key.
+
+    Backends that cannot return ids from bulk inserts (MySQL) get them read back
+    in PK order for the framework that was just created.
+    """
+    if not objects:
+        return objects
+
+    done = 0
+    for chunk in _chunks(objects, batch_size):
+        model.objects.bulk_create(chunk, batch_size=batch_size)
+        done += len(chunk)
+        if on_chunk:
+            on_chunk(done, len(objects))
+
+    if any(getattr(obj, pk_name) is None for obj in objects):
+        new_ids = list(
+            model.objects.filter(FrameworkId=framework)
+            .order_by(pk_name)
+            .values_list(pk_name, flat=True)
+        )
+        if len(new_ids) != len(objects):
+            raise FrameworkImportError(
+                f"Expected {len(objects)} new {model.__name__} rows, found {len(new_ids)}"
+            )
+        for obj, new_id in zip(objects, new_ids):
+            setattr(obj, pk_name, new_id)
+            obj._state.adding = False
+    return objects
+
+
+def import_framework(plan, progress_callback=None, batch_size=None, progress_range=(10, 95)):
+    """
+    Persist a validated FrameworkImportPlan and return summary counts.
+
+    progress_callback(progress, message) is invoked after every chunk with a
+    percentage inside progress_range.
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    start_pct, end_pct = progress_range
+    total_rows = 1 + plan.total_policies + plan.total_subpolicies + plan.total_compliances
+    written = [0]
+
+    def report(count, message):
+        written[0] += count
+        if progress_callback:
+            pct = start_pct + int((end_pct - start_pct) * written[0] / max(total_rows, 1))
+            progress_callback(min(pct, end_pct), message)
+
+    def chunk_reporter(label):
+        last = [0]
+
+        def on_chunk(done, total):
+            report(done - last[0], f"Saved {done}/{total} {label}")
+            last[0] = done
+        return on_chunk
+
+    with transaction.atomic():
+        framework = Framework.objects.create(**plan.framework_fields)
+        report(1, f"Created framework {framework.FrameworkName}")
+
+        policy_objs = [
+            Policy(FrameworkId=framework, **policy['fields'])
+            for policy in plan.policies
+        ]
+        _bulk_insert(Policy, policy_objs, 'PolicyId', framework, batch_size, chunk_reporter('policies'))
+        bulk_set_retention(policy_objs, 'policy', 'policy_create', record_type='policy', name_attr='PolicyName')
+
+        subpolicy_objs = []
+        subpolicy_specs = []
+        for policy_obj, policy in zip(policy_objs, plan.policies):
+            for subpolicy in policy['subpolicies']:
+                subpolicy_objs.append(SubPolicy(PolicyId=policy_obj, FrameworkId=framework, **subpolicy['fields']))
+                subpolicy_specs.append(subpolicy)
+        _bulk_insert(SubPolicy, subpolicy_objs, 'SubPolicyId', framework, batch_size, chunk_reporter('subpolicies'))
+        bulk_set_retention(subpolicy_objs, 'policy', 'policy_subpolicy_add')
+
+        compliance_objs = []
+        deferred_saves = []
+        for subpolicy_obj, subpolicy in zip(subpolicy_objs, subpolicy_specs):
+            for fields in subpolicy['compliances']:
+                compliance = Compliance(SubPolicy=subpolicy_obj, FrameworkId=framework, **fields)
+                # Compliance.save() creates the linked Risk for approved, active
+                # items; keep that side effect by saving those rows individually.
+                if compliance.Status == 'Approved' and compliance.ActiveInactive == 'Active':
+                    deferred_saves.append(compliance)
+                else:
+                    compliance_objs.append(compliance)
+        _bulk_insert(Compliance, compliance_objs, 'ComplianceId', framework, batch_size, chunk_reporter('compliances'))
+        bulk_set_retention(
+            compliance_objs, 'compliance', 'compliance_create', record_type='compliance', name_attr='ComplianceTitle'
+        )
+        for compliance in deferred_saves:
+            compliance.save()
+        if deferred_saves:
+            report(len(deferred_saves), f"Saved {len(deferred_saves)} approved compliances")
+        # bulk_create sends no post_save; bumped once the import commits
+        touch(Framework, Policy, SubPolicy, Compliance)
+
+    return {
+        'framework': framework,
+        'total_policies': len(policy_objs),
+        'total_subpolicies': len(subpolicy_objs),
+        'total_compliances': len(compliance_objs) + len(deferred_saves),
+        'subpolicies': dict(zip((spec['key'] for spec in subpolicy_specs), subpolicy_objs)),
+        'warnings': plan.warnings,
+        'renamed_identifiers': plan.renamed_identifiers,
+    }
@@ -0,0 +1,225 @@
+"""
+Shared progress store for framework upload tasks.
+
+Progress used to live in a module-level dict and the default (per-process)
+LocMemCache, so a status poll that landed on another worker found nothing.
+State is now written to the upload_task_progress table, which every worker
+can read. Writes go through the separate 'progress' database connection in
+autocommit, so an update made inside a long transaction (e.g. a framework
+import) is visible straight away instead of when that transaction commits.
+The in-process dict is still kept as a fallback when the database is
+unavailable.
+
+Within a run progress never goes backwards. Each named stage records when it
+started and ended, which gives per-stage latency for the
+pdf -> index -> sections -> policies pipeline.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from grc.models import UploadTaskProgress
+
+
+# Fallback copy of the latest state per task (per process only)
+processing_status = {}
+
+PROGRESS_DB = 'progress' if 'progress' in settings.DATABASES else 'default'
+
+# Held connections stay well under the gunicorn worker timeout (120s); clients
+# poll again / EventSource reconnects with Last-Event-ID
+LONG_POLL_DEFAULT_TIMEOUT = 20
+LONG_POLL_MAX_TIMEOUT = 25
+POLL_INTERVAL = 0.5
+SSE_MAX_DURATION = 55
+SSE_RETRY_MS = 2000
+SSE_HEARTBEAT_INTERVAL = 15
+
+
+def _status_for(progress, status):
+    if status:
+        return status
+    return 'running' if progress < 100 else 'completed'
+
+
+def _close_stage(timings, stage, now):
+    entry = timings.get(stage)
+    if entry and not entry.get('ended_at'):
+        entry['ended_at'] = now
+        entry['duration'] = round(now - entry['started_at'], 3)
+
+
+def _apply_update(state, progress, message, stage, reset, now, status=None):
+    """Mutate a state dict in place following the monotonic/stage rules"""
+    if reset:
+        state['progress'] = 0
+        state['stage'] = None
+        state['stage_timings'] = {}
+
+    timings = state.setdefault('stage_timings', {}) or {}
+    state['stage_timings'] = timings
+
+    current = state.get('progress') or 0
+    state['progress'] = max(current, int(progress))
+    state['message'] = message
+
+    if stage and stage != state.get('stage'):
+        if state.get('stage'):
+            _close_stage(timings, state['stage'], now)
+        timings[stage] = {'started_at': now, 'ended_at': None, 'duration': None}
+        state['stage'] = stage
+
+    state['status'] = _status_for(state['progress'], status)
+    if state['status'] != 'running' and state.get('stage'):
+        _close_stage(timings, state['stage'], now)
+    state['version'] = (state.get('version') or 0) + 1
+    state['timestamp'] = now
+    return state
+
+
+def _serialize(row):
+    return {
+        'task_id': row.task_id,
+        'progress': row.progress,
+        'message': row.message,
+        'stage': row.stage,
+        'status': row.status,
+        'stage_timings': row.stage_timings or {},
+        'version': row.version,
+        'timestamp': row.updated_at.timestamp() if row.updated_at else time.time(),
+        'error': row.status == 'failed',
+    }
+
+
+def update_progress(task_id, progress, message, stage=None, reset=False, status=None):
+    """
+    Record progress for a task.
+
+    The task is 'running' below 100% and 'completed' at 100% unless status is
+    given; callers reporting an error pass status='failed'.
+
+    progress is clamped so it never decreases unless reset=True, which starts
+    a new run for the same task_id (e.g. saving a framework after processing).
+    Passing a new stage closes the previous stage's timer.
+    """
+    now = time.time()
+    try:
+        # Own connection: committed (and the row lock released) as soon as this block ends
+        with transaction.atomic(using=PROGRESS_DB):
+            row, _ = UploadTaskProgress.objects.using(PROGRESS_DB).select_for_update().get_or_create(task_id=task_id)
+            state = {
+                'progress': row.progress,
+                'stage': row.stage,
+                'stage_timings': dict(row.stage_timings or {}),
+                'version': row.version,
+            }
+            _apply_update(state, progress, message, stage, reset, now, status)
+            row.progress = state['progress']
+            row.message = message
+            row.stage = state['stage']
+            row.status = state['status']
+            row.stage_timings = state['stage_timings']
+            row.version = state['version']
+            row.save(using=PROGRESS_DB)
+            processing_status[task_id] = _serialize(row)
+    except Exception as e:
+        print(f"Warning: could not persist progress for task {task_id}: {e}")
+        state = processing_status.setdefault(task_id, {'task_id': task_id})
+        _apply_update(state, progress, message, stage, reset, now, status)
+        state['error'] = state['status'] == 'failed'
+    return processing_status.get(task_id)
+
+
+def get_progress(task_id):
+    """Latest state for a task from the shared store, or None"""
+    try:
+        row = UploadTaskProgress.objects.using(PROGRESS_DB).filter(task_id=task_id).first()
+        if row:
+            return _serialize(row)
+    except Exception as e:
+        print(f"Warning: could not read progress for task {task_id}: {e}")
+    return processing_status.get(task_id)
+
+
+def _not_found():
+    return {
+        'progress': 0,
+        'message': 'Task not found or expired',
+        'error': True
+    }
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def wait_processing_status(request, task_id):
+    """
+    Long-poll for a task update.
+
+    Returns as soon as the task's version is greater than ?version=, the task
+    finishes, or ?timeout= seconds pass (in which case the current state is
+    returned unchanged).
+    """
+    try:
+        since = int(request.GET.get('version', 0))
+        timeout = min(float(request.GET.get('timeout', LONG_POLL_DEFAULT_TIMEOUT)), LONG_POLL_MAX_TIMEOUT)
+    except ValueError:
+        return JsonResponse({'error': 'version and timeout must be numeric'}, status=400)
+
+    deadline = time.time() + max(timeout, 0)
+    status = get_progress(task_id)
+    while time.time() < deadline:
+        if status and (status.get('version', 0) > since or status.get('status') != 'running'):
+            break
+        time.sleep(POLL_INTERVAL)
+        status = get_progress(task_id)
+
+    if not status:
+        return JsonResponse(_not_found(), status=404)
+    return JsonResponse(status)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def stream_processing_status(request, task_id):
+    """
+    Server-sent events stream of task updates until the task finishes.
+
+    Closes after SSE_MAX_DURATION; EventSource then reconnects and resumes from
+    the Last-Event-ID it sends.
+    """
+    try:
+        resume_version = int(request.META.get('HTTP_LAST_EVENT_ID', -1))
+    except ValueError:
+        resume_version = -1
+
+    def event_stream():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        last_version = resume_version
+        last_sent = time.time()
+        started = last_sent
+        while time.time() - started < SSE_MAX_DURATION:
+            status = get_progress(task_id)
+            if status is None:
+                yield f"event: error\ndata: {json.dumps(_not_found())}\n\n"
+                return
+            if status.get('version', 0) != last_version or status.get('status') != 'running':
+                last_version = status.get('version', 0)
+                last_sent = time.time()
+                yield f"id: {last_version}\ndata: {json.dumps(status)}\n\n"
+                if status.get('status') != 'running':
+                    return
+            elif time.time() - last_sent >= SSE_HEARTBEAT_INTERVAL:
+                last_sent = time.time()
+                yield ": keep-alive\n\n"
+            time.sleep(POLL_INTERVAL)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -16,7 +16,6 @@ import re
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough
-from django.db import transaction
 from django.utils import timezone
 from datetime import datetime
 from grc.models import Framework, Policy, SubPolicy, Compliance
@@ -31,9 +30,9 @@ from ..uploadNist import ai_upload
 from ..uploadNist import pdf_index_extractor
 from ..uploadNist import index_content_extractor
 from ..uploadNist import policy_extractor_enhanced
-
-# Global progress tracking
-processing_status = {}
+from .bulk_framework_import import FrameworkImportPlan, FrameworkImportError, import_framework
+# Progress is kept in the shared task store; processing_status is re-exported for older callers
+from .task_progress import processing_status, update_progress, get_progress
 
 def create_user_folder(userid):
     """
@@ -114,19 +113,10 @@ def create_user_folder(userid):
     # Should not reach here, but just in case
     raise OSError(f"Failed to create folder '{folder_name}'")
 
-def update_progress(task_id, progress, message):
-    """Update processing progress"""
-    processing_status[task_id] = {
-        'progress': progress,
-        'message': message,
-        'timestamp': time.time()
-    }
-    cache.set(f'processing_{task_id}', processing_status[task_id], timeout=3600)
-
 def process_pdf_framework_new(userid, pdf_path, task_id):
     """New PDF processing function using the NEW AI upload pipeline"""
     try:
-        update_progress(task_id, 5, "Starting PDF processing with new AI pipeline...")
+        update_progress(task_id, 5, "Starting PDF processing with new AI pipeline...", stage='pdf')
         
         # Use the new ai_upload pipeline
         from pathlib import Path
@@ -138,7 +128,7 @@ def process_pdf_framework_new(userid, pdf_path, task_id):
         pdf_name = pdf_path_obj.stem
         
         # Step 1: Extract Index
-        update_progress(task_id, 30, "Extracting PDF index...")
+        update_progress(task_id, 30, "Extracting PDF index...", stage='index')
         index_json_path = user_folder / f"{pdf_name}_index.json"
         
         try:
@@ -150,11 +140,11 @@ def process_pdf_framework_new(userid, pdf_path, task_id):
             index_items_count = len(index_data.get('items', []))
             update_progress(task_id, 40, f"Index extracted: {index_items_count} items")
         except Exception as e:
-            update_progress(task_id, 100, f"Index extraction failed: {str(e)}")
+            update_progress(task_id, 100, f"Index extraction failed: {str(e)}", status='failed')
             return False
         
         # Step 2: Extract Sections
-        update_progress(task_id, 45, "Extracting sections...")
+        update_progress(task_id, 45, "Extracting sections...", stage='sections')
         sections_dir = user_folder / f"sections_{pdf_name}"
         
         try:
@@ -167,11 +157,11 @@ def process_pdf_framework_new(userid, pdf_path, task_id):
             sections_count = len(manifest.get('sections_written', []))
             update_progress(task_id, 60, f"Sections extracted: {sections_count} sections")
         except Exception as e:
-            update_progress(task_id, 100, f"Section extraction failed: {str(e)}")
+            update_progress(task_id, 100, f"Section extraction failed: {str(e)}", status='failed')
             return False
         
         # Step 3: Extract Policies
-        update_progress(task_id, 65, "Extracting policies using AI...")
+        update_progress(task_id, 65, "Extracting policies using AI...", stage='policies')
         policies_dir = user_folder / f"policies_{pdf_name}"
         
         try:
@@ -206,11 +196,11 @@ def process_pdf_framework_new(userid, pdf_path, task_id):
             return True
             
         except Exception as e:
-            update_progress(task_id, 100, f"Policy extraction failed: {str(e)}")
+            update_progress(task_id, 100, f"Policy extraction failed: {str(e)}", status='failed')
             return False
             
     except Exception as e:
-        update_progress(task_id, 100, f"Error: {str(e)}")
+        update_progress(task_id, 100, f"Error: {str(e)}", status='failed')
         return False
 
 def process_pdf_framework(pdf_path, task_id, output_dir):
@@ -227,7 +217,7 @@ def process_pdf_framework(pdf_path, task_id, output_dir):
         result_output_dir = extract_document_sections(pdf_path, output_dir)
         
         if not result_output_dir:
-            update_progress(task_id, 100, "Error: Failed to extract document sections")
+            update_progress(task_id, 100, "Error: Failed to extract document sections", status='failed')
             return False
             
         # Store the output directory path for later use
@@ -237,7 +227,7 @@ def process_pdf_framework(pdf_path, task_id, output_dir):
         return True
         
     except Exception as e:
-        update_progress(task_id, 100, f"Error: {str(e)}")
+        update_progress(task_id, 100, f"Error: {str(e)}", status='failed')
         return False
 
 def use_default_temp_data(task_id, output_dir):
@@ -250,7 +240,7 @@ def use_default_temp_data(task_id, output_dir):
         temp_source_dir = os.path.join(settings.MEDIA_ROOT, 'temp', 'temp')
         
         if not os.path.exists(temp_source_dir):
-            update_progress(task_id, 100, "Error: Default temp data not found")
+            update_progress(task_id, 100, "Error: Default temp data not found", status='failed')
             return False
         
         # Create output directory
@@ -265,7 +255,7 @@ def use_default_temp_data(task_id, output_dir):
                        if os.path.isdir(os.path.join(temp_source_dir, d))]
         
         if not section_dirs:
-            update_progress(task_id, 100, "Error: No sections found in temp data")
+            update_progress(task_id, 100, "Error: No sections found in temp data", status='failed')
             return False
         
         update_progress(task_id, 5, "Loading default framework data...")
@@ -310,7 +300,7 @@ def use_default_temp_data(task_id, output_dir):
         return True
         
     except Exception as e:
-        update_progress(task_id, 100, f"Error loading default data: {str(e)}")
+        update_progress(task_id, 100, f"Error loading default data: {str(e)}", status='failed')
         return False
 
 def process_pdf_framework_fast(pdf_path, task_id, output_dir):
@@ -329,7 +319,7 @@ def process_pdf_framework_fast(pdf_path, task_id, output_dir):
             return False
             
     except Exception as e:
-        update_progress(task_id, 100, f"Error: {str(e)}")
+        update_progress(task_id, 100, f"Error: {str(e)}", status='failed')
         return False
 
 @csrf_exempt
@@ -384,7 +374,7 @@ def upload_framework_file(request):
                     if result:
                         update_progress(task_id, 100, "Framework data processed successfully!")
                     else:
-                        update_progress(task_id, 100, "Error: Failed to process framework data")
+                        update_progress(task_id, 100, "Error: Failed to process framework data", status='failed')
                 else:
                     # For non-PDF files, use fast processing
                     update_progress(task_id, 20, f"Processing {file_extension} file...")
@@ -394,7 +384,7 @@ def upload_framework_file(request):
                         cache.set(f'output_dir_{task_id}', output_dir, timeout=3600)
                         update_progress(task_id, 100, "File processed successfully!")
                     else:
-                        update_progress(task_id, 100, "Error: Failed to process file")
+                        update_progress(task_id, 100, "Error: Failed to process file", status='failed')
                     
                     # Create a simple section based on filename
                     filename_base = os.path.splitext(uploaded_file.name)[0]
@@ -442,7 +432,7 @@ def upload_framework_file(request):
                     update_progress(task_id, 100, f"{file_extension.upper()} file processed successfully!")
                     
             except Exception as e:
-                update_progress(task_id, 100, f"Error: {str(e)}")
+                update_progress(task_id, 100, f"Error: {str(e)}", status='failed')
         
         thread = threading.Thread(target=background_process)
         thread.daemon = True
@@ -467,7 +457,7 @@ def upload_framework_file(request):
 def get_processing_status(request, task_id):
     """Get processing status for a task"""
     try:
-        status = cache.get(f'processing_{task_id}')
+        status = get_progress(task_id)
         if status:
             return JsonResponse(status)
         else:
@@ -781,10 +771,13 @@ def create_checked_structure(request):
                 print(f"Created plain file: {plain_filename}")
                 file_counter += 1
         
+        # This task_id already finished the PDF phase; start a new run so pollers
+        # see this phase as running before the thread gets going
+        update_progress(task_id, 50, "Processing checked sections to extract policy information...", reset=True)
+
         # Start processing in background thread
         def background_process():
             # Process the checked sections to extract policy information
-            update_progress(task_id, 50, "Processing checked sections to extract policy information...")
             excel_path = process_checked_sections(task_id)
             
             if excel_path:
@@ -792,7 +785,7 @@ def create_checked_structure(request):
                 # Cache the Excel file path for later retrieval
                 cache.set(f'policy_excel_{task_id}', excel_path, timeout=3600)
             else:
-                update_progress(task_id, 100, "Error: Failed to extract policy information")
+                update_progress(task_id, 100, "Error: Failed to extract policy information", status='failed')
         
         thread = threading.Thread(target=background_process)
         thread.daemon = True
@@ -911,7 +904,7 @@ def direct_process_checked_sections(request):
                 # Cache the Excel file path for later retrieval
                 cache.set(f'policy_excel_{task_id}', excel_path, timeout=3600)
             else:
-                update_progress(task_id, 100, "Error: Failed to extract policy information")
+                update_progress(task_id, 100, "Error: Failed to extract policy information", status='failed')
         
         thread = threading.Thread(target=background_process)
         thread.daemon = True
@@ -1797,8 +1790,6 @@ def parse_compliance_items(control_text):
 def save_edited_framework_to_database(request):
     """Save edited framework, policies, subpolicies, and compliances from Step 6 to database"""
     try:
-        from django.db import transaction
-        from ...models import Framework, Policy, SubPolicy, Compliance
         from datetime import date
         
         data = json.loads(request.body)
@@ -1844,193 +1835,151 @@ def save_edited_framework_to_database(request):
         else:
             print(f"\n❌ ERROR: checked_section.json not found at: {checked_sections_path}")
         
-        # Use transaction to ensure all-or-nothing save
-        with transaction.atomic():
-            # Step 1: Create Framework
-            framework = Framework.objects.create(
-                FrameworkName=framework_data.get('FrameworkName', 'Untitled Framework'),
-                CurrentVersion=float(framework_data.get('CurrentVersion', 1.0)) if framework_data.get('CurrentVersion') else 1.0,
-                FrameworkDescription=framework_data.get('FrameworkDescription', ''),
-                EffectiveDate=framework_data.get('EffectiveDate') or date.today(),
-                CreatedByName=framework_data.get('CreatedByName', 'Admin'),
-                CreatedByDate=date.today(),
-                Category=framework_data.get('Category', ''),
-                Identifier=framework_data.get('Identifier', ''),
-                StartDate=framework_data.get('StartDate') or date.today(),
-                EndDate=framework_data.get('EndDate'),
-                Status=framework_data.get('Status', 'Under Review'),
-                ActiveInactive=framework_data.get('ActiveInactive', 'Active'),
-                Reviewer=framework_data.get('Reviewer', ''),
-                InternalExternal=framework_data.get('InternalExternal', 'Internal')
-            )
-            print(f"Created Framework: {framework.FrameworkId}")
-            
-            # Create a mapping of subpolicy_id to SubPolicy object for compliance linking
-            subpolicy_mapping = {}
-            total_policies = 0
-            total_subpolicies = 0
-            total_compliances = 0
-            
-            # Step 2: Process each section -> policies -> subpolicies
-            print(f"\n===== PROCESSING SECTIONS, POLICIES, AND SUBPOLICIES =====")
-            
-            for section_idx, section in enumerate(sections_data):
-                print(f"\nSection {section_idx + 1}: {section.get('section_title', 'N/A')}")
-                
-                for policy_idx, policy_data in enumerate(section.get('policies', [])):
-                    print(f"  Policy {policy_idx + 1}: {policy_data.get('policy_title', 'N/A')}")
-                    
-                    # Create Policy
-                    policy = Policy.objects.create(
-                        FrameworkId=framework,
-                        CurrentVersion='1.0',
-                        Status=policy_data.get('Status', 'Under Review'),
-                        PolicyDescription=policy_data.get('policy_description', ''),
-                        PolicyName=policy_data.get('policy_title', 'Untitled Policy'),
-                        StartDate=date.today(),
-                        Department=policy_data.get('Department', ''),
-                        CreatedByName=policy_data.get('CreatedByName', 'Admin'),
-                        CreatedByDate=date.today(),
-                        Applicability=policy_data.get('Applicability', ''),
-                        Scope=policy_data.get('scope', ''),
-                        Objective=policy_data.get('objective', ''),
-                        Identifier=policy_data.get('policy_id', ''),
-                        PermanentTemporary='Permanent',
-                        ActiveInactive='Active',
-                        Reviewer=policy_data.get('Reviewer', ''),
-                        PolicyType=policy_data.get('policy_type', ''),
-                        PolicyCategory=policy_data.get('policy_category', ''),
-                        PolicySubCategory=policy_data.get('policy_subcategory', '')
-                    )
-                    total_policies += 1
-                    print(f"  ✅ Created Policy: {policy.PolicyId} - {policy.PolicyName}")
-                    
-                    # Step 3: Create SubPolicies for this Policy
-                    for subpolicy_idx, subpolicy_data in enumerate(policy_data.get('subpolicies', [])):
-                        subpolicy_id = subpolicy_data.get('subpolicy_id', '')
-                        print(f"    Subpolicy {subpolicy_idx + 1}: {subpolicy_data.get('subpolicy_title', 'N/A')} (ID: {subpolicy_id})")
-                        
-                        subpolicy = SubPolicy.objects.create(
-                            PolicyId=policy,
-                            SubPolicyName=subpolicy_data.get('subpolicy_title', 'Untitled SubPolicy'),
-                            CreatedByName=subpolicy_data.get('CreatedByName', 'Admin'),
-                            CreatedByDate=date.today(),
-                            Identifier=subpolicy_id,
-                            Description=subpolicy_data.get('subpolicy_description', ''),
-                            Status='Under Review',
-                            PermanentTemporary='Permanent',
-                            Control=subpolicy_data.get('control', ''),
-                            FrameworkId=framework
-                        )
-                        total_subpolicies += 1
-                        print(f"    ✅ Created SubPolicy DB ID: {subpolicy.SubPolicyId}, Identifier: {subpolicy.Identifier}")
-                        
-                        # Map subpolicy_id to SubPolicy object for compliance linking
-                        # IMPORTANT: Use the subpolicy_id as the key!
-                        subpolicy_mapping[subpolicy_id] = subpolicy
-                        print(f"    📌 Mapped '{subpolicy_id}' → SubPolicy(DB ID: {subpolicy.SubPolicyId})")
-            
-            # Step 4: Create Compliances (match by SubPolicyId)
-            print(f"\n===== CREATING COMPLIANCES =====")
-            print(f"Total compliances to process: {len(compliances_list)}")
-            print(f"SubPolicy mapping has {len(subpolicy_mapping)} entries")
-            print(f"Mapped SubPolicy IDs: {list(subpolicy_mapping.keys())}")
-            
-            for idx, compliance_data in enumerate(compliances_list):
-                subpolicy_id = compliance_data.get('SubPolicyId', '')
-                
-                print(f"\n[{idx+1}/{len(compliances_list)}] Processing compliance for SubPolicyId: {subpolicy_id}")
-                
-                # Find the SubPolicy object
-                subpolicy = subpolicy_mapping.get(subpolicy_id)
-                
-                if not subpolicy:
-                    print(f"❌ WARNING: SubPolicy not found for compliance with SubPolicyId: {subpolicy_id}")
-                    print(f"   Available SubPolicy IDs: {list(subpolicy_mapping.keys())}")
-                    continue
+        # Build the full import plan first, then validate and bulk insert it
+        framework_fields = {
+            'FrameworkName': framework_data.get('FrameworkName', 'Untitled Framework'),
+            'CurrentVersion': float(framework_data.get('CurrentVersion', 1.0)) if framework_data.get('CurrentVersion') else 1.0,
+            'FrameworkDescription': framework_data.get('FrameworkDescription', ''),
+            'EffectiveDate': framework_data.get('EffectiveDate') or date.today(),
+            'CreatedByName': framework_data.get('CreatedByName', 'Admin'),
+            'CreatedByDate': date.today(),
+            'Category': framework_data.get('Category', ''),
+            'Identifier': framework_data.get('Identifier', ''),
+            'StartDate': framework_data.get('StartDate') or date.today(),
+            'EndDate': framework_data.get('EndDate'),
+            'Status': framework_data.get('Status', 'Under Review'),
+            'ActiveInactive': framework_data.get('ActiveInactive', 'Active'),
+            'Reviewer': framework_data.get('Reviewer', ''),
+            'InternalExternal': framework_data.get('InternalExternal', 'Internal')
+        }
+        
+        policies_plan = []
+        subpolicy_mapping = {}
+        for section in sections_data:
+            for policy_data in section.get('policies', []):
+                subpolicies_plan = []
+                for subpolicy_data in policy_data.get('subpolicies', []):
+                    subpolicy_id = subpolicy_data.get('subpolicy_id', '')
+                    subpolicy_plan = {
+                        'key': subpolicy_id,
+                        'fields': {
+                            'SubPolicyName': subpolicy_data.get('subpolicy_title', 'Untitled SubPolicy'),
+                            'CreatedByName': subpolicy_data.get('CreatedByName', 'Admin'),
+                            'CreatedByDate': date.today(),
+                            'Identifier': subpolicy_id,
+                            'Description': subpolicy_data.get('subpolicy_description', ''),
+                            'Status': 'Under Review',
+                            'PermanentTemporary': 'Permanent',
+                            'Control': subpolicy_data.get('control', '')
+                        },
+                        'compliances': []
+                    }
+                    subpolicies_plan.append(subpolicy_plan)
+                    # Compliances are linked by subpolicy_id; the last subpolicy with a given id wins
+                    subpolicy_mapping[subpolicy_id] = subpolicy_plan
                 
-                try:
-                    # Prepare mitigation field (must be JSON or dict)
-                    mitigation_value = compliance_data.get('mitigation', {})
-                    if isinstance(mitigation_value, str):
-                        # If it's already a string, keep it
-                        mitigation_final = mitigation_value
-                    elif isinstance(mitigation_value, dict):
-                        # If it's a dict, leave it as dict (Django JSONField handles it)
-                        mitigation_final = mitigation_value
-                    else:
-                        mitigation_final = {}
-                    
-                    print(f"   Creating compliance: {compliance_data.get('ComplianceTitle', 'N/A')[:50]}")
-                    
-                    # Truncate fields to match model max_length constraints
-                    compliance_title = (compliance_data.get('ComplianceTitle', 'Untitled Compliance') or 'Untitled Compliance')[:145]
-                    business_units = (compliance_data.get('BusinessUnitsCovered', '') or '')[:225]
-                    created_by = (compliance_data.get('CreatedByName', 'Admin') or 'Admin')[:250]
-                    identifier = (compliance_data.get('Identifier', '') or '')[:45]
-                    applicability = (compliance_data.get('Applicability', '') or '')[:450]
-                    risk_category = (compliance_data.get('RiskCategory', '') or '')[:45]
-                    risk_business_impact = (compliance_data.get('RiskBusinessImpact', '') or '')[:45]
-                    
-                    # Create Compliance record
-                    compliance = Compliance.objects.create(
-                        SubPolicy=subpolicy,
-                        ComplianceTitle=compliance_title,
-                        ComplianceItemDescription=compliance_data.get('ComplianceItemDescription', ''),
-                        ComplianceType=compliance_data.get('ComplianceType', 'Regulatory'),
-                        Scope=compliance_data.get('Scope', ''),
-                        Objective=compliance_data.get('Objective', ''),
-                        BusinessUnitsCovered=business_units,
-                        IsRisk=bool(compliance_data.get('IsRisk', 1)),
-                        PossibleDamage=compliance_data.get('PossibleDamage', ''),
-                        mitigation=mitigation_final,
-                        Criticality=compliance_data.get('Criticality', 'Medium'),
-                        MandatoryOptional=compliance_data.get('MandatoryOptional', 'Mandatory'),
-                        ManualAutomatic=compliance_data.get('ManualAutomatic', 'Manual'),
-                        Impact=str(compliance_data.get('Impact', '5')),
-                        Probability=str(compliance_data.get('Probability', '5')),
-                        MaturityLevel=compliance_data.get('MaturityLevel', 'Initial'),
-                        ActiveInactive=compliance_data.get('ActiveInactive', 'Active'),
-                        PermanentTemporary=compliance_data.get('PermanentTemporary', 'Permanent'),
-                        CreatedByName=created_by,
-                        CreatedByDate=date.today(),
-                        ComplianceVersion=compliance_data.get('ComplianceVersion', '1.0'),
-                        Status=compliance_data.get('Status', 'Under Review'),
-                        Identifier=identifier,
-                        Applicability=applicability,
-                        PotentialRiskScenarios=compliance_data.get('PotentialRiskScenarios', ''),
-                        RiskType=compliance_data.get('RiskType', 'Current'),
-                        RiskCategory=risk_category,
-                        RiskBusinessImpact=risk_business_impact,
-                        FrameworkId=framework
-                    )
-                    total_compliances += 1
-                    print(f"   ✅ Created Compliance: {compliance.ComplianceId} - {compliance.ComplianceTitle}")
-                except Exception as comp_error:
-                    print(f"   ❌ ERROR creating compliance for SubPolicyId {subpolicy_id}:")
-                    print(f"      Error: {str(comp_error)}")
-                    print(f"      Compliance data: {json.dumps(compliance_data, indent=2)[:500]}")
-                    import traceback
-                    traceback.print_exc()
-                    # Continue with next compliance instead of failing entire transaction
-                    continue
+                policies_plan.append({
+                    'fields': {
+                        'CurrentVersion': '1.0',
+                        'Status': policy_data.get('Status', 'Under Review'),
+                        'PolicyDescription': policy_data.get('policy_description', ''),
+                        'PolicyName': policy_data.get('policy_title', 'Untitled Policy'),
+                        'StartDate': date.today(),
+                        'Department': policy_data.get('Department', ''),
+                        'CreatedByName': policy_data.get('CreatedByName', 'Admin'),
+                        'CreatedByDate': date.today(),
+                        'Applicability': policy_data.get('Applicability', ''),
+                        'Scope': policy_data.get('scope', ''),
+                        'Objective': policy_data.get('objective', ''),
+                        'Identifier': policy_data.get('policy_id', ''),
+                        'PermanentTemporary': 'Permanent',
+                        'ActiveInactive': 'Active',
+                        'Reviewer': policy_data.get('Reviewer', ''),
+                        'PolicyType': policy_data.get('policy_type', ''),
+                        'PolicyCategory': policy_data.get('policy_category', ''),
+                        'PolicySubCategory': policy_data.get('policy_subcategory', '')
+                    },
+                    'subpolicies': subpolicies_plan
+                })
+        
+        skipped_compliances = 0
+        for compliance_data in compliances_list:
+            subpolicy_id = compliance_data.get('SubPolicyId', '')
+            subpolicy_plan = subpolicy_mapping.get(subpolicy_id)
+            if not subpolicy_plan:
+                print(f"❌ WARNING: SubPolicy not found for compliance with SubPolicyId: {subpolicy_id}")
+                skipped_compliances += 1
+                continue
             
-            print(f"\n===== DATABASE SAVE COMPLETE =====")
-            print(f"Framework ID: {framework.FrameworkId}")
-            print(f"Total Policies: {total_policies}")
-            print(f"Total SubPolicies: {total_subpolicies}")
-            print(f"Total Compliances: {total_compliances}")
+            # Prepare mitigation field (must be JSON or dict)
+            mitigation_value = compliance_data.get('mitigation', {})
+            if not isinstance(mitigation_value, (str, dict)):
+                mitigation_value = {}
             
-            return JsonResponse({
-                'success': True,
-                'message': 'Successfully saved to database',
-                'framework_id': framework.FrameworkId,
-                'framework_name': framework.FrameworkName,
-                'total_policies': total_policies,
-                'total_subpolicies': total_subpolicies,
-                'total_compliances': total_compliances
+            subpolicy_plan['compliances'].append({
+                'ComplianceTitle': compliance_data.get('ComplianceTitle', 'Untitled Compliance') or 'Untitled Compliance',
+                'ComplianceItemDescription': compliance_data.get('ComplianceItemDescription', ''),
+                'ComplianceType': compliance_data.get('ComplianceType', 'Regulatory'),
+                'Scope': compliance_data.get('Scope', ''),
+                'Objective': compliance_data.get('Objective', ''),
+                'BusinessUnitsCovered': compliance_data.get('BusinessUnitsCovered', '') or '',
+                'IsRisk': bool(compliance_data.get('IsRisk', 1)),
+                'PossibleDamage': compliance_data.get('PossibleDamage', ''),
+                'mitigation': mitigation_value,
+                'Criticality': compliance_data.get('Criticality', 'Medium'),
+                'MandatoryOptional': compliance_data.get('MandatoryOptional', 'Mandatory'),
+                'ManualAutomatic': compliance_data.get('ManualAutomatic', 'Manual'),
+                'Impact': str(compliance_data.get('Impact', '5')),
+                'Probability': str(compliance_data.get('Probability', '5')),
+                'MaturityLevel': compliance_data.get('MaturityLevel', 'Initial'),
+                'ActiveInactive': compliance_data.get('ActiveInactive', 'Active'),
+                'PermanentTemporary': compliance_data.get('PermanentTemporary', 'Permanent'),
+                'CreatedByName': compliance_data.get('CreatedByName', 'Admin') or 'Admin',
+                'CreatedByDate': date.today(),
+                'ComplianceVersion': compliance_data.get('ComplianceVersion', '1.0'),
+                'Status': compliance_data.get('Status', 'Under Review'),
+                'Identifier': compliance_data.get('Identifier', '') or '',
+                'Applicability': compliance_data.get('Applicability', '') or '',
+                'PotentialRiskScenarios': compliance_data.get('PotentialRiskScenarios', ''),
+                'RiskType': compliance_data.get('RiskType', 'Current'),
+                'RiskCategory': compliance_data.get('RiskCategory', '') or '',
+                'RiskBusinessImpact': compliance_data.get('RiskBusinessImpact', '') or ''
             })
-            
+        
+        plan = FrameworkImportPlan(framework_fields, policies_plan).validate()
+        print(f"Validated import plan: {plan.total_policies} policies, {plan.total_subpolicies} subpolicies, "
+              f"{plan.total_compliances} compliances ({len(plan.warnings)} warnings)")
+        
+        if task_id:
+            update_progress(task_id, 5, "Saving framework to database...", stage='database', reset=True)
+        progress_callback = (lambda progress, message: update_progress(task_id, progress, message)) if task_id else None
+        result = import_framework(plan, progress_callback=progress_callback)
+        framework = result['framework']
+        
+        if task_id:
+            update_progress(task_id, 100, "Framework saved to database")
+        
+        print(f"\n===== DATABASE SAVE COMPLETE =====")
+        print(f"Framework ID: {framework.FrameworkId}")
+        print(f"Total Policies: {result['total_policies']}")
+        print(f"Total SubPolicies: {result['total_subpolicies']}")
+        print(f"Total Compliances: {result['total_compliances']}")
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'Successfully saved to database',
+            'framework_id': framework.FrameworkId,
+            'framework_name': framework.FrameworkName,
+            'total_policies': result['total_policies'],
+            'total_subpolicies': result['total_subpolicies'],
+            'total_compliances': result['total_compliances'],
+            'skipped_compliances': skipped_compliances,
+            'warnings': result['warnings'],
+            'renamed_identifiers': result['renamed_identifiers']
+        })
+    
+    except FrameworkImportError as e:
+        return JsonResponse({'error': str(e), 'validation_errors': e.errors}, status=400)
     except Exception as e:
         import traceback
         print(f"ERROR saving to database: {str(e)}")
@@ -2082,185 +2031,147 @@ def save_framework_to_database(request):
         
         print("Successfully loaded hierarchical JSON data")
         
-        # Start database transaction to ensure all-or-nothing save
-        with transaction.atomic():
-            # STEP 1: CREATE FRAMEWORK FIRST
-            framework_data = hierarchical_data.get('hierarchy', {}).get('level_1_framework', {})
-            if not framework_data:
-                return JsonResponse({'error': 'Framework data not found in JSON'}, status=400)
-            
-            framework_details = framework_data.get('data', {})
-            print(f"Framework details: {framework_details.get('title', 'Untitled Framework')}")
-            
-            # Format dates - handle both string formats and empty values
-            effective_date = framework_details.get('effectiveDate')
-            start_date = framework_details.get('startDate')
-            end_date = framework_details.get('endDate')
-            
-            # Convert string dates to datetime objects if they exist
-            effective_date = datetime.strptime(effective_date, '%Y-%m-%d').date() if effective_date else timezone.now().date()
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else timezone.now().date()
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
-            
-            # Create Framework record
-            framework = Framework.objects.create(
-                FrameworkName=framework_details.get('title', 'Untitled Framework'),
-                FrameworkDescription=framework_details.get('description', ''),
-                EffectiveDate=effective_date,
-                CreatedByName='System Import',
-                CreatedByDate=timezone.now().date(),
-                Category=framework_details.get('category', ''),
-                StartDate=start_date,
-                EndDate=end_date,
-                Status='Active',
-                ActiveInactive='Active',
-                Reviewer='System'
-            )
-            
-            print(f"✅ STEP 1 COMPLETED: Created framework with ID: {framework.FrameworkId}")
-            
-            # STEP 2: CREATE ALL POLICIES
-            policies = []
-            policy_mapping = {}  # Map section_name to policy object
-            
-            for policy_node in framework_data.get('children', []):
-                if policy_node.get('type') == 'policy':
-                    policy_data = policy_node.get('data', {})
-                    section_name = policy_node.get('section_name', '')
-                    
-                    print(f"Processing policy section: {section_name}")
-                    
-                    # Create Policy record
-                    policy = Policy.objects.create(
-                        FrameworkId=framework,
-                        Status='Active',
-                        PolicyDescription=policy_data.get('objective', '') or section_name,
-                        PolicyName=policy_data.get('policyName', '') or section_name,
-                        StartDate=start_date,
-                        Department=policy_data.get('department', ''),
-                        CreatedByName=policy_data.get('createdBy', 'System Import'),
-                        CreatedByDate=timezone.now().date(),
-                        Applicability=policy_data.get('applicability', ''),
-                        DocURL=policy_data.get('documentUrl', ''),
-                        Scope=policy_data.get('scope', ''),
-                        Objective=policy_data.get('objective', ''),
-                        Identifier=policy_data.get('identifier', ''),
-                        ActiveInactive='Active',
-                        Reviewer=policy_data.get('reviewer', 'System'),
-                        CoverageRate=float(policy_data.get('coverageRate', 0)) if policy_data.get('coverageRate') else 0
-                    )
-                    
-                    policies.append(policy)
-                    policy_mapping[section_name] = policy
-                    print(f"Created policy with ID: {policy.PolicyId} for section: {section_name}")
-            
-            print(f"✅ STEP 2 COMPLETED: Created {len(policies)} policies")
-            
-            # STEP 3: CREATE ALL SUB-POLICIES
-            sub_policies = []
-            sub_policy_mapping = {}  # Map for compliance linking
-            
-            for policy_node in framework_data.get('children', []):
-                if policy_node.get('type') == 'policy':
-                    section_name = policy_node.get('section_name', '')
-                    policy = policy_mapping.get(section_name)
-                    
-                    if not policy:
-                        continue
-                    
-                    for sub_policy_node in policy_node.get('children', []):
-                        if sub_policy_node.get('type') == 'sub_policy':
-                            sub_policy_data = sub_policy_node.get('data', {})
-                            
-                            print(f"Creating sub-policy: {sub_policy_data.get('sub_policy_name', 'Unnamed')}")
-                            
-                            # Create SubPolicy record
-                            sub_policy = SubPolicy.objects.create(
-                                PolicyId=policy,
-                                SubPolicyName=sub_policy_data.get('sub_policy_name', ''),
-                                CreatedByName='System Import',
-                                CreatedByDate=timezone.now().date(),
-                                Identifier=sub_policy_data.get('Sub_policy_id', ''),
-                                Description=sub_policy_data.get('control', ''),
-                                Status='Active',
-                                Control=sub_policy_data.get('control', '')
-                            )
-                            
-                            sub_policies.append(sub_policy)
-                            # Create unique key for compliance mapping
-                            sub_policy_key = f"{section_name}_{sub_policy_data.get('Sub_policy_id', '')}"
-                            sub_policy_mapping[sub_policy_key] = {
-                                'sub_policy': sub_policy,
-                                'compliance_nodes': sub_policy_node.get('children', [])
-                            }
-                            print(f"Created sub-policy with ID: {sub_policy.SubPolicyId} - {sub_policy.SubPolicyName}")
-            
-            print(f"✅ STEP 3 COMPLETED: Created {len(sub_policies)} sub-policies")
+        # STEP 1: BUILD FRAMEWORK FIELDS
+        framework_data = hierarchical_data.get('hierarchy', {}).get('level_1_framework', {})
+        if not framework_data:
+            return JsonResponse({'error': 'Framework data not found in JSON'}, status=400)
+        
+        framework_details = framework_data.get('data', {})
+        print(f"Framework details: {framework_details.get('title', 'Untitled Framework')}")
+        
+        # Format dates - handle both string formats and empty values
+        effective_date = framework_details.get('effectiveDate')
+        start_date = framework_details.get('startDate')
+        end_date = framework_details.get('endDate')
+        
+        # Convert string dates to datetime objects if they exist
+        effective_date = datetime.strptime(effective_date, '%Y-%m-%d').date() if effective_date else timezone.now().date()
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else timezone.now().date()
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        today = timezone.now().date()
+        
+        framework_fields = {
+            'FrameworkName': framework_details.get('title', 'Untitled Framework'),
+            'FrameworkDescription': framework_details.get('description', ''),
+            'EffectiveDate': effective_date,
+            'CreatedByName': 'System Import',
+            'CreatedByDate': today,
+            'Category': framework_details.get('category', ''),
+            'StartDate': start_date,
+            'EndDate': end_date,
+            'Status': 'Active',
+            'ActiveInactive': 'Active',
+            'Reviewer': 'System'
+        }
+        
+        # STEP 2: BUILD POLICY -> SUB-POLICY -> COMPLIANCE PLAN
+        policies_plan = []
+        for policy_node in framework_data.get('children', []):
+            if policy_node.get('type') != 'policy':
+                continue
+            policy_data = policy_node.get('data', {})
+            section_name = policy_node.get('section_name', '')
             
-            # STEP 4: CREATE ALL COMPLIANCE ITEMS
-            compliance_items = []
-            total_compliance_count = 0
-
-            for sub_policy_key, sub_policy_info in sub_policy_mapping.items():
-                sub_policy = sub_policy_info['sub_policy']
-                print(f"Processing compliance for sub-policy: {sub_policy.SubPolicyName} (ID: {sub_policy.SubPolicyId})")
-                compliance_nodes = sub_policy_info['compliance_nodes']
+            subpolicies_plan = []
+            for sub_policy_node in policy_node.get('children', []):
+                if sub_policy_node.get('type') != 'sub_policy':
+                    continue
+                sub_policy_data = sub_policy_node.get('data', {})
                 
-                compliance_count_for_subpolicy = 0
-                for compliance_node in compliance_nodes:
-                    if compliance_node.get('type') == 'compliance':
-                        compliance_data = compliance_node.get('data', {})
-                        print(f"Compliance data for {sub_policy.SubPolicyName}:", compliance_data)
-                        
-                        # Create Compliance record with corrected field names
-                        compliance_obj = Compliance.objects.create(
-                            SubPolicy=sub_policy,  # Changed from SubPolicyId to SubPolicy
-                            ComplianceItemDescription=compliance_data.get('description', '')[:500] if compliance_data.get('description') else '',
-                            Status=compliance_data.get('status', 'pending')[:50] if compliance_data.get('status') else 'pending',
-                            CreatedByName=compliance_data.get('assignee', 'System')[:250] if compliance_data.get('assignee') else 'System',
-                            
-                            # Static values for remaining fields
-                            IsRisk=False,
-                            PossibleDamage='',
-                            mitigation='{}',  # Changed from Mitigation to mitigation (lowercase)
-                            Criticality='Medium',
-                            MandatoryOptional='Optional',
-                            ManualAutomatic='Manual',
-                            Impact='0.0',  # Changed to string since model field is CharField
-                            Probability='0.0',  # Changed to string since model field is CharField
-                            ActiveInactive='Active',
-                            PermanentTemporary='Permanent',
-                            CreatedByDate=timezone.now().date(),
-                            ComplianceVersion='1.0',
-                            Identifier=compliance_data.get('letter', 'a')[:45] if compliance_data.get('letter') else 'a',
-                            MaturityLevel='Initial'
-                        )
+                compliances_plan = []
+                for compliance_node in sub_policy_node.get('children', []):
+                    if compliance_node.get('type') != 'compliance':
+                        continue
+                    compliance_data = compliance_node.get('data', {})
+                    compliances_plan.append({
+                        'ComplianceItemDescription': compliance_data.get('description', '')[:500] if compliance_data.get('description') else '',
+                        'Status': compliance_data.get('status', 'pending') or 'pending',
+                        'CreatedByName': compliance_data.get('assignee', 'System') or 'System',
                         
-                        compliance_items.append(compliance_obj)
-                        compliance_count_for_subpolicy += 1
-                        total_compliance_count += 1
-                        print(f"Created compliance item with ID: {compliance_obj.ComplianceId} for sub-policy: {sub_policy.SubPolicyName}")
+                        # Static values for remaining fields
+                        'IsRisk': False,
+                        'PossibleDamage': '',
+                        'mitigation': '{}',
+                        'Criticality': 'Medium',
+                        'MandatoryOptional': 'Optional',
+                        'ManualAutomatic': 'Manual',
+                        'Impact': '0.0',
+                        'Probability': '0.0',
+                        'ActiveInactive': 'Active',
+                        'PermanentTemporary': 'Permanent',
+                        'CreatedByDate': today,
+                        'ComplianceVersion': '1.0',
+                        'Identifier': compliance_data.get('letter', 'a') or 'a',
+                        'MaturityLevel': 'Initial'
+                    })
                 
-                print(f"Created {compliance_count_for_subpolicy} compliance items for sub-policy: {sub_policy.SubPolicyName}")
-
-            print(f"✅ STEP 4 COMPLETED: Created {total_compliance_count} compliance items")
-              # STEP 5: FINALIZE AND RETURN                   
-            # Return success with all counts
-            print(f"===== DATABASE SAVE COMPLETED SUCCESSFULLY =====")
-            print(f"Framework ID: {framework.FrameworkId}")
-            print(f"Total policies: {len(policies)}")
-            print(f"Total sub-policies: {len(sub_policies)}")
-            print(f"Total compliance items: {total_compliance_count}")
+                subpolicies_plan.append({
+                    'key': f"{section_name}_{sub_policy_data.get('Sub_policy_id', '')}",
+                    'fields': {
+                        'SubPolicyName': sub_policy_data.get('sub_policy_name', ''),
+                        'CreatedByName': 'System Import',
+                        'CreatedByDate': today,
+                        'Identifier': sub_policy_data.get('Sub_policy_id', ''),
+                        'Description': sub_policy_data.get('control', ''),
+                        'Status': 'Active',
+                        'Control': sub_policy_data.get('control', '')
+                    },
+                    'compliances': compliances_plan
+                })
             
-            return JsonResponse({
-                'message': 'Framework, policies, sub-policies, and compliance items saved to database successfully',
-                'framework_id': framework.FrameworkId,
-                'framework_name': framework.FrameworkName,
-                'total_policies': len(policies),
-                'total_sub_policies': len(sub_policies),
-                'total_compliance_items': total_compliance_count
+            policies_plan.append({
+                'fields': {
+                    'Status': 'Active',
+                    'PolicyDescription': policy_data.get('objective', '') or section_name,
+                    'PolicyName': policy_data.get('policyName', '') or section_name,
+                    'StartDate': start_date,
+                    'Department': policy_data.get('department', ''),
+                    'CreatedByName': policy_data.get('createdBy', 'System Import'),
+                    'CreatedByDate': today,
+                    'Applicability': policy_data.get('applicability', ''),
+                    'DocURL': policy_data.get('documentUrl', ''),
+                    'Scope': policy_data.get('scope', ''),
+                    'Objective': policy_data.get('objective', ''),
+                    'Identifier': policy_data.get('identifier', ''),
+                    'ActiveInactive': 'Active',
+                    'Reviewer': policy_data.get('reviewer', 'System'),
+                    'CoverageRate': float(policy_data.get('coverageRate', 0)) if policy_data.get('coverageRate') else 0
+                },
+                'subpolicies': subpolicies_plan
             })
+        
+        # STEP 3: VALIDATE THE WHOLE STRUCTURE, THEN BULK INSERT EACH LEVEL
+        plan = FrameworkImportPlan(framework_fields, policies_plan).validate()
+        print(f"Validated import plan: {plan.total_policies} policies, {plan.total_subpolicies} sub-policies, "
+              f"{plan.total_compliances} compliance items ({len(plan.warnings)} warnings)")
+        
+        update_progress(task_id, 5, "Saving framework to database...", stage='database', reset=True)
+        result = import_framework(
+            plan,
+            progress_callback=lambda progress, message: update_progress(task_id, progress, message)
+        )
+        framework = result['framework']
+        update_progress(task_id, 100, "Framework saved to database")
+        
+        print(f"===== DATABASE SAVE COMPLETED SUCCESSFULLY =====")
+        print(f"Framework ID: {framework.FrameworkId}")
+        print(f"Total policies: {result['total_policies']}")
+        print(f"Total sub-policies: {result['total_subpolicies']}")
+        print(f"Total compliance items: {result['total_compliances']}")
+        
+        return JsonResponse({
+            'message': 'Framework, policies, sub-policies, and compliance items saved to database successfully',
+            'framework_id': framework.FrameworkId,
+            'framework_name': framework.FrameworkName,
+            'total_policies': result['total_policies'],
+            'total_sub_policies': result['total_subpolicies'],
+            'total_compliance_items': result['total_compliances'],
+            'warnings': result['warnings'],
+            'renamed_identifiers': result['renamed_identifiers']
+        })
     
+    except FrameworkImportError as e:
+        return JsonResponse({'error': str(e), 'validation_errors': e.errors}, status=400)
     except Exception as e:
         print(f"===== ERROR SAVING TO DATABASE =====")
         print(f"Error: {str(e)}")
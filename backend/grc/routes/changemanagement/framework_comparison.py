@@ -14,6 +14,7 @@ from rest_framework.decorators import api_view, authentication_classes, permissi
 from rest_framework.response import Response
 from rest_framework import status
 from grc.models import Framework, Policy, SubPolicy, Compliance
+from grc.routes.Global.http_client import get_client
 from .similarity_matcher import get_similarity_matcher
 from .framework_update_checker import run_framework_update_check
 from .downloads_scanner import scan_downloads_folder, DownloadsScanner
@@ -27,7 +28,6 @@ logger = logging.getLogger(__name__)
 def _call_openai_for_compliance_matching(amendment_compliance: dict, db_compliances: list, framework_name: str) -> dict:
     """Use OpenAI to match an amendment compliance against database compliances"""
     try:
-        import requests
         import json
         
         api_key = getattr(settings, 'OPENAI_API_KEY', '')
@@ -94,7 +94,7 @@ JSON:"""
             'max_tokens': 500
         }
         
-        response = requests.post(
+        response = get_client('openai').post(
             'https://api.openai.com/v1/chat/completions',
             headers=headers,
             json=payload,
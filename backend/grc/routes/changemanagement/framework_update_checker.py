@@ -5,6 +5,7 @@ from datetime import datetime
 from typing import Optional
 
 import requests
+from grc.routes.Global.http_client import get_client
 
 
 def create_system_prompt(framework_name: str, last_updated_date: str) -> str:
@@ -187,7 +188,7 @@ def query_perplexity_api(framework_name: str, last_updated_date: str, api_key: s
         "max_tokens": 800,
     }
 
-    response = requests.post(
+    response = get_client('perplexity').post(
         "https://api.perplexity.ai/chat/completions",
         headers=headers,
         json=payload,
@@ -500,7 +501,7 @@ Respond with ONLY the PDF URL or "NOT_FOUND" if no direct AMENDMENT PDF download
     }
     
     try:
-        response = requests.post(
+        response = get_client('perplexity').post(
             "https://api.perplexity.ai/chat/completions",
             headers=headers,
             json=payload,
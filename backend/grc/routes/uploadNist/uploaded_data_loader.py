@@ -1,6 +1,9 @@
 import os
 import json
 import logging
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Union
 from django.conf import settings
@@ -330,107 +333,170 @@ def build_sections_from_index(index_data: Dict) -> List[Dict]:
     logger.info(f"✓ Built {len(sections)} sections from index")
     return sections
 
-def _get_policies_for_section_internal(policies_data: List[Dict], section_folder: str) -> List[Dict]:
-    """Get policies for a specific section from policies data."""
-    logger.info(f"[MATCH] Looking for policies in section: '{section_folder}'")
-    
-    if not policies_data or not isinstance(policies_data, list):
-        logger.warning("No policies data provided or invalid format")
-        return []
-    
-    policies = []
-    
-    try:
-        # Normalize section folder for comparison
-        section_folder_normalized = section_folder.replace('\\', '/').strip('/').lower()
+def _normalize_folder(folder: str) -> str:
+    """Normalize a section folder path for comparison."""
+    return (folder or '').replace('\\', '/').strip('/').lower()
+
+def _format_policy(policy: Dict) -> Dict:
+    """Shape one extracted policy (with its subpolicies) for the section review UI."""
+    subpolicies_raw = policy.get('subpolicies', [])
+    if not isinstance(subpolicies_raw, list):
+        subpolicies_raw = []
+    
+    subpolicies = []
+    for subpolicy in subpolicies_raw:
+        if isinstance(subpolicy, dict):
+            subpolicies.append({
+                'subpolicy_id': subpolicy.get('subpolicy_id', ''),
+                'subpolicy_title': subpolicy.get('subpolicy_title', ''),
+                'subpolicy_description': subpolicy.get('subpolicy_description', ''),
+                'subpolicy_text': subpolicy.get('subpolicy_text', ''),
+                'control': subpolicy.get('control', ''),
+                'selected': False
+            })
+    
+    return {
+        'policy_id': policy.get('policy_id', ''),
+        'policy_title': policy.get('policy_title', 'Unnamed Policy'),
+        'policy_description': policy.get('policy_description', ''),
+        'policy_text': policy.get('policy_text', ''),
+        'scope': policy.get('scope', ''),
+        'objective': policy.get('objective', ''),
+        'policy_type': policy.get('policy_type', ''),
+        'policy_category': policy.get('policy_category', ''),
+        'policy_subcategory': policy.get('policy_subcategory', ''),
+        'selected': False,
+        'expanded': False,
+        'subpolicies': subpolicies
+    }
+
+class UploadedPoliciesIndex:
+    """
+    Parsed all_policies.json with lookups by section folder and policy id.
+    
+    Entries are normalized once. A section lookup returns the policies of the
+    folder itself and of every child folder, in the same order as the file.
+    Returned lists are shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, policies_data: List[Dict]):
+        self.entry_count = 0
+        # normalized folder -> [(entry position, [formatted policies])]
+        self._by_folder: Dict[str, List] = {}
+        self._section_cache: Dict[str, List[Dict]] = {}
+        self._policy_cache: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        
+        if not isinstance(policies_data, list):
+            policies_data = []
         
-        # Find policies for this section
-        for policy_entry in policies_data:
+        for position, policy_entry in enumerate(policies_data):
             if not isinstance(policy_entry, dict):
                 continue
-                
             section_info = policy_entry.get('section_info', {})
-            if not isinstance(section_info, dict):
+            analysis = policy_entry.get('analysis', {})
+            if not isinstance(section_info, dict) or not isinstance(analysis, dict):
+                continue
+            entry_policies = analysis.get('policies', [])
+            if not isinstance(entry_policies, list):
                 continue
-                
-            entry_folder = section_info.get('folder_path', '')
-            entry_folder_normalized = entry_folder.replace('\\', '/').strip('/').lower()
-            
-            # Match: exact match OR entry is a child of section
-            is_match = (
-                entry_folder_normalized == section_folder_normalized or
-                entry_folder_normalized.startswith(section_folder_normalized + '/')
-            )
             
-            if is_match:
-                logger.info(f"[MATCH] ✓ Found match: '{entry_folder}' matches '{section_folder}'")
-                
-                analysis = policy_entry.get('analysis', {})
-                if not isinstance(analysis, dict):
-                    continue
-                    
-                entry_policies = analysis.get('policies', [])
-                if not isinstance(entry_policies, list):
-                    continue
-                
-                # Add each policy with ALL details
-                for policy in entry_policies:
-                    if not isinstance(policy, dict):
-                        continue
-                        
-                    policy_id = policy.get('policy_id', '')
-                    policy_title = policy.get('policy_title', 'Unnamed Policy')
-                    policy_description = policy.get('policy_description', '')
-                    policy_text = policy.get('policy_text', '')
-                    scope = policy.get('scope', '')
-                    objective = policy.get('objective', '')
-                    policy_type = policy.get('policy_type', '')
-                    policy_category = policy.get('policy_category', '')
-                    policy_subcategory = policy.get('policy_subcategory', '')
-                    
-                    # Get subpolicies with all their details
-                    subpolicies_raw = policy.get('subpolicies', [])
-                    if not isinstance(subpolicies_raw, list):
-                        subpolicies_raw = []
-                    
-                    # Format subpolicies properly
-                    subpolicies = []
-                    for subpolicy in subpolicies_raw:
-                        if isinstance(subpolicy, dict):
-                            formatted_subpolicy = {
-                                'subpolicy_id': subpolicy.get('subpolicy_id', ''),
-                                'subpolicy_title': subpolicy.get('subpolicy_title', ''),
-                                'subpolicy_description': subpolicy.get('subpolicy_description', ''),
-                                'subpolicy_text': subpolicy.get('subpolicy_text', ''),
-                                'control': subpolicy.get('control', ''),
-                                'selected': False
-                            }
-                            subpolicies.append(formatted_subpolicy)
-                    
-                    policy_data = {
-                        'policy_id': policy_id,
-                        'policy_title': policy_title,
-                        'policy_description': policy_description,
-                        'policy_text': policy_text,
-                        'scope': scope,
-                        'objective': objective,
-                        'policy_type': policy_type,
-                        'policy_category': policy_category,
-                        'policy_subcategory': policy_subcategory,
-                        'selected': False,
-                        'expanded': False,
-                        'subpolicies': subpolicies
-                    }
-                    
-                    policies.append(policy_data)
-                    logger.info(f"[MATCH] ✓ Added policy: '{policy_title}' with {len(subpolicies)} subpolicies")
+            folder = _normalize_folder(section_info.get('folder_path', ''))
+            formatted = [_format_policy(p) for p in entry_policies if isinstance(p, dict)]
+            self._by_folder.setdefault(folder, []).append((position, formatted))
+            self.entry_count += 1
+        
+        self._sorted_folders = sorted(self._by_folder)
+    
+    def policies_for_section(self, section_folder: str) -> List[Dict]:
+        """Policies for a section folder and all of its child folders."""
+        key = _normalize_folder(section_folder)
+        cached = self._section_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        matches = list(self._by_folder.get(key, []))
+        # Child folders sort directly after "<key>/" so a bisect finds the whole range
+        prefix = key + '/'
+        start = bisect_left(self._sorted_folders, prefix)
+        for folder in self._sorted_folders[start:]:
+            if not folder.startswith(prefix):
+                break
+            matches.extend(self._by_folder[folder])
+        matches.sort(key=lambda item: item[0])
+        
+        policies = [policy for _, entry_policies in matches for policy in entry_policies]
+        with self._lock:
+            self._section_cache[key] = policies
+        return policies
+    
+    def get_policy(self, section_folder: str, policy_id: str) -> Optional[Dict]:
+        """First policy with policy_id inside a section, or None."""
+        key = _normalize_folder(section_folder)
+        by_id = self._policy_cache.get(key)
+        if by_id is None:
+            by_id = {}
+            for policy in self.policies_for_section(section_folder):
+                by_id.setdefault(policy.get('policy_id'), policy)
+            with self._lock:
+                self._policy_cache[key] = by_id
+        return by_id.get(policy_id)
+
+# all_policies.json path -> (mtime_ns, size, UploadedPoliciesIndex)
+_policies_index_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_policies_index_lock = threading.Lock()
+POLICIES_INDEX_CACHE_SIZE = getattr(settings, 'UPLOADED_POLICIES_INDEX_CACHE_SIZE', 32)
+
+def get_uploaded_policies_index(user_id: str) -> Optional[UploadedPoliciesIndex]:
+    """
+    Return the cached policies index for a user's upload.
     
+    The cache entry is rebuilt when all_policies.json changes size or mtime, and
+    the least recently used uploads are evicted once the cache is full.
+    """
+    policies_folder = get_policies_folder(user_id)
+    if not policies_folder:
+        return None
+    
+    policies_json_path = policies_folder / "all_policies.json"
+    try:
+        stat = policies_json_path.stat()
+    except OSError:
+        logger.warning(f"all_policies.json not found in {policies_folder}")
+        return None
+    
+    cache_key = str(policies_json_path)
+    with _policies_index_lock:
+        cached = _policies_index_cache.get(cache_key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            _policies_index_cache.move_to_end(cache_key)
+            return cached[2]
+    
+    try:
+        with open(policies_json_path, 'r', encoding='utf-8') as f:
+            policies_data = json.load(f)
     except Exception as e:
-        logger.error(f"Error getting policies for section {section_folder}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error loading all_policies.json: {str(e)}")
+        return None
+    
+    index = UploadedPoliciesIndex(policies_data)
+    logger.info(f"Indexed all_policies.json for user {user_id}: {index.entry_count} entries")
+    
+    with _policies_index_lock:
+        _policies_index_cache[cache_key] = (stat.st_mtime_ns, stat.st_size, index)
+        _policies_index_cache.move_to_end(cache_key)
+        while len(_policies_index_cache) > POLICIES_INDEX_CACHE_SIZE:
+            _policies_index_cache.popitem(last=False)
+    return index
+
+def _get_policies_for_section_internal(policies_data: List[Dict], section_folder: str) -> List[Dict]:
+    """Get policies for a specific section from policies data."""
+    if not policies_data or not isinstance(policies_data, list):
+        logger.warning("No policies data provided or invalid format")
+        return []
     
-    logger.info(f"[MATCH] ✓ FINAL: Found {len(policies)} total policies for section '{section_folder}'")
+    policies = UploadedPoliciesIndex(policies_data).policies_for_section(section_folder)
+    logger.info(f"[MATCH] Found {len(policies)} total policies for section '{section_folder}'")
     return policies
 
 def build_complete_structure(user_id: str) -> List[Dict]:
@@ -441,7 +507,7 @@ def build_complete_structure(user_id: str) -> List[Dict]:
     
     # Get sections folder and policies data
     sections_folder = get_sections_folder(user_id)
-    policies_data = get_all_policies_json(user_id)
+    policies_index = get_uploaded_policies_index(user_id)
     
     # Try to get sections_index.json first (most reliable), then PDF index
     sections_index_data = get_sections_index_json(user_id)
@@ -470,8 +536,8 @@ def build_complete_structure(user_id: str) -> List[Dict]:
     logger.info(f"[BUILD] ✓ Built {len(sections)} sections")
     
     # If we have policies data, populate the policies for each section
-    if policies_data:
-        logger.info(f"[BUILD] Populating policies from {len(policies_data)} policy entries")
+    if policies_index:
+        logger.info(f"[BUILD] Populating policies from {policies_index.entry_count} policy entries")
         
         for idx, section in enumerate(sections):
             section_folder = section.get('folder', '')
@@ -479,7 +545,7 @@ def build_complete_structure(user_id: str) -> List[Dict]:
             
             logger.info(f"[BUILD] Section {idx+1}/{len(sections)}: '{section_title}' (folder: {section_folder})")
             
-            section_policies = _get_policies_for_section_internal(policies_data, section_folder)
+            section_policies = policies_index.policies_for_section(section_folder)
             section['policies'] = section_policies
             
             # Count total policies and subpolicies
@@ -604,11 +670,11 @@ def get_uploaded_policies_for_section(request, user_id, section_folder):
     logger.info(f"Getting policies for user {user_id}, section {section_folder}")
     
     try:
-        policies_data = get_all_policies_json(user_id)
-        if not policies_data:
+        policies_index = get_uploaded_policies_index(user_id)
+        if not policies_index or not policies_index.entry_count:
             return JsonResponse({'error': 'Policies data not found'}, status=404)
         
-        policies = _get_policies_for_section_internal(policies_data, section_folder)
+        policies = policies_index.policies_for_section(section_folder)
         return JsonResponse({'policies': policies})
     except Exception as e:
         logger.error(f"Error getting policies for section: {str(e)}")
@@ -622,14 +688,12 @@ def get_uploaded_subpolicies_for_policy(request, user_id, section_folder, policy
     logger.info(f"Getting subpolicies for user {user_id}, section {section_folder}, policy {policy_id}")
     
     try:
-        policies_data = get_all_policies_json(user_id)
-        if not policies_data:
+        policies_index = get_uploaded_policies_index(user_id)
+        if not policies_index or not policies_index.entry_count:
             return JsonResponse({'error': 'Policies data not found'}, status=404)
         
-        policies = _get_policies_for_section_internal(policies_data, section_folder)
-        
         # Find the specific policy
-        policy = next((p for p in policies if p.get('policy_id') == policy_id), None)
+        policy = policies_index.get_policy(section_folder, policy_id)
         if not policy:
             return JsonResponse({'error': 'Policy not found'}, status=404)
         
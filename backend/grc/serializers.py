@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Framework, Policy, SubPolicy, PolicyApproval, ComplianceApproval, ExportTask, Notification, S3File, PolicyCategory ,Entity
 from datetime import date
 from django.contrib.auth.models import User
+from django.db.models import Exists, OuterRef
 from datetime import date
 
 # Import all models
@@ -11,19 +12,30 @@ from .models import (
     ComplianceApproval, ExportTask, LastChecklistItemVerified, Notification, S3File, 
     PolicyCategory, RiskAssignment
 )
+from .routes.Global.query_planning import PlannedSerializerMixin, QueryPlan, planned_prefetch
 
 # =============================================================================
 # FRAMEWORK MODULE SERIALIZERS
 # =============================================================================
 
-class FrameworkSerializer(serializers.ModelSerializer):
+class FrameworkSerializer(PlannedSerializerMixin, serializers.ModelSerializer):
     policies = serializers.SerializerMethodField()
     CreatedByName = serializers.CharField(required=False, allow_blank=True)
     Reviewer = serializers.CharField(required=False, allow_blank=True)
     
+    query_plan = QueryPlan(prefetch_related=[
+        lambda: planned_prefetch(
+            PolicySerializer, 'policy_set',
+            Policy.objects.filter(Status='Approved', ActiveInactive='Active'),
+            to_attr='approved_active_policies'
+        ),
+    ])
+    
     def get_policies(self, obj):
         # Filter policies to only include Approved and Active ones
-        policies = obj.policy_set.filter(Status='Approved', ActiveInactive='Active')
+        policies = getattr(obj, 'approved_active_policies', None)
+        if policies is None:
+            policies = obj.policy_set.filter(Status='Approved', ActiveInactive='Active')
         return PolicySerializer(policies, many=True).data
     
     class Meta:
@@ -42,7 +54,7 @@ class FrameworkSerializer(serializers.ModelSerializer):
 
 
 
-class PolicySerializer(serializers.ModelSerializer):
+class PolicySerializer(PlannedSerializerMixin, serializers.ModelSerializer):
     FrameworkCategory = serializers.CharField(source='FrameworkId.Category', read_only=True)
     FrameworkName = serializers.CharField(source='FrameworkId.FrameworkName', read_only=True)
     subpolicies = serializers.SerializerMethodField()
@@ -52,6 +64,8 @@ class PolicySerializer(serializers.ModelSerializer):
     ActiveInactive = serializers.CharField(required=False, default='Inactive')
     CoverageRate = serializers.FloatField(required=False, allow_null=True)
 
+    query_plan = QueryPlan(select_related=['FrameworkId'], prefetch_related=['subpolicy_set'])
+
     def get_subpolicies(self, obj):
         # Get all subpolicies without filtering by status
         subpolicies = obj.subpolicy_set.all()
@@ -365,7 +379,7 @@ class AuditSerializer(serializers.ModelSerializer):
         fields = ['AuditId', 'Assignee', 'Auditor', 'Reviewer', 'FrameworkId', 'PolicyId', 'DueDate', 'Frequency', 'AuditType', 'Status']
 
 
-class AuditFindingSerializer(serializers.ModelSerializer):
+class AuditFindingSerializer(PlannedSerializerMixin, serializers.ModelSerializer):
     ComplianceDetails = serializers.SerializerMethodField()
     compliance_name = serializers.SerializerMethodField()
     compliance_mitigation = serializers.SerializerMethodField()
@@ -378,6 +392,8 @@ class AuditFindingSerializer(serializers.ModelSerializer):
         help_text="Framework ID is optional - only add if framework is selected"
     )
 
+    query_plan = QueryPlan(select_related=['ComplianceId'])
+
     class Meta:
         model = AuditFinding
         fields = '__all__'
@@ -401,14 +417,20 @@ class AuditFindingSerializer(serializers.ModelSerializer):
 # INCIDENT MODULE SERIALIZERS
 # =============================================================================
 
-class IncidentSerializer(serializers.ModelSerializer):
+class IncidentSerializer(PlannedSerializerMixin, serializers.ModelSerializer):
     has_risk_instance = serializers.SerializerMethodField()
     
+    query_plan = QueryPlan(annotations={
+        'risk_instance_exists': lambda: Exists(RiskInstance.objects.filter(IncidentId=OuterRef('IncidentId'))),
+    })
+    
     class Meta:
         model = Incident
         fields = '__all__'
     
     def get_has_risk_instance(self, obj):
+        if hasattr(obj, 'risk_instance_exists'):
+            return bool(obj.risk_instance_exists)
         return RiskInstance.objects.filter(IncidentId=obj.IncidentId).exists()
 
 
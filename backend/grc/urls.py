@@ -25,7 +25,7 @@ from .routes.changemanagement import framework_comparison
 from .routes.Tree import tree
 from .routes.Integrations.Bamboohr.bamboohr import (
     bamboohr_oauth, bamboohr_oauth_callback, bamboohr_stored_data,
-    bamboohr_employees, bamboohr_departments, bamboohr_sync_data, 
+    bamboohr_employees, bamboohr_departments, bamboohr_sync_data, bamboohr_sync_status,
     bamboohr_reports, bamboohr_add_user
 )
 
@@ -35,7 +35,7 @@ from .routes.Integrations.Sentinel.sentinel import (
     sentinel_oauth_callback, sentinel_disconnect, sentinel_check_status,
     get_sentinel_alerts, get_sentinel_stats, get_sentinel_incident,
     receive_incident_webhook, get_received_incidents,
-    save_sentinel_incident, get_saved_incidents
+    save_sentinel_incident, get_saved_incidents, sync_sentinel_incidents
 )
 from .routes.Policy.policy import (
 
@@ -162,6 +162,12 @@ from .routes.UploadFramework.upload_framework import (
 
 )
 
+from .routes.UploadFramework.task_progress import (
+
+    wait_processing_status, stream_processing_status
+
+)
+
 from .routes.uploadNist.checked_sections import (
 
     save_selected_sections, get_checked_sections, delete_checked_sections,
@@ -407,7 +413,9 @@ from .routes.Global.notifications import (
 
     push_notification, get_notifications,
 
-    mark_as_read, mark_all_as_read
+    mark_as_read, mark_all_as_read,
+
+    get_unread_count, notification_stream
 
 )
 
@@ -971,6 +979,10 @@ policy_urlpatterns = [
 
     path('processing-status/<str:task_id>/', get_processing_status, name='processing-status'),
 
+    path('processing-status/<str:task_id>/wait/', wait_processing_status, name='processing-status-wait'),
+
+    path('processing-status/<str:task_id>/stream/', stream_processing_status, name='processing-status-stream'),
+
     path('processing-status-new/<str:task_id>/', new_get_processing_status, name='processing-status-new'),
 
     path('get-sections/<str:task_id>/', get_sections, name='get-sections'),
@@ -2559,6 +2571,14 @@ notification_urlpatterns = [
 
     path('api/mark-all-as-read/', mark_all_as_read, name='api-mark-all-as-read'),
 
+    path('notifications/unread-count/', get_unread_count, name='notifications-unread-count'),
+
+    path('api/notifications/unread-count/', get_unread_count, name='api-notifications-unread-count'),
+
+    path('notifications/stream/', notification_stream, name='notifications-stream'),
+
+    path('api/notifications/stream/', notification_stream, name='api-notifications-stream'),
+
 ]
 
 
@@ -2789,6 +2809,7 @@ path('bamboohr/oauth/', bamboohr_oauth, name='bamboohr-oauth'),
     path('bamboohr/employees/', bamboohr_employees, name='bamboohr-employees'),
     path('bamboohr/departments/', bamboohr_departments, name='bamboohr-departments'),
     path('bamboohr/sync-data/', bamboohr_sync_data, name='bamboohr-sync-data'),
+    path('bamboohr/sync-status/', bamboohr_sync_status, name='bamboohr-sync-status'),
     path('bamboohr/reports/', bamboohr_reports, name='bamboohr-reports'),
     path('bamboohr/add-user/', bamboohr_add_user, name='bamboohr-add-user'),
 # ========================================================================
@@ -2814,6 +2835,7 @@ path('bamboohr/oauth/', bamboohr_oauth, name='bamboohr-oauth'),
     # Sentinel database operations
     path('sentinel/save-incident/', save_sentinel_incident, name='sentinel-save-incident'),
     path('sentinel/saved-incidents/', get_saved_incidents, name='sentinel-get-saved-incidents'),
+    path('sentinel/sync-incidents/', sync_sentinel_incidents, name='sentinel-sync-incidents'),
  
 
  
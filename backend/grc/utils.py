@@ -1,6 +1,6 @@
 from django.utils.dateparse import parse_date as django_parse_date
 from datetime import datetime
-import requests
+from .routes.Global.http_client import get_client
 from .models import GRCLog
 
 def parse_date(date_str):
@@ -69,7 +69,7 @@ def send_log(module, actionType, description=None, userId=None, userName=None,
                 # Clean out None values
                 api_log_data = {k: v for k, v in api_log_data.items() if v is not None}
                
-                response = requests.post(LOGGING_SERVICE_URL, json=api_log_data)
+                response = get_client('logging_service').post(LOGGING_SERVICE_URL, json=api_log_data)
                 if response.status_code != 200:
                     print(f"Failed to send log to service: {response.text}")
         except Exception as e: